@@ -18,6 +18,7 @@ from .illustrator_reviewer import IllustratorReviewerAgent
 from .designer_reviewer import DesignerReviewerAgent
 from .image_validator import ImageValidatorAgent
 from .iterative_fix import IterativeFixAgent
+from .edition_translator import EditionTranslatorAgent
 
 __all__ = [
     "AgentBase",
@@ -34,4 +35,5 @@ __all__ = [
     "DesignerReviewerAgent",
     "ImageValidatorAgent",
     "IterativeFixAgent",
+    "EditionTranslatorAgent",
 ]
@@ -4,6 +4,7 @@ Base Agent Interface
 Abstract base class for all agents in the pipeline.
 """
 
+import time
 from abc import ABC, abstractmethod
 from typing import Any, TypeVar, Generic
 from logging import Logger
@@ -12,6 +13,9 @@ import sys
 sys.path.append('..')
 
 from clients.gemini_client import GeminiClient
+from utils.job_context import stage_context
+from utils.metrics import AGENT_DURATION
+from utils.tracing import span
 
 InputT = TypeVar('InputT')
 OutputT = TypeVar('OutputT')
@@ -118,25 +122,31 @@ class AgentBase(ABC, Generic[InputT, OutputT]):
             ValueError: If input validation fails
         """
         self.logger.info(f"[{self.name}] Starting execution")
+        started = time.perf_counter()
         
         # Validate input
         if not await self.validate_input(input_data):
             self.logger.error(f"[{self.name}] Input validation failed")
+            AGENT_DURATION.observe(time.perf_counter() - started, agent=self.name, outcome="invalid_input")
             raise ValueError(f"Invalid input for {self.name}")
         
-        # Pre-process
-        processed_input = await self.pre_process(input_data)
-        
-        # Main execution
-        try:
-            result = await self.run(processed_input)
-        except Exception as e:
-            self.logger.error(f"[{self.name}] Execution failed: {str(e)}")
-            raise
-        
-        # Post-process
-        final_result = await self.post_process(result)
+        # Model calls made by this agent are labelled with its name
+        with stage_context(self.name), span(f"agent.{self.name}", agent=self.name):
+            # Pre-process
+            processed_input = await self.pre_process(input_data)
+            
+            # Main execution
+            try:
+                result = await self.run(processed_input)
+            except Exception as e:
+                self.logger.error(f"[{self.name}] Execution failed: {str(e)}")
+                AGENT_DURATION.observe(time.perf_counter() - started, agent=self.name, outcome="error")
+                raise
+            
+            # Post-process
+            final_result = await self.post_process(result)
         
+        AGENT_DURATION.observe(time.perf_counter() - started, agent=self.name, outcome="success")
         self.logger.info(f"[{self.name}] Execution completed successfully")
         return final_result
     
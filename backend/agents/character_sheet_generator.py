@@ -20,6 +20,7 @@ from models.user_input import BookPreferences, ReferenceImages
 from models.generation import GenerationResult
 from prompts.master_prompts import CHARACTER_SHEET_PROMPT, build_prompt
 from prompts.language_utils import resolve_language
+from utils.retry import get_retry_policy, result_failure, Failure, TRANSIENT
 
 
 class CharacterSheetGeneratorAgent(AgentBase[
@@ -66,32 +67,36 @@ class CharacterSheetGeneratorAgent(AgentBase[
         output_path = os.path.join(output_dir, "character_ref.jpg")
         
         # Generate the character sheet image
-        max_attempts = 3
-        for attempt in range(max_attempts):
-            try:
-                result: GenerationResult = await self.gemini.generate_image(
-                    prompt=prompt,
-                    output_path=output_path,
-                    reference_images=ref_paths,
-                )
-                
-                if result.success and result.image_path:
-                    self._log_info(f"Character sheet generated successfully: {result.image_path}")
-                    return result.image_path
-                
-                self._log_warning(
-                    f"Character sheet generation attempt {attempt + 1} failed: "
-                    f"{result.error_message or 'No image data returned'}"
-                )
-                
-            except Exception as e:
-                self._log_warning(f"Character sheet generation attempt {attempt + 1} error: {str(e)}")
-            
-            if attempt < max_attempts - 1:
-                import asyncio
-                await asyncio.sleep(1)
+        async def attempt_generation(attempt: int) -> GenerationResult:
+            return await self.gemini.generate_image(
+                prompt=prompt,
+                output_path=output_path,
+                reference_images=ref_paths,
+            )
+        
+        def sheet_failure(result: GenerationResult) -> Optional[Failure]:
+            if result.success and not result.image_path:
+                return Failure(TRANSIENT, "No image data returned")
+            return result_failure(result)
+        
+        try:
+            result = await get_retry_policy().run(
+                attempt_generation,
+                classify_result=sheet_failure,
+                description="character sheet generation"
+            )
+        except Exception as e:
+            self._log_error(f"Character sheet generation error: {str(e)}")
+            return None
+        
+        if result.success and result.image_path:
+            self._log_info(f"Character sheet generated successfully: {result.image_path}")
+            return result.image_path
         
-        self._log_error("Failed to generate character sheet after all attempts")
+        self._log_error(
+            f"Failed to generate character sheet ({result.error_class or 'no image'}): "
+            f"{result.error_message or 'No image data returned'}"
+        )
         return None
     
     def _build_character_sheet_prompt(
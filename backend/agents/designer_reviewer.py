@@ -4,14 +4,14 @@ Designer Reviewer Agent
 Reviews the overall design cohesion of the book.
 """
 
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from .base import AgentBase
 
 import sys
 sys.path.append('..')
 
 from models.generation import GenerationResult
-from models.review import IllustrationReviewItem, DesignReview
+from models.review import IllustrationReviewItem, DesignReview, StyleConsistency, BookVisualAssessment
 from models.user_input import BookPreferences
 from prompts.master_prompts import DESIGNER_REVIEWER_PROMPT, build_prompt
 from prompts.language_utils import resolve_language
@@ -33,17 +33,26 @@ class DesignerReviewerAgent(AgentBase[Tuple[List[GenerationResult], List[Illustr
         Review the overall book design.
         
         Args:
-            input_data: Tuple of (List[GenerationResult], List[IllustrationReviewItem], BookPreferences, user_language)
+            input_data: Tuple of (List[GenerationResult], List[IllustrationReviewItem], BookPreferences,
+                user_language), optionally followed by the measured StyleConsistency and the
+                contact-sheet BookVisualAssessment
             
         Returns:
             DesignReview with overall assessment
         """
         # Handle both old and new format
+        style_metrics: Optional[StyleConsistency] = None
+        visual_assessment: Optional[BookVisualAssessment] = None
         if len(input_data) == 3:
             generation_results, illustration_reviews, preferences = input_data
             user_language = "en-US"
-        else:
+        elif len(input_data) == 4:
             generation_results, illustration_reviews, preferences, user_language = input_data
+        elif len(input_data) == 5:
+            generation_results, illustration_reviews, preferences, user_language, style_metrics = input_data
+        else:
+            (generation_results, illustration_reviews, preferences, user_language,
+             style_metrics, visual_assessment) = input_data
         
         user_language = resolve_language(user_language)
         
@@ -51,7 +60,9 @@ class DesignerReviewerAgent(AgentBase[Tuple[List[GenerationResult], List[Illustr
         
         # Build system prompt with language
         system_prompt = build_prompt(DESIGNER_REVIEWER_PROMPT, user_language)
-        user_prompt = self._build_review_prompt(generation_results, illustration_reviews, preferences, user_language)
+        user_prompt = self._build_review_prompt(
+            generation_results, illustration_reviews, preferences, user_language, style_metrics, visual_assessment
+        )
         
         try:
             result = await self.gemini.generate_json(
@@ -62,12 +73,13 @@ class DesignerReviewerAgent(AgentBase[Tuple[List[GenerationResult], List[Illustr
             
             review = DesignReview(**result)
             review.page_reviews = illustration_reviews
+            review.style_metrics = style_metrics
+            review.visual_assessment = visual_assessment
             
             # Determine which pages need attention
-            review.pages_needing_attention = [
-                r.page_number for r in illustration_reviews
-                if r.recommended_action != "approve"
-            ]
+            review.pages_needing_attention = self._pages_needing_attention(
+                illustration_reviews, style_metrics, visual_assessment
+            )
             
             # Determine if approved
             review.approved = (
@@ -80,10 +92,24 @@ class DesignerReviewerAgent(AgentBase[Tuple[List[GenerationResult], List[Illustr
             
         except Exception as e:
             self._log_error(f"Design review failed: {str(e)}")
-            return self._create_fallback_review(illustration_reviews, user_language)
+            return self._create_fallback_review(illustration_reviews, user_language, style_metrics, visual_assessment)
     
-    def _build_review_prompt(self, results: List[GenerationResult], reviews: List[IllustrationReviewItem], 
-                            preferences: BookPreferences, user_language: str) -> str:
+    @staticmethod
+    def _pages_needing_attention(reviews: List[IllustrationReviewItem],
+                                 style_metrics: Optional[StyleConsistency],
+                                 visual_assessment: Optional[BookVisualAssessment] = None) -> List[int]:
+        """Pages not approved by their review, plus measured style outliers and pages seen as inconsistent."""
+        pages = {r.page_number for r in reviews if r.recommended_action != "approve"}
+        if style_metrics is not None:
+            pages.update(style_metrics.outlier_pages)
+        if visual_assessment is not None:
+            pages.update(visual_assessment.inconsistent_pages)
+        return sorted(pages)
+    
+    def _build_review_prompt(self, results: List[GenerationResult], reviews: List[IllustrationReviewItem],
+                            preferences: BookPreferences, user_language: str,
+                            style_metrics: Optional[StyleConsistency] = None,
+                            visual_assessment: Optional[BookVisualAssessment] = None) -> str:
         """Build the review prompt."""
         parts = [
             f"User Language: {user_language}",
@@ -103,6 +129,34 @@ class DesignerReviewerAgent(AgentBase[Tuple[List[GenerationResult], List[Illustr
                 ""
             ])
         
+        if style_metrics is not None:
+            parts.extend([
+                "=== MEASURED STYLE CONSISTENCY ===",
+                f"Consistency Score: {style_metrics.consistency_score:.1f}/10 "
+                f"(mean distance from book centroid {style_metrics.mean_distance:.2f})",
+                f"Book Palette: {', '.join(style_metrics.book_palette)}",
+                f"Outlier Pages: {', '.join(str(p) for p in style_metrics.outlier_pages) or 'None'}",
+                ""
+            ])
+            for page in style_metrics.pages:
+                parts.append(
+                    f"Page {page.page_number}: brightness {page.brightness:.2f}, contrast {page.contrast:.2f}, "
+                    f"saturation {page.saturation:.2f}, edges {page.edge_density:.2f}, "
+                    f"palette {', '.join(page.palette)}, distance {page.distance:.2f}"
+                    + (" (OUTLIER)" if page.outlier else "")
+                )
+            parts.append("")
+        
+        if visual_assessment is not None:
+            parts.extend([
+                "=== CONTACT SHEET ASSESSMENT ===",
+                f"Cohesion: {visual_assessment.cohesion_assessment}",
+                f"Style Consistency: {visual_assessment.style_consistency}",
+                f"Issues: {'; '.join(visual_assessment.consistency_issues) or 'None'}",
+                f"Inconsistent Pages: {', '.join(str(p) for p in visual_assessment.inconsistent_pages) or 'None'}",
+                ""
+            ])
+        
         parts.extend([
             "=== TASK ===",
             f"IMPORTANT: All feedback (global_assessment, global_issues, global_suggestions) MUST be in {user_language}.",
@@ -110,12 +164,15 @@ class DesignerReviewerAgent(AgentBase[Tuple[List[GenerationResult], List[Illustr
             "Please evaluate the overall design cohesion of this book.",
             "Consider how all pages work together as a unified whole.",
             "Identify any global issues and provide suggestions.",
+            "Use the measured style consistency, where given, to judge style and palette consistency.",
             "Score each aspect from 0-10."
         ])
         
         return "\n".join(parts)
     
-    def _create_fallback_review(self, illustration_reviews: List[IllustrationReviewItem], user_language: str) -> DesignReview:
+    def _create_fallback_review(self, illustration_reviews: List[IllustrationReviewItem], user_language: str,
+                                style_metrics: Optional[StyleConsistency] = None,
+                                visual_assessment: Optional[BookVisualAssessment] = None) -> DesignReview:
         """Create a fallback review."""
         messages = {
             "pt-BR": {
@@ -134,14 +191,11 @@ class DesignerReviewerAgent(AgentBase[Tuple[List[GenerationResult], List[Illustr
         
         msg = messages.get(user_language, messages["en-US"])
         
-        pages_needing_attention = [
-            r.page_number for r in illustration_reviews
-            if r.recommended_action != "approve"
-        ]
+        pages_needing_attention = self._pages_needing_attention(illustration_reviews, style_metrics, visual_assessment)
         
         return DesignReview(
             overall_cohesion=7.0,
-            style_consistency_score=7.0,
+            style_consistency_score=style_metrics.consistency_score if style_metrics is not None else 7.0,
             color_palette_harmony=7.0,
             narrative_flow=7.0,
             character_consistency=7.0,
@@ -149,5 +203,7 @@ class DesignerReviewerAgent(AgentBase[Tuple[List[GenerationResult], List[Illustr
             global_issues=[msg["issue"]],
             global_suggestions=[msg["suggestion"]],
             pages_needing_attention=pages_needing_attention,
-            approved=len(pages_needing_attention) == 0
+            approved=len(pages_needing_attention) == 0,
+            style_metrics=style_metrics,
+            visual_assessment=visual_assessment
         )
@@ -0,0 +1,135 @@
+"""
+Edition Translator Agent
+
+Translates a finished book into another language. Illustrations never
+contain text, so an edition reuses the original images and only its
+text is translated: all of it in one batched call.
+"""
+
+import json
+from typing import Any, Dict, List, Tuple
+from .base import AgentBase
+
+import sys
+sys.path.append('..')
+
+from models.output import FinalBookPackage, TranslatedSegments
+from prompts.master_prompts import EDITION_TRANSLATOR_PROMPT, build_prompt
+from prompts.language_utils import resolve_language
+
+
+# Paths of the user-facing text in a package; "*" stands for every list item
+TEXT_FIELDS: Tuple[Tuple[str, ...], ...] = (
+    ("title",),
+    ("cover", "narrative_text"),
+    ("back_cover", "narrative_text"),
+    ("pages", "*", "narrative_text"),
+    ("pages", "*", "memory_reference"),
+    ("narrative_plan", "book_title"),
+    ("narrative_plan", "back_cover", "text_content"),
+    ("narrative_plan", "narrative_arc"),
+    ("narrative_plan", "pages", "*", "narrative_text"),
+    ("narrative_plan", "pages", "*", "memory_reference"),
+    ("design_review", "global_issues", "*"),
+    ("design_review", "global_suggestions", "*"),
+    ("design_review", "page_reviews", "*", "artistic_assessment"),
+    ("design_review", "page_reviews", "*", "composition_notes"),
+    ("design_review", "page_reviews", "*", "strengths", "*"),
+    ("design_review", "page_reviews", "*", "areas_for_improvement", "*"),
+    ("design_review", "visual_assessment", "cohesion_assessment"),
+    ("design_review", "visual_assessment", "consistency_issues", "*"),
+)
+
+
+def _find_text(node: Any, path: Tuple[str, ...], found: List[Tuple[Any, Any]]) -> None:
+    """Collect (container, key) of every non-empty string at path under node."""
+    if node is None:
+        return
+    head, rest = path[0], path[1:]
+    if head == "*":
+        keys = range(len(node)) if isinstance(node, list) else []
+    else:
+        keys = [head] if isinstance(node, dict) and head in node else []
+    for key in keys:
+        if rest:
+            _find_text(node[key], rest, found)
+        elif isinstance(node[key], str) and node[key].strip():
+            found.append((node, key))
+
+
+class EditionTranslatorAgent(AgentBase[Tuple[FinalBookPackage, str, str], FinalBookPackage]):
+    """
+    Agent responsible for translating a book into another language.
+    
+    Collects the book's text into segments, translates them in one call
+    and writes them back into a copy of the package. Identical texts (a
+    page's text appears on the page and in the narrative plan) are
+    translated once.
+    """
+    
+    # Use fast model for translation
+    MODEL = "gemini-2.0-flash"
+    
+    async def run(self, input_data: Tuple[FinalBookPackage, str, str]) -> FinalBookPackage:
+        """
+        Translate a book.
+        
+        Args:
+            input_data: Tuple of (FinalBookPackage, source_language, target_language)
+        
+        Returns:
+            FinalBookPackage in the target language, with the same images
+        
+        Raises:
+            ValueError: If segments are still missing after a second call
+        """
+        package, source_language, target_language = input_data
+        source_language = resolve_language(source_language)
+        target_language = resolve_language(target_language)
+        
+        data = package.model_dump(mode="json")
+        locations: Dict[str, List[Tuple[Any, Any]]] = {}
+        for path in TEXT_FIELDS:
+            found: List[Tuple[Any, Any]] = []
+            _find_text(data, path, found)
+            for container, key in found:
+                locations.setdefault(container[key], []).append((container, key))
+        
+        texts = list(locations)
+        segments = {f"s{index}": text for index, text in enumerate(texts)}
+        self._log_info(f"Translating {len(segments)} segments ({source_language} -> {target_language})")
+        
+        translated = await self._translate(segments, source_language, target_language) if segments else {}
+        missing = {segment_id: text for segment_id, text in segments.items() if segment_id not in translated}
+        if missing:
+            # Models occasionally drop segments from long batches
+            self._log_warning(f"{len(missing)} segments missing, asking again")
+            translated.update(await self._translate(missing, source_language, target_language))
+            missing = [segment_id for segment_id in missing if segment_id not in translated]
+            if missing:
+                raise ValueError(f"Translation incomplete: {len(missing)} of {len(segments)} segments missing")
+        
+        for segment_id, text in segments.items():
+            for container, key in locations[text]:
+                container[key] = translated[segment_id]
+        data["language"] = target_language
+        return FinalBookPackage.model_validate(data)
+    
+    async def _translate(self, segments: Dict[str, str], source_language: str, target_language: str) -> Dict[str, str]:
+        """One translation call; returns the translated text by segment id."""
+        system_prompt = build_prompt(EDITION_TRANSLATOR_PROMPT, target_language, source_language=source_language)
+        user_prompt = "Segments:\n" + json.dumps(
+            [{"id": segment_id, "text": text} for segment_id, text in segments.items()],
+            ensure_ascii=False,
+            indent=2
+        )
+        result = await self.gemini.generate_json(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            schema=TranslatedSegments
+        )
+        return {
+            segment.id: segment.text
+            for segment in TranslatedSegments(**result).segments
+            if segment.id in segments and segment.text.strip()
+        }
@@ -2,8 +2,15 @@
 Illustrator Reviewer Agent
 
 Reviews generated images for artistic quality.
+
+In contact-sheet mode the page images are tiled into one or a few
+labelled montages and reviewed together in a single vision call, which
+also yields a book-level assessment of how the pages fit together.
+Otherwise each image is reviewed in its own call.
 """
 
+import asyncio
+import tempfile
 from typing import List, Tuple
 from .base import AgentBase
 
@@ -12,12 +19,14 @@ sys.path.append('..')
 
 from models.generation import GenerationResult
 from models.user_input import BookPreferences
-from models.review import IllustrationReviewItem
-from prompts.master_prompts import ILLUSTRATOR_REVIEWER_PROMPT, build_prompt
+from models.review import IllustrationReviewItem, IllustrationReviews
+from prompts.master_prompts import ILLUSTRATOR_REVIEWER_PROMPT, CONTACT_SHEET_REVIEWER_PROMPT, build_prompt
 from prompts.language_utils import resolve_language
+from utils.contact_sheet import build_contact_sheets
+from utils.tracing import span
 
 
-class IllustratorReviewerAgent(AgentBase[Tuple[List[GenerationResult], BookPreferences, str], List[IllustrationReviewItem]]):
+class IllustratorReviewerAgent(AgentBase[Tuple[List[GenerationResult], BookPreferences, str], IllustrationReviews]):
     """
     Agent responsible for reviewing illustration quality.
     
@@ -27,8 +36,12 @@ class IllustratorReviewerAgent(AgentBase[Tuple[List[GenerationResult], BookPrefe
     
     # Use fast model for illustration review
     MODEL = "gemini-2.0-flash"
+    
+    # Review all pages together on contact sheets (set from config by the runner)
+    CONTACT_SHEET = True
+    CONTACT_SHEET_PAGES = 12
 
-    async def run(self, input_data: Tuple[List[GenerationResult], BookPreferences, str]) -> List[IllustrationReviewItem]:
+    async def run(self, input_data: Tuple[List[GenerationResult], BookPreferences, str]) -> IllustrationReviews:
         """
         Review all generated illustrations.
         
@@ -36,7 +49,7 @@ class IllustratorReviewerAgent(AgentBase[Tuple[List[GenerationResult], BookPrefe
             input_data: Tuple of (List[GenerationResult], BookPreferences, user_language)
             
         Returns:
-            List of IllustrationReviewItems
+            IllustrationReviews with one item per result
         """
         # Handle both old and new format
         if len(input_data) == 2:
@@ -49,17 +62,93 @@ class IllustratorReviewerAgent(AgentBase[Tuple[List[GenerationResult], BookPrefe
         
         self._log_info(f"Reviewing {len(generation_results)} illustrations (language: {user_language})")
         
+        if self.CONTACT_SHEET and sum(result.has_image for result in generation_results) > 1:
+            try:
+                reviews = await self._review_contact_sheets(generation_results, preferences, user_language)
+                self._log_info(
+                    f"Completed {len(reviews.pages)} illustration reviews in {reviews.vision_calls} vision call(s)"
+                )
+                return reviews
+            except Exception as e:
+                self._log_warning(f"Contact-sheet review failed, reviewing pages one by one: {str(e)}")
+        
         reviews = []
         for i, result in enumerate(generation_results):
             if result.has_image:
-                review = await self._review_illustration(result, i, preferences, user_language)
+                with span("review.illustration", page=i):
+                    review = await self._review_illustration(result, i, preferences, user_language)
                 reviews.append(review)
             else:
                 # Create a failed review for missing images
                 reviews.append(self._create_failed_review(i, user_language))
         
         self._log_info(f"Completed {len(reviews)} illustration reviews")
-        return reviews
+        return IllustrationReviews(pages=reviews, vision_calls=sum(result.has_image for result in generation_results))
+    
+    async def _review_contact_sheets(self, generation_results: List[GenerationResult],
+                                     preferences: BookPreferences, user_language: str) -> IllustrationReviews:
+        """Review all illustrations in one vision call over labelled contact sheets."""
+        pages = [
+            (i, result.get_image_location())
+            for i, result in enumerate(generation_results)
+            if result.has_image
+        ]
+        system_prompt = build_prompt(CONTACT_SHEET_REVIEWER_PROMPT, user_language)
+        labels = ", ".join(str(i) for i, _ in pages)
+        
+        user_prompt = f"""User Language: {user_language}
+Review this {len(pages)}-page set of illustrations for a {preferences.style} style memory book.
+
+The attached contact sheets show every page as a thumbnail labelled "Page N".
+Page labels: {labels}
+Expected Style: {preferences.style}
+
+IMPORTANT: All feedback (artistic_assessment, composition_notes, strengths, areas_for_improvement,
+cohesion_assessment, consistency_issues) MUST be in {user_language}.
+
+Please evaluate each page for:
+1. Overall artistic quality
+2. Composition
+3. Color harmony
+4. Emotional impact
+5. Style adherence
+6. Strengths and weaknesses
+
+Then assess the book as a whole: style and palette consistency across pages,
+and which pages do not match the rest.
+
+Return one review per labelled page, with its label as page_number."""
+        
+        with tempfile.TemporaryDirectory(prefix="contact_sheets_") as directory:
+            with span("review.contact_sheets", pages=len(pages)):
+                sheets = await asyncio.to_thread(
+                    build_contact_sheets, pages, directory, self.CONTACT_SHEET_PAGES
+                )
+                result_data = await self.gemini.analyze_images(
+                    prompt=f"{system_prompt}\n\n{user_prompt}",
+                    images=sheets,
+                    schema=IllustrationReviews
+                )
+        
+        parsed = IllustrationReviews(**result_data)
+        by_page = {item.page_number: item for item in parsed.pages}
+        
+        reviews = []
+        for i, result in enumerate(generation_results):
+            if not result.has_image:
+                reviews.append(self._create_failed_review(i, user_language))
+            elif i in by_page:
+                reviews.append(by_page[i])
+            else:
+                self._log_warning(f"Contact-sheet review has no entry for page {i}")
+                reviews.append(self._create_default_review(i, user_language))
+        
+        assessment = parsed.book_assessment
+        if assessment is not None:
+            labelled = {i for i, _ in pages}
+            assessment.inconsistent_pages = [p for p in assessment.inconsistent_pages if p in labelled]
+        
+        return IllustrationReviews(pages=reviews, book_assessment=assessment, vision_calls=1)
     
     async def _review_illustration(self, result: GenerationResult, page_num: int, 
                                    preferences: BookPreferences, user_language: str) -> IllustrationReviewItem:
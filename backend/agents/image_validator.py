@@ -15,6 +15,8 @@ from models.visual import VisualFingerprint
 from models.review import ImageQCResult, QualityMetrics
 from prompts.master_prompts import IMAGE_VALIDATOR_PROMPT, build_prompt
 from prompts.language_utils import resolve_language
+from utils.image_precheck import describe_flags
+from utils import metrics
 
 
 class ImageValidatorAgent(AgentBase[Tuple[GenerationResult, VisualFingerprint, int, str], ImageQCResult]):
@@ -54,6 +56,15 @@ class ImageValidatorAgent(AgentBase[Tuple[GenerationResult, VisualFingerprint, i
         
         image_path = generation_result.get_image_location()
         
+        # Obvious failures found by the local pre-check skip the vision call
+        signals = generation_result.signals
+        if signals is not None and signals.rejected:
+            for flag in signals.flags:
+                metrics.IMAGE_PRECHECK_REJECTIONS.inc(reason=flag)
+            issues = describe_flags(signals)
+            self._log_info(f"Page {page_number} rejected by pre-check: {'; '.join(issues)}")
+            return self._create_rejected_result(page_number, issues, image_path or "")
+        
         # Build system prompt with language
         system_prompt = build_prompt(IMAGE_VALIDATOR_PROMPT, user_language)
         user_prompt = self._build_validation_prompt(fingerprint, page_number, user_language)
@@ -114,6 +125,19 @@ class ImageValidatorAgent(AgentBase[Tuple[GenerationResult, VisualFingerprint, i
         
         return "\n".join(parts)
     
+    def _create_rejected_result(self, page_number: int, issues: list[str], image_path: str) -> ImageQCResult:
+        """Create a QC result for an image the pre-check rejected."""
+        return ImageQCResult(
+            page_number=page_number,
+            image_path=image_path,
+            passed=False,
+            metrics=QualityMetrics(),
+            issues_found=issues,
+            suggestions=["Regenerate the image as a complete, detailed illustration distinct from the other pages"],
+            requires_regeneration=True,
+            fingerprint_match_score=0.0
+        )
+    
     def _create_failed_result(self, page_number: int, error: str, user_language: str, image_path: str = "") -> ImageQCResult:
         """Create a failed QC result."""
         messages = {
@@ -4,7 +4,8 @@ Narrative Planner Agent
 Creates the narrative plan for the memory book.
 """
 
-from typing import Tuple
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from .base import AgentBase
 
 import sys
@@ -12,9 +13,84 @@ sys.path.append('..')
 
 from models.profile import NormalizedProfile
 from models.user_input import BookPreferences
-from models.planning import NarrativePlan, PagePlanItem, CoverConcept, BackCoverConcept
-from prompts.master_prompts import NARRATIVE_PLANNER_PROMPT, build_prompt
+from models.planning import (
+    NarrativePlan, PagePlanItem, CoverConcept, BackCoverConcept, PhaseAllocation, PlanOutline, PhasePagePlan
+)
+from prompts.master_prompts import (
+    NARRATIVE_PLANNER_PROMPT, NARRATIVE_OUTLINE_PROMPT, NARRATIVE_PHASE_PROMPT, build_prompt
+)
 from prompts.language_utils import resolve_language
+from utils.incremental_json import IncrementalJSONParser
+
+
+class PlanStream:
+    """
+    Pages of a narrative plan as the planner streams them, then the plan.
+    
+    Streamed pages are provisional: the finished plan (which may be a
+    fallback plan if streaming failed) is authoritative, and consumers
+    reconcile against it.
+    """
+    
+    def __init__(self):
+        self._pages: List[PagePlanItem] = []
+        self._waiters: List[asyncio.Future] = []
+        self._plan: Optional[asyncio.Future] = None
+    
+    def _plan_future(self) -> asyncio.Future:
+        if self._plan is None:
+            self._plan = asyncio.get_running_loop().create_future()
+        return self._plan
+    
+    def _wake(self) -> None:
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters.clear()
+    
+    def add_page(self, page: PagePlanItem) -> None:
+        """Publish a page as soon as it has been generated."""
+        self._pages.append(page)
+        self._wake()
+    
+    def finish(self, plan: NarrativePlan) -> None:
+        """Publish the finished plan; ends iteration over pages()."""
+        future = self._plan_future()
+        if not future.done():
+            future.set_result(plan)
+        self._wake()
+    
+    def fail(self, error: BaseException) -> None:
+        """End the stream without a plan."""
+        future = self._plan_future()
+        if not future.done():
+            if isinstance(error, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(error)
+        self._wake()
+    
+    @property
+    def finished(self) -> bool:
+        return self._plan is not None and self._plan.done()
+    
+    async def pages(self) -> AsyncIterator[PagePlanItem]:
+        """Streamed pages in order, ending when the plan is finished."""
+        index = 0
+        while True:
+            if index < len(self._pages):
+                index += 1
+                yield self._pages[index - 1]
+            elif self.finished:
+                return
+            else:
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+                await waiter
+    
+    async def plan(self) -> NarrativePlan:
+        """The finished plan."""
+        return await asyncio.shield(self._plan_future())
 
 
 class NarrativePlannerAgent(AgentBase[Tuple[NormalizedProfile, BookPreferences, str], NarrativePlan]):
@@ -27,24 +103,53 @@ class NarrativePlannerAgent(AgentBase[Tuple[NormalizedProfile, BookPreferences,
     
     # Use creative model for narrative planning
     MODEL = "gemini-2.0-pro-exp"
+    
+    # Books with at least this many pages are planned in chunks (0 disables)
+    CHUNKED_MIN_PAGES = 15
 
     async def run(self, input_data: Tuple[NormalizedProfile, BookPreferences, str]) -> NarrativePlan:
         """
         Create a narrative plan for the book.
         
+        With a PlanStream as a fourth element, the plan is streamed and
+        each page is published to the stream as soon as it is complete.
+        
         Args:
-            input_data: Tuple of (NormalizedProfile, BookPreferences, user_language)
+            input_data: Tuple of (NormalizedProfile, BookPreferences, user_language[, PlanStream])
             
         Returns:
             Complete NarrativePlan for the book
         """
         # Handle both old and new format
+        stream = None
         if len(input_data) == 2:
             profile, preferences = input_data
             user_language = "en-US"
+        elif len(input_data) == 4:
+            profile, preferences, user_language, stream = input_data
         else:
             profile, preferences, user_language = input_data
         
+        if self.CHUNKED_MIN_PAGES and preferences.page_count >= self.CHUNKED_MIN_PAGES:
+            planning = self._run_chunked(profile, preferences, user_language, stream)
+        elif stream is not None:
+            planning = self._run_streaming(profile, preferences, user_language, stream)
+        else:
+            return await self._plan_single(profile, preferences, user_language)
+        
+        try:
+            plan = await planning
+        except BaseException as e:
+            if stream is not None:
+                stream.fail(e)
+            raise
+        if stream is not None:
+            stream.finish(plan)
+        return plan
+    
+    async def _plan_single(self, profile: NormalizedProfile, preferences: BookPreferences,
+                           user_language: str) -> NarrativePlan:
+        """Plan the whole book in one call."""
         user_language = resolve_language(user_language)
         
         self._log_info(f"Creating narrative plan for {preferences.page_count} pages (language: {user_language})")
@@ -69,6 +174,300 @@ class NarrativePlannerAgent(AgentBase[Tuple[NormalizedProfile, BookPreferences,
             self._log_error(f"Narrative planning failed: {str(e)}")
             return self._create_fallback_plan(profile, preferences)
     
+    async def _run_streaming(
+        self,
+        profile: NormalizedProfile,
+        preferences: BookPreferences,
+        user_language: str,
+        stream: PlanStream
+    ) -> NarrativePlan:
+        """Stream the plan, publishing pages as they close; falls back to a single call."""
+        user_language = resolve_language(user_language)
+        self._log_info(
+            f"Streaming narrative plan for {preferences.page_count} pages (language: {user_language})"
+        )
+        
+        parser = IncrementalJSONParser("pages")
+        
+        def on_text(text: str) -> None:
+            for page in parser.feed(text):
+                try:
+                    stream.add_page(PagePlanItem(**page))
+                except ValueError as e:
+                    self._log_warning(f"Skipping invalid streamed page: {str(e)[:200]}")
+        
+        try:
+            result = await self.gemini.stream_json(
+                system_prompt=build_prompt(NARRATIVE_PLANNER_PROMPT, user_language),
+                user_prompt=self._build_user_prompt(profile, preferences, user_language),
+                on_text=on_text,
+                schema=NarrativePlan
+            )
+            plan = NarrativePlan(**result)
+        except Exception as e:
+            self._log_warning(
+                f"Streamed planning failed after {parser.emitted} pages, planning without streaming: {str(e)}"
+            )
+            return await self._plan_single(profile, preferences, user_language)
+        
+        self._log_info(f"Created plan with {len(plan.pages)} pages ({parser.emitted} streamed)")
+        return plan
+    
+    async def _run_chunked(
+        self,
+        profile: NormalizedProfile,
+        preferences: BookPreferences,
+        user_language: str,
+        stream: Optional[PlanStream] = None
+    ) -> NarrativePlan:
+        """
+        Plan a large book hierarchically.
+        
+        An outline call allocates pages to life phases, then each phase's
+        pages are expanded concurrently and the pages are merged and
+        renumbered. Each call's output stays small whatever the page
+        count. Falls back to a single call when the outline fails.
+        """
+        user_language = resolve_language(user_language)
+        self._log_info(
+            f"Creating chunked narrative plan for {preferences.page_count} pages (language: {user_language})"
+        )
+        
+        try:
+            result = await self.gemini.generate_json(
+                system_prompt=build_prompt(NARRATIVE_OUTLINE_PROMPT, user_language),
+                user_prompt=self._build_outline_prompt(profile, preferences, user_language),
+                schema=PlanOutline
+            )
+            outline = PlanOutline(**result)
+        except Exception as e:
+            self._log_warning(f"Plan outline failed, planning in a single call: {str(e)}")
+            return await self._plan_single(profile, preferences, user_language)
+        
+        allocation = self._allocate_pages(outline, profile, preferences.page_count)
+        if not allocation:
+            self._log_warning("Plan outline has no life phases, planning in a single call")
+            return await self._plan_single(profile, preferences, user_language)
+        
+        async def expand(phase: PhaseAllocation, first_page: int) -> List[PagePlanItem]:
+            pages = await self._expand_phase(phase, outline, profile, preferences, user_language)
+            for offset, page in enumerate(pages):
+                page.page_number = first_page + offset
+                if stream is not None:
+                    stream.add_page(page)
+            return pages
+        
+        first_pages = []
+        next_page = 1
+        for phase in allocation:
+            first_pages.append(next_page)
+            next_page += phase.page_count
+        
+        expanded = await asyncio.gather(*[
+            expand(phase, first_page) for phase, first_page in zip(allocation, first_pages)
+        ])
+        pages = [page for phase_pages in expanded for page in phase_pages]
+        
+        plan = NarrativePlan(
+            book_title=outline.book_title or preferences.title,
+            total_pages=preferences.page_count,
+            cover=outline.cover,
+            back_cover=outline.back_cover,
+            pages=pages,
+            narrative_arc=outline.narrative_arc,
+            visual_themes=outline.visual_themes,
+            color_progression=outline.color_progression
+        )
+        self._log_info(
+            f"Created plan with {len(plan.pages)} pages from {len(allocation)} phases: "
+            + ", ".join(f"{phase.life_phase}={phase.page_count}" for phase in allocation)
+        )
+        return plan
+    
+    async def replan_pages(
+        self,
+        plan: NarrativePlan,
+        pages: List[PagePlanItem],
+        focus: List[str],
+        profile: NormalizedProfile,
+        preferences: BookPreferences,
+        user_language: str
+    ) -> List[PagePlanItem]:
+        """
+        Plan some pages of one life phase again, keeping the rest of the plan.
+        
+        The pages are re-expanded like a phase of a chunked plan, with the
+        plan's own outline, in one call. They keep their page numbers.
+        
+        Args:
+            plan: The current plan
+            pages: Pages to plan again, all of the same life phase
+            focus: Memories the new pages should cover
+            profile: Normalized profile, with the phase's current data
+            preferences: Book preferences
+            user_language: User's language
+        
+        Returns:
+            The new pages, in the order of pages
+        """
+        user_language = resolve_language(user_language)
+        phase = PhaseAllocation(life_phase=pages[0].life_phase, page_count=len(pages), focus=focus)
+        self._log_info(f"Re-planning {len(pages)} pages of the {phase.life_phase} phase (language: {user_language})")
+        
+        outline = PlanOutline(
+            book_title=plan.book_title,
+            cover=plan.cover,
+            back_cover=plan.back_cover,
+            narrative_arc=plan.narrative_arc,
+            visual_themes=plan.visual_themes,
+            color_progression=plan.color_progression
+        )
+        replanned = await self._expand_phase(phase, outline, profile, preferences, user_language)
+        for old, page in zip(pages, replanned):
+            page.page_number = old.page_number
+        return replanned
+    
+    def _allocate_pages(self, outline: PlanOutline, profile: NormalizedProfile,
+                        page_count: int) -> List[PhaseAllocation]:
+        """
+        Fix the outline's page allocation to cover the profile's phases and the page count.
+        
+        Phases follow the profile's chronological order; phases the outline
+        skipped get no pages unless nothing was allocated at all, in which
+        case pages are split evenly. Totals that do not match the page
+        count are scaled, distributing leftover pages by largest remainder.
+        """
+        suggested: Dict[str, PhaseAllocation] = {}
+        for phase in outline.phases:
+            suggested.setdefault(phase.life_phase, phase)
+        
+        names = [phase.phase_name for phase in profile.life_phases] or list(suggested)
+        if not names:
+            return []
+        
+        requested = [suggested[name].page_count if name in suggested else 0 for name in names]
+        if sum(requested) == 0:
+            requested = [1] * len(names)
+        
+        total = sum(requested)
+        shares = [count * page_count / total for count in requested]
+        counts = [int(share) for share in shares]
+        by_remainder = sorted(range(len(names)), key=lambda i: shares[i] - counts[i], reverse=True)
+        for i in by_remainder[:page_count - sum(counts)]:
+            counts[i] += 1
+        
+        return [
+            PhaseAllocation(
+                life_phase=name,
+                page_count=count,
+                focus=suggested[name].focus if name in suggested else []
+            )
+            for name, count in zip(names, counts)
+            if count > 0
+        ]
+    
+    async def _expand_phase(
+        self,
+        phase: PhaseAllocation,
+        outline: PlanOutline,
+        profile: NormalizedProfile,
+        preferences: BookPreferences,
+        user_language: str
+    ) -> List[PagePlanItem]:
+        """Plan one phase's pages; padded with or cut to the allotted count."""
+        pages: List[PagePlanItem] = []
+        try:
+            result = await self.gemini.generate_json(
+                system_prompt=build_prompt(NARRATIVE_PHASE_PROMPT, user_language),
+                user_prompt=self._build_phase_prompt(phase, outline, profile, preferences, user_language),
+                schema=PhasePagePlan
+            )
+            pages = PhasePagePlan(**result).pages[:phase.page_count]
+        except Exception as e:
+            self._log_warning(f"Planning the {phase.life_phase} phase failed: {str(e)}")
+        
+        for page in pages:
+            page.life_phase = phase.life_phase
+        if len(pages) < phase.page_count:
+            pages.extend(self._fallback_phase_pages(profile, phase, len(pages)))
+        return pages
+    
+    def _fallback_phase_pages(self, profile: NormalizedProfile, phase: PhaseAllocation,
+                              planned: int) -> List[PagePlanItem]:
+        """Simple pages for the part of a phase that could not be planned."""
+        profile_phase = profile.get_phase(phase.life_phase)
+        memories = phase.focus or (profile_phase.core_memories if profile_phase else [])
+        tone = profile_phase.emotional_themes[0] if profile_phase and profile_phase.emotional_themes else "nostalgic"
+        pages = []
+        for index in range(planned, phase.page_count):
+            memory = memories[index] if index < len(memories) else f"Memory from {phase.life_phase}"
+            pages.append(PagePlanItem(
+                page_number=index + 1,
+                life_phase=phase.life_phase,
+                memory_reference=memory,
+                scene_description=f"Illustration of: {memory}",
+                emotional_tone=tone,
+                key_elements=[],
+                setting="",
+                characters_present=[profile.subject_name or "subject"],
+                suggested_composition="centered"
+            ))
+        return pages
+    
+    def _build_outline_prompt(self, profile: NormalizedProfile, preferences: BookPreferences,
+                              user_language: str) -> str:
+        """Build the user prompt for the plan outline."""
+        parts = self._build_user_prompt(profile, preferences, user_language).split("=== TASK ===")[0].split("\n")
+        parts.extend([
+            "=== TASK ===",
+            f"IMPORTANT: All descriptive text MUST be in {user_language}.",
+            "",
+            "Please create:",
+            "1. A cover concept that captures the person's essence",
+            "2. A symbolic back cover concept",
+            f"3. The number of pages for each life phase, adding up to exactly {preferences.page_count}",
+            "4. For each life phase, the memories its pages should cover",
+        ])
+        return "\n".join(parts)
+    
+    def _build_phase_prompt(self, phase: PhaseAllocation, outline: PlanOutline, profile: NormalizedProfile,
+                            preferences: BookPreferences, user_language: str) -> str:
+        """Build the user prompt for expanding one life phase."""
+        parts = [
+            f"User Language: {user_language}",
+            f"Plan the {phase.page_count}-page section of the {phase.life_phase} life phase "
+            f"in a {preferences.page_count}-page memory book.",
+            f"Title: {outline.book_title or preferences.title}",
+            f"Style: {preferences.style}",
+            f"Subject: {profile.subject_name or 'Unknown'}",
+            "",
+            "=== BOOK OUTLINE ===",
+            f"Narrative Arc: {outline.narrative_arc or 'Not specified'}",
+            f"Visual Themes: {', '.join(outline.visual_themes) or 'None identified'}",
+            f"Color Progression: {outline.color_progression or 'Not specified'}",
+            f"Focus for this phase: {', '.join(phase.focus) or 'Choose from the memories below'}",
+            ""
+        ]
+        
+        profile_phase = profile.get_phase(phase.life_phase)
+        if profile_phase is not None:
+            parts.extend([
+                f"=== {profile_phase.phase_name.upper()} ({profile_phase.age_range}) ===",
+                f"Core Memories: {', '.join(profile_phase.core_memories) or 'None'}",
+                f"Significant Events: {', '.join(profile_phase.significant_events) or 'None'}",
+                f"Emotional Themes: {', '.join(profile_phase.emotional_themes) or 'None'}",
+                f"Narrative Elements: {', '.join(profile_phase.narrative_elements) or 'None'}",
+                ""
+            ])
+        
+        parts.extend([
+            "=== TASK ===",
+            f"IMPORTANT: All descriptive text MUST be in {user_language}.",
+            f"Create exactly {phase.page_count} page plans for the {phase.life_phase} phase, "
+            "numbered from 1, in chronological order."
+        ])
+        return "\n".join(parts)
+    
     def _build_user_prompt(self, profile: NormalizedProfile, preferences: BookPreferences, user_language: str) -> str:
         """Build the user prompt for narrative planning."""
         parts = [
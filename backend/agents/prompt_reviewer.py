@@ -13,6 +13,7 @@ sys.path.append('..')
 from models.prompts import PromptItem
 from prompts.master_prompts import PROMPT_REVIEWER_PROMPT, build_prompt
 from prompts.language_utils import resolve_language
+from utils.tracing import span
 
 
 class PromptReviewerAgent(AgentBase[Tuple[List[PromptItem], str], List[PromptItem]]):
@@ -54,7 +55,8 @@ class PromptReviewerAgent(AgentBase[Tuple[List[PromptItem], str], List[PromptIte
         
         # Review each prompt
         for prompt in prompts:
-            improved = await self._review_single_prompt(prompt, all_prompts_text, user_language)
+            with span("review.prompt", page=prompt.page_number):
+                improved = await self._review_single_prompt(prompt, all_prompts_text, user_language)
             improved_prompts.append(improved)
         
         self._log_info(f"Reviewed and improved {len(improved_prompts)} prompts")
@@ -4,8 +4,10 @@ Prompt Writer Agent
 Creates prompts for all internal pages of the book.
 """
 
-from typing import Tuple, List
+import asyncio
+from typing import Dict, Tuple, List, Union
 from .base import AgentBase
+from .narrative_planner import PlanStream
 
 import sys
 sys.path.append('..')
@@ -29,12 +31,15 @@ class PromptWriterAgent(AgentBase[Tuple[NarrativePlan, VisualFingerprint, BookPr
     # Use creative model for prompt writing
     MODEL = "gemini-2.0-pro-exp"
 
-    async def run(self, input_data: Tuple[NarrativePlan, VisualFingerprint, BookPreferences, str]) -> List[PromptItem]:
+    async def run(self, input_data: Tuple[Union[NarrativePlan, PlanStream], VisualFingerprint, BookPreferences, str]) -> List[PromptItem]:
         """
         Create prompts for all internal pages.
         
+        Given a PlanStream instead of a plan, prompts are written for
+        pages as the planner streams them.
+        
         Args:
-            input_data: Tuple of (NarrativePlan, VisualFingerprint, BookPreferences, user_language)
+            input_data: Tuple of (NarrativePlan or PlanStream, VisualFingerprint, BookPreferences, user_language)
             
         Returns:
             List of PromptItems for all pages
@@ -48,6 +53,9 @@ class PromptWriterAgent(AgentBase[Tuple[NarrativePlan, VisualFingerprint, BookPr
         
         user_language = resolve_language(user_language)
         
+        if isinstance(narrative_plan, PlanStream):
+            return await self._run_streaming(narrative_plan, fingerprint, preferences, user_language)
+        
         self._log_info(f"Creating prompts for {len(narrative_plan.pages)} pages (language: {user_language})")
         
         prompts = []
@@ -58,6 +66,49 @@ class PromptWriterAgent(AgentBase[Tuple[NarrativePlan, VisualFingerprint, BookPr
         self._log_info(f"Created {len(prompts)} page prompts")
         return prompts
     
+    async def _run_streaming(self, stream: PlanStream, fingerprint: VisualFingerprint,
+                             preferences: BookPreferences, user_language: str) -> List[PromptItem]:
+        """
+        Write page prompts while the narrative plan is still streaming.
+        
+        Each streamed page gets its prompt right away. Once the plan is
+        finished, prompts of pages that changed or were never streamed are
+        written, and prompts of pages no longer in the plan are dropped.
+        """
+        self._log_info(f"Creating prompts for streamed pages (language: {user_language})")
+        
+        def write(page_plan: PagePlanItem) -> asyncio.Task:
+            return asyncio.ensure_future(
+                self._create_page_prompt(page_plan, fingerprint, preferences, user_language)
+            )
+        
+        started: Dict[int, Tuple[PagePlanItem, asyncio.Task]] = {}
+        tasks: List[asyncio.Task] = []
+        try:
+            async for page_plan in stream.pages():
+                if page_plan.page_number not in started:
+                    started[page_plan.page_number] = (page_plan, write(page_plan))
+            narrative_plan = await stream.plan()
+            
+            rewritten = 0
+            for page_plan in narrative_plan.pages:
+                streamed, task = started.pop(page_plan.page_number, (None, None))
+                if streamed != page_plan:
+                    if task is not None:
+                        task.cancel()
+                    task = write(page_plan)
+                    rewritten += 1
+                tasks.append(task)
+            prompts = list(await asyncio.gather(*tasks))
+        finally:
+            # Pages dropped from the final plan, or everything on failure
+            # (finished tasks ignore the cancellation)
+            for task in [task for _, task in started.values()] + tasks:
+                task.cancel()
+        
+        self._log_info(f"Created {len(prompts)} page prompts ({rewritten} after the plan finished)")
+        return prompts
+    
     async def _create_page_prompt(self, page_plan: PagePlanItem, fingerprint: VisualFingerprint, 
                                   preferences: BookPreferences, user_language: str) -> PromptItem:
         """Create a prompt for a single page."""
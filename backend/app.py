@@ -5,34 +5,46 @@ FastAPI application for the memory book generation service.
 """
 
 import os
+import hmac
 import json
 import uuid
 import asyncio
 from typing import Optional, List, Any
 from datetime import datetime
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, BackgroundTasks
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, BackgroundTasks, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, PlainTextResponse
 from pydantic import BaseModel, Field
 
-from models.user_input import UserForm, BookPreferences, ReferenceImages, LifePhase, PhysicalCharacteristics
+from models.job_payload import JobPayload
+from models.job_payload import PhysicalCharacteristicsRequest
+from pipeline.job_processor import process_job_background
+from pipeline.speculation import get_speculation_manager
+from pipeline.editions import edition_languages, translate_editions
+from pipeline.regeneration import regenerate_page, PageBusyError
+from pipeline.revision import revise_job
 from models.output import FinalBookPackage
-from pipeline.runner import PipelineRunner
 from clients.gemini_client import GeminiClient
 from utils.logging import setup_logger, get_logger
 from utils.config import get_config, load_config_from_env
+from utils.job_context import job_context, track_task_activity, PRIORITY_INTERACTIVE
+from utils.metrics import render_metrics
+from utils.tracing import get_exporter, trace_id_for_job, build_waterfall
+from utils.loop_monitor import get_loop_monitor, start_loop_monitor
+from utils.profiler import profile, ProfilerBusyError
 from prompts.language_utils import resolve_language
 from store import (
     get_job_store, 
     JobStatus, 
-    StepName, 
-    PageStatus,
     save_uploaded_files,
     get_asset_path,
-    get_outputs_dir,
     list_job_assets,
-    get_mime_type
+    get_mime_type,
+    get_job_queue,
+    get_idempotency_index,
+    request_fingerprint,
+    IdempotencyConflictError
 )
 
 
@@ -83,51 +95,13 @@ job_store = get_job_store()
 # Request/Response Models
 # ============================================================================
 
-class LifePhaseRequest(BaseModel):
-    """Life phase data from the frontend."""
-    memories: List[str] = Field(default_factory=list)
-    key_events: List[str] = Field(default_factory=list)
-    emotions: List[str] = Field(default_factory=list)
-
-
-class PhysicalCharacteristicsRequest(BaseModel):
-    """Physical characteristics from the frontend form."""
-    name: str = ""
-    gender: Optional[str] = None
-    skin_color: Optional[str] = None
-    hair_color: Optional[str] = None
-    hair_style: Optional[str] = None
-    has_glasses: bool = False
-    has_facial_hair: bool = False
-
-
-class JobPayload(BaseModel):
-    """Payload for job creation (sent as JSON string in form data)."""
-    # User form data
-    young: LifePhaseRequest = Field(default_factory=LifePhaseRequest)
-    adolescent: LifePhaseRequest = Field(default_factory=LifePhaseRequest)
-    adult: LifePhaseRequest = Field(default_factory=LifePhaseRequest)
-    elderly: LifePhaseRequest = Field(default_factory=LifePhaseRequest)
-    
-    # Book preferences
-    title: str = Field(..., min_length=1)
-    date: str = Field(...)
-    page_count: int = Field(default=10)
-    style: str = Field(default="watercolor")
-    
-    # Language preference
-    user_language: str = Field(default="en-US")
-    
-    # Reference input mode and physical characteristics
-    reference_input_mode: Optional[str] = Field(default="photos")
-    physical_characteristics: Optional[PhysicalCharacteristicsRequest] = Field(default=None)
-
-
 class JobCreateResponse(BaseModel):
     """Response from job creation."""
     job_id: str
     status: str
     message: str
+    # True when the request repeated an earlier one and no new job was started
+    duplicate: bool = False
 
 
 class JobStatusResponse(BaseModel):
@@ -136,13 +110,57 @@ class JobStatusResponse(BaseModel):
     status: str
     current_step: Optional[str] = None
     progress_percent: int = 0
+    priority: str = "normal"
+    deadline: Optional[str] = None
     steps: List[dict] = Field(default_factory=list)
     pages: List[dict] = Field(default_factory=list)
+    styles: List[dict] = Field(default_factory=list)
+    editions: List[str] = Field(default_factory=list)
     created_at: str
     updated_at: str
+    usage: Optional[dict] = None
+    critical_path: Optional[dict] = None
     error: Optional[str] = None
 
 
+class ReferenceSessionResponse(BaseModel):
+    """Response from a reference pre-upload."""
+    session_token: str
+    reference_count: int
+    expires_at: datetime
+    speculating: bool
+
+
+class EditionRequest(BaseModel):
+    """Request body for translating a completed book."""
+    languages: List[str] = Field(..., min_length=1, max_length=8, description="Target language codes")
+    style: Optional[str] = Field(default=None, description="Style to translate, for a multi-style job")
+
+
+class EditionResponse(BaseModel):
+    """Response from translating a completed book."""
+    job_id: str
+    style: Optional[str] = None
+    editions: List[str]
+    errors: dict = Field(default_factory=dict)
+
+
+class RegeneratePageRequest(BaseModel):
+    """Request body for regenerating one page of a completed book."""
+    feedback: Optional[str] = Field(default=None, max_length=2000, description="What should change in the image")
+    style: Optional[str] = Field(default=None, description="Style the page belongs to, for a multi-style job")
+
+
+class RevisionResponse(BaseModel):
+    """What a revision of a job's memories recomputed."""
+    job_id: str
+    changed_phases: List[str]
+    replanned_pages: List[int]
+    regenerated_pages: List[int]
+    model_calls: int
+    calls_saved: Optional[int] = None
+
+
 class HealthResponse(BaseModel):
     """Health check response."""
     status: str
@@ -154,315 +172,106 @@ class HealthResponse(BaseModel):
 
 
 # ============================================================================
-# Background Processing
+# API Endpoints
 # ============================================================================
 
-async def process_job_background(job_id: str, payload: JobPayload, reference_paths: List[str]):
-    """
-    Process a job in the background.
+@app.get("/health", response_model=HealthResponse)
+async def health_check():
+    """Health check endpoint."""
+    config_errors = config.validate()
     
-    Updates job store with progress as the pipeline runs.
+    return HealthResponse(
+        status="healthy",
+        version="1.0.0",
+        timestamp=datetime.now(),
+        config_valid=len(config_errors) == 0,
+        stub_mode=config.is_stub_mode,
+        supported_languages=["pt-BR", "en-US", "es-ES", "fr-FR", "de-DE", "it-IT"]
+    )
+
+
+async def read_reference_uploads(reference_images: List[UploadFile]) -> List[tuple]:
     """
-    user_language = resolve_language(payload.user_language)
+    Read and validate uploaded reference images.
     
-    try:
-        # Update job status to processing
-        job_store.update_job_status(job_id, status=JobStatus.PROCESSING)
-        
-        # Initialize Gemini client
-        gemini_client = GeminiClient(
-            api_key=config.google_api_key,
-            model=config.gemini_model
-        )
-        
-        # Create pipeline runner
-        runner = PipelineRunner(gemini_client, logger)
-        
-        # Convert payload to internal models
-        user_form = UserForm(
-            young=LifePhase(
-                memories=payload.young.memories,
-                key_events=payload.young.key_events,
-                emotions=payload.young.emotions
-            ),
-            adolescent=LifePhase(
-                memories=payload.adolescent.memories,
-                key_events=payload.adolescent.key_events,
-                emotions=payload.adolescent.emotions
-            ),
-            adult=LifePhase(
-                memories=payload.adult.memories,
-                key_events=payload.adult.key_events,
-                emotions=payload.adult.emotions
-            ),
-            elderly=LifePhase(
-                memories=payload.elderly.memories,
-                key_events=payload.elderly.key_events,
-                emotions=payload.elderly.emotions
+    Returns:
+        List of (content, filename) tuples
+    
+    Raises:
+        HTTPException: 400 for files that are too large or of an unsupported type
+    """
+    # Validate file types and sizes
+    MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+    ALLOWED_TYPES = {'image/jpeg', 'image/png', 'image/webp'}
+    
+    files = []
+    for img in reference_images:
+        content = await img.read()
+        
+        # Check size
+        if len(content) > MAX_FILE_SIZE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"File {img.filename} exceeds maximum size of 10MB"
             )
-        )
-        
-        preferences = BookPreferences(
-            title=payload.title,
-            date=payload.date,
-            page_count=payload.page_count,
-            style=payload.style
-        )
         
-        # Build physical characteristics from payload if provided
-        phys_chars = None
-        if payload.physical_characteristics and payload.physical_characteristics.name:
-            phys_chars = PhysicalCharacteristics(
-                name=payload.physical_characteristics.name,
-                gender=payload.physical_characteristics.gender,
-                skin_color=payload.physical_characteristics.skin_color,
-                hair_color=payload.physical_characteristics.hair_color,
-                hair_style=payload.physical_characteristics.hair_style,
-                has_glasses=payload.physical_characteristics.has_glasses,
-                has_facial_hair=payload.physical_characteristics.has_facial_hair,
+        # Check type
+        if img.content_type not in ALLOWED_TYPES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"File {img.filename} has unsupported type. Use JPG, PNG, or WebP."
             )
         
-        reference_images = ReferenceImages(
-            paths=reference_paths,
-            physical_characteristics=phys_chars,
-            reference_input_mode=payload.reference_input_mode or "photos"
-        )
-        
-        # Run pipeline with progress tracking
-        result = await run_pipeline_with_tracking(
-            runner=runner,
-            job_id=job_id,
-            user_form=user_form,
-            preferences=preferences,
-            reference_images=reference_images,
-            user_language=user_language
-        )
-        
-        # Save result
-        output_dir = get_outputs_dir(job_id)
-        result_path = os.path.join(output_dir, "result.json")
-        
-        with open(result_path, 'w', encoding='utf-8') as f:
-            json.dump(result.model_dump(), f, indent=2, default=str)
-        
-        job_store.set_result(job_id, result_path, result.model_dump())
-        job_store.update_job_status(
-            job_id, 
-            status=JobStatus.COMPLETED, 
-            progress_percent=100
-        )
-        
-        logger.info(f"[{job_id}] Job completed successfully")
-        
-    except Exception as e:
-        logger.error(f"[{job_id}] Job failed: {str(e)}")
-        job_store.update_job_status(
-            job_id,
-            status=JobStatus.FAILED,
-            error=str(e)
-        )
+        files.append((content, img.filename))
+    return files
 
 
-async def run_pipeline_with_tracking(
-    runner: PipelineRunner,
-    job_id: str,
-    user_form: UserForm,
-    preferences: BookPreferences,
-    reference_images: ReferenceImages,
-    user_language: str
-) -> FinalBookPackage:
-    """
-    Run pipeline with progress tracking to job store.
+@app.post("/references", response_model=ReferenceSessionResponse)
+async def upload_references(
+    reference_images: List[UploadFile] = File(..., description="Reference images"),
+    style: Optional[str] = Form(None, description="Book style, if already chosen"),
+    user_language: Optional[str] = Form(None, description="User language"),
+    physical_characteristics: Optional[str] = Form(None, description="JSON physical characteristics"),
+    character_sheet: bool = Form(True, description="Also generate the character sheet ahead of the job")
+):
     """
-    from datetime import datetime
+    Upload reference images ahead of a job.
     
-    # Helper to update progress
-    def update_progress(step: str, percent: int):
-        job_store.start_step(job_id, step)
-        job_store.update_job_status(job_id, current_step=step, progress_percent=percent)
+    Returns a session token to pass as reference_session to POST /jobs.
+    Given the style, visual analysis and the character sheet start right
+    away in the background, so the job can skip them.
+    """
+    if not reference_images:
+        raise HTTPException(status_code=400, detail="No reference images uploaded")
     
-    def complete_step(step: str):
-        job_store.complete_step(job_id, step)
+    try:
+        characteristics = (
+            PhysicalCharacteristicsRequest.model_validate_json(physical_characteristics)
+            if physical_characteristics else None
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid physical_characteristics: {str(e)}")
     
-    output_dir = get_outputs_dir(job_id)
+    files = await read_reference_uploads(reference_images)
     
     try:
-        # Phase 1: Normalization (10%)
-        update_progress(StepName.NORMALIZATION.value, 5)
-        normalized_profile = await runner.normalizer.execute(
-            (user_form, preferences, user_language)
-        )
-        complete_step(StepName.NORMALIZATION.value)
-        
-        # Phase 2: Planning + Visual Analysis (30%)
-        update_progress(StepName.PLANNING.value, 15)
-        job_store.start_step(job_id, StepName.VISUAL_ANALYSIS.value)
-        
-        narrative_plan, visual_fingerprint = await asyncio.gather(
-            runner.narrative_planner.execute((normalized_profile, preferences, user_language)),
-            runner.visual_analyzer.execute((reference_images, preferences, user_language))
-        )
-        
-        complete_step(StepName.PLANNING.value)
-        complete_step(StepName.VISUAL_ANALYSIS.value)
-        
-        # Phase 2.5: Character Sheet Generation (32%)
-        update_progress(StepName.CHARACTER_SHEET.value, 28)
-        character_sheet_path = await runner.character_sheet_generator.execute(
-            (visual_fingerprint, preferences, reference_images, output_dir, user_language)
-        )
-        complete_step(StepName.CHARACTER_SHEET.value)
-        
-        # Build consolidated reference images: user photos + character sheet
-        all_reference_images = list(reference_images.paths)
-        if character_sheet_path:
-            all_reference_images.append(character_sheet_path)
-            visual_fingerprint.character_sheet_path = character_sheet_path
-            logger.info(f"[{job_id}] Character sheet generated: {character_sheet_path}")
-        else:
-            logger.info(f"[{job_id}] Character sheet generation skipped or failed - continuing without it")
-        
-        # Phase 3: Prompt Creation (45%)
-        update_progress(StepName.PROMPT_CREATION.value, 35)
-        
-        cover_prompt, back_cover_prompt, page_prompts = await asyncio.gather(
-            runner.cover_creator.execute((narrative_plan.cover, visual_fingerprint, preferences, user_language)),
-            runner.back_cover_creator.execute((narrative_plan.back_cover, visual_fingerprint, preferences, user_language)),
-            runner.prompt_writer.execute((narrative_plan, visual_fingerprint, preferences, user_language))
-        )
-        
-        all_prompts = [cover_prompt] + page_prompts + [back_cover_prompt]
-        complete_step(StepName.PROMPT_CREATION.value)
-        
-        # Phase 4: Prompt Review (55%)
-        update_progress(StepName.PROMPT_REVIEW.value, 50)
-        reviewed_prompts = await runner.prompt_reviewer.execute((all_prompts, user_language))
-        complete_step(StepName.PROMPT_REVIEW.value)
-        
-        # Phase 5: Image Generation (75%)
-        update_progress(StepName.IMAGE_GENERATION.value, 55)
-        
-        generation_results = []
-        total_prompts = len(reviewed_prompts)
-        
-        for i, prompt in enumerate(reviewed_prompts):
-            # Update page status
-            page_num = prompt.page_number
-            job_store.update_page_status(job_id, page_num, PageStatus.GENERATING)
-            
-            # Determine filename
-            if prompt.prompt_type == "cover":
-                filename = "cover.jpg"
-            elif prompt.prompt_type == "back_cover":
-                filename = "back_cover.jpg"
-            else:
-                filename = f"page_{prompt.page_number:02d}.jpg"
-            
-            output_path = os.path.join(output_dir, filename)
-            
-            # Generate image with retry
-            # Always pass reference images (user photos + character sheet) for consistency
-            # Only skip for back cover which typically doesn't feature the character
-            refs = all_reference_images if (all_reference_images and prompt.prompt_type != "back_cover") else None
-            
-            max_attempts = 3
-            result = None
-            for attempt in range(max_attempts):
-                result = await runner.image_client.generate_image(
-                    prompt=prompt.get_full_prompt(),
-                    reference_images=refs,
-                    render_params=prompt.render_params.model_dump(),
-                    output_path=output_path
-                )
-                
-                if result.success:
-                    break
-                
-                if attempt < max_attempts - 1:
-                    logger.warning(f"[{job_id}] Image gen failed for {filename} (attempt {attempt+1}), retrying...")
-                    await asyncio.sleep(1)
-            
-            generation_results.append(result)
-            
-            # Update page status
-            job_store.update_page_status(
-                job_id, page_num, 
-                PageStatus.COMPLETED if result.success else PageStatus.FAILED,
-                image_path=result.image_path
-            )
-            
-            # Update overall progress
-            progress = 55 + int((i + 1) / total_prompts * 20)
-            job_store.update_job_status(job_id, progress_percent=progress)
-        
-        # Log any failed images
-        failed_count = sum(1 for r in generation_results if not r.success)
-        if failed_count > 0:
-            logger.warning(f"[{job_id}] {failed_count}/{total_prompts} images failed generation")
-        
-        complete_step(StepName.IMAGE_GENERATION.value)
-        
-        # Phase 6: Illustration Review (85%)
-        update_progress(StepName.ILLUSTRATION_REVIEW.value, 78)
-        illustration_reviews = await runner.illustrator_reviewer.execute(
-            (generation_results, preferences, user_language)
-        )
-        complete_step(StepName.ILLUSTRATION_REVIEW.value)
-        
-        # Phase 7: Design Review (90%)
-        update_progress(StepName.DESIGN_REVIEW.value, 85)
-        design_review = await runner.designer_reviewer.execute(
-            (generation_results, illustration_reviews, preferences, user_language)
+        session = await get_speculation_manager().create(
+            files,
+            style=style,
+            user_language=user_language,
+            physical_characteristics=characteristics,
+            character_sheet=character_sheet
         )
-        complete_step(StepName.DESIGN_REVIEW.value)
-        
-        # Phase 8: Validation (95%)
-        update_progress(StepName.VALIDATION.value, 90)
-        # Simplified validation for now
-        complete_step(StepName.VALIDATION.value)
-        
-        # Phase 9: Finalization (100%)
-        update_progress(StepName.FINALIZATION.value, 95)
-        
-        # Build final package
-        final_package = runner._build_final_package(
-            book_id=job_id,
-            preferences=preferences,
-            results=generation_results,
-            prompts=reviewed_prompts,
-            narrative_plan=narrative_plan,
-            fingerprint=visual_fingerprint,
-            design_review=design_review,
-            output_dir=output_dir,
-            total_time_ms=0,
-            total_retries=0
-        )
-        
-        complete_step(StepName.FINALIZATION.value)
-        
-        return final_package
-        
-    finally:
-        # Cleanup
-        await runner.image_client.close()
-
-
-# ============================================================================
-# API Endpoints
-# ============================================================================
-
-@app.get("/health", response_model=HealthResponse)
-async def health_check():
-    """Health check endpoint."""
-    config_errors = config.validate()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid style: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to save files: {str(e)}")
     
-    return HealthResponse(
-        status="healthy",
-        version="1.0.0",
-        timestamp=datetime.now(),
-        config_valid=len(config_errors) == 0,
-        stub_mode=config.is_stub_mode,
-        supported_languages=["pt-BR", "en-US", "es-ES", "fr-FR", "de-DE", "it-IT"]
+    return ReferenceSessionResponse(
+        session_token=session.token,
+        reference_count=len(session.reference_images.paths),
+        expires_at=datetime.fromtimestamp(session.expires_at),
+        speculating=session.speculating
     )
 
 
@@ -470,7 +279,9 @@ async def health_check():
 async def create_job(
     background_tasks: BackgroundTasks,
     payload: str = Form(..., description="JSON payload"),
-    reference_images: List[UploadFile] = File(default=[], description="Reference images (optional)")
+    reference_images: List[UploadFile] = File(default=[], description="Reference images (optional)"),
+    reference_session: Optional[str] = Form(None, description="Token from POST /references (optional)"),
+    idempotency_key: Optional[str] = Header(None, max_length=255)
 ):
     """
     Create a new book generation job.
@@ -478,9 +289,12 @@ async def create_job(
     Accepts multipart/form-data with:
     - payload: JSON string with job configuration
     - reference_images: Optional image files for personalization
-    """
-    job_id = str(uuid.uuid4())
+    - reference_session: Optional token of images uploaded ahead via POST /references
     
+    A repeated request returns the job created by the first one instead of
+    starting another: one with the same Idempotency-Key header, or without
+    the header, the same payload and images within JOB_DEDUP_WINDOW_SECONDS.
+    """
     try:
         # Parse payload
         payload_data = JobPayload.model_validate_json(payload)
@@ -489,34 +303,74 @@ async def create_job(
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid payload: {str(e)}")
     
+    if reference_images and reference_session:
+        raise HTTPException(status_code=400, detail="Send either reference_images or reference_session, not both")
+    
+    files_to_save = await read_reference_uploads(reference_images) if reference_images else []
+    
+    # Claim the request's key before anything is saved, so concurrent
+    # duplicates wait for this request instead of creating their own job
+    fingerprint = request_fingerprint(
+        payload_data.model_dump(mode="json"), (content for content, _ in files_to_save), reference_session
+    )
+    dedup_key = None
+    if idempotency_key:
+        dedup_key, ttl_seconds = f"key:{idempotency_key}", None
+    elif config.job_dedup_window_seconds > 0:
+        dedup_key, ttl_seconds = f"request:{fingerprint}", config.job_dedup_window_seconds
+    
+    if dedup_key is not None:
+        index = get_idempotency_index()
+        try:
+            existing_job_id = await index.claim(dedup_key, fingerprint, ttl_seconds)
+            if existing_job_id is not None and job_store.get_job(existing_job_id) is None:
+                # Deleted by another process since; the key starts over
+                index.forget_job(existing_job_id)
+                existing_job_id = await index.claim(dedup_key, fingerprint, ttl_seconds)
+        except IdempotencyConflictError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        
+        if existing_job_id is not None:
+            logger.info(f"[{existing_job_id}] Duplicate job request, returning the existing job")
+            return JobCreateResponse(
+                job_id=existing_job_id,
+                status=job_store.get_job(existing_job_id).status,
+                message="Duplicate request; returning the existing job",
+                duplicate=True
+            )
+    
+    job_id = str(uuid.uuid4())
+    try:
+        response = await start_job(
+            background_tasks, job_id, payload_data, user_language, files_to_save, reference_session
+        )
+    except BaseException:
+        if dedup_key is not None:
+            index.release(dedup_key)
+        raise
+    if dedup_key is not None:
+        index.complete(dedup_key, job_id)
+    return response
+
+
+async def start_job(
+    background_tasks: BackgroundTasks,
+    job_id: str,
+    payload_data: JobPayload,
+    user_language: str,
+    files_to_save: List[tuple],
+    reference_session: Optional[str]
+) -> JobCreateResponse:
+    """Save a new job's references, create its record and start processing it."""
     # Reference images are optional - if provided, validate them
     reference_paths = []
     
-    if reference_images:
-        # Validate file types and sizes
-        MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
-        ALLOWED_TYPES = {'image/jpeg', 'image/png', 'image/webp'}
-        
-        files_to_save = []
-        for img in reference_images:
-            content = await img.read()
-            
-            # Check size
-            if len(content) > MAX_FILE_SIZE:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"File {img.filename} exceeds maximum size of 10MB"
-                )
-            
-            # Check type
-            if img.content_type not in ALLOWED_TYPES:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"File {img.filename} has unsupported type. Use JPG, PNG, or WebP."
-                )
-            
-            files_to_save.append((content, img.filename))
-        
+    if reference_session:
+        reference_paths = await get_speculation_manager().adopt(reference_session, job_id)
+        if reference_paths is None:
+            raise HTTPException(status_code=400, detail="Unknown or expired reference session")
+    
+    if files_to_save:
         # Save uploaded files
         try:
             reference_paths = await save_uploaded_files(job_id, files_to_save)
@@ -527,15 +381,28 @@ async def create_job(
     job_store.create_job(
         job_id=job_id,
         user_language=user_language,
-        input_payload=payload_data.model_dump(),
+        input_payload=payload_data.model_dump(mode="json"),
         reference_image_paths=reference_paths,
-        page_count=payload_data.page_count
+        page_count=payload_data.page_count,
+        priority=payload_data.priority,
+        deadline=payload_data.deadline,
+        styles=payload_data.requested_styles() if payload_data.is_multi_style else None
     )
     
     logger.info(f"[{job_id}] Job created: {payload_data.title} (language: {user_language})")
     
-    # Start background processing
-    background_tasks.add_task(process_job_background, job_id, payload_data, reference_paths)
+    # Start processing: hand off to worker processes in queue mode,
+    # otherwise run in this process as a background task
+    if config.is_queue_mode:
+        get_job_queue().enqueue(
+            job_id,
+            payload_data.model_dump(mode="json"),
+            reference_paths,
+            priority=payload_data.priority,
+            deadline=payload_data.deadline
+        )
+    else:
+        background_tasks.add_task(process_job_background, job_id, payload_data, reference_paths)
     
     return JobCreateResponse(
         job_id=job_id,
@@ -555,35 +422,170 @@ async def get_job_status(job_id: str):
     return JobStatusResponse(**job.to_status_response())
 
 
-@app.get("/jobs/{job_id}/result")
-async def get_job_result(job_id: str):
-    """Get job result (final book package). 
-    Images are returned as public URLs in image_path when available.
-    The /assets/ endpoint remains as fallback."""
+@app.get("/jobs/{job_id}/trace")
+async def get_job_trace(job_id: str):
+    """
+    Get the job's trace as a waterfall timeline.
+    
+    Each span row has its depth, start offset and duration in ms, so the
+    frontend can render it directly.
+    """
     job = job_store.get_job(job_id)
     
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
+    exporter = get_exporter()
+    if exporter is None:
+        raise HTTPException(status_code=404, detail="Tracing is disabled")
+    
+    spans = await asyncio.to_thread(exporter.load, trace_id_for_job(job_id))
+    timeline = build_waterfall(spans)
+    timeline["job_id"] = job_id
+    timeline["job_status"] = job.status
+    return timeline
+
+
+def completed_result(job, style: Optional[str]) -> dict:
+    """The result JSON of a completed job, or of one of its styles."""
     if job.status != JobStatus.COMPLETED:
         raise HTTPException(
             status_code=400,
             detail=f"Job not completed. Current status: {job.status}"
         )
     
-    if not job.result_json:
+    result_json = job.result_json
+    if style is not None:
+        if style not in job.styles:
+            raise HTTPException(status_code=404, detail=f"Style not in this job: {style}")
+        result_json = job.styles[style].result_json
+        if not result_json:
+            raise HTTPException(status_code=404, detail=f"No result for style {style}: {job.styles[style].error}")
+    
+    if not result_json:
         raise HTTPException(status_code=404, detail="Result not found")
+    return result_json
+
+
+@app.post("/jobs/{job_id}/editions", response_model=EditionResponse)
+async def create_editions(job_id: str, request: EditionRequest):
+    """
+    Translate a completed book into other languages.
     
-    # Convert datetime objects to ISO strings for JSON serialization
-    import json
-    from datetime import datetime
+    Each edition reuses the book's images; only the text is translated,
+    in one model call per language. Languages are translated concurrently
+    and served by GET /jobs/{job_id}/result?language=.
+    """
+    job = job_store.get_job(job_id)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    package = FinalBookPackage.model_validate(completed_result(job, request.style))
+    languages = edition_languages(request.languages, package.language or job.user_language)
+    errors = await translate_editions(job_id, package, languages, style=request.style)
+    
+    editions = [language for language, error in errors.items() if error is None]
+    if languages and not editions:
+        raise HTTPException(
+            status_code=502,
+            detail="Translation failed: " + "; ".join(f"{language}: {error}" for language, error in errors.items())
+        )
+    
+    return EditionResponse(
+        job_id=job_id,
+        style=request.style,
+        editions=editions,
+        errors={language: error for language, error in errors.items() if error is not None}
+    )
+
+
+@app.post("/jobs/{job_id}/pages/{page_number}/regenerate")
+async def regenerate_page_endpoint(job_id: str, page_number: int, request: Optional[RegeneratePageRequest] = None):
+    """
+    Regenerate one image of a completed book, optionally with feedback.
+    
+    page_number is 0 for the cover and -1 for the back cover. The job's
+    fingerprint, character sheet and prompt for the page are reused;
+    other pages, the covers and the design review are not touched.
+    Returns the page's updated entry in the book.
+    """
+    request = request or RegeneratePageRequest()
+    job = job_store.get_job(job_id)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    completed_result(job, request.style)
+    try:
+        page = await regenerate_page(job_id, page_number, request.feedback, style=request.style)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (ValueError, PageBusyError) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.exception(f"[{job_id}] Page {page_number} regeneration failed: {e}")
+        raise HTTPException(status_code=502, detail=f"Page regeneration failed: {str(e)}")
+    
+    return page.model_dump(mode="json")
+
+
+@app.post("/jobs/{job_id}/revisions", response_model=RevisionResponse)
+async def revise_job_endpoint(job_id: str, payload: JobPayload):
+    """
+    Apply edited memories to a completed book incrementally.
+    
+    The body is the job's payload with the edited memories. Only the
+    changed life phases are normalized again, only pages about changed
+    memories are planned again, and only pages whose prompt changed get
+    a new image. Everything else is carried over.
+    """
+    job = job_store.get_job(job_id)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    completed_result(job, None)
+    try:
+        revision = await revise_job(job_id, payload)
+    except (ValueError, PageBusyError) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.exception(f"[{job_id}] Revision failed: {e}")
+        raise HTTPException(status_code=502, detail=f"Revision failed: {str(e)}")
+    
+    return RevisionResponse(job_id=job_id, **vars(revision))
+
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, style: Optional[str] = None, language: Optional[str] = None):
+    """Get job result (final book package). 
+    Images are returned as public URLs in image_path when available.
+    The /assets/ endpoint remains as fallback.
+    For a multi-style job, style selects the book; without it, the first
+    completed style is returned. language selects a translated edition
+    (see POST /jobs/{job_id}/editions)."""
+    job = job_store.get_job(job_id)
     
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    result_json = completed_result(job, style)
+    if language is not None:
+        editions = job.progress_target(style).editions
+        language = resolve_language(language)
+        if language in editions:
+            result_json = editions[language]
+        elif language != resolve_language(result_json.get("language") or job.user_language):
+            raise HTTPException(status_code=404, detail=f"No edition in {language}")
+    
+    # Convert datetime objects to ISO strings for JSON serialization
     def json_serial(obj):
         if isinstance(obj, datetime):
             return obj.isoformat()
         raise TypeError(f"Type {type(obj)} not serializable")
     
-    result = json.loads(json.dumps(job.result_json, default=json_serial))
+    result = json.loads(json.dumps(result_json, default=json_serial))
     
     # Add asset_url hints so frontend knows where to fetch images
     def add_asset_url(page_data):
@@ -593,7 +595,10 @@ async def get_job_result(job_id: str):
         image_path = page_data.get("image_path", "")
         if not image_path or image_path.startswith("data:") or image_path.startswith("http"):
             return
-        filename = os.path.basename(image_path.replace("\\", "/"))
+        # Multi-style images are relative to the outputs directory ("<style>/cover.jpg")
+        filename = image_path.replace("\\", "/")
+        if result.get("style") not in job.styles:
+            filename = os.path.basename(filename)
         page_data["asset_url"] = f"/assets/{job_id}/outputs/{filename}"
     
     add_asset_url(result.get("cover"))
@@ -629,17 +634,21 @@ async def list_job_assets_endpoint(job_id: str):
     }
 
 
-@app.get("/assets/{job_id}/{folder}/{filename}")
+@app.get("/assets/{job_id}/{folder}/{filename:path}")
 async def serve_asset(job_id: str, folder: str, filename: str):
-    """Serve an asset file directly. Images are already compressed at generation time."""
+    """Serve an asset file directly. Images are already compressed at generation time.
+    Outputs of a multi-style job are in a subdirectory per style."""
     if folder not in ["references", "outputs"]:
         raise HTTPException(status_code=400, detail="Invalid folder")
     
     from store.file_storage import get_references_dir, get_outputs_dir
     base_dir = get_references_dir(job_id) if folder == "references" else get_outputs_dir(job_id)
-    filepath = os.path.join(base_dir, filename)
+    filepath = os.path.realpath(os.path.join(base_dir, filename))
+    
+    if not filepath.startswith(os.path.realpath(base_dir) + os.sep):
+        raise HTTPException(status_code=400, detail="Invalid filename")
     
-    if not os.path.exists(filepath):
+    if not os.path.isfile(filepath):
         raise HTTPException(status_code=404, detail="Asset not found")
     
     return FileResponse(filepath, media_type=get_mime_type(filename))
@@ -676,9 +685,16 @@ async def delete_job(job_id: str):
     
     # Cleanup storage
     cleanup_job_storage(job_id)
+    exporter = get_exporter()
+    if exporter is not None:
+        exporter.delete(trace_id_for_job(job_id))
     
-    # Delete job record
+    # Delete job record; in queue mode also its queue entry, which
+    # cancels the job if a worker is running it
     job_store.delete_job(job_id)
+    if config.is_queue_mode:
+        get_job_queue().remove(job_id)
+    get_idempotency_index().forget_job(job_id)
     
     return {"message": "Job deleted successfully"}
 
@@ -747,7 +763,9 @@ Rules:
             api_key=config.google_api_key,
             model=config.gemini_model
         )
-        enhanced = await gemini_client.generate_text(system_prompt, user_prompt)
+        # Interactive priority lets the call use the reserved scheduler slots
+        with job_context(priority=PRIORITY_INTERACTIVE):
+            enhanced = await gemini_client.generate_text(system_prompt, user_prompt)
 
         if not enhanced or len(enhanced.strip()) < 10:
             raise HTTPException(status_code=500, detail="AI returned an empty or too-short response")
@@ -762,6 +780,65 @@ Rules:
         raise HTTPException(status_code=500, detail=f"Text enhancement failed: {str(e)}")
 
 
+@app.get("/metrics", response_class=PlainTextResponse, tags=["monitoring"])
+async def metrics_endpoint():
+    """Prometheus metrics for this process."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+def require_debug_token(x_debug_token: Optional[str] = Header(None)) -> None:
+    """Allow /debug endpoints only with the configured DEBUG_TOKEN."""
+    if not config.debug_token:
+        raise HTTPException(status_code=404, detail="Debug endpoints are disabled")
+    if not x_debug_token or not hmac.compare_digest(x_debug_token, config.debug_token):
+        raise HTTPException(status_code=401, detail="Invalid debug token")
+
+
+@app.get("/debug/blocking-calls", tags=["monitoring"], dependencies=[Depends(require_debug_token)])
+async def blocking_calls(limit: int = 20):
+    """
+    Top event loop blocking call sites since startup.
+    
+    Sites are ordered by total blocked time, each with a sample stack.
+    """
+    return get_loop_monitor().snapshot(limit=max(1, min(limit, 100)))
+
+
+@app.get("/debug/profile", tags=["monitoring"], dependencies=[Depends(require_debug_token)])
+async def debug_profile(seconds: float = 10, hz: Optional[int] = None, format: str = "collapsed"):
+    """
+    Sample all thread stacks for N seconds.
+    
+    Returns collapsed stacks (one "frame;frame;... count" line per stack)
+    for flame graph tools, or JSON with format=json. Stacks are prefixed
+    with the thread name and, where known, the job ID and agent.
+    """
+    if not 0 < seconds <= config.profiler_max_seconds:
+        raise HTTPException(
+            status_code=400,
+            detail=f"seconds must be between 0 and {config.profiler_max_seconds}"
+        )
+    if format not in ("collapsed", "json"):
+        raise HTTPException(status_code=400, detail="format must be 'collapsed' or 'json'")
+    sample_hz = max(1, min(hz or config.profiler_sample_hz, 1000))
+    
+    try:
+        result = await profile(seconds, sample_hz=sample_hz)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    logger.info(
+        f"[Profile] {result.samples} samples in {result.seconds:.1f}s "
+        f"({result.overhead:.2%} sampling overhead)"
+    )
+    if format == "json":
+        return result.to_dict()
+    return PlainTextResponse(result.collapsed(), headers={
+        "X-Profile-Samples": str(result.samples),
+        "X-Profile-Overhead": f"{result.overhead:.4f}",
+    })
+
+
 @app.get("/")
 async def root():
     """Root endpoint with API information."""
@@ -771,15 +848,23 @@ async def root():
         "docs": "/docs",
         "health": "/health",
         "endpoints": {
+            "upload_references": "POST /references",
             "create_job": "POST /jobs",
             "job_status": "GET /jobs/{job_id}",
             "job_result": "GET /jobs/{job_id}/result",
+            "job_editions": "POST /jobs/{job_id}/editions",
+            "regenerate_page": "POST /jobs/{job_id}/pages/{page_number}/regenerate",
+            "revise_job": "POST /jobs/{job_id}/revisions",
+            "job_trace": "GET /jobs/{job_id}/trace",
             "job_assets": "GET /jobs/{job_id}/assets",
             "serve_asset": "GET /assets/{job_id}/{folder}/{filename}",
             "list_jobs": "GET /jobs",
             "delete_job": "DELETE /jobs/{job_id}",
             "enhance_text": "POST /enhance-text",
-            "languages": "GET /languages"
+            "languages": "GET /languages",
+            "metrics": "GET /metrics",
+            "blocking_calls": "GET /debug/blocking-calls",
+            "profile": "GET /debug/profile?seconds=N"
         }
     }
 
@@ -803,6 +888,11 @@ async def startup_event():
         logger.warning(f"Configuration warnings: {errors}")
         logger.warning("Running in stub mode - no real API calls will be made")
     
+    # Label tasks with their job/agent for the profiler and watch for
+    # event loop stalls (blocking calls inside async code)
+    track_task_activity()
+    start_loop_monitor()
+    
     logger.info("MemoryBook API ready")
 
 
@@ -810,4 +900,5 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup resources on shutdown."""
     logger.info("MemoryBook API shutting down...")
+    await get_loop_monitor().stop()
     logger.info("MemoryBook API shutdown complete")
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Pipeline Benchmark
+
+Offline benchmark of the full job pipeline on a fake Gemini backend
+(clients/fake_genai.py). Unlike stub mode, every model call goes through
+the call scheduler, worker threads, response parsing and Pillow
+compression, with simulated per-model latency, rate limits, errors and
+real-sized image payloads.
+
+Each scenario runs in its own process so peak RSS is per scenario:
+
+    single-10, single-15, single-20   one book of each page count
+    concurrent-N                      N concurrent 10-page books
+
+Reported per scenario: wall time, p50/p95 latency per stage (agent,
+image attempt and model call spans), event-loop lag with the top
+blocking call sites, and peak RSS. Model latencies are multiplied by
+--time-scale; CPU work is not, so lower scales make CPU-bound
+regressions more visible.
+
+Usage:
+    cd backend
+    python benchmark.py --books 4 --time-scale 0.05 --output bench.json
+    python benchmark.py --scenario single-20
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import argparse
+import resource
+import tempfile
+import subprocess
+from datetime import datetime
+from typing import Any, Dict, List
+
+PAGE_COUNTS = (10, 15, 20)
+
+
+class CollectingExporter:
+    """Span exporter that keeps finished spans in memory."""
+    
+    def __init__(self):
+        self.spans: List[Any] = []
+    
+    def export(self, span) -> None:
+        self.spans.append(span)
+    
+    def load(self, trace_id: str) -> List[Dict[str, Any]]:
+        return [s.to_dict() for s in self.spans if s.trace_id == trace_id]
+    
+    def delete(self, trace_id: str) -> None:
+        self.spans = [s for s in self.spans if s.trace_id != trace_id]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+def parse_scenario(name: str) -> Dict[str, int]:
+    """Map a scenario name to its book and page counts."""
+    kind, _, value = name.partition("-")
+    if kind == "single" and value.isdigit() and int(value) in PAGE_COUNTS:
+        return {"books": 1, "pages": int(value)}
+    if kind == "concurrent" and value.isdigit() and int(value) > 0:
+        return {"books": int(value), "pages": 10}
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+def make_reference_photos(directory: str, count: int) -> List[str]:
+    """Write phone-camera sized reference photos."""
+    from clients.fake_genai import render_image
+    from PIL import Image
+    import io
+    
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"reference_{i}.jpg")
+        image = Image.open(io.BytesIO(render_image(2000, 1500, 100 + i))).convert("RGB")
+        image.save(path, "JPEG", quality=90)
+        paths.append(path)
+    return paths
+
+
+def build_payload(pages: int, index: int):
+    """A filled-in job payload like the frontend sends."""
+    from models.job_payload import JobPayload
+    
+    phase = {
+        "memories": ["Summer afternoons in grandma's garden", "Learning to ride a bicycle"],
+        "key_events": ["First day of school"],
+        "emotions": ["Joy", "Curiosity"],
+    }
+    return JobPayload(
+        title=f"Benchmark Book {index + 1}",
+        date="2024",
+        page_count=pages,
+        style="watercolor",
+        young=phase,
+        adolescent=phase,
+        adult=phase,
+        elderly=phase
+    )
+
+
+async def run_scenario(name: str, args) -> Dict[str, Any]:
+    """Run one scenario in this process and collect its measurements."""
+    from clients.fake_genai import FakeGenaiClient
+    from clients.gemini_client import set_sdk_factory
+    from pipeline.job_processor import process_job_background
+    from store import get_job_store
+    from utils import tracing
+    from utils.loop_monitor import LoopMonitor
+    
+    shape = parse_scenario(name)
+    fake = FakeGenaiClient(time_scale=args.time_scale, seed=args.seed)
+    set_sdk_factory(lambda api_key: fake)
+    exporter = CollectingExporter()
+    tracing.set_exporter(exporter)
+    
+    photos_dir = tempfile.mkdtemp(prefix="bench-refs-")
+    references = make_reference_photos(photos_dir, args.references)
+    
+    job_store = get_job_store()
+    job_ids = []
+    for index in range(shape["books"]):
+        job_id = str(uuid.uuid4())
+        job_store.create_job(job_id, page_count=shape["pages"])
+        job_ids.append(job_id)
+    
+    monitor = LoopMonitor(interval=0.02, threshold=0.1, recent=100000)
+    monitor.start()
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        process_job_background(job_id, build_payload(shape["pages"], i), references)
+        for i, job_id in enumerate(job_ids)
+    ])
+    wall = time.perf_counter() - started
+    await monitor.stop()
+    shutil.rmtree(photos_dir, ignore_errors=True)
+    
+    stages: Dict[str, List[float]] = {}
+    for finished in exporter.spans:
+        if finished.name.startswith(("agent.", "gemini.", "image.")):
+            seconds = (finished.end_time_unix_nano - finished.start_time_unix_nano) / 1e9
+            stages.setdefault(finished.name, []).append(seconds)
+    
+    statuses = [job_store.get_job(job_id).status for job_id in job_ids]
+    lag = monitor.lag_summary()
+    return {
+        "scenario": name,
+        "books": shape["books"],
+        "pages": shape["pages"],
+        "time_scale": args.time_scale,
+        "wall_seconds": round(wall, 3),
+        "jobs_completed": sum(1 for s in statuses if s == "completed"),
+        "stages": {
+            stage: {
+                "count": len(values),
+                "p50_ms": round(percentile(values, 0.5) * 1000, 1),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+            }
+            for stage, values in sorted(stages.items())
+        },
+        "loop_lag_ms": {"p50": lag["p50_ms"], "p95": lag["p95_ms"], "max": lag["max_ms"]},
+        "blocking_sites": [
+            {key: site[key] for key in ("site", "count", "total_ms", "max_ms")}
+            for site in monitor.top_sites(5)
+        ],
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "fake_backend": fake.stats.to_dict(),
+    }
+
+
+def run_in_subprocess(name: str, args) -> Dict[str, Any]:
+    """Run a scenario in a fresh interpreter with isolated storage."""
+    storage_dir = tempfile.mkdtemp(prefix="bench-storage-")
+    env = dict(
+        os.environ,
+        GOOGLE_API_KEY="benchmark-fake-key",
+        STORAGE_DIR=storage_dir,
+        JOB_EXECUTION_MODE="inline",
+        # The fake reuses a few pre-rendered images, which would all be
+        # flagged as duplicate pages
+        IMAGE_DUPLICATE_DISTANCE="-1",
+    )
+    command = [
+        sys.executable, os.path.abspath(__file__),
+        "--child", name,
+        "--time-scale", str(args.time_scale),
+        "--seed", str(args.seed),
+        "--references", str(args.references),
+    ]
+    try:
+        completed = subprocess.run(
+            command, env=env, capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+    finally:
+        shutil.rmtree(storage_dir, ignore_errors=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Scenario {name} failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def git_commit() -> str:
+    """Current commit, so results can be compared across commits."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def report(result: Dict[str, Any]) -> None:
+    """Print one scenario's results."""
+    label = f"{result['scenario']} ({result['books']} x {result['pages']} pages)"
+    print(f"\n{label}")
+    print("-" * len(label))
+    lag = result["loop_lag_ms"]
+    print(f"  wall time: {result['wall_seconds']:.2f}s  "
+          f"completed: {result['jobs_completed']}/{result['books']}  "
+          f"peak RSS: {result['peak_rss_mb']:.0f}MB")
+    print(f"  loop lag: p50={lag['p50']:.1f}ms p95={lag['p95']:.1f}ms max={lag['max']:.1f}ms")
+    for site in result["blocking_sites"]:
+        print(f"    blocked {site['total_ms']:.0f}ms in {site['count']} stalls at {site['site']}")
+    fake = result["fake_backend"]
+    print(f"  fake backend: calls={sum(fake['calls'].values())} "
+          f"rate_limited={sum(fake['rate_limited'].values())} "
+          f"errors={sum(fake['errors'].values())} refusals={sum(fake['refusals'].values())} "
+          f"malformed_json={sum(fake['malformed'].values())}")
+    print(f"  {'stage':<40} {'count':>6} {'p50 ms':>10} {'p95 ms':>10}")
+    for stage, values in result["stages"].items():
+        print(f"  {stage:<40} {values['count']:>6} {values['p50_ms']:>10.1f} {values['p95_ms']:>10.1f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on a fake Gemini backend")
+    parser.add_argument("--scenario", action="append",
+                        help="Scenario to run (repeatable); default: single-10/15/20 and concurrent-N")
+    parser.add_argument("--books", type=int, default=4, help="Books in the concurrent scenario")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="Real seconds per simulated second")
+    parser.add_argument("--references", type=int, default=2, help="Reference photos per book")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        import logging
+        logging.disable(logging.WARNING)
+        print(json.dumps(asyncio.run(run_scenario(args.child, args))))
+        return 0
+    
+    scenarios = args.scenario or [f"single-{pages}" for pages in PAGE_COUNTS] + [f"concurrent-{args.books}"]
+    for name in scenarios:
+        parse_scenario(name)
+    
+    print(f"Benchmarking {len(scenarios)} scenarios on the fake backend (time scale {args.time_scale})")
+    results = []
+    for name in scenarios:
+        result = run_in_subprocess(name, args)
+        report(result)
+        results.append(result)
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "commit": git_commit(),
+                "timestamp": datetime.now().isoformat(),
+                "results": results,
+            }, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
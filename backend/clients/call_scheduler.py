@@ -0,0 +1,243 @@
+"""
+Call Scheduler
+
+Orders model calls that compete for the same API quota.
+
+Each call kind ("text", "image") has a pool of concurrent slots. When a
+pool is full, waiting calls are admitted by job priority, then by the
+earliest deadline, then in arrival order. Some text slots are reserved
+for interactive calls, so requests like /enhance-text are never stuck
+behind a backlog of book generation.
+
+The scheduler is per process; in queue mode every worker process
+schedules its own calls.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional
+
+import sys
+sys.path.append('..')
+
+from utils.job_context import current_job
+
+
+KIND_TEXT = "text"
+KIND_IMAGE = "image"
+
+
+@dataclass(order=True)
+class _Waiter:
+    """A call waiting for a slot."""
+    rank: int
+    deadline: float
+    sequence: int
+    interactive: bool = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class _SlotPool:
+    """Concurrency slots for one kind of call."""
+    
+    def __init__(self, capacity: int, reserved: int):
+        self.capacity = max(1, capacity)
+        # Always leave at least one slot for batch work
+        self.reserved = max(0, min(reserved, self.capacity - 1))
+        self.in_use = 0
+        self.batch_in_use = 0
+        self.waiters: List[_Waiter] = []
+    
+    def can_admit(self, interactive: bool) -> bool:
+        if self.in_use >= self.capacity:
+            return False
+        if interactive:
+            return True
+        return self.batch_in_use < self.capacity - self.reserved
+    
+    def take(self, interactive: bool) -> None:
+        self.in_use += 1
+        if not interactive:
+            self.batch_in_use += 1
+    
+    def give_back(self, interactive: bool) -> None:
+        self.in_use -= 1
+        if not interactive:
+            self.batch_in_use -= 1
+    
+    def dispatch(self) -> None:
+        """Admit waiters in priority order while slots are free."""
+        while self.waiters:
+            waiter = self.waiters[0]
+            if waiter.future.done():
+                # Cancelled while waiting
+                heapq.heappop(self.waiters)
+                continue
+            if not self.can_admit(waiter.interactive):
+                # The head of the heap is the most urgent waiter; when it is
+                # a batch call, no interactive call is waiting behind it.
+                return
+            heapq.heappop(self.waiters)
+            self.take(waiter.interactive)
+            waiter.future.set_result(None)
+
+
+class CallScheduler:
+    """
+    Priority and deadline aware admission control for model calls.
+    
+    Usage:
+        async with scheduler.slot(KIND_IMAGE):
+            response = await asyncio.to_thread(...)
+    """
+    
+    def __init__(self, limits: Dict[str, int], reserved: Optional[Dict[str, int]] = None):
+        """
+        Initialize the scheduler.
+        
+        Args:
+            limits: Maximum concurrent calls per call kind
+            reserved: Slots per call kind that only interactive calls may use
+        """
+        reserved = reserved or {}
+        self._pools = {
+            kind: _SlotPool(capacity, reserved.get(kind, 0))
+            for kind, capacity in limits.items()
+        }
+        self._sequence = itertools.count()
+    
+    def _pool(self, kind: str) -> _SlotPool:
+        if kind not in self._pools:
+            self._pools[kind] = _SlotPool(1, 0)
+        return self._pools[kind]
+    
+    @asynccontextmanager
+    async def slot(self, kind: str) -> AsyncIterator[None]:
+        """
+        Hold a slot for one call of the given kind.
+        
+        Priority and deadline are taken from the current job context.
+        
+        Args:
+            kind: Call kind (KIND_TEXT or KIND_IMAGE)
+        """
+        pool = self._pool(kind)
+        context = current_job()
+        interactive = context.is_interactive
+        
+        deadline = context.deadline_timestamp
+        waiter = _Waiter(
+            rank=context.priority_rank,
+            deadline=deadline if deadline is not None else math.inf,
+            sequence=next(self._sequence),
+            interactive=interactive,
+            future=asyncio.get_running_loop().create_future()
+        )
+        heapq.heappush(pool.waiters, waiter)
+        pool.dispatch()
+        
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted just before the cancellation arrived
+                pool.give_back(interactive)
+                pool.dispatch()
+            raise
+        
+        try:
+            yield
+        finally:
+            pool.give_back(interactive)
+            pool.dispatch()
+    
+    @asynccontextmanager
+    async def slot_if_free(self, kind: str) -> AsyncIterator[bool]:
+        """
+        Hold a slot only if one is free now and nobody is waiting for it.
+        
+        Used for optional calls (such as hedged requests) that are only
+        worth making without queueing.
+        
+        Args:
+            kind: Call kind (KIND_TEXT or KIND_IMAGE)
+        
+        Yields:
+            Whether a slot was taken
+        """
+        pool = self._pool(kind)
+        interactive = current_job().is_interactive
+        waiting = any(not w.future.done() for w in pool.waiters)
+        if waiting or not pool.can_admit(interactive):
+            yield False
+            return
+        
+        pool.take(interactive)
+        try:
+            yield True
+        finally:
+            pool.give_back(interactive)
+            pool.dispatch()
+    
+    def hold_until(self, kind: str, future: asyncio.Future) -> None:
+        """
+        Keep a slot in use until a future is done.
+        
+        For calls abandoned while their worker thread keeps running (such
+        as the loser of a hedged request): the thread still uses quota,
+        so its slot must not go to another call until it returns. Call it
+        before leaving the call's own slot.
+        
+        Args:
+            kind: Call kind (KIND_TEXT or KIND_IMAGE)
+            future: The running thread's future
+        """
+        pool = self._pool(kind)
+        interactive = current_job().is_interactive
+        pool.take(interactive)
+        
+        def release(done: asyncio.Future) -> None:
+            if not done.cancelled():
+                # Nobody awaits an abandoned call; mark its error retrieved
+                done.exception()
+            pool.give_back(interactive)
+            pool.dispatch()
+        
+        future.add_done_callback(release)
+    
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Current slot usage and queue depth per call kind."""
+        return {
+            kind: {
+                "capacity": pool.capacity,
+                "reserved": pool.reserved,
+                "in_use": pool.in_use,
+                "waiting": sum(1 for w in pool.waiters if not w.future.done()),
+            }
+            for kind, pool in self._pools.items()
+        }
+
+
+# Global scheduler instance
+_call_scheduler: Optional[CallScheduler] = None
+
+
+def get_call_scheduler() -> CallScheduler:
+    """Get the process-wide call scheduler configured from the app config."""
+    global _call_scheduler
+    if _call_scheduler is None:
+        from utils.config import get_config
+        
+        config = get_config()
+        _call_scheduler = CallScheduler(
+            limits={
+                KIND_TEXT: config.text_max_concurrency,
+                KIND_IMAGE: config.image_max_concurrency,
+            },
+            reserved={KIND_TEXT: config.interactive_reserved_slots}
+        )
+    return _call_scheduler
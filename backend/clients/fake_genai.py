@@ -0,0 +1,457 @@
+"""
+Fake GenAI Client
+
+Offline stand-in for google-genai's Client, used by the benchmark to
+exercise the real GeminiClient code paths without network access.
+
+Unlike stub mode, requests go through the call scheduler, worker
+threads, response parsing and Pillow compression. Each model has a
+latency distribution, a requests-per-minute limit and an error rate.
+Image responses carry real-sized PNG payloads. JSON responses are
+generated from the native response schema, or the schema GeminiClient
+appends to the prompt, so agents take their normal (non-fallback) path.
+Replies to schema-in-prompt requests are malformed at the profile's
+malformed_json_rate; native JSON mode constrains output, so never.
+generate_content_stream returns the same text in chunks spread over the
+simulated latency.
+
+Usage:
+    from clients.fake_genai import FakeGenaiClient
+    from clients.gemini_client import set_sdk_factory
+    
+    set_sdk_factory(lambda api_key: FakeGenaiClient(time_scale=0.1))
+"""
+
+import io
+import re
+import ast
+import json
+import math
+import time
+import random
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+
+SCHEMA_MARKER = "Respond with valid JSON matching this schema:\n"
+JSON_MIME_TYPE = "application/json"
+
+WORDS = (
+    "warm light garden memory family laughter window afternoon soft golden "
+    "kitchen river childhood bicycle letter journey harbor quiet smile autumn "
+    "portrait festival meadow lantern train wedding grandmother evening path"
+).split()
+
+
+@dataclass
+class ModelProfile:
+    """Simulated behaviour of one model."""
+    latency_median: float
+    latency_sigma: float
+    requests_per_minute: int
+    error_rate: float = 0.0
+    refusal_rate: float = 0.0
+    malformed_json_rate: float = 0.0
+
+
+DEFAULT_PROFILES: Dict[str, ModelProfile] = {
+    "gemini-2.0-flash": ModelProfile(1.4, 0.45, 2000, error_rate=0.01, malformed_json_rate=0.02),
+    "gemini-2.0-pro-exp": ModelProfile(5.0, 0.5, 150, error_rate=0.02, malformed_json_rate=0.02),
+    "gemini-2.5-flash-image": ModelProfile(9.0, 0.35, 100, error_rate=0.03, refusal_rate=0.02),
+}
+
+FALLBACK_PROFILE = ModelProfile(2.0, 0.5, 1000, error_rate=0.01)
+
+
+class FakeAPIError(Exception):
+    """Error shaped like google.genai.errors.APIError (code, status, message, details)."""
+    
+    def __init__(self, code: int, status: str, message: str, details: Optional[Dict[str, Any]] = None):
+        self.code = code
+        self.status = status
+        self.message = message
+        self.details = details or {"error": {"code": code, "message": message, "status": status}}
+        super().__init__(f"{code} {status}. {message}")
+
+
+@dataclass
+class FakeBlob:
+    data: bytes
+    mime_type: str
+
+
+@dataclass
+class FakePart:
+    text: Optional[str] = None
+    inline_data: Optional[FakeBlob] = None
+
+
+@dataclass
+class FakeContent:
+    parts: List[FakePart]
+    role: str = "model"
+
+
+@dataclass
+class FakeCandidate:
+    content: FakeContent
+    finish_reason: str = "STOP"
+
+
+@dataclass
+class FakeUsage:
+    prompt_token_count: int
+    candidates_token_count: int
+
+
+@dataclass
+class FakeResponse:
+    """Response shaped like types.GenerateContentResponse."""
+    candidates: List[FakeCandidate]
+    usage_metadata: FakeUsage
+    
+    @property
+    def text(self) -> Optional[str]:
+        texts = [p.text for p in self.candidates[0].content.parts if p.text]
+        return "".join(texts) if texts else None
+
+
+@dataclass
+class FakeStats:
+    """Counters of what the fake backend served, per model."""
+    calls: Dict[str, int] = field(default_factory=dict)
+    rate_limited: Dict[str, int] = field(default_factory=dict)
+    errors: Dict[str, int] = field(default_factory=dict)
+    refusals: Dict[str, int] = field(default_factory=dict)
+    malformed: Dict[str, int] = field(default_factory=dict)
+    bytes_served: int = 0
+    
+    def bump(self, counter: Dict[str, int], model: str) -> None:
+        counter[model] = counter.get(model, 0) + 1
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": dict(self.calls),
+            "rate_limited": dict(self.rate_limited),
+            "errors": dict(self.errors),
+            "refusals": dict(self.refusals),
+            "malformed": dict(self.malformed),
+            "bytes_served": self.bytes_served,
+        }
+
+
+def render_image(width: int, height: int, seed: int) -> bytes:
+    """
+    Render an illustration-like PNG of realistic size.
+    
+    A gradient with grain and random shapes compresses about as well as
+    a real generated illustration (~1.2MB at 1024x1024).
+    """
+    from PIL import Image, ImageDraw
+    
+    rng = random.Random(seed)
+    base = Image.linear_gradient("L").resize((width, height))
+    img = Image.merge("RGB", (base, base.rotate(90), base.rotate(180)))
+    img = Image.blend(img, Image.effect_noise((width, height), 28).convert("RGB"), 0.25)
+    draw = ImageDraw.Draw(img)
+    for _ in range(40):
+        x, y = rng.randrange(width), rng.randrange(height)
+        size = rng.randrange(20, 200)
+        draw.ellipse(
+            [x, y, x + size, y + size],
+            fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        )
+    
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class SchemaFiller:
+    """Builds plausible JSON instances of a JSON schema."""
+    
+    def __init__(self, rng: random.Random, page_count: Optional[int] = None, array_length: int = 2):
+        self.rng = rng
+        self.page_count = page_count
+        self.array_length = array_length
+        self.defs: Dict[str, Any] = {}
+    
+    def fill(self, schema: Dict[str, Any]) -> Any:
+        self.defs = schema.get("$defs", {})
+        return self._value(schema, "", 0)
+    
+    def _resolve(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        if "$ref" in schema:
+            return self._resolve(self.defs[schema["$ref"].split("/")[-1]])
+        if "allOf" in schema and len(schema["allOf"]) == 1:
+            return self._resolve(schema["allOf"][0])
+        if "anyOf" in schema:
+            options = [s for s in schema["anyOf"] if s.get("type") != "null"]
+            return self._resolve(options[0]) if options else {"type": "null"}
+        return schema
+    
+    def _value(self, schema: Dict[str, Any], name: str, index: int) -> Any:
+        schema = self._resolve(schema)
+        if "const" in schema:
+            return schema["const"]
+        if "enum" in schema:
+            return schema["enum"][0]
+        
+        kind = schema.get("type", "string")
+        if kind == "object":
+            return {
+                prop: self._value(prop_schema, prop, index)
+                for prop, prop_schema in schema.get("properties", {}).items()
+            }
+        if kind == "array":
+            length = max(schema.get("minItems", 0), self.array_length)
+            if name == "pages" and self.page_count:
+                length = self.page_count
+            length = min(length, schema.get("maxItems", length))
+            items = schema.get("items", {})
+            return [self._value(items, name, i) for i in range(length)]
+        if kind == "integer":
+            if name == "page_number":
+                return index + 1
+            if name == "total_pages" and self.page_count:
+                return self.page_count
+            return int(self._number(schema))
+        if kind == "number":
+            return round(self._number(schema), 2)
+        if kind == "boolean":
+            return schema.get("default", True)
+        if kind == "null":
+            return None
+        return self._text(schema)
+    
+    def _number(self, schema: Dict[str, Any]) -> float:
+        low = schema.get("minimum", schema.get("exclusiveMinimum", 0))
+        high = schema.get("maximum", schema.get("exclusiveMaximum", low + 10))
+        # Reviews score well, so validation loops stay rare
+        return low + (high - low) * self.rng.uniform(0.75, 0.95)
+    
+    def _text(self, schema: Dict[str, Any]) -> str:
+        target = max(schema.get("minLength", 0), self.rng.randint(40, 160))
+        words = []
+        while sum(len(w) + 1 for w in words) < target:
+            words.append(self.rng.choice(WORDS))
+        text = " ".join(words)
+        return text[:schema["maxLength"]] if "maxLength" in schema else text
+
+
+class _RateLimiter:
+    """Sliding one-minute request window per model."""
+    
+    def __init__(self):
+        self._requests: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+    
+    def admit(self, model: str, limit: int, window: float) -> float:
+        """Admit a request; returns 0, or the seconds until the window has room."""
+        now = time.monotonic()
+        with self._lock:
+            requests = self._requests.setdefault(model, deque())
+            while requests and now - requests[0] > window:
+                requests.popleft()
+            if len(requests) >= limit:
+                return max(1e-6, requests[0] + window - now)
+            requests.append(now)
+            return 0.0
+
+
+class _FakeModels:
+    """The client.models namespace."""
+    
+    def __init__(self, client: "FakeGenaiClient"):
+        self._client = client
+    
+    def generate_content(self, model: str, contents: Any, config: Any = None) -> FakeResponse:
+        return self._client.generate_content(model=model, contents=contents, config=config)
+    
+    def generate_content_stream(self, model: str, contents: Any, config: Any = None) -> Iterator[FakeResponse]:
+        return self._client.generate_content_stream(model=model, contents=contents, config=config)
+
+
+class FakeGenaiClient:
+    """
+    Blocking fake of google.genai.Client.
+    
+    Like the real SDK, generate_content blocks the calling thread for
+    the simulated latency.
+    
+    Args:
+        profiles: Model name -> ModelProfile (defaults to DEFAULT_PROFILES)
+        time_scale: Real seconds per simulated second (0 disables sleeping)
+        seed: Random seed
+        image_size: Size of generated images
+        image_variants: Distinct images rendered up front and reused
+    """
+    
+    # Streamed responses: share of the latency before the first chunk,
+    # and characters per chunk
+    FIRST_CHUNK_SHARE = 0.15
+    STREAM_CHUNK = 200
+    
+    def __init__(
+        self,
+        profiles: Optional[Dict[str, ModelProfile]] = None,
+        time_scale: float = 1.0,
+        seed: int = 0,
+        image_size: Tuple[int, int] = (1024, 1024),
+        image_variants: int = 4
+    ):
+        self.profiles = dict(DEFAULT_PROFILES if profiles is None else profiles)
+        self.time_scale = time_scale
+        self.stats = FakeStats()
+        self.models = _FakeModels(self)
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._limiter = _RateLimiter()
+        self._images = [render_image(image_size[0], image_size[1], seed + i) for i in range(image_variants)]
+    
+    def profile(self, model: str) -> ModelProfile:
+        return self.profiles.get(model, FALLBACK_PROFILE)
+    
+    def _roll(self) -> float:
+        with self._rng_lock:
+            return self._rng.random()
+    
+    def _latency(self, profile: ModelProfile) -> float:
+        with self._rng_lock:
+            return self._rng.lognormvariate(math.log(profile.latency_median), profile.latency_sigma)
+    
+    def generate_content(self, model: str, contents: Any, config: Any = None) -> FakeResponse:
+        response, _ = self._generate(model, contents, config, 1.0)
+        return response
+    
+    def generate_content_stream(self, model: str, contents: Any, config: Any = None) -> Iterator[FakeResponse]:
+        """
+        Stream a text response in chunks.
+        
+        Part of the simulated latency passes before the first chunk; the
+        rest is spread over the chunks, so consumers see output early.
+        """
+        response, remaining = self._generate(model, contents, config, self.FIRST_CHUNK_SHARE)
+        text = response.text or ""
+        pieces = [text[i:i + self.STREAM_CHUNK] for i in range(0, len(text), self.STREAM_CHUNK)] or [""]
+        for index, piece in enumerate(pieces):
+            if index and remaining > 0:
+                time.sleep(remaining / len(pieces))
+            last = index == len(pieces) - 1
+            yield FakeResponse(
+                candidates=[FakeCandidate(FakeContent([FakePart(text=piece)]))],
+                usage_metadata=response.usage_metadata if last else FakeUsage(0, 0)
+            )
+    
+    def _generate(self, model: str, contents: Any, config: Any, latency_share: float) -> Tuple[FakeResponse, float]:
+        """A response after latency_share of the latency; also returns the seconds left."""
+        profile = self.profile(model)
+        with self._rng_lock:
+            self.stats.bump(self.stats.calls, model)
+        
+        window = 60.0 * self.time_scale if self.time_scale > 0 else 60.0
+        wait = self._limiter.admit(model, profile.requests_per_minute, window)
+        if wait:
+            with self._rng_lock:
+                self.stats.bump(self.stats.rate_limited, model)
+            message = "Resource has been exhausted (e.g. check quota)."
+            # Gemini reports when to retry as a google.rpc.RetryInfo detail
+            raise FakeAPIError(429, "RESOURCE_EXHAUSTED", message, details={"error": {
+                "code": 429,
+                "message": message,
+                "status": "RESOURCE_EXHAUSTED",
+                "details": [{
+                    "@type": "type.googleapis.com/google.rpc.RetryInfo",
+                    "retryDelay": f"{wait:.3f}s",
+                }],
+            }})
+        
+        latency = self._latency(profile) * self.time_scale if self.time_scale > 0 else 0.0
+        if latency > 0:
+            time.sleep(latency * latency_share)
+        remaining = latency * (1 - latency_share)
+        
+        if self._roll() < profile.error_rate:
+            with self._rng_lock:
+                self.stats.bump(self.stats.errors, model)
+            raise FakeAPIError(503, "UNAVAILABLE", "The model is overloaded. Please try again later.")
+        
+        prompt, image_inputs = _flatten(contents)
+        input_tokens = len(prompt) // 4 + 258 * image_inputs
+        
+        modalities = getattr(config, "response_modalities", None) or []
+        if "IMAGE" in modalities:
+            return self._image_response(model, profile, input_tokens), remaining
+        
+        response_schema = None
+        if getattr(config, "response_mime_type", None) == JSON_MIME_TYPE:
+            response_schema = getattr(config, "response_schema", None)
+        text = self._text_for(prompt, model, response_schema)
+        return FakeResponse(
+            candidates=[FakeCandidate(FakeContent([FakePart(text=text)]))],
+            usage_metadata=FakeUsage(input_tokens, len(text) // 4)
+        ), remaining
+    
+    def _image_response(self, model: str, profile: ModelProfile, input_tokens: int) -> FakeResponse:
+        if self._roll() < profile.refusal_rate:
+            with self._rng_lock:
+                self.stats.bump(self.stats.refusals, model)
+            text = "I can't generate that image. Try rephrasing the request."
+            return FakeResponse(
+                candidates=[FakeCandidate(FakeContent([FakePart(text=text)]), finish_reason="SAFETY")],
+                usage_metadata=FakeUsage(input_tokens, 0)
+            )
+        
+        with self._rng_lock:
+            data = self._rng.choice(self._images)
+            self.stats.bytes_served += len(data)
+        return FakeResponse(
+            candidates=[FakeCandidate(FakeContent([FakePart(inline_data=FakeBlob(data, "image/png"))]))],
+            usage_metadata=FakeUsage(input_tokens, 1290)
+        )
+    
+    def _text_for(self, prompt: str, model: str, response_schema: Optional[Dict[str, Any]] = None) -> str:
+        schema = response_schema or _extract_schema(prompt)
+        with self._rng_lock:
+            seed = self._rng.random()
+        rng = random.Random(seed)
+        if schema is None:
+            return SchemaFiller(rng)._text({"minLength": 400})
+        
+        match = re.search(r"(\d+)-page", prompt)
+        filler = SchemaFiller(rng, page_count=int(match.group(1)) if match else None)
+        text = json.dumps(filler.fill(schema))
+        if response_schema is None and rng.random() < self.profile(model).malformed_json_rate:
+            with self._rng_lock:
+                self.stats.bump(self.stats.malformed, model)
+            # A reply cut off mid-object, as free-form JSON sometimes is
+            return f"Here is the JSON you asked for:\n```json\n{text[:len(text) // 2]}"
+        return text
+
+
+def _flatten(contents: Any) -> Tuple[str, int]:
+    """Join the text of request contents and count inline images."""
+    texts = []
+    images = 0
+    for item in contents if isinstance(contents, list) else [contents]:
+        if isinstance(item, str):
+            texts.append(item)
+        elif getattr(item, "inline_data", None) is not None:
+            images += 1
+        elif getattr(item, "text", None):
+            texts.append(item.text)
+    return "\n".join(texts), images
+
+
+def _extract_schema(prompt: str) -> Optional[Dict[str, Any]]:
+    """Recover the JSON schema GeminiClient appends to JSON prompts."""
+    start = prompt.find(SCHEMA_MARKER)
+    if start < 0:
+        return None
+    line = prompt[start + len(SCHEMA_MARKER):].split("\n", 1)[0]
+    try:
+        return ast.literal_eval(line)
+    except (ValueError, SyntaxError):
+        return None
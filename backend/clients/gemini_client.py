@@ -6,20 +6,131 @@ Client for Google Gemini API interactions using the new google-genai SDK.
 
 import os
 import json
+import time
+import asyncio
 import base64
 import uuid
 import logging
-from typing import Type, Optional, Any
+import functools
+import threading
+from typing import Type, Optional, Any, Callable
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 
 # Import for image generation results
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from models.generation import GenerationResult, GenerationMetadata
+from clients.call_scheduler import get_call_scheduler, KIND_TEXT, KIND_IMAGE
+from clients.hedging import get_hedge_policy, hedged_call, HedgeUnavailable
+from clients.singleflight import get_singleflight, request_key
+from clients.response_schema import response_schema_for, schema_instruction_for
+from utils.job_context import current_job, current_stage, with_activity
+from utils import metrics
+from utils.tracing import span
+from utils.retry import (
+    get_retry_policy, classify_error, ModelCallError, REFUSAL_REASONS, TRANSIENT, SAFETY, PERMANENT
+)
 
 logger = logging.getLogger("memorybook")
 
+# Builds the google-genai client from an API key; replaced by the
+# benchmark with an offline fake (see clients/fake_genai.py)
+_sdk_factory: Optional[Callable[[str], Any]] = None
+
+
+def set_sdk_factory(factory: Optional[Callable[[str], Any]]) -> None:
+    """
+    Replace the factory used to create the google-genai client.
+    
+    Args:
+        factory: Callable taking the API key, or None for the real SDK
+    """
+    global _sdk_factory
+    _sdk_factory = factory
+
+
+def _instrumented(method: str, image: bool = False):
+    """
+    Record latency and outcome of a GeminiClient method, inside a span.
+    
+    Args:
+        method: Method name used as the metric label
+        image: Whether the method uses the image model
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            model = self.MODEL_IMAGE if image else (kwargs.get("model") or self.model)
+            started = time.perf_counter()
+            with span(f"gemini.{method}", model=model) as call_span:
+                try:
+                    result = await func(self, *args, **kwargs)
+                except asyncio.CancelledError:
+                    metrics.record_model_call(method, model, time.perf_counter() - started, "cancelled")
+                    raise
+                except Exception:
+                    metrics.record_model_call(method, model, time.perf_counter() - started, "error")
+                    raise
+                
+                if self._stub_mode:
+                    outcome = "stub"
+                elif isinstance(result, GenerationResult) and not result.success:
+                    outcome = "refused" if result.error_class == SAFETY else "error"
+                    call_span.set_status("ERROR", result.error_message)
+                else:
+                    outcome = "success"
+                call_span.set_attribute("outcome", outcome)
+                metrics.record_model_call(method, model, time.perf_counter() - started, outcome)
+                return result
+        return wrapper
+    return decorator
+
+
+def _refusal_reason(response: Any) -> Optional[str]:
+    """The safety/policy reason a response was refused for, if it was."""
+    feedback = getattr(response, "prompt_feedback", None)
+    reasons = [getattr(feedback, "block_reason", None)]
+    for candidate in getattr(response, "candidates", None) or []:
+        reasons.append(getattr(candidate, "finish_reason", None))
+    for reason in reasons:
+        # The SDK uses enums, the fake plain strings
+        name = getattr(reason, "name", None) or (str(reason) if reason else None)
+        if name in REFUSAL_REASONS:
+            return name
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def _json_config_for(schema: Type[BaseModel]) -> Optional[Any]:
+    """Native structured-output config for a Pydantic model, built once per model."""
+    response_schema = response_schema_for(schema)
+    if response_schema is None:
+        return None
+    from google.genai import types
+    
+    return types.GenerateContentConfig(response_mime_type="application/json", response_schema=response_schema)
+
+
+def _rejects_native_schema(error: BaseException) -> bool:
+    """Whether an error means the request's response schema or JSON mode is not accepted."""
+    if classify_error(error).error_class != PERMANENT:
+        return False
+    code = getattr(error, "code", None)
+    # 400 INVALID_ARGUMENT from the API, or the SDK failing to convert the schema
+    return code == 400 or isinstance(error, (ValueError, TypeError))
+
+
+def _inline_bytes(parts: Any) -> int:
+    """Total size of inline binary data in request or response parts."""
+    total = 0
+    for part in parts or []:
+        inline_data = getattr(part, "inline_data", None)
+        data = getattr(inline_data, "data", None)
+        if data:
+            total += len(data)
+    return total
+
 
 class GeminiClient:
     """
@@ -35,6 +146,13 @@ class GeminiClient:
     # Gemini 2.5 Flash Image - stable image generation model (tested Feb 2026)
     MODEL_IMAGE = os.getenv("GEMINI_MODEL_IMAGE", "gemini-2.5-flash-image")
     
+    # Characters per chunk when stub mode simulates a streamed reply
+    STUB_STREAM_CHUNK = 64
+    
+    # Requests with more inline image data than this are hashed for
+    # coalescing in a worker thread
+    INLINE_HASH_BYTES = 256 * 1024
+    
     def __init__(self, api_key: Optional[str] = None, model: str = None):
         """
         Initialize the Gemini client.
@@ -47,12 +165,17 @@ class GeminiClient:
         self.model = model or self.MODEL_FAST
         self._client = None
         self._stub_mode = not self.api_key
+        # (model, schema) pairs the API refused as a native response schema
+        self._native_unsupported: set = set()
     
     def _ensure_client(self):
         """Ensure the client is initialized."""
         if self._stub_mode:
             return None
         
+        if self._client is None and _sdk_factory is not None:
+            self._client = _sdk_factory(self.api_key)
+        
         if self._client is None:
             try:
                 from google import genai
@@ -63,6 +186,126 @@ class GeminiClient:
         
         return self._client
     
+    async def _generate_content(
+        self, kind: str, hedge: bool = False, retry: bool = True, coalesce: bool = True, **kwargs
+    ) -> Any:
+        """
+        Call generate_content through the process-wide call scheduler.
+        
+        The SDK call is blocking, so it runs in a worker thread once the
+        scheduler admits it; the event loop stays free for other jobs.
+        Token, byte and cost usage of the request is recorded. Throttled
+        and transient failures are retried by the shared retry policy;
+        the slot is released while backing off. Identical calls in flight
+        at the same time share one request (see clients/singleflight.py).
+        
+        Args:
+            kind: Call kind used for scheduling (KIND_TEXT or KIND_IMAGE)
+            hedge: Race a backup request against a slow one when image
+                hedging is enabled (see clients/hedging.py)
+            retry: Retry here; False when the caller retries the whole operation
+            coalesce: Share the request with identical ones in flight; False
+                for sampled outputs each caller needs its own of (images)
+            **kwargs: Arguments for client.models.generate_content
+            
+        Returns:
+            The SDK response
+        """
+        singleflight = get_singleflight() if coalesce else None
+        if singleflight is None:
+            return await self._request(kind, hedge, retry, **kwargs)
+        
+        request = dict(kwargs, api_key=self.api_key, kind=kind, hedge=hedge, retry=retry)
+        if _inline_bytes(kwargs.get("contents")) > self.INLINE_HASH_BYTES:
+            key = await asyncio.to_thread(request_key, **request)
+        else:
+            key = request_key(**request)
+        if key is None:
+            return await self._request(kind, hedge, retry, **kwargs)
+        return await singleflight.do(key, lambda: self._request(kind, hedge, retry, **kwargs), kind=kind)
+    
+    async def _request(self, kind: str, hedge: bool, retry: bool, **kwargs) -> Any:
+        """generate_content through the scheduler, retried unless the caller retries."""
+        if not retry:
+            return await self._scheduled_call(kind, hedge, **kwargs)
+        return await get_retry_policy().run(
+            lambda attempt: self._scheduled_call(kind, hedge, **kwargs),
+            description=f"{kind} call to {kwargs.get('model', self.model)}"
+        )
+    
+    async def _scheduled_call(self, kind: str, hedge: bool, **kwargs) -> Any:
+        """One generate_content request (possibly hedged) inside a scheduler slot."""
+        queued_at = time.perf_counter()
+        policy = get_hedge_policy() if hedge else None
+        
+        async with get_call_scheduler().slot(kind):
+            metrics.SCHEDULER_WAIT.observe(
+                time.perf_counter() - queued_at, kind=kind, priority=current_job().priority
+            )
+            if policy is None:
+                return await self._call_sdk(kind, **kwargs)
+            return await hedged_call(
+                lambda: self._call_sdk(kind, **kwargs),
+                lambda: self._hedge_sdk(kind, **kwargs),
+                policy
+            )
+    
+    async def _hedge_sdk(self, kind: str, **kwargs) -> Any:
+        """Backup request for hedging; only runs if a slot is free right away."""
+        async with get_call_scheduler().slot_if_free(kind) as admitted:
+            if not admitted:
+                raise HedgeUnavailable(f"No free {kind} slot for a hedged request")
+            return await self._call_sdk(kind, **kwargs)
+    
+    async def _call_sdk(self, kind: str, **kwargs) -> Any:
+        """
+        Make one generate_content request in a worker thread and record its usage.
+        
+        Args:
+            kind: Call kind (KIND_TEXT or KIND_IMAGE)
+            **kwargs: Arguments for client.models.generate_content
+        
+        Returns:
+            The SDK response
+        """
+        model = kwargs.get("model", self.model)
+        bytes_uploaded = _inline_bytes(kwargs.get("contents"))
+        started = time.perf_counter()
+        thread = asyncio.ensure_future(
+            asyncio.to_thread(with_activity(self._client.models.generate_content), **kwargs)
+        )
+        try:
+            # Shielded: a cancelled call returns at once, and its thread
+            # keeps the slot until the SDK call returns
+            response = await asyncio.shield(thread)
+        except asyncio.CancelledError:
+            get_call_scheduler().hold_until(kind, thread)
+            raise
+        except Exception:
+            metrics.record_model_usage(
+                model, time.perf_counter() - started, success=False, bytes_uploaded=bytes_uploaded
+            )
+            raise
+        
+        usage = getattr(response, "usage_metadata", None)
+        response_parts = []
+        if getattr(response, "candidates", None):
+            content = getattr(response.candidates[0], "content", None)
+            response_parts = getattr(content, "parts", None) or []
+        bytes_downloaded = _inline_bytes(response_parts)
+        
+        metrics.record_model_usage(
+            model,
+            time.perf_counter() - started,
+            input_tokens=getattr(usage, "prompt_token_count", None) or 0,
+            output_tokens=getattr(usage, "candidates_token_count", None) or 0,
+            bytes_uploaded=bytes_uploaded,
+            bytes_downloaded=bytes_downloaded,
+            images=1 if kind == KIND_IMAGE and bytes_downloaded else 0
+        )
+        return response
+    
+    @_instrumented("generate_text")
     async def generate_text(self, system_prompt: str, user_prompt: str, model: str = None) -> str:
         """
         Generate text from a prompt.
@@ -83,14 +326,16 @@ class GeminiClient:
         
         try:
             full_prompt = f"{system_prompt}\n\n{user_prompt}"
-            response = client.models.generate_content(
+            response = await self._generate_content(
+                KIND_TEXT,
                 model=model_name,
                 contents=[full_prompt]
             )
             return response.text
         except Exception as e:
-            raise RuntimeError(f"Gemini text generation failed: {str(e)}")
+            raise ModelCallError(f"Gemini text generation failed: {str(e)}", classify_error(e)) from e
     
+    @_instrumented("generate_json")
     async def generate_json(
         self,
         system_prompt: str,
@@ -118,47 +363,24 @@ class GeminiClient:
         if client is None:
             return self._generate_stub_json(schema)
         
+        # Prepare content parts
+        content_parts = []
+        
+        # Add images if provided
+        if images:
+            for image_path in images:
+                image_data = self._load_image_for_genai(image_path)
+                if image_data:
+                    content_parts.append(image_data)
+        
         try:
-            # Build the prompt with JSON instruction
-            json_instruction = ""
-            if schema:
-                json_instruction = f"\n\nRespond with valid JSON matching this schema:\n{schema.model_json_schema()}"
-            
-            full_prompt = f"{system_prompt}{json_instruction}\n\n{user_prompt}"
-            
-            # Prepare content parts
-            content_parts = []
-            
-            # Add images if provided
-            if images:
-                for image_path in images:
-                    image_data = self._load_image_for_genai(image_path)
-                    if image_data:
-                        content_parts.append(image_data)
-            
-            content_parts.append(full_prompt)
-            
-            response = client.models.generate_content(
-                model=model_name,
-                contents=content_parts
+            return await self._request_json(
+                "generate_json", model_name, content_parts, system_prompt, f"\n\n{user_prompt}", schema
             )
-            
-            # Parse JSON from response
-            response_text = response.text
-            
-            # Try to extract JSON from the response
-            json_data = self._extract_json(response_text)
-            
-            # Validate against schema if provided
-            if schema:
-                validated = schema(**json_data)
-                return validated.model_dump()
-            
-            return json_data
-            
         except Exception as e:
-            raise RuntimeError(f"Gemini JSON generation failed: {str(e)}")
+            raise ModelCallError(f"Gemini JSON generation failed: {str(e)}", classify_error(e)) from e
     
+    @_instrumented("analyze_images")
     async def analyze_images(
         self,
         prompt: str,
@@ -181,39 +403,235 @@ class GeminiClient:
         if client is None:
             return self._generate_stub_json(schema)
         
+        # Build content with images
+        content_parts = []
+        
+        for image_path in images:
+            image_data = self._load_image_for_genai(image_path)
+            if image_data:
+                content_parts.append(image_data)
+        
         try:
-            # Build content with images
-            content_parts = []
-            
-            for image_path in images:
-                image_data = self._load_image_for_genai(image_path)
-                if image_data:
-                    content_parts.append(image_data)
-            
-            # Add the prompt
-            json_instruction = ""
-            if schema:
-                json_instruction = f"\n\nRespond with valid JSON matching this schema:\n{schema.model_json_schema()}"
-            
-            content_parts.append(f"{prompt}{json_instruction}")
-            
-            response = client.models.generate_content(
-                model=self.model,
-                contents=content_parts
-            )
-            
-            # Parse JSON from response
-            json_data = self._extract_json(response.text)
-            
-            if schema:
+            return await self._request_json("analyze_images", self.model, content_parts, prompt, "", schema)
+        except Exception as e:
+            raise ModelCallError(f"Gemini image analysis failed: {str(e)}", classify_error(e)) from e
+    
+    async def _request_json(
+        self,
+        method: str,
+        model_name: str,
+        content_parts: list,
+        prompt: str,
+        prompt_tail: str,
+        schema: Optional[Type[BaseModel]]
+    ) -> dict:
+        """
+        Request JSON output, natively constrained to the schema when possible.
+        
+        The native path sends the schema as response_schema and leaves it
+        out of the prompt. Schemas Gemini cannot express, disabled native
+        mode and models that reject the request use the schema-in-prompt
+        path instead.
+        
+        Args:
+            method: Calling method, for metrics
+            model_name: Model to call
+            content_parts: Image parts preceding the prompt
+            prompt: Prompt text the schema instruction is appended to
+            prompt_tail: Text following the schema instruction
+            schema: Optional Pydantic model for validation
+        
+        Returns:
+            Parsed (and validated, with a schema) JSON
+        """
+        config = self._native_json_config(model_name, schema)
+        if config is not None:
+            try:
+                response = await self._generate_content(
+                    KIND_TEXT,
+                    model=model_name,
+                    contents=content_parts + [f"{prompt}{prompt_tail}"],
+                    config=config
+                )
+            except Exception as e:
+                if not _rejects_native_schema(e):
+                    raise
+                self._native_unsupported.add((model_name, schema))
+                metrics.STRUCTURED_OUTPUT_FALLBACKS.inc(model=model_name, reason="rejected")
+                logger.warning(
+                    f"[gemini] {model_name} rejected the response schema for {schema.__name__}; "
+                    f"using schema-in-prompt JSON: {str(e)[:200]}"
+                )
+            else:
+                return self._parse_json(method, "native", response.text, schema)
+        
+        json_instruction = schema_instruction_for(schema) if schema else ""
+        response = await self._generate_content(
+            KIND_TEXT,
+            model=model_name,
+            contents=content_parts + [f"{prompt}{json_instruction}{prompt_tail}"]
+        )
+        return self._parse_json(method, "prompt", response.text, schema)
+    
+    def _native_json_config(self, model_name: str, schema: Optional[Type[BaseModel]]) -> Optional[Any]:
+        """Generation config for native structured output, or None to use the prompt path."""
+        if schema is None or (model_name, schema) in self._native_unsupported:
+            return None
+        from utils.config import get_config
+        
+        if not get_config().structured_output_enabled:
+            return None
+        config = _json_config_for(schema)
+        if config is None:
+            metrics.STRUCTURED_OUTPUT_FALLBACKS.inc(model=model_name, reason="unsupported_schema")
+        return config
+    
+    def _parse_json(self, method: str, mode: str, text: Optional[str], schema: Optional[Type[BaseModel]]) -> dict:
+        """Parse and validate a JSON reply, counting replies that do not parse."""
+        # Try to extract JSON from the response
+        json_data = self._extract_json(text or "")
+        if not json_data:
+            metrics.JSON_PARSE_FAILURES.inc(method=method, mode=mode, stage=current_stage())
+        
+        # Validate against schema if provided
+        if schema:
+            try:
                 validated = schema(**json_data)
-                return validated.model_dump()
-            
-            return json_data
+            except ValidationError:
+                if json_data:
+                    metrics.JSON_PARSE_FAILURES.inc(method=method, mode=mode, stage=current_stage())
+                raise
+            return validated.model_dump()
+        
+        return json_data
+    
+    @_instrumented("stream_json")
+    async def stream_json(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        on_text: Callable[[str], None],
+        schema: Optional[Type[BaseModel]] = None,
+        model: str = None
+    ) -> dict:
+        """
+        Generate JSON output, streaming the reply's text as it is generated.
+        
+        Prompting matches generate_json (native response schema when
+        possible). The stream holds a text scheduler slot until it ends
+        and is not retried; callers fall back to generate_json when it
+        fails. Stub mode streams the stub JSON in small chunks.
+        
+        Args:
+            system_prompt: System instructions
+            user_prompt: User's prompt
+            on_text: Called on the event loop with each chunk of text
+            schema: Optional Pydantic model for validation
+            model: Optional model override
             
+        Returns:
+            The complete reply as a (validated) dictionary
+        """
+        client = self._ensure_client()
+        model_name = model or self.model
+        
+        if client is None:
+            result = self._generate_stub_json(schema)
+            text = json.dumps(result)
+            for start in range(0, len(text), self.STUB_STREAM_CHUNK):
+                on_text(text[start:start + self.STUB_STREAM_CHUNK])
+                await asyncio.sleep(0)
+            return result
+        
+        config = self._native_json_config(model_name, schema)
+        json_instruction = schema_instruction_for(schema) if schema and config is None else ""
+        request = {"model": model_name, "contents": [f"{system_prompt}{json_instruction}\n\n{user_prompt}"]}
+        if config is not None:
+            request["config"] = config
+        
+        try:
+            queued_at = time.perf_counter()
+            async with get_call_scheduler().slot(KIND_TEXT):
+                metrics.SCHEDULER_WAIT.observe(
+                    time.perf_counter() - queued_at, kind=KIND_TEXT, priority=current_job().priority
+                )
+                text = await self._stream_sdk(on_text, **request)
+            return self._parse_json("stream_json", "prompt" if config is None else "native", text, schema)
         except Exception as e:
-            raise RuntimeError(f"Gemini image analysis failed: {str(e)}")
+            raise ModelCallError(f"Gemini JSON streaming failed: {str(e)}", classify_error(e)) from e
+    
+    async def _stream_sdk(self, on_text: Callable[[str], None], **kwargs) -> str:
+        """
+        Make one generate_content_stream request and record its usage.
+        
+        The blocking SDK iterator runs in a worker thread that hands
+        chunks to the event loop. If the caller is cancelled or the
+        stream fails, the thread stops reading at the next chunk and
+        keeps a text slot until it returns.
+        
+        Args:
+            on_text: Called with the text of each chunk
+            **kwargs: Arguments for client.models.generate_content_stream
+        
+        Returns:
+            The concatenated text
+        """
+        model = kwargs.get("model", self.model)
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        end = object()
+        
+        def post(item: Any) -> None:
+            try:
+                loop.call_soon_threadsafe(chunks.put_nowait, item)
+            except RuntimeError:
+                # Loop closed while the stream was being read
+                stop.set()
+        
+        def read_stream() -> None:
+            try:
+                for chunk in self._client.models.generate_content_stream(**kwargs):
+                    if stop.is_set():
+                        break
+                    post(chunk)
+            except Exception as e:
+                post(e)
+            finally:
+                post(end)
+        
+        started = time.perf_counter()
+        reader = asyncio.ensure_future(asyncio.to_thread(with_activity(read_stream)))
+        texts = []
+        usage = None
+        try:
+            while True:
+                item = await chunks.get()
+                if item is end:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                usage = getattr(item, "usage_metadata", None) or usage
+                text = getattr(item, "text", None)
+                if text:
+                    texts.append(text)
+                    on_text(text)
+        except BaseException:
+            stop.set()
+            get_call_scheduler().hold_until(KIND_TEXT, reader)
+            metrics.record_model_usage(model, time.perf_counter() - started, success=False)
+            raise
+        await reader
+        
+        metrics.record_model_usage(
+            model,
+            time.perf_counter() - started,
+            input_tokens=getattr(usage, "prompt_token_count", None) or 0,
+            output_tokens=getattr(usage, "candidates_token_count", None) or 0
+        )
+        return "".join(texts)
     
+    @_instrumented("revise_text")
     async def revise_text(
         self,
         prompt: str,
@@ -341,6 +759,7 @@ Maintain the original intent while enhancing quality."""
         
         return result
     
+    @_instrumented("generate_image", image=True)
     async def generate_image(
         self,
         prompt: str,
@@ -386,7 +805,13 @@ Maintain the original intent while enhancing quality."""
             content_parts.append(enforced_prompt)
             
             # Generate image using Gemini 3 Pro Image
-            response = client.models.generate_content(
+            # Page-level callers retry the whole generation (see utils/retry.py).
+            # Not coalesced: pages with identical prompts each need their own image.
+            response = await self._generate_content(
+                KIND_IMAGE,
+                hedge=True,
+                retry=False,
+                coalesce=False,
                 model=self.MODEL_IMAGE,
                 contents=content_parts,
                 config=types.GenerateContentConfig(
@@ -394,10 +819,12 @@ Maintain the original intent while enhancing quality."""
                 )
             )
             
-            # Extract image from response
+            # Extract image from response (a blocked prompt has no candidates)
             image_data = None
             text_snippet = None
-            for part in response.candidates[0].content.parts:
+            candidates = getattr(response, "candidates", None) or []
+            content = getattr(candidates[0], "content", None) if candidates else None
+            for part in getattr(content, "parts", None) or []:
                 if part.inline_data is not None:
                     image_data = part.inline_data.data
                     mime_type = part.inline_data.mime_type
@@ -406,7 +833,14 @@ Maintain the original intent while enhancing quality."""
                     text_snippet = str(part.text)[:200]
 
             if not image_data:
-                message = "No image data returned by Gemini image model"
+                refusal = _refusal_reason(response)
+                if refusal:
+                    # Retrying the same prompt gets the same refusal; callers
+                    # repair the prompt instead (PipelineRunner.repair_refused_image)
+                    message = f"Image model refused the prompt ({refusal})"
+                    metrics.IMAGE_REFUSALS.inc(stage=current_stage(), reason=refusal)
+                else:
+                    message = "No image data returned by Gemini image model"
                 if text_snippet:
                     message = f"{message}. Text: {text_snippet}"
                 logger.warning(f"[generate_image] {message}")
@@ -414,6 +848,7 @@ Maintain the original intent while enhancing quality."""
                 return GenerationResult(
                     success=False,
                     error_message=message,
+                    error_class=SAFETY if refusal else TRANSIENT,
                     metadata=GenerationMetadata(
                         generation_id=generation_id,
                         model_used=self.MODEL_IMAGE,
@@ -446,6 +881,7 @@ Maintain the original intent while enhancing quality."""
                 from PIL import Image as PILImage
                 import io as _io
                 
+                cpu_started = time.thread_time()
                 img = None
                 # Attempt 1: direct open
                 try:
@@ -474,6 +910,7 @@ Maintain the original intent while enhancing quality."""
                     img.save(output_path, 'JPEG', quality=60, optimize=True, progressive=True)
                     logger.info(f"[generate_image] Saved compressed JPEG: {output_path} "
                                 f"({os.path.getsize(output_path) / 1024:.0f}KB)")
+                    metrics.IMAGE_PROCESSING.observe(time.thread_time() - cpu_started, operation="compress")
                 else:
                     # Last resort: save raw bytes and let the browser handle it
                     logger.warning(f"[generate_image] Pillow could not open image, saving raw "
@@ -495,11 +932,17 @@ Maintain the original intent while enhancing quality."""
             )
             
         except Exception as e:
-            logger.exception("[generate_image] Unexpected error during image generation")
+            failure = classify_error(e)
+            if failure.retryable:
+                logger.warning(f"[generate_image] {failure.error_class} error: {e}")
+            else:
+                logger.exception("[generate_image] Unexpected error during image generation")
             generation_time = int((datetime.now() - start_time).total_seconds() * 1000)
             return GenerationResult(
                 success=False,
                 error_message=str(e),
+                error_class=failure.error_class,
+                retry_after=failure.retry_after,
                 metadata=GenerationMetadata(
                     generation_id=generation_id,
                     model_used=self.MODEL_IMAGE,
@@ -0,0 +1,198 @@
+"""
+Request Hedging
+
+Cuts the latency tail of image generation by racing a second, identical
+request against a slow one.
+
+If a request has not returned after a percentile (default p90) of recent
+latencies, a hedge is issued and whichever succeeds first wins; the
+other is cancelled. Hedges are limited per job so a slow model cannot
+double a book's quota use, and a hedge is only issued when a scheduler
+slot is free right away - a hedge that has to queue would not arrive
+early anyway.
+
+The losing request is cancelled, but the SDK call already running in a
+worker thread finishes in the background and keeps its scheduler slot
+until it returns, so hedging never exceeds the concurrency limit.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Optional
+
+import sys
+sys.path.append('..')
+
+from utils import metrics
+from utils.job_context import current_job
+
+
+class HedgeUnavailable(Exception):
+    """Raised by a hedge call that could not start (e.g. no free slot)."""
+
+
+class HedgePolicy:
+    """
+    Decides when to hedge, from recent latencies and per-job budgets.
+    
+    Args:
+        percentile: Latency percentile (0-1) after which a request is hedged
+        budget_per_job: Hedges allowed per job
+        min_samples: Latencies needed before hedging starts
+        window: Recent latencies kept
+        min_delay: Lower bound of the hedge delay in seconds
+    """
+    
+    # Jobs whose spent budget is remembered; older jobs are forgotten
+    MAX_JOBS = 1000
+    
+    def __init__(
+        self,
+        percentile: float = 0.9,
+        budget_per_job: int = 3,
+        min_samples: int = 20,
+        window: int = 200,
+        min_delay: float = 0.0
+    ):
+        self.percentile = percentile
+        self.budget_per_job = budget_per_job
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._latencies = deque(maxlen=window)
+        self._spent: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def observe(self, seconds: float) -> None:
+        """Record the latency of a completed request."""
+        with self._lock:
+            self._latencies.append(seconds)
+    
+    def delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while there is too little data."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(self.percentile * len(ordered)))
+        return max(self.min_delay, ordered[index])
+    
+    def try_spend(self, job_id: Optional[str]) -> bool:
+        """Take one hedge from the job's budget; False when it is exhausted."""
+        key = job_id or ""
+        with self._lock:
+            spent = self._spent.get(key, 0)
+            if spent >= self.budget_per_job:
+                return False
+            self._spent[key] = spent + 1
+            self._spent.move_to_end(key)
+            while len(self._spent) > self.MAX_JOBS:
+                self._spent.popitem(last=False)
+            return True
+    
+    def refund(self, job_id: Optional[str]) -> None:
+        """Return a hedge that could not be issued to the job's budget."""
+        key = job_id or ""
+        with self._lock:
+            if self._spent.get(key):
+                self._spent[key] -= 1
+    
+    def spent(self, job_id: Optional[str]) -> int:
+        """Hedges issued for a job so far."""
+        with self._lock:
+            return self._spent.get(job_id or "", 0)
+
+
+async def _cancel(*tasks: asyncio.Task) -> None:
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def hedged_call(
+    call: Callable[[], Awaitable[Any]],
+    hedge: Callable[[], Awaitable[Any]],
+    policy: HedgePolicy
+) -> Any:
+    """
+    Run a request, hedging it when it is slower than usual.
+    
+    Args:
+        call: Starts the primary request
+        hedge: Starts an identical backup request; may raise HedgeUnavailable
+        policy: Hedge policy (latency window and budgets)
+    
+    Returns:
+        Result of the first request that succeeds
+    
+    Raises:
+        The primary request's error if every request fails
+    """
+    delay = policy.delay()
+    started = time.perf_counter()
+    primary = asyncio.ensure_future(call())
+    if delay is None:
+        result = await primary
+        policy.observe(time.perf_counter() - started)
+        return result
+    
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+    except asyncio.CancelledError:
+        await _cancel(primary)
+        raise
+    if done:
+        result = primary.result()
+        policy.observe(time.perf_counter() - started)
+        return result
+    
+    if not policy.try_spend(current_job().job_id):
+        metrics.record_hedge("no_budget")
+        result = await primary
+        policy.observe(time.perf_counter() - started)
+        return result
+    
+    backup = asyncio.ensure_future(hedge())
+    pending = {primary, backup}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            if backup in done and isinstance(backup.exception(), HedgeUnavailable):
+                policy.refund(current_job().job_id)
+                metrics.record_hedge("no_slot")
+            winner = next((task for task in done if task.exception() is None), None)
+            if winner is not None:
+                await _cancel(*pending)
+                metrics.record_hedge("won" if winner is backup else "lost")
+                # When the hedge wins this is a lower bound of the primary's
+                # latency, which keeps slow requests in the window
+                policy.observe(time.perf_counter() - started)
+                return winner.result()
+    except asyncio.CancelledError:
+        await _cancel(primary, backup)
+        raise
+    
+    if not isinstance(backup.exception(), HedgeUnavailable):
+        metrics.record_hedge("failed")
+    return primary.result()
+
+
+# Global policy instance
+_hedge_policy: Optional[HedgePolicy] = None
+
+
+def get_hedge_policy() -> Optional[HedgePolicy]:
+    """Get the process-wide image hedge policy, or None when hedging is disabled."""
+    global _hedge_policy
+    from utils.config import get_config
+    
+    config = get_config()
+    if not config.image_hedging_enabled:
+        return None
+    if _hedge_policy is None:
+        _hedge_policy = HedgePolicy(
+            percentile=config.image_hedge_percentile / 100,
+            budget_per_job=config.image_hedge_budget
+        )
+    return _hedge_policy
@@ -0,0 +1,126 @@
+"""
+Response Schemas
+
+Converts Pydantic models to the OpenAPI subset Gemini accepts as a
+native response schema (response_mime_type="application/json").
+
+With a native schema the model is constrained to emit JSON of that
+shape, so the schema does not have to be pasted into the prompt and the
+reply does not have to be fished out of prose. Conversions are computed
+once per Pydantic model and cached. Models that cannot be expressed in
+the subset (e.g. free-form dict fields) convert to None and keep using
+the schema-in-prompt path.
+"""
+
+import functools
+from typing import Any, Dict, Optional, Type
+
+from pydantic import BaseModel
+
+SCHEMA_INSTRUCTION = "Respond with valid JSON matching this schema:\n"
+
+# Keys copied as-is from a JSON schema node
+_PASSTHROUGH = ("description", "minimum", "maximum", "minItems", "maxItems", "minLength", "maxLength")
+
+# String formats Gemini understands; others are dropped
+_STRING_FORMATS = {"date-time", "enum"}
+
+
+class UnsupportedSchema(ValueError):
+    """Raised when a JSON schema has no equivalent in Gemini's schema subset."""
+
+
+class _Converter:
+    """Inlines $refs and rewrites one JSON schema into Gemini's subset."""
+    
+    def __init__(self, root: Dict[str, Any]):
+        self.defs = root.get("$defs", {})
+        self._resolving: set = set()
+    
+    def convert(self, node: Dict[str, Any]) -> Dict[str, Any]:
+        if "$ref" in node:
+            name = node["$ref"].split("/")[-1]
+            if name in self._resolving:
+                raise UnsupportedSchema(f"Recursive schema {name}")
+            self._resolving.add(name)
+            try:
+                resolved = self.convert(self.defs[name])
+            finally:
+                self._resolving.discard(name)
+            if node.get("description"):
+                resolved = dict(resolved, description=node["description"])
+            return resolved
+        
+        if "allOf" in node:
+            if len(node["allOf"]) != 1:
+                raise UnsupportedSchema("allOf with several schemas")
+            return self.convert({**node["allOf"][0], **{k: v for k, v in node.items() if k != "allOf"}})
+        
+        if "anyOf" in node:
+            options = [option for option in node["anyOf"] if option.get("type") != "null"]
+            if len(options) != 1:
+                raise UnsupportedSchema("anyOf with several non-null schemas")
+            converted = self.convert(options[0])
+            converted["nullable"] = True
+            if node.get("description"):
+                converted["description"] = node["description"]
+            return converted
+        
+        result: Dict[str, Any] = {key: node[key] for key in _PASSTHROUGH if key in node}
+        if "const" in node:
+            result.update(type="string", enum=[str(node["const"])])
+            return result
+        if "enum" in node:
+            result.update(type="string", enum=[str(value) for value in node["enum"]])
+            return result
+        
+        kind = node.get("type")
+        if isinstance(kind, list) or kind is None:
+            raise UnsupportedSchema(f"Untyped or multi-typed node: {kind!r}")
+        result["type"] = kind
+        
+        if kind == "object":
+            properties = node.get("properties") or {}
+            if not properties:
+                # Free-form dicts have no equivalent: OBJECT needs properties
+                raise UnsupportedSchema("Object without properties")
+            result["properties"] = {name: self.convert(prop) for name, prop in properties.items()}
+            result["required"] = [name for name in node.get("required", []) if name in properties]
+            # Generate fields in declaration order, like the Pydantic model
+            result["propertyOrdering"] = list(properties)
+        elif kind == "array":
+            result["items"] = self.convert(node.get("items") or {"type": "string"})
+        elif kind == "string" and node.get("format") in _STRING_FORMATS:
+            result["format"] = node["format"]
+        return result
+
+
+def to_response_schema(json_schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert a Pydantic JSON schema to Gemini's response schema subset.
+    
+    Args:
+        json_schema: Output of BaseModel.model_json_schema()
+    
+    Returns:
+        Schema dict for GenerateContentConfig.response_schema
+    
+    Raises:
+        UnsupportedSchema: If the schema cannot be expressed
+    """
+    return _Converter(json_schema).convert(json_schema)
+
+
+@functools.lru_cache(maxsize=None)
+def response_schema_for(model: Type[BaseModel]) -> Optional[Dict[str, Any]]:
+    """Native response schema of a Pydantic model, or None when unsupported."""
+    try:
+        return to_response_schema(model.model_json_schema())
+    except UnsupportedSchema:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def schema_instruction_for(model: Type[BaseModel]) -> str:
+    """Prompt text asking for JSON matching a Pydantic model (fallback path)."""
+    return f"\n\n{SCHEMA_INSTRUCTION}{model.model_json_schema()}"
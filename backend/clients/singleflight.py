@@ -0,0 +1,159 @@
+"""
+Request Coalescing
+
+Concurrent jobs and endpoints sometimes send byte-identical requests at
+the same time: duplicate jobs, two tabs enhancing the same text, parallel
+validation of identical fallback prompts. SingleFlight lets identical
+in-flight calls share one upstream request: the first caller starts it
+in a task and every caller, the first included, waits on that task.
+
+Requests are keyed by a hash of everything sent to the model (see
+request_key); a request that cannot be hashed is never coalesced.
+GeminiClient coalesces text and vision requests only: image generation
+is sampled, and each caller needs its own image.
+
+Cancellation: a caller that goes away stops waiting, but the request
+keeps running for the callers still waiting. When the last one goes
+away the request is cancelled. The request runs in the context of the
+caller that started it, so its usage and scheduling priority are that
+caller's job's.
+"""
+
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import sys
+sys.path.append('..')
+
+from pydantic import BaseModel
+
+from utils import metrics
+
+
+def _feed(digest: Any, value: Any) -> None:
+    """Add a request value to a hash; raises TypeError for values that cannot be hashed reliably."""
+    if value is None or isinstance(value, (bool, int, float, Enum)):
+        digest.update(repr(value).encode())
+    elif isinstance(value, str):
+        digest.update(b"s%d:" % len(value))
+        digest.update(value.encode())
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        digest.update(b"b%d:" % len(value))
+        digest.update(value)
+    elif isinstance(value, BaseModel):
+        digest.update(type(value).__qualname__.encode())
+        _feed(digest, value.model_dump(exclude_none=True))
+    elif isinstance(value, dict):
+        digest.update(b"{%d" % len(value))
+        for key in sorted(value, key=str):
+            _feed(digest, str(key))
+            _feed(digest, value[key])
+    elif isinstance(value, (list, tuple)):
+        digest.update(b"[%d" % len(value))
+        for item in value:
+            _feed(digest, item)
+    elif isinstance(value, type):
+        digest.update(f"{value.__module__}.{value.__qualname__}".encode())
+    else:
+        raise TypeError(f"Cannot hash request value of type {type(value).__name__}")
+
+
+def request_key(**request: Any) -> Optional[str]:
+    """
+    Hash of a request, or None if part of it cannot be hashed.
+    
+    Args:
+        **request: Everything that determines the response (model,
+            contents, config, credentials, call options)
+    """
+    digest = hashlib.sha256()
+    try:
+        _feed(digest, request)
+    except TypeError:
+        return None
+    return digest.hexdigest()
+
+
+@dataclass
+class _Call:
+    """A shared in-flight request and the number of callers waiting on it."""
+    task: asyncio.Task
+    waiters: int = 0
+
+
+class SingleFlight:
+    """
+    Shares in-flight calls between callers with the same key.
+    
+    Per process and event loop; calls are only shared while in flight,
+    results are not cached.
+    """
+    
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+    
+    def in_flight(self) -> int:
+        """Number of requests currently shared or waited on."""
+        return len(self._calls)
+    
+    async def do(self, key: str, call: Callable[[], Awaitable[Any]], kind: str = "") -> Any:
+        """
+        Run a call, or join the identical one already in flight.
+        
+        Args:
+            key: Request key (see request_key)
+            call: Starts the request
+            kind: Call kind, for metrics
+        
+        Returns:
+            The shared request's result; its exception is raised to every caller
+        """
+        shared = self._calls.get(key)
+        if shared is not None and shared.task.get_loop() is not asyncio.get_running_loop():
+            # Left over from a closed event loop
+            shared = None
+        if shared is None:
+            shared = _Call(task=asyncio.ensure_future(call()))
+            self._calls[key] = shared
+            shared.task.add_done_callback(lambda _: self._finished(key, shared))
+            metrics.MODEL_CALL_COALESCING.inc(kind=kind, outcome="sent")
+        else:
+            metrics.MODEL_CALL_COALESCING.inc(kind=kind, outcome="coalesced")
+        
+        shared.waiters += 1
+        try:
+            return await asyncio.shield(shared.task)
+        finally:
+            shared.waiters -= 1
+            if shared.waiters == 0 and not shared.task.done():
+                # Every caller went away: nobody needs the request any more,
+                # and a new caller must not join it while it is cancelled
+                self._finished(key, shared)
+                shared.task.cancel()
+                metrics.MODEL_CALL_COALESCING.inc(kind=kind, outcome="abandoned")
+    
+    def _finished(self, key: str, shared: _Call) -> None:
+        if self._calls.get(key) is shared:
+            del self._calls[key]
+        if shared.task.done() and not shared.task.cancelled():
+            # Raised to the waiters; marks it retrieved when all went away
+            shared.task.exception()
+
+
+# Global instance
+_singleflight: Optional[SingleFlight] = None
+
+
+def get_singleflight() -> Optional[SingleFlight]:
+    """Get the process-wide request coalescing, or None when it is disabled."""
+    global _singleflight
+    from utils.config import get_config
+    
+    if not get_config().request_coalescing_enabled:
+        return None
+    if _singleflight is None:
+        _singleflight = SingleFlight()
+    return _singleflight
@@ -7,11 +7,16 @@ Contains all Pydantic models for data validation and serialization.
 from .user_input import LifePhase, UserForm, BookPreferences, ReferenceImages
 from .profile import NormalizedProfile, NormalizedLifePhase
 from .visual import VisualFingerprint, FacialFeatures, BodyCharacteristics, StyleAttributes
-from .planning import PagePlanItem, CoverConcept, BackCoverConcept, NarrativePlan
+from .planning import (
+    PagePlanItem, CoverConcept, BackCoverConcept, NarrativePlan, PhaseAllocation, PlanOutline, PhasePagePlan
+)
 from .prompts import PromptItem, RenderParams
-from .generation import GenerationResult, GenerationMetadata
-from .review import ImageQCResult, IllustrationReviewItem, DesignReview, QualityMetrics
-from .output import FinalBookPackage, BookPage
+from .generation import GenerationResult, GenerationMetadata, ImageSignals
+from .review import (
+    ImageQCResult, IllustrationReviewItem, DesignReview, QualityMetrics, PageStyleMetrics, StyleConsistency,
+    BookVisualAssessment, IllustrationReviews
+)
+from .output import FinalBookPackage, BookPage, TextSegment, TranslatedSegments
 
 __all__ = [
     # User Input
@@ -32,18 +37,28 @@ __all__ = [
     "CoverConcept",
     "BackCoverConcept",
     "NarrativePlan",
+    "PhaseAllocation",
+    "PlanOutline",
+    "PhasePagePlan",
     # Prompts
     "PromptItem",
     "RenderParams",
     # Generation
     "GenerationResult",
     "GenerationMetadata",
+    "ImageSignals",
     # Review
     "ImageQCResult",
     "IllustrationReviewItem",
+    "IllustrationReviews",
+    "BookVisualAssessment",
     "DesignReview",
     "QualityMetrics",
+    "PageStyleMetrics",
+    "StyleConsistency",
     # Output
     "FinalBookPackage",
     "BookPage",
+    "TextSegment",
+    "TranslatedSegments",
 ]
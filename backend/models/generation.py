@@ -48,6 +48,59 @@ class GenerationMetadata(BaseModel):
     )
 
 
+class ImageSignals(BaseModel):
+    """Cheap local measurements of a generated image (see utils/image_precheck.py)."""
+    
+    width: int = Field(
+        default=0,
+        ge=0,
+        description="Image width in pixels"
+    )
+    height: int = Field(
+        default=0,
+        ge=0,
+        description="Image height in pixels"
+    )
+    aspect_ratio: float = Field(
+        default=0.0,
+        ge=0.0,
+        description="Width divided by height"
+    )
+    entropy: float = Field(
+        default=0.0,
+        ge=0.0,
+        description="Shannon entropy of the gray levels, in bits (0-8)"
+    )
+    blank_fraction: float = Field(
+        default=0.0,
+        ge=0.0,
+        le=1.0,
+        description="Share of pixels close to the median gray level"
+    )
+    phash: str = Field(
+        default="",
+        description="64-bit perceptual hash as hex"
+    )
+    duplicate_of: Optional[int] = Field(
+        default=None,
+        description="Page this image is a near-duplicate of"
+    )
+    flags: list[str] = Field(
+        default_factory=list,
+        description="Failed checks: unreadable, blank, low_entropy, aspect_ratio, duplicate"
+    )
+    analysis_ms: float = Field(
+        default=0.0,
+        ge=0.0,
+        description="Time taken by the analysis in milliseconds"
+    )
+    
+    @property
+    def rejected(self) -> bool:
+        """Whether the image failed a check and should be regenerated."""
+        return bool(self.flags)
+
+
 class GenerationResult(BaseModel):
     """Result of an image generation."""
     
@@ -75,10 +128,22 @@ class GenerationResult(BaseModel):
         default=None,
         description="Error message if generation failed"
     )
+    error_class: Optional[str] = Field(
+        default=None,
+        description="Failure class for retries: throttle, transient, safety or permanent"
+    )
+    retry_after: Optional[float] = Field(
+        default=None,
+        description="Seconds the server asked to wait before retrying"
+    )
     warnings: list[str] = Field(
         default_factory=list,
         description="Any warnings during generation"
     )
+    signals: Optional[ImageSignals] = Field(
+        default=None,
+        description="Local pre-check measurements of the image"
+    )
     
     @property
     def has_image(self) -> bool:
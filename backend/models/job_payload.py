@@ -0,0 +1,67 @@
+"""
+Job Payload Models
+
+Models for the job creation payload sent by the frontend.
+"""
+
+from datetime import datetime
+from typing import Literal, Optional
+from pydantic import BaseModel, Field
+
+
+class LifePhaseRequest(BaseModel):
+    """Life phase data from the frontend."""
+    memories: list[str] = Field(default_factory=list)
+    key_events: list[str] = Field(default_factory=list)
+    emotions: list[str] = Field(default_factory=list)
+
+
+class PhysicalCharacteristicsRequest(BaseModel):
+    """Physical characteristics from the frontend form."""
+    name: str = ""
+    gender: Optional[str] = None
+    skin_color: Optional[str] = None
+    hair_color: Optional[str] = None
+    hair_style: Optional[str] = None
+    has_glasses: bool = False
+    has_facial_hair: bool = False
+
+
+class JobPayload(BaseModel):
+    """Payload for job creation (sent as JSON string in form data)."""
+    # User form data
+    young: LifePhaseRequest = Field(default_factory=LifePhaseRequest)
+    adolescent: LifePhaseRequest = Field(default_factory=LifePhaseRequest)
+    adult: LifePhaseRequest = Field(default_factory=LifePhaseRequest)
+    elderly: LifePhaseRequest = Field(default_factory=LifePhaseRequest)
+    
+    # Book preferences
+    title: str = Field(..., min_length=1)
+    date: str = Field(...)
+    page_count: int = Field(default=10)
+    style: str = Field(default="watercolor")
+    
+    # Multi-style job: the same book in each of these styles (style is
+    # ignored); the style-independent stages run once for all of them
+    styles: list[str] = Field(default_factory=list)
+    
+    # Language preference
+    user_language: str = Field(default="en-US")
+    
+    # Reference input mode and physical characteristics
+    reference_input_mode: Optional[str] = Field(default="photos")
+    physical_characteristics: Optional[PhysicalCharacteristicsRequest] = Field(default=None)
+    
+    # Scheduling: model calls of higher priority jobs run first, then
+    # those of the job with the earliest deadline
+    priority: Literal["high", "normal", "low"] = Field(default="normal")
+    deadline: Optional[datetime] = Field(default=None, description="Desired completion time")
+    
+    def requested_styles(self) -> list[str]:
+        """Styles to generate, in order and without duplicates."""
+        return list(dict.fromkeys(self.styles)) or [self.style]
+    
+    @property
+    def is_multi_style(self) -> bool:
+        """Whether the job fans out into several styles."""
+        return len(self.requested_styles()) > 1
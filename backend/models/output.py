@@ -70,6 +70,10 @@ class FinalBookPackage(BaseModel):
         ...,
         description="Illustration style used"
     )
+    language: Optional[str] = Field(
+        default=None,
+        description="Language of the book's text"
+    )
     created_at: datetime = Field(
         default_factory=datetime.now,
         description="When the book was created"
@@ -154,3 +158,25 @@ class FinalBookPackage(BaseModel):
             and self.back_cover is not None
             and len(self.pages) == self.total_pages - 2  # Excluding covers
         )
+
+
+class TextSegment(BaseModel):
+    """A piece of a book's text, identified for translation."""
+    
+    id: str = Field(
+        ...,
+        description="Segment identifier, unchanged by translation"
+    )
+    text: str = Field(
+        ...,
+        description="Text of the segment"
+    )
+
+
+class TranslatedSegments(BaseModel):
+    """A book's text segments in another language."""
+    
+    segments: list[TextSegment] = Field(
+        default_factory=list,
+        description="Translated segments"
+    )
@@ -165,3 +165,63 @@ class NarrativePlan(BaseModel):
     def validate_page_count(self) -> bool:
         """Validate that the number of pages matches the plan."""
         return len(self.pages) == self.total_pages
+
+
+class PhaseAllocation(BaseModel):
+    """Pages allotted to one life phase in a plan outline."""
+    
+    life_phase: str = Field(
+        ...,
+        description="Life phase"
+    )
+    page_count: int = Field(
+        ...,
+        ge=0,
+        description="Number of pages for this life phase"
+    )
+    focus: list[str] = Field(
+        default_factory=list,
+        description="Memories this phase's pages should cover, in order"
+    )
+
+
+class PlanOutline(BaseModel):
+    """Book-level plan without page details, expanded per life phase."""
+    
+    book_title: str = Field(
+        ...,
+        description="Title of the book"
+    )
+    cover: CoverConcept = Field(
+        ...,
+        description="Front cover concept"
+    )
+    back_cover: BackCoverConcept = Field(
+        ...,
+        description="Back cover concept"
+    )
+    phases: list[PhaseAllocation] = Field(
+        default_factory=list,
+        description="Pages allotted to each life phase, youngest first"
+    )
+    narrative_arc: str = Field(
+        default="",
+        description="Description of the overall narrative arc"
+    )
+    visual_themes: list[str] = Field(
+        default_factory=list,
+        description="Visual themes to maintain throughout"
+    )
+    color_progression: str = Field(
+        default="",
+        description="How colors should progress through the book"
+    )
+
+
+class PhasePagePlan(BaseModel):
+    """Page plans for one life phase."""
+    
+    pages: list[PagePlanItem] = Field(
+        default_factory=list,
+        description="Plan for each page of the life phase"
+    )
@@ -129,6 +129,124 @@ class IllustrationReviewItem(BaseModel):
     )
 
 
+class BookVisualAssessment(BaseModel):
+    """Book-level judgement of the page images seen side by side."""
+    
+    cohesion_assessment: str = Field(
+        default="",
+        description="How well the pages work together as one book"
+    )
+    style_consistency: Literal["perfect", "good", "acceptable", "inconsistent"] = Field(
+        default="good",
+        description="How consistently the pages share one style"
+    )
+    consistency_issues: list[str] = Field(
+        default_factory=list,
+        description="Inconsistencies across pages"
+    )
+    inconsistent_pages: list[int] = Field(
+        default_factory=list,
+        description="Pages that do not match the rest of the book"
+    )
+
+
+class IllustrationReviews(BaseModel):
+    """Page reviews, with a book-level assessment when pages were reviewed together."""
+    
+    pages: list[IllustrationReviewItem] = Field(
+        default_factory=list,
+        description="Review of each page"
+    )
+    book_assessment: Optional[BookVisualAssessment] = Field(
+        default=None,
+        description="Assessment of the pages as a whole (contact-sheet mode)"
+    )
+    vision_calls: int = Field(
+        default=0,
+        ge=0,
+        description="Vision-model calls made for the reviews"
+    )
+
+
+class PageStyleMetrics(BaseModel):
+    """Pixel-level style measurements of one page (see utils/style_analytics.py)."""
+    
+    page_number: int = Field(
+        ...,
+        description="Page number"
+    )
+    brightness: float = Field(
+        default=0.0,
+        ge=0.0,
+        le=1.0,
+        description="Mean luminance"
+    )
+    contrast: float = Field(
+        default=0.0,
+        ge=0.0,
+        le=1.0,
+        description="Standard deviation of luminance"
+    )
+    saturation: float = Field(
+        default=0.0,
+        ge=0.0,
+        le=1.0,
+        description="Mean colour saturation"
+    )
+    edge_density: float = Field(
+        default=0.0,
+        ge=0.0,
+        le=1.0,
+        description="Share of pixels on a strong edge"
+    )
+    palette: list[str] = Field(
+        default_factory=list,
+        description="Dominant colours as hex, most common first"
+    )
+    distance: float = Field(
+        default=0.0,
+        ge=0.0,
+        description="Distance of the page's style vector from the book centroid"
+    )
+    outlier: bool = Field(
+        default=False,
+        description="Whether the page's style stands out from the book"
+    )
+
+
+class StyleConsistency(BaseModel):
+    """Book-level style consistency measured from the page images."""
+    
+    pages: list[PageStyleMetrics] = Field(
+        default_factory=list,
+        description="Per-page measurements"
+    )
+    book_palette: list[str] = Field(
+        default_factory=list,
+        description="Dominant colours across the book as hex"
+    )
+    mean_distance: float = Field(
+        default=0.0,
+        ge=0.0,
+        description="Mean distance of pages from the book centroid"
+    )
+    outlier_threshold: float = Field(
+        default=0.0,
+        ge=0.0,
+        description="Distance above which a page is an outlier"
+    )
+    outlier_pages: list[int] = Field(
+        default_factory=list,
+        description="Pages whose style stands out from the book"
+    )
+    consistency_score: float = Field(
+        default=10.0,
+        ge=0.0,
+        le=10.0,
+        description="Measured style consistency (0-10)"
+    )
+
+
 class DesignReview(BaseModel):
     """Overall design review for the book."""
     
@@ -182,6 +300,14 @@ class DesignReview(BaseModel):
         default=False,
         description="Whether the design is approved"
     )
+    style_metrics: Optional[StyleConsistency] = Field(
+        default=None,
+        description="Measured pixel-level style consistency"
+    )
+    visual_assessment: Optional[BookVisualAssessment] = Field(
+        default=None,
+        description="Book-level assessment from the contact-sheet review"
+    )
     
     def get_average_score(self) -> float:
         """Calculate the average of all scores."""
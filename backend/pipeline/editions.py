@@ -0,0 +1,99 @@
+"""
+Book Editions
+
+Translates a completed book into other languages. The illustrations
+carry no text, so an edition reuses the book's images and only its text
+is translated, in one batched call per language (see
+agents/edition_translator.py). Editions are written to
+result.<language>.json next to the book's result.json and stored on the
+job record, so GET /jobs/{job_id}/result?language= can serve them.
+"""
+
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+import sys
+sys.path.append('..')
+
+from agents.edition_translator import EditionTranslatorAgent
+from clients.gemini_client import GeminiClient
+from models.output import FinalBookPackage
+from pipeline.job_processor import save_result
+from store import get_job_store
+from utils.config import get_config
+from utils.job_context import job_context, PRIORITY_INTERACTIVE
+from utils.tracing import span
+from utils import metrics
+from prompts.language_utils import resolve_language
+
+
+logger = logging.getLogger(__name__)
+
+
+def edition_languages(languages: List[str], source_language: str) -> List[str]:
+    """Resolve requested languages, dropping duplicates and the book's own language."""
+    source_language = resolve_language(source_language)
+    resolved = []
+    for language in languages:
+        language = resolve_language(language)
+        if language != source_language and language not in resolved:
+            resolved.append(language)
+    return resolved
+
+
+async def translate_editions(
+    job_id: str,
+    package: FinalBookPackage,
+    languages: List[str],
+    style: Optional[str] = None
+) -> Dict[str, Optional[str]]:
+    """
+    Translate a job's book into several languages concurrently.
+    
+    Args:
+        job_id: Job identifier
+        package: The completed book (the job's or one style's result)
+        languages: Resolved target languages (see edition_languages)
+        style: Style of a multi-style job the package belongs to
+    
+    Returns:
+        Error message by language, None for the editions that were stored
+    """
+    config = get_config()
+    job_store = get_job_store()
+    source_language = package.language or job_store.get_job(job_id).user_language
+    gemini_client = GeminiClient(
+        api_key=config.google_api_key,
+        model=config.gemini_model
+    )
+    translator = EditionTranslatorAgent(gemini_client, logger)
+    
+    async def translate(language: str) -> None:
+        with span("edition.translate", language=language, style=style):
+            edition = await translator.execute((package, source_language, language))
+        result_path = await asyncio.to_thread(save_result, job_id, edition, style, language)
+        job_store.set_edition(job_id, language, edition.model_dump(), style=style)
+        logger.info(f"[{job_id}] Edition {language} written to {result_path}")
+    
+    try:
+        # Interactive priority: a user is waiting on the response. No job id,
+        # the job's usage was already reported when it completed.
+        with job_context(priority=PRIORITY_INTERACTIVE):
+            outcomes = await asyncio.gather(
+                *(translate(language) for language in languages),
+                return_exceptions=True
+            )
+    finally:
+        await gemini_client.close()
+    
+    errors: Dict[str, Optional[str]] = {}
+    for language, outcome in zip(languages, outcomes):
+        if isinstance(outcome, BaseException):
+            logger.error(f"[{job_id}] Edition {language} failed: {outcome}")
+            metrics.EDITION_TRANSLATIONS.inc(outcome="failed")
+            errors[language] = str(outcome)
+        else:
+            metrics.EDITION_TRANSLATIONS.inc(outcome="completed")
+            errors[language] = None
+    return errors
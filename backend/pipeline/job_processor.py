@@ -0,0 +1,624 @@
+"""
+Job Processor
+
+Runs a queued book generation job through the pipeline and records
+progress in the job store. Shared by the API process (inline mode) and
+the standalone worker processes (queue mode).
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple, Union
+
+import sys
+sys.path.append('..')
+
+from models.user_input import UserForm, BookPreferences, ReferenceImages, LifePhase, PhysicalCharacteristics
+from models.output import FinalBookPackage
+from models.generation import GenerationResult
+from models.job_payload import JobPayload, PhysicalCharacteristicsRequest
+from pipeline.runner import PipelineRunner, SharedStages
+from pipeline.stage_graph import Stage, StageGraph, StageRun
+from clients.gemini_client import GeminiClient
+from utils.config import get_config
+from utils.job_context import job_context, stage_context
+from utils.retry import get_retry_policy, result_failure, SAFETY
+from utils.tracing import span
+from utils import metrics
+from prompts.language_utils import resolve_language
+from store import (
+    get_job_store,
+    JobStatus,
+    StepName,
+    PageStatus,
+    get_outputs_dir,
+)
+
+logger = logging.getLogger("memorybook")
+
+
+def build_pipeline_inputs(
+    payload: JobPayload,
+    reference_paths: List[str]
+) -> Tuple[UserForm, BookPreferences, ReferenceImages]:
+    """
+    Convert a job payload into the pipeline's internal models.
+    
+    Args:
+        payload: Job payload from the API
+        reference_paths: Paths to the saved reference images
+        
+    Returns:
+        Tuple of (UserForm, BookPreferences, ReferenceImages)
+    """
+    # Convert payload to internal models
+    user_form = UserForm(
+        young=LifePhase(
+            memories=payload.young.memories,
+            key_events=payload.young.key_events,
+            emotions=payload.young.emotions
+        ),
+        adolescent=LifePhase(
+            memories=payload.adolescent.memories,
+            key_events=payload.adolescent.key_events,
+            emotions=payload.adolescent.emotions
+        ),
+        adult=LifePhase(
+            memories=payload.adult.memories,
+            key_events=payload.adult.key_events,
+            emotions=payload.adult.emotions
+        ),
+        elderly=LifePhase(
+            memories=payload.elderly.memories,
+            key_events=payload.elderly.key_events,
+            emotions=payload.elderly.emotions
+        )
+    )
+    
+    preferences = BookPreferences(
+        title=payload.title,
+        date=payload.date,
+        page_count=payload.page_count,
+        style=payload.requested_styles()[0]
+    )
+    
+    reference_images = build_reference_images(
+        reference_paths, payload.physical_characteristics, payload.reference_input_mode
+    )
+    
+    return user_form, preferences, reference_images
+
+
+def build_reference_images(
+    reference_paths: List[str],
+    physical_characteristics: Optional[PhysicalCharacteristicsRequest],
+    reference_input_mode: Optional[str]
+) -> ReferenceImages:
+    """
+    Convert reference inputs from the API into ReferenceImages.
+    
+    Args:
+        reference_paths: Paths to the saved reference images
+        physical_characteristics: Characteristics typed into the form, if any
+        reference_input_mode: "photos" or "characteristics"
+        
+    Returns:
+        ReferenceImages
+    """
+    # Build physical characteristics from payload if provided
+    phys_chars = None
+    if physical_characteristics and physical_characteristics.name:
+        phys_chars = PhysicalCharacteristics(
+            name=physical_characteristics.name,
+            gender=physical_characteristics.gender,
+            skin_color=physical_characteristics.skin_color,
+            hair_color=physical_characteristics.hair_color,
+            hair_style=physical_characteristics.hair_style,
+            has_glasses=physical_characteristics.has_glasses,
+            has_facial_hair=physical_characteristics.has_facial_hair,
+        )
+    
+    return ReferenceImages(
+        paths=reference_paths,
+        physical_characteristics=phys_chars,
+        reference_input_mode=reference_input_mode or "photos"
+    )
+
+
+async def process_job_background(
+    job_id: str,
+    payload: JobPayload,
+    reference_paths: List[str],
+    raise_on_failure: bool = False
+):
+    """
+    Process a job in the background.
+    
+    Model calls made while the job runs are scheduled with the job's
+    priority and deadline.
+    
+    Args:
+        raise_on_failure: Re-raise the error of a failed job instead of
+            marking it FAILED, so a queue worker can decide whether to
+            retry it
+    """
+    with job_context(job_id, priority=payload.priority, deadline=payload.deadline):
+        with span("job.process", page_count=payload.page_count, style=payload.style):
+            await _process_job(job_id, payload, reference_paths, raise_on_failure)
+
+
+def _store_job_usage(job_id: str, started: float, outcome: str) -> None:
+    """Record job latency and store its usage breakdown on the job record."""
+    elapsed = time.perf_counter() - started
+    metrics.JOB_DURATION.observe(elapsed, outcome=outcome)
+    usage = metrics.pop_job_usage(job_id)
+    usage["wall_seconds"] = round(elapsed, 3)
+    get_job_store().set_usage(job_id, usage)
+
+
+async def _process_job(
+    job_id: str,
+    payload: JobPayload,
+    reference_paths: List[str],
+    raise_on_failure: bool = False
+):
+    """
+    Run the pipeline for a job.
+    
+    Updates job store with progress as the pipeline runs.
+    """
+    user_language = resolve_language(payload.user_language)
+    config = get_config()
+    job_store = get_job_store()
+    started = time.perf_counter()
+    
+    try:
+        # Update job status to processing
+        job_store.update_job_status(job_id, status=JobStatus.PROCESSING)
+        
+        # Initialize Gemini client
+        gemini_client = GeminiClient(
+            api_key=config.google_api_key,
+            model=config.gemini_model
+        )
+        
+        # Create pipeline runner
+        runner = PipelineRunner(gemini_client, logger)
+        
+        user_form, preferences, reference_images = build_pipeline_inputs(payload, reference_paths)
+        
+        if payload.is_multi_style:
+            await _process_styles(runner, job_id, payload, user_form, preferences, reference_images, user_language)
+        else:
+            # Run pipeline with progress tracking
+            result = await run_pipeline_with_tracking(
+                runner=runner,
+                job_id=job_id,
+                user_form=user_form,
+                preferences=preferences,
+                reference_images=reference_images,
+                user_language=user_language
+            )
+            
+            # Save result
+            job_store.set_result(job_id, save_result(job_id, result), result.model_dump())
+            job_store.set_critical_path(job_id, runner.stage_report)
+        _store_job_usage(job_id, started, "success")
+        job_store.update_job_status(
+            job_id, 
+            status=JobStatus.COMPLETED, 
+            progress_percent=100
+        )
+        
+        logger.info(f"[{job_id}] Job completed successfully")
+        
+    except Exception as e:
+        logger.error(f"[{job_id}] Job failed: {str(e)}")
+        _store_job_usage(job_id, started, "error")
+        if raise_on_failure:
+            raise
+        job_store.update_job_status(
+            job_id,
+            status=JobStatus.FAILED,
+            error=str(e)
+        )
+
+
+def save_result(
+    job_id: str,
+    result: FinalBookPackage,
+    style: Optional[str] = None,
+    language: Optional[str] = None
+) -> str:
+    """
+    Write a book package to the job's (or style's) outputs.
+    
+    Args:
+        language: Language of a translated edition, written to
+            result.<language>.json next to result.json
+    
+    Returns:
+        Path of the written file
+    """
+    output_dir = get_outputs_dir(job_id)
+    if style is not None:
+        output_dir = os.path.join(output_dir, style)
+    result_path = os.path.join(output_dir, f"result.{language}.json" if language else "result.json")
+    
+    with open(result_path, 'w', encoding='utf-8') as f:
+        json.dump(result.model_dump(), f, indent=2, default=str)
+    return result_path
+
+
+async def _process_styles(
+    runner: PipelineRunner,
+    job_id: str,
+    payload: JobPayload,
+    user_form: UserForm,
+    preferences: BookPreferences,
+    reference_images: ReferenceImages,
+    user_language: str
+) -> None:
+    """
+    Run a multi-style job and store the result of each style.
+    
+    The job completes when at least one style does; its own result is
+    that of the first completed style, for clients that expect one book.
+    
+    Raises:
+        RuntimeError: If every style failed
+    """
+    job_store = get_job_store()
+    results = await run_styles_with_tracking(
+        runner=runner,
+        job_id=job_id,
+        user_form=user_form,
+        preferences=[
+            BookPreferences(**{**preferences.model_dump(), "style": style})
+            for style in payload.requested_styles()
+        ],
+        reference_images=reference_images,
+        user_language=user_language
+    )
+    
+    completed = []
+    for style, result in results.items():
+        if isinstance(result, Exception):
+            continue
+        result_path = save_result(job_id, result, style)
+        job_store.set_result(job_id, result_path, result.model_dump(), style=style)
+        job_store.update_job_status(job_id, status=JobStatus.COMPLETED, progress_percent=100, style=style)
+        completed.append((result_path, result))
+    
+    if not completed:
+        raise RuntimeError(
+            "All styles failed: " + "; ".join(f"{style}: {error}" for style, error in results.items())
+        )
+    result_path, result = completed[0]
+    job_store.set_result(job_id, result_path, result.model_dump())
+
+
+# Job step and progress percent reported when a stage starts; the three
+# prompt stages share one step, completed when all of them finish
+STAGE_STEPS = {
+    "normalized_profile": (StepName.NORMALIZATION, 5),
+    "narrative_plan": (StepName.PLANNING, 15),
+    "visual_fingerprint": (StepName.VISUAL_ANALYSIS, 15),
+    "character_sheet": (StepName.CHARACTER_SHEET, 28),
+    "cover_prompt": (StepName.PROMPT_CREATION, 35),
+    "back_cover_prompt": (StepName.PROMPT_CREATION, 35),
+    "page_prompts": (StepName.PROMPT_CREATION, 35),
+    "reviewed_prompts": (StepName.PROMPT_REVIEW, 50),
+    "generation_results": (StepName.IMAGE_GENERATION, 55),
+    "illustration_reviews": (StepName.ILLUSTRATION_REVIEW, 78),
+    "design_review": (StepName.DESIGN_REVIEW, 85),
+}
+
+
+async def run_pipeline_with_tracking(
+    runner: PipelineRunner,
+    job_id: str,
+    user_form: UserForm,
+    preferences: BookPreferences,
+    reference_images: ReferenceImages,
+    user_language: str
+) -> FinalBookPackage:
+    """
+    Run pipeline with progress tracking to job store.
+    
+    Stages run as soon as their inputs are ready (see StageGraph); the
+    critical-path report is left on runner.stage_report.
+    """
+    try:
+        stage_run = await _run_tracked_stages(
+            runner, job_id, user_form, preferences, reference_images, user_language
+        )
+        runner.stage_report = stage_run.report()
+        return stage_run["final_package"]
+        
+    finally:
+        # Cleanup
+        await runner.image_client.close()
+
+
+async def run_styles_with_tracking(
+    runner: PipelineRunner,
+    job_id: str,
+    user_form: UserForm,
+    preferences: List[BookPreferences],
+    reference_images: ReferenceImages,
+    user_language: str
+) -> Dict[str, Union[FinalBookPackage, Exception]]:
+    """
+    Run a multi-style job: the same book once per style.
+    
+    Normalization, narrative planning and visual analysis run once and
+    are shared (see SharedStages); the fingerprint's style attributes,
+    character sheet, prompts, images and reviews are per style. Each
+    style's progress and critical-path report go to its StyleRecord and
+    its files to a subdirectory of the job's outputs named after it.
+    
+    Args:
+        preferences: Book preferences, one per style
+        
+    Returns:
+        Package or error by style; a failing style does not stop the others
+    """
+    shared = SharedStages(runner.config.plan_streaming_enabled)
+    job_store = get_job_store()
+    
+    async def run_style(style_preferences: BookPreferences) -> FinalBookPackage:
+        style = style_preferences.style
+        job_store.update_job_status(job_id, status=JobStatus.PROCESSING, style=style)
+        try:
+            with span("job.style", style=style):
+                stage_run = await _run_tracked_stages(
+                    runner, job_id, user_form, style_preferences, reference_images, user_language,
+                    style=style, shared=shared
+                )
+        except Exception as e:
+            logger.error(f"[{job_id}] Style {style} failed: {str(e)}")
+            job_store.update_job_status(job_id, status=JobStatus.FAILED, error=str(e), style=style)
+            raise
+        job_store.set_critical_path(job_id, stage_run.report(), style=style)
+        return stage_run["final_package"]
+    
+    try:
+        results = await asyncio.gather(
+            *(run_style(style_preferences) for style_preferences in preferences),
+            return_exceptions=True
+        )
+    finally:
+        shared.cancel()
+        await runner.image_client.close()
+    
+    for result in results:
+        # Cancellation is not a per-style outcome
+        if isinstance(result, BaseException) and not isinstance(result, Exception):
+            raise result
+    return {p.style: result for p, result in zip(preferences, results)}
+
+
+async def _run_tracked_stages(
+    runner: PipelineRunner,
+    job_id: str,
+    user_form: UserForm,
+    preferences: BookPreferences,
+    reference_images: ReferenceImages,
+    user_language: str,
+    style: Optional[str] = None,
+    shared: Optional[SharedStages] = None
+) -> StageRun:
+    """
+    Run the pipeline stages of a job, or of one style of a multi-style job.
+    
+    Args:
+        style: Style whose StyleRecord receives the progress; None for
+            a single-style job
+        shared: Stages shared with the job's other styles
+    """
+    job_store = get_job_store()
+    progress = {"percent": 0}
+    
+    # Helper to update progress
+    def update_progress(step: str, percent: int):
+        # Stages overlap, so progress only moves forward
+        progress["percent"] = max(progress["percent"], percent)
+        job_store.start_step(job_id, step, style=style)
+        job_store.update_job_status(job_id, current_step=step, progress_percent=progress["percent"], style=style)
+    
+    def complete_step(step: str):
+        job_store.complete_step(job_id, step, style=style)
+    
+    pending = {}
+    for stage_name, (step, _) in STAGE_STEPS.items():
+        pending.setdefault(step.value, set()).add(stage_name)
+    
+    def on_stage_start(stage_name: str):
+        if stage_name in STAGE_STEPS:
+            step, percent = STAGE_STEPS[stage_name]
+            update_progress(step.value, percent)
+    
+    def on_stage_finish(stage_name: str):
+        if stage_name in STAGE_STEPS:
+            step = STAGE_STEPS[stage_name][0].value
+            pending[step].discard(stage_name)
+            if not pending[step]:
+                complete_step(step)
+    
+    output_dir = get_outputs_dir(job_id)
+    if style is not None:
+        output_dir = os.path.join(output_dir, style)
+        os.makedirs(output_dir, exist_ok=True)
+    
+    async def generation_results(reviewed_prompts, reference_paths, visual_fingerprint):
+        generation_results = []
+        total_prompts = len(reviewed_prompts)
+        
+        for i, prompt in enumerate(reviewed_prompts):
+            # Update page status
+            page_num = prompt.page_number
+            job_store.update_page_status(job_id, page_num, PageStatus.GENERATING, style=style)
+            
+            # Determine filename
+            if prompt.prompt_type == "cover":
+                filename = "cover.jpg"
+            elif prompt.prompt_type == "back_cover":
+                filename = "back_cover.jpg"
+            else:
+                filename = f"page_{prompt.page_number:02d}.jpg"
+            
+            output_path = os.path.join(output_dir, filename)
+            
+            # Generate image with retry
+            # Always pass reference images (user photos + character sheet) for consistency
+            # Only skip for back cover which typically doesn't feature the character
+            refs = reference_paths if (reference_paths and prompt.prompt_type != "back_cover") else None
+            
+            async def attempt_generation(attempt: int) -> GenerationResult:
+                with span("image.generate", page=page_num, attempt=attempt):
+                    return await runner.image_client.generate_image(
+                        prompt=prompt.get_full_prompt(),
+                        reference_images=refs,
+                        render_params=prompt.render_params.model_dump(),
+                        output_path=output_path
+                    )
+            
+            with stage_context(StepName.IMAGE_GENERATION.value):
+                result = await get_retry_policy().run(
+                    attempt_generation,
+                    classify_result=result_failure,
+                    description=f"[{job_id}] image generation for {filename}"
+                )
+            
+            if result.error_class == SAFETY:
+                # Refused by safety filters: repair the prompt instead of retrying it
+                job_store.update_page_status(job_id, page_num, PageStatus.FIXING, style=style)
+                # The repaired prompt is the one validated and stored
+                result, reviewed_prompts[i] = await runner.repair_refused_image(
+                    prompt, result, visual_fingerprint, refs, output_path, user_language
+                )
+            
+            generation_results.append(result)
+            
+            # Update page status
+            job_store.update_page_status(
+                job_id, page_num, 
+                PageStatus.COMPLETED if result.success else PageStatus.FAILED,
+                image_path=result.image_path,
+                style=style
+            )
+            
+            # Update overall progress
+            progress["percent"] = max(progress["percent"], 55 + int((i + 1) / total_prompts * 20))
+            job_store.update_job_status(job_id, progress_percent=progress["percent"], style=style)
+        
+        # Log any failed images
+        failed_count = sum(1 for r in generation_results if not r.success)
+        if failed_count > 0:
+            logger.warning(f"[{job_id}] {failed_count}/{total_prompts} images failed generation")
+        
+        # Obvious failures found by the local pre-check are regenerated once
+        await runner.precheck_images(generation_results, reviewed_prompts)
+        rejected = [
+            i for i, result in enumerate(generation_results)
+            if result.signals is not None and result.signals.rejected
+        ]
+        for i in rejected:
+            prompt = reviewed_prompts[i]
+            job_store.update_page_status(job_id, prompt.page_number, PageStatus.FIXING, style=style)
+            refs = reference_paths if (reference_paths and prompt.prompt_type != "back_cover") else None
+            generation_results[i], reviewed_prompts[i] = await runner.repair_rejected_image(
+                prompt, generation_results[i], visual_fingerprint, refs, user_language
+            )
+            job_store.update_page_status(
+                job_id, prompt.page_number,
+                PageStatus.COMPLETED if generation_results[i].success else PageStatus.FAILED,
+                image_path=generation_results[i].image_path,
+                style=style
+            )
+        if rejected:
+            await runner.precheck_images(generation_results, reviewed_prompts)
+        return generation_results
+    
+    async def illustration_reviews(generation_results):
+        return await runner.illustrator_reviewer.execute((generation_results, preferences, user_language))
+    
+    async def style_metrics(generation_results, reviewed_prompts):
+        return await runner.analyze_style(generation_results, reviewed_prompts)
+    
+    async def design_review(generation_results, illustration_reviews, style_metrics):
+        return await runner.designer_reviewer.execute(
+            (
+                generation_results, illustration_reviews.pages, preferences, user_language,
+                style_metrics, illustration_reviews.book_assessment
+            )
+        )
+    
+    async def final_package(generation_results, reviewed_prompts, narrative_plan, visual_fingerprint, design_review,
+                            normalized_profile):
+        # Phase 8: Validation (95%)
+        update_progress(StepName.VALIDATION.value, 90)
+        # Simplified validation for now
+        complete_step(StepName.VALIDATION.value)
+        
+        # Phase 9: Finalization (100%)
+        update_progress(StepName.FINALIZATION.value, 95)
+        
+        # Build final package
+        final_package = runner.build_final_package(
+            book_id=job_id,
+            preferences=preferences,
+            results=generation_results,
+            prompts=reviewed_prompts,
+            narrative_plan=narrative_plan,
+            fingerprint=visual_fingerprint,
+            design_review=design_review,
+            output_dir=output_dir,
+            total_time_ms=0,
+            total_retries=0,
+            subdirectory=style,
+            language=user_language
+        )
+        
+        job_store.set_prompts(job_id, [prompt.model_dump() for prompt in reviewed_prompts], style=style)
+        job_store.set_normalized_profile(job_id, normalized_profile.model_dump())
+        complete_step(StepName.FINALIZATION.value)
+        
+        return final_package
+    
+    graph = StageGraph(
+        runner.planning_stages(
+            user_form,
+            preferences,
+            reference_images,
+            output_dir,
+            user_language,
+            lambda message: logger.info(f"[{job_id}] {message}"),
+            shared
+        ) + [
+            Stage(
+                "generation_results",
+                generation_results,
+                ("reviewed_prompts", "reference_paths", "visual_fingerprint")
+            ),
+            Stage("illustration_reviews", illustration_reviews, ("generation_results",)),
+            Stage("style_metrics", style_metrics, ("generation_results", "reviewed_prompts")),
+            Stage("design_review", design_review, ("generation_results", "illustration_reviews", "style_metrics")),
+            Stage(
+                "final_package",
+                final_package,
+                (
+                    "generation_results", "reviewed_prompts", "narrative_plan", "visual_fingerprint", "design_review",
+                    "normalized_profile"
+                )
+            ),
+        ]
+    )
+    
+    stage_run = await graph.run(on_start=on_stage_start, on_finish=on_stage_finish)
+    logger.info(f"[{job_id}] {stage_run.describe()}")
+    return stage_run
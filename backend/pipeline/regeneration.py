@@ -0,0 +1,290 @@
+"""
+Page Regeneration
+
+Regenerates one image of a completed book, optionally following user
+feedback, without running a new job. The job's stored fingerprint,
+character sheet and reviewed prompt for the page are reused: only
+IterativeFixAgent (to apply the feedback), image generation and
+validation run, for that page alone. The new image replaces the old
+file and uploaded asset, and the page's entry in the result is updated
+in place; other pages, the covers and the design review are untouched.
+"""
+
+import asyncio
+import logging
+import os
+from typing import List, Optional, Tuple
+
+import sys
+sys.path.append('..')
+
+from clients.gemini_client import GeminiClient
+from models.generation import GenerationResult
+from models.output import BookPage, FinalBookPackage
+from models.prompts import PromptItem
+from models.review import ImageQCResult
+from models.visual import VisualFingerprint
+from pipeline.job_processor import save_result
+from pipeline.runner import PipelineRunner
+from store import get_job_store, get_outputs_dir, JobRecord, PageStatus
+from utils.config import get_config
+from utils.job_context import job_context, stage_context, PRIORITY_INTERACTIVE
+from utils.retry import get_retry_policy, result_failure, SAFETY
+from utils.tracing import span
+from utils import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class PageBusyError(RuntimeError):
+    """Raised when the page is already being regenerated."""
+
+
+def image_filename(prompt: PromptItem) -> str:
+    """Output filename of a prompt's image, as written by the pipeline."""
+    if prompt.prompt_type == "cover":
+        return "cover.jpg"
+    if prompt.prompt_type == "back_cover":
+        return "back_cover.jpg"
+    return f"page_{prompt.page_number:02d}.jpg"
+
+
+def book_page(package: FinalBookPackage, page_number: int) -> Optional[BookPage]:
+    """The cover (0), back cover (-1) or content page of a package."""
+    if page_number == 0:
+        return package.cover
+    if page_number == -1:
+        return package.back_cover
+    return next((page for page in package.pages if page.page_number == page_number), None)
+
+
+def page_image_paths(job_id: str, prompt: PromptItem, style: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Paths of a page's image and of its replacement while it is generated.
+    
+    The replacement is generated beside the current image, which stays in
+    place until the new one exists.
+    """
+    output_dir = get_outputs_dir(job_id)
+    if style is not None:
+        output_dir = os.path.join(output_dir, style)
+    filename = image_filename(prompt)
+    draft = f"{os.path.splitext(filename)[0]}.regenerating.jpg"
+    return os.path.join(output_dir, filename), os.path.join(output_dir, draft)
+
+
+def page_references(job: JobRecord, fingerprint: VisualFingerprint, prompt: PromptItem) -> Optional[List[str]]:
+    """Same references as the original generation: photos and character sheet, none for the back cover."""
+    if prompt.prompt_type == "back_cover":
+        return None
+    refs = list(job.reference_image_paths)
+    if fingerprint.character_sheet_path and os.path.exists(fingerprint.character_sheet_path):
+        refs.append(fingerprint.character_sheet_path)
+    return refs or None
+
+
+async def generate_page_image(
+    runner: PipelineRunner,
+    prompt: PromptItem,
+    refs: Optional[List[str]],
+    output_path: str,
+    fingerprint: VisualFingerprint,
+    user_language: str
+) -> Tuple[GenerationResult, PromptItem]:
+    """
+    Generate one page image, retrying like the pipeline does.
+    
+    Returns:
+        (GenerationResult, the prompt used, repaired if it was refused)
+    """
+    async def attempt_generation(attempt: int) -> GenerationResult:
+        with span("image.regenerate", page=prompt.page_number, attempt=attempt, requested=True):
+            return await runner.image_client.generate_image(
+                prompt=prompt.get_full_prompt(),
+                reference_images=refs,
+                render_params=prompt.render_params.model_dump(),
+                output_path=output_path
+            )
+    
+    with stage_context("page_regeneration"):
+        result = await get_retry_policy().run(
+            attempt_generation,
+            classify_result=result_failure,
+            description=f"regeneration of page {prompt.page_number}"
+        )
+    if result.error_class == SAFETY:
+        result, prompt = await runner.repair_refused_image(
+            prompt, result, fingerprint, refs, output_path, user_language
+        )
+    return result, prompt
+
+
+async def publish_page_image(
+    runner: PipelineRunner,
+    job_id: str,
+    result: GenerationResult,
+    image_path: str,
+    page_number: int,
+    style: Optional[str] = None
+) -> str:
+    """
+    Move a generated replacement over the page's image and upload it.
+    
+    Returns:
+        The page's image_path for the book: public URL, or relative path
+    """
+    if result.image_path and os.path.exists(result.image_path):
+        await asyncio.to_thread(os.replace, result.image_path, image_path)
+    relative_path = runner.to_relative_path(image_path, style)
+    public_url = await asyncio.to_thread(runner.upload_image, job_id, relative_path, image_path, page_number)
+    return public_url or relative_path
+
+
+def save_book(job_id: str, package: FinalBookPackage, style: Optional[str] = None) -> None:
+    """Store an updated book as the job's (or a style's) result."""
+    job_store = get_job_store()
+    result_json = package.model_dump()
+    result_path = save_result(job_id, package, style)
+    job_store.set_result(job_id, result_path, result_json, style=style)
+    job = job_store.get_job(job_id)
+    if style is not None and (job.result_json or {}).get("style") == style:
+        # The job's own result is this style's book
+        job_store.set_result(job_id, result_path, result_json)
+
+
+async def regenerate_page(
+    job_id: str,
+    page_number: int,
+    feedback: Optional[str] = None,
+    style: Optional[str] = None
+) -> BookPage:
+    """
+    Regenerate one image of a completed job's book.
+    
+    Without feedback the stored prompt is generated again as is; with
+    feedback, IterativeFixAgent first rewrites it. Images failing
+    validation are fixed and regenerated up to config.max_retries times. The
+    old image is only replaced once a new one was generated.
+    
+    Args:
+        job_id: Job identifier
+        page_number: Page to regenerate (0 for the cover, -1 for the back cover)
+        feedback: What the user wants changed
+        style: Style of a multi-style job the page belongs to
+    
+    Returns:
+        The page's updated entry in the book
+    
+    Raises:
+        LookupError: If the book has no such page
+        ValueError: If the job has no stored prompts or fingerprint to reuse
+        PageBusyError: If the page is already being regenerated
+        RuntimeError: If no image could be generated
+    """
+    config = get_config()
+    job_store = get_job_store()
+    job = job_store.get_job(job_id)
+    target = job.progress_target(style)
+    package = FinalBookPackage.model_validate(target.result_json)
+    
+    if book_page(package, page_number) is None:
+        raise LookupError(f"Page {page_number} is not in this book")
+    prompt = next(
+        (PromptItem(**item) for item in target.prompts if item["page_number"] == page_number),
+        None
+    )
+    fingerprint = package.visual_fingerprint
+    if prompt is None or fingerprint is None:
+        raise ValueError("This job has no stored prompts to regenerate from")
+    page_info = next((page for page in target.pages if page.page_number == page_number), None)
+    if page_info and page_info.status in (PageStatus.GENERATING, PageStatus.FIXING, PageStatus.VALIDATING):
+        raise PageBusyError(f"Page {page_number} is already being regenerated")
+    
+    user_language = package.language or job.user_language
+    image_path, draft_path = page_image_paths(job_id, prompt, style)
+    refs = page_references(job, fingerprint, prompt)
+    
+    gemini_client = GeminiClient(
+        api_key=config.google_api_key,
+        model=config.gemini_model
+    )
+    runner = PipelineRunner(gemini_client, logger)
+    job_store.update_page_status(
+        job_id, page_number, PageStatus.FIXING if feedback else PageStatus.GENERATING, style=style
+    )
+    
+    attempts = 0
+    try:
+        # Interactive priority: a user is waiting on the response. No job id,
+        # the job's usage was already reported when it completed.
+        with job_context(priority=PRIORITY_INTERACTIVE), span(
+            "page.regenerate", page=page_number, style=style, feedback=bool(feedback)
+        ):
+            if feedback:
+                prompt = await runner.iterative_fix.execute((
+                    prompt,
+                    ImageQCResult(
+                        page_number=page_number,
+                        image_path=image_path,
+                        passed=False,
+                        issues_found=[f"The reader asked for changes: {feedback}"],
+                        suggestions=[feedback],
+                        requires_regeneration=True
+                    ),
+                    fingerprint,
+                    user_language
+                ))
+            
+            for validation_round in range(config.max_retries + 1):
+                job_store.update_page_status(job_id, page_number, PageStatus.GENERATING, style=style)
+                result, prompt = await generate_page_image(
+                    runner, prompt, refs, draft_path, fingerprint, user_language
+                )
+                attempts += 1
+                if not result.success:
+                    raise RuntimeError(f"Page {page_number} could not be regenerated: {result.error_message}")
+                
+                job_store.update_page_status(job_id, page_number, PageStatus.VALIDATING, style=style)
+                with span("image.validate", page=page_number, validation_round=validation_round + 1):
+                    qc_result = await runner.image_validator.execute(
+                        (result, fingerprint, page_number, user_language)
+                    )
+                if not qc_result.requires_regeneration or validation_round == config.max_retries:
+                    break
+                
+                job_store.update_page_status(job_id, page_number, PageStatus.FIXING, style=style)
+                prompt = await runner.iterative_fix.execute((prompt, qc_result, fingerprint, user_language))
+                metrics.record_retry("validation_failed", stage="page_regeneration")
+            
+            published_path = await publish_page_image(runner, job_id, result, image_path, page_number, style)
+    except BaseException:
+        # The book keeps its old image
+        if os.path.exists(draft_path):
+            os.remove(draft_path)
+        job_store.update_page_status(job_id, page_number, PageStatus.COMPLETED, style=style)
+        raise
+    finally:
+        await runner.image_client.close()
+    
+    # Re-read the result: other pages may have been regenerated meanwhile.
+    # Nothing below awaits, so the update cannot interleave with theirs.
+    job = job_store.get_job(job_id)
+    target = job.progress_target(style)
+    package = FinalBookPackage.model_validate(target.result_json)
+    page = book_page(package, page_number)
+    page.image_path = published_path
+    page.generation_attempts += attempts
+    package.total_retries += attempts
+    
+    save_book(job_id, package, style)
+    job_store.set_prompts(
+        job_id,
+        [prompt.model_dump() if item["page_number"] == page_number else item for item in target.prompts],
+        style=style
+    )
+    job_store.update_page_status(
+        job_id, page_number, PageStatus.COMPLETED, image_path=image_path, increment_retry=True, style=style
+    )
+    logger.info(f"[{job_id}] Page {page_number} regenerated in {attempts} attempt(s)")
+    return page
@@ -0,0 +1,270 @@
+"""
+Incremental Revisions
+
+Re-runs only the part of a completed job that an edit to its memories
+affects. The revised form is diffed against the job's stored input per
+life phase; only the changed phases are normalized again, and only the
+pages planned from changed memories (matched by life phase and
+memory_reference) are planned again. Prompts are written for those
+pages, and only the pages whose prompt changed get a new image. The
+fingerprint, character sheet, covers, other pages and the design review
+are carried over.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional
+
+import sys
+sys.path.append('..')
+
+from clients.gemini_client import GeminiClient
+from models.job_payload import JobPayload
+from models.output import FinalBookPackage
+from models.planning import NarrativePlan, PagePlanItem
+from models.profile import NormalizedProfile
+from models.prompts import PromptItem
+from models.user_input import UserForm
+from pipeline.job_processor import build_pipeline_inputs
+from pipeline.regeneration import (
+    PageBusyError, book_page, generate_page_image, page_image_paths, page_references, publish_page_image, save_book
+)
+from pipeline.runner import PipelineRunner
+from store import get_job_store, PageStatus
+from utils.config import get_config
+from utils.job_context import job_context, PRIORITY_INTERACTIVE
+from utils.tracing import span
+from utils import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Life phases of the user form, in chronological order
+PHASES = ("young", "adolescent", "adult", "elderly")
+
+# Similarity above which a page's memory_reference is taken to be about a memory
+MATCH_RATIO = 0.6
+
+# Payload fields a revision may change; anything else needs a new job
+REVISABLE_FIELDS = set(PHASES) | {"priority", "deadline"}
+
+
+@dataclass
+class Revision:
+    """What a revision recomputed."""
+    changed_phases: List[str] = field(default_factory=list)
+    replanned_pages: List[int] = field(default_factory=list)
+    regenerated_pages: List[int] = field(default_factory=list)
+    model_calls: int = 0
+    # Calls of the original job minus those of the revision; None when
+    # the job's usage is unknown
+    calls_saved: Optional[int] = None
+
+
+def changed_phases(old: UserForm, new: UserForm) -> List[str]:
+    """Life phases whose memories, key events or emotions differ."""
+    return [phase for phase in PHASES if getattr(old, phase) != getattr(new, phase)]
+
+
+def _is_about(page: PagePlanItem, memory: str) -> bool:
+    """Whether a page's memory_reference refers to a memory of the form."""
+    reference, memory = page.memory_reference.lower(), memory.lower()
+    if memory in reference or reference in memory:
+        return True
+    return SequenceMatcher(None, reference, memory).ratio() >= MATCH_RATIO
+
+
+def affected_pages(plan: NarrativePlan, old: UserForm, new: UserForm, phases: List[str]) -> List[PagePlanItem]:
+    """
+    Pages of the changed phases that have to be planned again.
+    
+    Pages about memories or key events that were edited or removed are
+    affected. When no page of a phase can be traced to the edit (a memory
+    was added, the emotions changed), every page of the phase is.
+    """
+    affected = []
+    for phase in phases:
+        old_phase, new_phase = getattr(old, phase), getattr(new, phase)
+        current = set(new_phase.memories + new_phase.key_events)
+        removed = [memory for memory in old_phase.memories + old_phase.key_events if memory not in current]
+        pages = plan.get_pages_by_phase(phase)
+        traced = [page for page in pages if any(_is_about(page, memory) for memory in removed)]
+        affected.extend(traced or pages)
+    return sorted(affected, key=lambda page: page.page_number)
+
+
+def merge_phases(profile: NormalizedProfile, revised: NormalizedProfile, phases: List[str]) -> NormalizedProfile:
+    """The profile with the changed phases taken from a normalization of those phases alone."""
+    by_name = {phase.phase_name: phase for phase in profile.life_phases}
+    for name in phases:
+        by_name.pop(name, None)
+        phase = revised.get_phase(name)
+        if phase is not None:
+            by_name[name] = phase
+    merged = profile.model_copy(deep=True)
+    merged.life_phases = sorted(
+        by_name.values(),
+        key=lambda phase: PHASES.index(phase.phase_name) if phase.phase_name in PHASES else len(PHASES)
+    )
+    return merged
+
+
+def _check_revisable(old: JobPayload, new: JobPayload) -> None:
+    """Raise ValueError if the revision changes more than the memories."""
+    old_data, new_data = old.model_dump(mode="json"), new.model_dump(mode="json")
+    changed = sorted(key for key in old_data if key not in REVISABLE_FIELDS and old_data[key] != new_data.get(key))
+    if changed:
+        raise ValueError(f"Only memories can be revised; create a new job to change {', '.join(changed)}")
+    if old.is_multi_style:
+        raise ValueError("Multi-style jobs cannot be revised; create a new job")
+
+
+async def revise_job(job_id: str, payload: JobPayload) -> Revision:
+    """
+    Apply an edit of a completed job's memories to its book.
+    
+    Args:
+        job_id: Job identifier
+        payload: The job's payload with the edited memories
+    
+    Returns:
+        Revision describing what was recomputed
+    
+    Raises:
+        ValueError: If more than the memories changed, or the job has no
+            stored state to revise
+        PageBusyError: If a page of the book is being regenerated
+    """
+    config = get_config()
+    job_store = get_job_store()
+    job = job_store.get_job(job_id)
+    if not job.input_payload or not job.normalized_profile or not job.prompts:
+        raise ValueError("This job has no stored input to revise")
+    old_payload = JobPayload.model_validate(job.input_payload)
+    _check_revisable(old_payload, payload)
+    package = FinalBookPackage.model_validate(job.result_json)
+    if package.narrative_plan is None or package.visual_fingerprint is None:
+        raise ValueError("This job has no stored plan to revise")
+    
+    if any(page.status in (PageStatus.GENERATING, PageStatus.FIXING, PageStatus.VALIDATING) for page in job.pages):
+        raise PageBusyError("A page of this book is being regenerated")
+    
+    old_form, _, _ = build_pipeline_inputs(old_payload, job.reference_image_paths)
+    user_form, preferences, _ = build_pipeline_inputs(payload, job.reference_image_paths)
+    revision = Revision(changed_phases=changed_phases(old_form, user_form))
+    if not revision.changed_phases:
+        return revision
+    
+    plan, fingerprint = package.narrative_plan, package.visual_fingerprint
+    user_language = package.language or job.user_language
+    profile = NormalizedProfile.model_validate(job.normalized_profile)
+    stored_prompts = {item["page_number"]: PromptItem(**item) for item in job.prompts}
+    affected = affected_pages(plan, old_form, user_form, revision.changed_phases)
+    
+    gemini_client = GeminiClient(
+        api_key=config.google_api_key,
+        model=config.gemini_model
+    )
+    runner = PipelineRunner(gemini_client, logger)
+    regenerated: Dict[int, str] = {}
+    generating: Optional[int] = None
+    
+    try:
+        with job_context(job_id, priority=PRIORITY_INTERACTIVE), span(
+            "job.revise", phases=",".join(revision.changed_phases), pages=len(affected)
+        ):
+            # Only the changed phases go to the normalizer
+            partial_form = UserForm(**{phase: getattr(user_form, phase) for phase in revision.changed_phases})
+            revised = await runner.normalizer.execute((partial_form, preferences, user_language))
+            profile = merge_phases(profile, revised, revision.changed_phases)
+            
+            async def replan(phase: str) -> List[PagePlanItem]:
+                pages = [page for page in affected if page.life_phase == phase]
+                if not pages:
+                    return []
+                kept = [page for page in plan.get_pages_by_phase(phase) if page not in pages]
+                form_phase = getattr(user_form, phase)
+                focus = [
+                    memory for memory in form_phase.memories + form_phase.key_events
+                    if not any(_is_about(page, memory) for page in kept)
+                ]
+                return await runner.narrative_planner.replan_pages(
+                    plan, pages, focus, profile, preferences, user_language
+                )
+            
+            replanned = [
+                page
+                for pages in await asyncio.gather(*(replan(phase) for phase in revision.changed_phases))
+                for page in pages
+            ]
+            old_pages = {page.page_number: page for page in plan.pages}
+            replanned = [page for page in replanned if page != old_pages[page.page_number]]
+            revision.replanned_pages = [page.page_number for page in replanned]
+            
+            prompts: List[PromptItem] = []
+            if replanned:
+                page_prompts = await runner.prompt_writer.execute(
+                    (plan.model_copy(update={"pages": replanned}), fingerprint, preferences, user_language)
+                )
+                prompts = await runner.prompt_reviewer.execute((page_prompts, user_language))
+            prompts = [
+                prompt for prompt in prompts
+                if prompt.get_full_prompt() != stored_prompts[prompt.page_number].get_full_prompt()
+            ]
+            
+            for prompt in prompts:
+                generating = prompt.page_number
+                job_store.update_page_status(job_id, generating, PageStatus.GENERATING)
+                image_path, draft_path = page_image_paths(job_id, prompt)
+                result, fixed_prompt = await generate_page_image(
+                    runner, prompt, page_references(job, fingerprint, prompt), draft_path, fingerprint, user_language
+                )
+                if not result.success:
+                    raise RuntimeError(f"Page {prompt.page_number} could not be regenerated: {result.error_message}")
+                regenerated[prompt.page_number] = await publish_page_image(
+                    runner, job_id, result, image_path, prompt.page_number
+                )
+                stored_prompts[prompt.page_number] = fixed_prompt
+                job_store.update_page_status(job_id, generating, PageStatus.COMPLETED, image_path=image_path)
+                generating = None
+    except BaseException:
+        # The job keeps its old input and text; pages already replaced keep their new image
+        if generating is not None:
+            job_store.update_page_status(job_id, generating, PageStatus.COMPLETED)
+        metrics.pop_job_usage(job_id)
+        raise
+    finally:
+        await runner.image_client.close()
+    
+    revision.regenerated_pages = sorted(regenerated)
+    revision.model_calls = int(metrics.pop_job_usage(job_id)["total"]["calls"])
+    if job.usage:
+        revision.calls_saved = max(int(job.usage["total"]["calls"]) - revision.model_calls, 0)
+    
+    # Re-read the result: pages may have been regenerated meanwhile.
+    # Nothing below awaits, so the update cannot interleave with theirs.
+    job = job_store.get_job(job_id)
+    package = FinalBookPackage.model_validate(job.result_json)
+    replanned_by_number = {page.page_number: page for page in replanned}
+    package.narrative_plan.pages = [
+        replanned_by_number.get(page.page_number, page) for page in package.narrative_plan.pages
+    ]
+    for page_number, page_plan in replanned_by_number.items():
+        page = book_page(package, page_number)
+        page.narrative_text = page_plan.narrative_text
+        page.life_phase = page_plan.life_phase
+        page.memory_reference = page_plan.memory_reference
+        if page_number in regenerated:
+            page.image_path = regenerated[page_number]
+            page.generation_attempts += 1
+    
+    save_book(job_id, package)
+    job_store.set_prompts(job_id, [prompt.model_dump() for prompt in stored_prompts.values()])
+    job_store.set_revised_input(job_id, payload.model_dump(mode="json"), profile.model_dump())
+    logger.info(
+        f"[{job_id}] Revised {', '.join(revision.changed_phases)}: re-planned pages {revision.replanned_pages}, "
+        f"regenerated {revision.regenerated_pages} with {revision.model_calls} model calls"
+    )
+    return revision
@@ -6,8 +6,9 @@ Main pipeline orchestration for book generation.
 
 import asyncio
 import os
+import time
 import uuid
-from typing import Optional
+from typing import Any, Awaitable, Callable, Optional
 from logging import Logger
 from datetime import datetime
 
@@ -20,11 +21,11 @@ from models.visual import VisualFingerprint
 from models.planning import NarrativePlan
 from models.prompts import PromptItem
 from models.generation import GenerationResult
-from models.review import IllustrationReviewItem, DesignReview
+from models.review import IllustrationReviewItem, DesignReview, ImageQCResult, StyleConsistency
 from models.output import FinalBookPackage, BookPage
 
 from agents.normalizer import NormalizerAgent
-from agents.narrative_planner import NarrativePlannerAgent
+from agents.narrative_planner import NarrativePlannerAgent, PlanStream
 from agents.visual_analyzer import VisualAnalyzerAgent
 from agents.character_sheet_generator import CharacterSheetGeneratorAgent
 from agents.cover_creator import CoverCreatorAgent
@@ -38,9 +39,22 @@ from agents.iterative_fix import IterativeFixAgent
 
 from clients.gemini_client import GeminiClient
 
+from pipeline.stage_graph import Stage, StageGraph
+from pipeline.speculation import get_speculation_manager
+
 from utils.logging import PipelineLogger
 from utils.config import get_config
 from utils.file_utils import ensure_directory
+from utils.image_precheck import analyze_image, describe_flags, mark_duplicates
+from utils.style_analytics import analyze_book_style
+from utils.reference_cache import (
+    ReferenceCache, reference_digest, entry_key, is_cacheable, FINGERPRINT, CHARACTER_SHEET
+)
+from store.file_storage import STORAGE_DIR
+from utils.job_context import stage_context
+from utils.retry import get_retry_policy, result_failure, SAFETY
+from utils.tracing import span, trace_id_for_job
+from utils import metrics
 
 from prompts.language_utils import resolve_language
 
@@ -77,6 +91,33 @@ class GeminiImageClient:
         await self.gemini.close()
 
 
+class SharedStages:
+    """
+    Style-independent stage results shared by the styles of a multi-style job.
+    
+    Every style runs its own planning stages; the first one to reach a
+    shared stage (normalization, narrative planning, visual analysis)
+    runs it and the others await the same result. With plan streaming,
+    the narrative plan streams to the prompt writers of all styles.
+    """
+    
+    def __init__(self, plan_streaming: bool):
+        self.plan_stream = PlanStream() if plan_streaming else None
+        self._tasks: dict[str, asyncio.Task] = {}
+    
+    async def once(self, name: str, run: Callable[[], Awaitable[Any]]) -> Any:
+        """Result of run(), started by the first caller for this name."""
+        if name not in self._tasks:
+            self._tasks[name] = asyncio.ensure_future(run())
+        # A style that fails must not cancel the stage for the others
+        return await asyncio.shield(self._tasks[name])
+    
+    def cancel(self) -> None:
+        """Cancel shared stages no style is waiting for anymore."""
+        for task in self._tasks.values():
+            task.cancel()
+
+
 class PipelineRunner:
     """
     Main pipeline runner for book generation.
@@ -99,6 +140,23 @@ class PipelineRunner:
         # Initialize image generation client using Gemini
         self.image_client = GeminiImageClient(gemini_client)
         
+        # Critical-path report of the last run (see StageRun.report)
+        self.stage_report = None
+        
+        # Fingerprints and character sheets shared across jobs; off in stub
+        # mode so placeholder results never reach a real job
+        self.reference_cache = None
+        if self.config.reference_cache_enabled and not self.config.is_stub_mode:
+            self.reference_cache = ReferenceCache(
+                self.config.reference_cache_directory or os.path.join(STORAGE_DIR, "cache", "references"),
+                max_entries=self.config.reference_cache_max_entries,
+                max_bytes=self.config.reference_cache_max_mb * 1024 * 1024,
+                ttl_seconds=self.config.reference_cache_ttl_hours * 3600
+            )
+        
+        # Set on runners that fill the reference cache ahead of a job (see pipeline/speculation.py)
+        self.speculative = False
+        
         # Initialize agents
         self._init_agents()
     
@@ -106,6 +164,7 @@ class PipelineRunner:
         """Initialize all agents."""
         self.normalizer = NormalizerAgent(self.gemini, self.logger)
         self.narrative_planner = NarrativePlannerAgent(self.gemini, self.logger)
+        self.narrative_planner.CHUNKED_MIN_PAGES = self.config.chunked_planning_min_pages
         self.visual_analyzer = VisualAnalyzerAgent(self.gemini, self.logger)
         self.character_sheet_generator = CharacterSheetGeneratorAgent(self.gemini, self.logger)
         self.cover_creator = CoverCreatorAgent(self.gemini, self.logger)
@@ -113,6 +172,8 @@ class PipelineRunner:
         self.prompt_writer = PromptWriterAgent(self.gemini, self.logger)
         self.prompt_reviewer = PromptReviewerAgent(self.gemini, self.logger)
         self.illustrator_reviewer = IllustratorReviewerAgent(self.gemini, self.logger)
+        self.illustrator_reviewer.CONTACT_SHEET = self.config.contact_sheet_review_enabled
+        self.illustrator_reviewer.CONTACT_SHEET_PAGES = self.config.contact_sheet_pages
         self.designer_reviewer = DesignerReviewerAgent(self.gemini, self.logger)
         self.image_validator = ImageValidatorAgent(self.gemini, self.logger)
         self.iterative_fix = IterativeFixAgent(self.gemini, self.logger)
@@ -139,105 +200,279 @@ class PipelineRunner:
             FinalBookPackage with the complete book
         """
         job_id = str(uuid.uuid4())
-        pipeline_logger = PipelineLogger(job_id, self.logger)
-        start_time = datetime.now()
-        
-        # Normalize language
-        user_language = resolve_language(user_language)
+        with span(
+            "pipeline.run",
+            trace_id=trace_id_for_job(job_id),
+            job_id=job_id,
+            page_count=preferences.page_count,
+            style=preferences.style
+        ):
+            return await self._run(
+                job_id, user_form, preferences, reference_images, user_language, max_retries
+            )
+    
+    def planning_stages(
+        self,
+        user_form: UserForm,
+        preferences: BookPreferences,
+        reference_images: ReferenceImages,
+        output_dir: str,
+        user_language: str,
+        log: Callable[[str], None],
+        shared: Optional[SharedStages] = None
+    ) -> list[Stage]:
+        """
+        Stages shared by every pipeline, up to the reviewed prompts.
         
-        # Create output directory
-        output_dir = ensure_directory(f"{self.config.output_directory}/{job_id}")
+        Visual analysis does not wait for normalization, the character
+        sheet only waits for the fingerprint, and prompt writing runs
+        while the character sheet is generated. Both the fingerprint and
+        the character sheet come from the reference cache when an earlier
+        job used the same references. With plan streaming,
+        page prompts do not wait for the narrative plan either: they are
+        written as the planner streams each page.
         
-        pipeline_logger.log_progress(f"Starting pipeline (language: {user_language})")
+        For one style of a multi-style job, normalization, planning and
+        visual analysis come from shared; the fingerprint is copied with
+        this style's attributes.
         
-        try:
-            # Phase 1: Normalize user input
-            pipeline_logger.start_step("Normalization")
-            normalized_profile = await self.normalizer.execute((user_form, preferences, user_language))
-            pipeline_logger.end_step("Normalization")
+        Args:
+            user_form: User's form data
+            preferences: Book preferences
+            reference_images: Reference images
+            output_dir: Directory for generated files
+            user_language: Resolved user language
+            log: Progress logger
+            shared: Stages shared with the other styles of the job
             
-            # Phase 2: Parallel planning and visual analysis
-            pipeline_logger.start_step("Planning & Visual Analysis")
-            narrative_plan, visual_fingerprint = await asyncio.gather(
-                self.narrative_planner.execute((normalized_profile, preferences, user_language)),
-                self.visual_analyzer.execute((reference_images, preferences, user_language))
+        Returns:
+            Stages producing reviewed_prompts and reference_paths
+        """
+        async def once(name: str, run: Callable[[], Awaitable[Any]]) -> Any:
+            if shared is None:
+                return await run()
+            return await shared.once(name, run)
+        
+        async def normalized_profile():
+            return await once(
+                "normalized_profile",
+                lambda: self.normalizer.execute((user_form, preferences, user_language))
             )
-            pipeline_logger.end_step("Planning & Visual Analysis")
+        
+        # Streamed pages reach page_prompts before the narrative_plan stage completes
+        if shared is not None:
+            plan_stream = shared.plan_stream
+        else:
+            plan_stream = PlanStream() if self.config.plan_streaming_enabled else None
+        
+        async def narrative_plan(normalized_profile):
+            if plan_stream is not None:
+                return await once(
+                    "narrative_plan",
+                    lambda: self.narrative_planner.execute(
+                        (normalized_profile, preferences, user_language, plan_stream)
+                    )
+                )
+            return await once(
+                "narrative_plan",
+                lambda: self.narrative_planner.execute((normalized_profile, preferences, user_language))
+            )
+        
+        async def reference_cache_keys():
+            return await self._reference_cache_keys(reference_images, preferences, user_language)
+        
+        async def visual_fingerprint(reference_cache_keys):
+            if reference_cache_keys is not None:
+                cached = await asyncio.to_thread(
+                    self.reference_cache.get_fingerprint, reference_cache_keys[FINGERPRINT]
+                )
+                if cached is not None:
+                    log("Visual fingerprint reused from cache")
+                    return cached
+            
+            async def analyse():
+                return preferences.style, await self.visual_analyzer.execute(
+                    (reference_images, preferences, user_language)
+                )
+            
+            analysed_style, fingerprint = await once("visual_fingerprint", analyse)
+            if shared is not None:
+                # The analysis describes the person; only the style attributes differ per style
+                fingerprint = fingerprint.model_copy(deep=True)
+                if analysed_style != preferences.style:
+                    fingerprint.style_attributes = self.visual_analyzer._get_style_attributes(preferences.style)
+            if reference_cache_keys is not None and is_cacheable(reference_images, fingerprint):
+                await self._cache_put(
+                    self.reference_cache.put_fingerprint, reference_cache_keys[FINGERPRINT], fingerprint
+                )
+            return fingerprint
+        
+        async def character_sheet(visual_fingerprint, reference_cache_keys):
+            if reference_cache_keys is not None:
+                cached = await asyncio.to_thread(
+                    self.reference_cache.get_character_sheet,
+                    reference_cache_keys[CHARACTER_SHEET],
+                    os.path.join(output_dir, "character_ref.jpg")
+                )
+                if cached is not None:
+                    log("Character sheet reused from cache")
+                    return cached
             
-            # Phase 2.5: Generate character reference sheet
-            # This creates a visual anchor for maintaining character consistency
-            pipeline_logger.start_step("Character Sheet Generation")
-            character_sheet_path = await self.character_sheet_generator.execute(
+            # Visual anchor for maintaining character consistency
+            sheet = await self.character_sheet_generator.execute(
                 (visual_fingerprint, preferences, reference_images, output_dir, user_language)
             )
-            
-            # Build the consolidated reference images list:
-            # original user photos + character sheet
-            all_reference_images = list(reference_images.paths)
-            if character_sheet_path:
-                all_reference_images.append(character_sheet_path)
-                visual_fingerprint.character_sheet_path = character_sheet_path
-                pipeline_logger.log_progress(f"Character sheet generated: {character_sheet_path}")
+            if sheet and reference_cache_keys is not None and is_cacheable(reference_images, visual_fingerprint):
+                await self._cache_put(
+                    self.reference_cache.put_character_sheet, reference_cache_keys[CHARACTER_SHEET], sheet
+                )
+            return sheet
+        
+        async def reference_paths(visual_fingerprint, character_sheet):
+            # Original user photos + character sheet
+            paths = list(reference_images.paths)
+            if character_sheet:
+                paths.append(character_sheet)
+                visual_fingerprint.character_sheet_path = character_sheet
+                log(f"Character sheet generated: {character_sheet}")
             else:
-                pipeline_logger.log_progress("Character sheet generation skipped or failed - continuing without it")
-            pipeline_logger.end_step("Character Sheet Generation")
-            
-            # Phase 3: Create prompts (parallel)
-            pipeline_logger.start_step("Prompt Creation")
-            cover_prompt, back_cover_prompt, page_prompts = await asyncio.gather(
-                self.cover_creator.execute((narrative_plan.cover, visual_fingerprint, preferences, user_language)),
-                self.back_cover_creator.execute((narrative_plan.back_cover, visual_fingerprint, preferences, user_language)),
-                self.prompt_writer.execute((narrative_plan, visual_fingerprint, preferences, user_language))
+                log("Character sheet generation skipped or failed - continuing without it")
+            return paths
+        
+        async def cover_prompt(narrative_plan, visual_fingerprint):
+            return await self.cover_creator.execute(
+                (narrative_plan.cover, visual_fingerprint, preferences, user_language)
             )
-            pipeline_logger.end_step("Prompt Creation")
-            
-            # Combine all prompts
-            all_prompts = [cover_prompt] + page_prompts + [back_cover_prompt]
-            
-            # Phase 4: Review prompts
-            pipeline_logger.start_step("Prompt Review")
-            reviewed_prompts = await self.prompt_reviewer.execute((all_prompts, user_language))
-            pipeline_logger.end_step("Prompt Review")
-            
-            # Phase 5: Generate images (always pass all reference images)
-            pipeline_logger.start_step("Image Generation")
-            generation_results = await self._generate_all_images(
-                reviewed_prompts,
-                all_reference_images,
-                output_dir
+        
+        async def back_cover_prompt(narrative_plan, visual_fingerprint):
+            return await self.back_cover_creator.execute(
+                (narrative_plan.back_cover, visual_fingerprint, preferences, user_language)
             )
-            pipeline_logger.end_step("Image Generation")
-            
-            # Phase 6: Review illustrations
-            pipeline_logger.start_step("Illustration Review")
-            illustration_reviews = await self.illustrator_reviewer.execute(
-                (generation_results, preferences, user_language)
+        
+        async def page_prompts(visual_fingerprint, narrative_plan=None):
+            plan = plan_stream if plan_stream is not None else narrative_plan
+            return await self.prompt_writer.execute((plan, visual_fingerprint, preferences, user_language))
+        
+        async def reviewed_prompts(cover_prompt, page_prompts, back_cover_prompt):
+            # Reviewed together so the reviewer sees the whole book
+            all_prompts = [cover_prompt] + page_prompts + [back_cover_prompt]
+            return await self.prompt_reviewer.execute((all_prompts, user_language))
+        
+        return [
+            Stage("normalized_profile", normalized_profile),
+            Stage("narrative_plan", narrative_plan, ("normalized_profile",)),
+            Stage("reference_cache_keys", reference_cache_keys),
+            Stage("visual_fingerprint", visual_fingerprint, ("reference_cache_keys",)),
+            Stage("character_sheet", character_sheet, ("visual_fingerprint", "reference_cache_keys")),
+            Stage("reference_paths", reference_paths, ("visual_fingerprint", "character_sheet")),
+            Stage("cover_prompt", cover_prompt, ("narrative_plan", "visual_fingerprint")),
+            Stage("back_cover_prompt", back_cover_prompt, ("narrative_plan", "visual_fingerprint")),
+            Stage(
+                "page_prompts",
+                page_prompts,
+                ("visual_fingerprint",) if plan_stream is not None else ("visual_fingerprint", "narrative_plan")
+            ),
+            Stage("reviewed_prompts", reviewed_prompts, ("cover_prompt", "page_prompts", "back_cover_prompt")),
+        ]
+    
+    async def _reference_cache_keys(
+        self,
+        reference_images: ReferenceImages,
+        preferences: BookPreferences,
+        user_language: str
+    ) -> Optional[dict[str, str]]:
+        """
+        Reference cache keys for the fingerprint and the character sheet.
+        
+        The fingerprint's text is in the user's language; the character
+        sheet only depends on the references and the style. When the
+        references were uploaded ahead of the job and are still being
+        analysed speculatively, this waits for that to finish, so the
+        results are cache hits.
+        
+        Returns:
+            Keys by entry kind, or None when the cache is off or the
+            references cannot be read
+        """
+        if self.reference_cache is None or not reference_images.has_any_reference():
+            return None
+        try:
+            digest = await asyncio.to_thread(reference_digest, reference_images)
+        except OSError as e:
+            self.logger.warning(f"Reference cache skipped: {e}")
+            return None
+        if not self.speculative:
+            await get_speculation_manager().wait_for(digest)
+        return {
+            FINGERPRINT: entry_key(digest, FINGERPRINT, preferences.style, user_language),
+            CHARACTER_SHEET: entry_key(digest, CHARACTER_SHEET, preferences.style),
+        }
+    
+    async def _cache_put(self, put: Callable, key: str, value) -> None:
+        """Store a reference cache entry; a failed write only costs the reuse."""
+        try:
+            await asyncio.to_thread(put, key, value)
+        except OSError as e:
+            self.logger.warning(f"Reference cache write failed: {e}")
+    
+    async def _run(
+        self,
+        job_id: str,
+        user_form: UserForm,
+        preferences: BookPreferences,
+        reference_images: ReferenceImages,
+        user_language: str,
+        max_retries: int
+    ) -> FinalBookPackage:
+        """Run the pipeline stages for a job (see run)."""
+        pipeline_logger = PipelineLogger(job_id, self.logger)
+        start_time = datetime.now()
+        
+        # Normalize language
+        user_language = resolve_language(user_language)
+        
+        # Create output directory
+        output_dir = ensure_directory(f"{self.config.output_directory}/{job_id}")
+        
+        pipeline_logger.log_progress(f"Starting pipeline (language: {user_language})")
+        
+        async def generation_results(reviewed_prompts, reference_paths, visual_fingerprint):
+            # Always pass all reference images
+            return await self._generate_all_images(
+                reviewed_prompts, reference_paths, output_dir, visual_fingerprint, user_language
             )
-            pipeline_logger.end_step("Illustration Review")
-            
-            # Phase 7: Design review
-            pipeline_logger.start_step("Design Review")
-            design_review = await self.designer_reviewer.execute(
-                (generation_results, illustration_reviews, preferences, user_language)
+        
+        async def illustration_reviews(generation_results):
+            return await self.illustrator_reviewer.execute((generation_results, preferences, user_language))
+        
+        async def style_metrics(generation_results, reviewed_prompts):
+            return await self.analyze_style(generation_results, reviewed_prompts)
+        
+        async def design_review(generation_results, illustration_reviews, style_metrics):
+            return await self.designer_reviewer.execute(
+                (
+                    generation_results, illustration_reviews.pages, preferences, user_language,
+                    style_metrics, illustration_reviews.book_assessment
+                )
             )
-            pipeline_logger.end_step("Design Review")
-            
-            # Phase 8: Validation and fixing loop
-            pipeline_logger.start_step("Validation & Fixing")
-            final_results, total_retries = await self._validation_loop(
+        
+        async def validated_results(generation_results, reviewed_prompts, visual_fingerprint, reference_paths,
+                                    design_review):
+            # Validation and fixing loop; regenerated images overwrite the
+            # files the reviewers read, so it runs after the reviews
+            return await self._validation_loop(
                 generation_results,
                 reviewed_prompts,
                 visual_fingerprint,
-                all_reference_images,
+                reference_paths,
                 output_dir,
                 user_language,
                 max_retries
             )
-            pipeline_logger.end_step("Validation & Fixing")
-            
-            # Build final package
-            pipeline_logger.start_step("Package Assembly")
-            final_package = self._build_final_package(
+        
+        async def final_package(validated_results, reviewed_prompts, narrative_plan, visual_fingerprint, design_review):
+            final_results, total_retries = validated_results
+            return self.build_final_package(
                 job_id,
                 preferences,
                 final_results,
@@ -247,13 +482,47 @@ class PipelineRunner:
                 design_review,
                 output_dir,
                 int((datetime.now() - start_time).total_seconds() * 1000),
-                total_retries
+                total_retries,
+                language=user_language
             )
-            pipeline_logger.end_step("Package Assembly")
+        
+        graph = StageGraph(
+            self.planning_stages(
+                user_form, preferences, reference_images, output_dir, user_language, pipeline_logger.log_progress
+            ) + [
+                Stage(
+                    "generation_results",
+                    generation_results,
+                    ("reviewed_prompts", "reference_paths", "visual_fingerprint")
+                ),
+                Stage("illustration_reviews", illustration_reviews, ("generation_results",)),
+                Stage("style_metrics", style_metrics, ("generation_results", "reviewed_prompts")),
+                Stage(
+                    "design_review",
+                    design_review,
+                    ("generation_results", "illustration_reviews", "style_metrics")
+                ),
+                Stage(
+                    "validated_results",
+                    validated_results,
+                    ("generation_results", "reviewed_prompts", "visual_fingerprint", "reference_paths", "design_review")
+                ),
+                Stage(
+                    "final_package",
+                    final_package,
+                    ("validated_results", "reviewed_prompts", "narrative_plan", "visual_fingerprint", "design_review")
+                ),
+            ]
+        )
+        
+        try:
+            stage_run = await graph.run(on_start=pipeline_logger.start_step, on_finish=pipeline_logger.end_step)
+            self.stage_report = stage_run.report()
             
+            pipeline_logger.log_progress(stage_run.describe())
             pipeline_logger.log_progress(f"Pipeline completed in {pipeline_logger.get_total_time():.2f}s")
             
-            return final_package
+            return stage_run["final_package"]
             
         except Exception as e:
             pipeline_logger.log_error(f"Pipeline failed: {str(e)}")
@@ -266,16 +535,21 @@ class PipelineRunner:
         self,
         prompts: list[PromptItem],
         reference_images: list[str],
-        output_dir: str
+        output_dir: str,
+        fingerprint: VisualFingerprint,
+        user_language: str
     ) -> list[GenerationResult]:
         """Generate all images from prompts with retry on failure.
         
         Always passes reference images (user photos + character sheet) to ensure
-        character consistency across all pages.
+        character consistency across all pages. Pages refused by safety
+        filters are repaired instead of retried; the repaired prompt
+        replaces the refused one in prompts, for validation and storage.
         """
         
-        async def generate_single(prompt: PromptItem) -> GenerationResult:
-            """Generate a single image with up to 3 retries."""
+        async def generate_single(index: int) -> GenerationResult:
+            """Generate a single image, retrying throttled and transient failures."""
+            prompt = prompts[index]
             if prompt.prompt_type == "cover":
                 filename = "cover.jpg"
             elif prompt.prompt_type == "back_cover":
@@ -289,39 +563,198 @@ class PipelineRunner:
             # Only skip for back cover which typically doesn't feature the character
             refs = reference_images if (reference_images and prompt.prompt_type != "back_cover") else None
             
-            max_attempts = 3
-            for attempt in range(max_attempts):
-                result = await self.image_client.generate_image(
-                    prompt=prompt.get_full_prompt(),
-                    reference_images=refs,
-                    render_params=prompt.render_params.model_dump(),
-                    output_path=output_path
-                )
-                
-                if result.success:
-                    return result
-                
-                if attempt < max_attempts - 1:
-                    self.logger.warning(
-                        f"Image generation failed for {filename} (attempt {attempt + 1}), retrying..."
+            async def attempt_generation(attempt: int) -> GenerationResult:
+                with span("image.generate", page=prompt.page_number, attempt=attempt):
+                    return await self.image_client.generate_image(
+                        prompt=prompt.get_full_prompt(),
+                        reference_images=refs,
+                        render_params=prompt.render_params.model_dump(),
+                        output_path=output_path
                     )
-                    await asyncio.sleep(1)  # Brief delay before retry
             
-            # Return last failed result
+            # Returns the last failed result when retries are exhausted
+            with stage_context("image_generation"):
+                result = await get_retry_policy().run(
+                    attempt_generation,
+                    classify_result=result_failure,
+                    description=f"image generation for {filename}"
+                )
+            
+            if result.error_class == SAFETY:
+                result, prompts[index] = await self.repair_refused_image(
+                    prompt, result, fingerprint, refs, output_path, user_language
+                )
             return result
         
         # Generate images with limited concurrency (2 at a time to avoid API limits)
         semaphore = asyncio.Semaphore(2)
         
-        async def generate_with_limit(prompt: PromptItem) -> GenerationResult:
+        async def generate_with_limit(index: int) -> GenerationResult:
             async with semaphore:
-                return await generate_single(prompt)
+                return await generate_single(index)
+        
+        results = list(await asyncio.gather(
+            *[generate_with_limit(index) for index in range(len(prompts))]
+        ))
+        
+        await self.precheck_images(results, prompts)
+        return results
+    
+    async def precheck_images(self, results: list[GenerationResult], prompts: list[PromptItem]) -> None:
+        """
+        Attach local pre-check signals to images that have none yet.
+        
+        Near-duplicates are re-marked across all pages each time, so this
+        runs again after regeneration. Stub placeholders are skipped.
+        """
+        if not self.config.image_precheck_enabled:
+            return
+        
+        pending = [
+            (result, prompt) for result, prompt in zip(results, prompts)
+            if result.has_image and result.image_path and result.signals is None
+            and not result.metadata.parameters.get("stub")
+        ]
         
-        results = await asyncio.gather(
-            *[generate_with_limit(prompt) for prompt in prompts]
+        def analyze():
+            for result, prompt in pending:
+                cpu_started = time.thread_time()
+                result.signals = analyze_image(
+                    result.image_path, prompt.render_params.width / prompt.render_params.height
+                )
+                metrics.IMAGE_PROCESSING.observe(time.thread_time() - cpu_started, operation="precheck")
+            mark_duplicates(results, [prompt.page_number for prompt in prompts], self.config.image_duplicate_distance)
+        
+        with span("image.precheck", images=len(pending)):
+            await asyncio.to_thread(analyze)
+    
+    async def analyze_style(
+        self,
+        results: list[GenerationResult],
+        prompts: list[PromptItem]
+    ) -> Optional[StyleConsistency]:
+        """
+        Measure style consistency across the interior pages' images.
+        
+        Covers are left out: they are meant to look different.
+        """
+        if not self.config.style_analytics_enabled:
+            return None
+        
+        pages = [(result, prompt) for result, prompt in zip(results, prompts) if prompt.prompt_type == "page"]
+        with span("image.style_analytics", images=len(pages)):
+            return await asyncio.to_thread(
+                analyze_book_style,
+                [result for result, _ in pages],
+                [prompt.page_number for _, prompt in pages]
+            )
+    
+    async def repair_refused_image(
+        self,
+        prompt: PromptItem,
+        refused: GenerationResult,
+        fingerprint: VisualFingerprint,
+        reference_images: Optional[list[str]],
+        output_path: str,
+        user_language: str
+    ) -> tuple[GenerationResult, PromptItem]:
+        """
+        Rewrite a prompt the image model refused and generate it once more.
+        
+        The refusal reason is handed to IterativeFixAgent as the QC issue,
+        skipping validation of an image that does not exist and retries of
+        a prompt that would be refused again.
+        
+        Returns:
+            (new GenerationResult, repaired PromptItem)
+        """
+        qc_result = ImageQCResult(
+            page_number=prompt.page_number,
+            image_path="",
+            passed=False,
+            issues_found=[refused.error_message or "Image model refused the prompt"],
+            suggestions=[
+                "Rephrase anything that could be read as violent, sexual, medical or "
+                "otherwise sensitive, keeping the scene and emotional intent",
+                "Describe people in neutral, wholesome terms",
+            ],
+            requires_regeneration=True
         )
+        self.logger.info(f"Page {prompt.page_number} refused by the image model; repairing prompt")
+        
+        with stage_context("refusal_repair"):
+            result, fixed_prompt = await self._repair_and_generate(
+                prompt, qc_result, fingerprint, reference_images, output_path, user_language, refusal=True
+            )
+        
+        metrics.REFUSAL_REPAIRS.inc(
+            outcome="repaired" if result.success else ("refused_again" if result.error_class == SAFETY else "failed")
+        )
+        return result, fixed_prompt
+    
+    async def repair_rejected_image(
+        self,
+        prompt: PromptItem,
+        rejected: GenerationResult,
+        fingerprint: VisualFingerprint,
+        reference_images: Optional[list[str]],
+        user_language: str
+    ) -> tuple[GenerationResult, PromptItem]:
+        """
+        Repair the prompt of an image the local pre-check rejected and generate it once more.
+        
+        For paths that do not run ImageValidatorAgent (which rejects these
+        images itself): the pre-check issues are handed to
+        IterativeFixAgent as the QC issues, without a vision call.
+        
+        Returns:
+            (new GenerationResult, repaired PromptItem)
+        """
+        issues = describe_flags(rejected.signals)
+        for flag in rejected.signals.flags:
+            metrics.IMAGE_PRECHECK_REJECTIONS.inc(reason=flag)
+        qc_result = ImageQCResult(
+            page_number=prompt.page_number,
+            image_path=rejected.image_path or "",
+            passed=False,
+            issues_found=issues,
+            requires_regeneration=True
+        )
+        self.logger.info(f"Page {prompt.page_number} rejected by pre-check: {'; '.join(issues)}")
+        
+        with stage_context("image_regeneration"):
+            return await self._repair_and_generate(
+                prompt, qc_result, fingerprint, reference_images, rejected.image_path, user_language
+            )
+    
+    async def _repair_and_generate(
+        self,
+        prompt: PromptItem,
+        qc_result: ImageQCResult,
+        fingerprint: VisualFingerprint,
+        reference_images: Optional[list[str]],
+        output_path: str,
+        user_language: str,
+        refusal: bool = False
+    ) -> tuple[GenerationResult, PromptItem]:
+        """Fix a prompt for its QC issues and generate its image with the retry policy."""
+        fixed_prompt = await self.iterative_fix.execute((prompt, qc_result, fingerprint, user_language))
+        
+        async def attempt_generation(attempt: int) -> GenerationResult:
+            with span("image.regenerate", page=prompt.page_number, attempt=attempt, refusal=refusal):
+                return await self.image_client.generate_image(
+                    prompt=fixed_prompt.get_full_prompt(),
+                    reference_images=reference_images,
+                    render_params=fixed_prompt.render_params.model_dump(),
+                    output_path=output_path
+                )
         
-        return list(results)
+        result = await get_retry_policy().run(
+            attempt_generation,
+            classify_result=result_failure,
+            description=f"repaired image generation for page {prompt.page_number}"
+        )
+        return result, fixed_prompt
     
     async def _validation_loop(
         self,
@@ -342,7 +775,8 @@ class PipelineRunner:
             validation_results = []
             for i, result in enumerate(final_results):
                 page_num = prompts[i].page_number
-                qc_result = await self.image_validator.execute((result, fingerprint, page_num, user_language))
+                with span("image.validate", page=page_num, validation_round=retry + 1):
+                    qc_result = await self.image_validator.execute((result, fingerprint, page_num, user_language))
                 validation_results.append(qc_result)
             
             # Find images that need regeneration
@@ -371,27 +805,44 @@ class PipelineRunner:
                 
                 output_path = f"{output_dir}/{filename}"
                 
-                new_result = await self.image_client.generate_image(
-                    prompt=fixed_prompt.get_full_prompt(),
-                    reference_images=reference_images,
-                    render_params=fixed_prompt.render_params.model_dump(),
-                    output_path=output_path
-                )
+                with stage_context("image_regeneration"), span(
+                    "image.regenerate", page=fixed_prompt.page_number, validation_round=retry + 1
+                ):
+                    new_result = await self.image_client.generate_image(
+                        prompt=fixed_prompt.get_full_prompt(),
+                        reference_images=reference_images,
+                        render_params=fixed_prompt.render_params.model_dump(),
+                        output_path=output_path
+                    )
+                metrics.record_retry("validation_failed", stage="image_regeneration")
                 
                 final_results[idx] = new_result
                 total_retries += 1
+            
+            await self.precheck_images(final_results, prompts)
         
         return final_results, total_retries
     
     @staticmethod
-    def _to_relative_path(image_path: str) -> str:
-        """Convert an absolute image path to just the filename."""
+    def to_relative_path(image_path: str, subdirectory: Optional[str] = None) -> str:
+        """Convert an absolute image path to just the filename (under subdirectory, if given)."""
         if not image_path:
             return ""
         # Handle both Windows (\\) and Unix (/) paths
-        return image_path.replace("\\", "/").split("/")[-1]
+        filename = image_path.replace("\\", "/").split("/")[-1]
+        return f"{subdirectory}/{filename}" if subdirectory else filename
     
-    def _build_final_package(
+    @staticmethod
+    def upload_image(book_id: str, filename: str, local_path: str, page_number: int) -> Optional[str]:
+        """Upload a generated image to public storage inside a trace span."""
+        from store.file_storage import upload_output_image
+        
+        with span("storage.upload", page=page_number, filename=filename) as upload_span:
+            url = upload_output_image(book_id, filename, local_path)
+            upload_span.set_attribute("uploaded", url is not None)
+            return url
+    
+    def build_final_package(
         self,
         book_id: str,
         preferences: BookPreferences,
@@ -402,9 +853,16 @@ class PipelineRunner:
         design_review: DesignReview,
         output_dir: str,
         total_time_ms: int,
-        total_retries: int
+        total_retries: int,
+        subdirectory: Optional[str] = None,
+        language: Optional[str] = None
     ) -> FinalBookPackage:
-        """Build the final book package."""
+        """
+        Build the final book package.
+        
+        Image paths are relative to the job's outputs directory; the images
+        of a multi-style job are in a subdirectory per style.
+        """
         # Find cover, back cover, and pages
         cover_result = None
         back_cover_result = None
@@ -423,11 +881,10 @@ class PipelineRunner:
         
         # Create BookPage objects (using relative filenames, not absolute paths)
         # Also embed base64 image data so images survive Cloud Run restarts
-        cover_image_path = self._to_relative_path(cover_result[0].image_path or "")
+        cover_image_path = self.to_relative_path(cover_result[0].image_path or "", subdirectory)
         cover_public_url = None
         if cover_result and cover_result[0].image_path:
-            from store.file_storage import upload_output_image
-            cover_public_url = upload_output_image(book_id, cover_image_path, cover_result[0].image_path)
+            cover_public_url = self.upload_image(book_id, cover_image_path, cover_result[0].image_path, 0)
 
         cover_page = BookPage(
             page_number=0,
@@ -436,11 +893,12 @@ class PipelineRunner:
             generation_attempts=cover_result[0].metadata.retry_count + 1
         ) if cover_result else None
         
-        back_cover_image_path = self._to_relative_path(back_cover_result[0].image_path or "")
+        back_cover_image_path = self.to_relative_path(back_cover_result[0].image_path or "", subdirectory)
         back_cover_public_url = None
         if back_cover_result and back_cover_result[0].image_path:
-            from store.file_storage import upload_output_image
-            back_cover_public_url = upload_output_image(book_id, back_cover_image_path, back_cover_result[0].image_path)
+            back_cover_public_url = self.upload_image(
+                book_id, back_cover_image_path, back_cover_result[0].image_path, -1
+            )
 
         back_cover_page = BookPage(
             page_number=-1,
@@ -457,11 +915,10 @@ class PipelineRunner:
                 None
             )
             
-            page_image_path = self._to_relative_path(result.image_path or "")
+            page_image_path = self.to_relative_path(result.image_path or "", subdirectory)
             page_public_url = None
             if result.image_path:
-                from store.file_storage import upload_output_image
-                page_public_url = upload_output_image(book_id, page_image_path, result.image_path)
+                page_public_url = self.upload_image(book_id, page_image_path, result.image_path, prompt.page_number)
 
             content_pages.append(BookPage(
                 page_number=prompt.page_number,
@@ -477,6 +934,7 @@ class PipelineRunner:
             book_id=book_id,
             title=preferences.title,
             style=preferences.style,
+            language=language,
             cover=cover_page,
             back_cover=back_cover_page,
             pages=content_pages,
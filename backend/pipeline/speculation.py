@@ -0,0 +1,276 @@
+"""
+Reference Speculation
+
+Users upload reference photos in the wizard minutes before they finish
+their memories. POST /references saves the photos under a session token
+and, given a style, starts visual analysis and (optionally) the
+character sheet right away as a low-priority background task.
+
+The results go into the reference cache (utils/reference_cache.py),
+which is keyed by photo content. A job submitted later with the token
+gets the session's photos and finds the fingerprint and character sheet
+there, so it skips both stages, also when it runs in a worker process.
+A job that starts while the speculation for its photos is still running
+in this process waits for it instead of repeating the work.
+
+Sessions not adopted within REFERENCE_SESSION_TTL_MINUTES expire: their
+speculation is cancelled and their uploads are deleted.
+"""
+
+import asyncio
+import logging
+import os
+import secrets
+import shutil
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import sys
+sys.path.append('..')
+
+from models.job_payload import PhysicalCharacteristicsRequest
+from models.user_input import BookPreferences, ReferenceImages, UserForm
+from pipeline.stage_graph import StageGraph
+from utils.config import get_config
+from utils.job_context import job_context, PRIORITY_LOW
+from utils.reference_cache import reference_digest
+from utils.tracing import span
+from utils import metrics
+from prompts.language_utils import resolve_language
+from store.file_storage import (
+    STORAGE_DIR,
+    save_session_files,
+    copy_references_to_job,
+    cleanup_session_storage,
+)
+
+logger = logging.getLogger("memorybook")
+
+# Planning stages run ahead of the job; the character sheet is optional
+SPECULATIVE_STAGES = ("reference_cache_keys", "visual_fingerprint", "character_sheet")
+
+
+@dataclass
+class ReferenceSession:
+    """Reference photos uploaded ahead of a job."""
+    token: str
+    reference_images: ReferenceImages
+    expires_at: float
+    digest: Optional[str] = None
+    task: Optional[asyncio.Task] = None
+    
+    @property
+    def speculating(self) -> bool:
+        """Whether the speculative analysis is still running."""
+        return self.task is not None and not self.task.done()
+
+
+class SpeculationManager:
+    """
+    Reference upload sessions and their speculative analysis.
+    
+    Per process: sessions live in the API process that created them.
+    """
+    
+    def __init__(self, ttl_seconds: float, wait_seconds: float, enabled: bool = True):
+        """
+        Args:
+            ttl_seconds: Lifetime of a session that is not adopted
+            wait_seconds: How long a job waits for speculation on its photos
+            enabled: Start speculative analysis for new sessions
+        """
+        self.ttl_seconds = ttl_seconds
+        self.wait_seconds = wait_seconds
+        self.enabled = enabled
+        self._sessions: Dict[str, ReferenceSession] = {}
+        # Running speculation by reference digest, for jobs to wait on
+        self._in_flight: Dict[str, asyncio.Task] = {}
+    
+    async def create(
+        self,
+        files: List[Tuple[bytes, str]],
+        style: Optional[str] = None,
+        user_language: Optional[str] = None,
+        physical_characteristics: Optional[PhysicalCharacteristicsRequest] = None,
+        character_sheet: bool = True
+    ) -> ReferenceSession:
+        """
+        Save uploaded photos as a new session and start speculation.
+        
+        Speculation needs the style (fingerprints and character sheets
+        are style specific) and a usable reference cache to hand results
+        to the job; without either the session only holds the photos.
+        
+        Args:
+            files: List of (content, filename) tuples
+            style: Book style, if already chosen
+            user_language: User's language
+            physical_characteristics: Characteristics typed into the form
+            character_sheet: Also generate the character sheet
+        
+        Raises:
+            ValueError: If the style is not a valid book style
+        """
+        from pipeline.job_processor import build_reference_images
+        
+        await self.sweep()
+        preferences = None
+        if style:
+            # Only the style matters to the speculative stages
+            preferences = BookPreferences(title="Reference session", date="-", style=style)
+        
+        token = secrets.token_urlsafe(24)
+        paths = await asyncio.to_thread(save_session_files, token, files)
+        session = ReferenceSession(
+            token=token,
+            reference_images=build_reference_images(paths, physical_characteristics, "photos"),
+            expires_at=time.time() + self.ttl_seconds
+        )
+        self._sessions[token] = session
+        
+        config = get_config()
+        if preferences is not None and self.enabled and config.reference_cache_enabled and not config.is_stub_mode:
+            session.digest = await asyncio.to_thread(reference_digest, session.reference_images)
+            stages = SPECULATIVE_STAGES if character_sheet else SPECULATIVE_STAGES[:2]
+            session.task = asyncio.create_task(
+                self._speculate(session, preferences, resolve_language(user_language or "en-US"), stages)
+            )
+            self._in_flight[session.digest] = session.task
+            session.task.add_done_callback(lambda task: self._finished(session, task))
+            metrics.SPECULATIONS.inc(outcome="started")
+        
+        logger.info(f"Reference session created: {len(paths)} photos (speculating: {session.speculating})")
+        return session
+    
+    async def _speculate(
+        self,
+        session: ReferenceSession,
+        preferences: BookPreferences,
+        user_language: str,
+        stage_names: Tuple[str, ...]
+    ) -> None:
+        """Run the reference stages of the pipeline, filling the reference cache."""
+        from clients.gemini_client import GeminiClient
+        from pipeline.runner import PipelineRunner
+        
+        config = get_config()
+        with job_context(priority=PRIORITY_LOW):
+            with span("speculation.references", images=len(session.reference_images.paths), style=preferences.style):
+                runner = PipelineRunner(GeminiClient(api_key=config.google_api_key, model=config.gemini_model), logger)
+                runner.speculative = True
+                output_dir = os.path.join(STORAGE_DIR, "sessions", session.token, "outputs")
+                os.makedirs(output_dir, exist_ok=True)
+                stages = [
+                    stage
+                    for stage in runner.planning_stages(
+                        UserForm(),
+                        preferences,
+                        session.reference_images,
+                        output_dir,
+                        user_language,
+                        lambda message: logger.info(f"[speculation] {message}")
+                    )
+                    if stage.name in stage_names
+                ]
+                try:
+                    await StageGraph(stages).run()
+                finally:
+                    await runner.image_client.close()
+    
+    def _finished(self, session: ReferenceSession, task: asyncio.Task) -> None:
+        if self._in_flight.get(session.digest) is task:
+            del self._in_flight[session.digest]
+        if task.cancelled():
+            outcome = "cancelled"
+        elif task.exception() is not None:
+            outcome = "failed"
+            logger.warning(f"Reference speculation failed: {task.exception()}")
+        else:
+            outcome = "completed"
+        metrics.SPECULATIONS.inc(outcome=outcome)
+    
+    async def wait_for(self, digest: str) -> None:
+        """
+        Wait (bounded) for running speculation on references with this digest.
+        
+        Never raises and never cancels the speculation; after it the
+        results, if any, are in the reference cache.
+        """
+        task = self._in_flight.get(digest)
+        if task is None:
+            return
+        with span("speculation.wait"):
+            await asyncio.wait({task}, timeout=self.wait_seconds)
+    
+    async def adopt(self, token: str, job_id: str) -> Optional[List[str]]:
+        """
+        Hand a session's photos to a job.
+        
+        Args:
+            token: Session token
+            job_id: Job adopting the session
+        
+        Returns:
+            The job's copies of the photos, or None for an unknown or
+            expired token
+        """
+        await self.sweep()
+        session = self._sessions.pop(token, None)
+        if session is None:
+            return None
+        paths = await asyncio.to_thread(copy_references_to_job, job_id, session.reference_images.paths)
+        metrics.SPECULATIONS.inc(outcome="adopted")
+        self._release(session)
+        return paths
+    
+    def _release(self, session: ReferenceSession) -> None:
+        """Delete a session's files once its speculation is done with them."""
+        if session.speculating:
+            session.task.add_done_callback(lambda _: cleanup_session_storage(session.token))
+        else:
+            cleanup_session_storage(session.token)
+    
+    async def sweep(self) -> None:
+        """Expire sessions past their TTL, and session files left by a previous process."""
+        now = time.time()
+        for token, session in list(self._sessions.items()):
+            if session.expires_at <= now:
+                del self._sessions[token]
+                if session.speculating:
+                    session.task.cancel()
+                metrics.SPECULATIONS.inc(outcome="expired")
+                self._release(session)
+        await asyncio.to_thread(self._remove_orphans, now)
+    
+    def _remove_orphans(self, now: float) -> None:
+        sessions_dir = os.path.join(STORAGE_DIR, "sessions")
+        if not os.path.isdir(sessions_dir):
+            return
+        for token in os.listdir(sessions_dir):
+            path = os.path.join(sessions_dir, token)
+            if token in self._sessions:
+                continue
+            try:
+                expired = now - os.stat(path).st_mtime > self.ttl_seconds
+            except FileNotFoundError:
+                continue
+            if expired:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+# Global speculation manager instance
+_speculation_manager: Optional[SpeculationManager] = None
+
+
+def get_speculation_manager() -> SpeculationManager:
+    """Get the process-wide speculation manager configured from the app config."""
+    global _speculation_manager
+    if _speculation_manager is None:
+        config = get_config()
+        _speculation_manager = SpeculationManager(
+            ttl_seconds=config.reference_session_ttl_minutes * 60,
+            wait_seconds=config.speculation_wait_seconds,
+            enabled=config.reference_speculation_enabled
+        )
+    return _speculation_manager
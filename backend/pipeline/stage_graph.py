@@ -0,0 +1,247 @@
+"""
+Stage Graph
+
+Dependency-driven executor for pipeline stages.
+
+Each stage names the values it consumes; a stage's own name is the
+value it produces. Instead of running fixed phases, the graph starts
+every stage the moment all of its inputs have resolved, and records
+when each stage ran so a run can report its critical path - the chain
+of stages that bounds total latency.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import sys
+sys.path.append('..')
+
+from utils.tracing import span
+
+
+@dataclass(frozen=True)
+class Stage:
+    """A pipeline stage and the values it depends on."""
+    name: str
+    run: Callable[..., Awaitable[Any]]
+    requires: Tuple[str, ...] = ()
+
+
+@dataclass
+class StageTiming:
+    """When a stage ran, in event loop time."""
+    name: str
+    requires: Tuple[str, ...]
+    started: float
+    finished: float
+    
+    @property
+    def duration(self) -> float:
+        return self.finished - self.started
+
+
+class StageRun:
+    """Values and timings of one graph execution."""
+    
+    def __init__(self, values: Dict[str, Any], timings: Dict[str, StageTiming], started: float, finished: float):
+        self.values = values
+        self.timings = timings
+        self.started = started
+        self.finished = finished
+    
+    def __getitem__(self, name: str) -> Any:
+        return self.values[name]
+    
+    def critical_path(self) -> List[str]:
+        """
+        Stages on the longest dependency chain, first to last.
+        
+        Starting from the stage that finished last, repeatedly step to
+        the dependency that finished last (the one the stage waited for).
+        """
+        if not self.timings:
+            return []
+        
+        path = []
+        current: Optional[StageTiming] = max(self.timings.values(), key=lambda t: t.finished)
+        while current is not None:
+            path.append(current.name)
+            parents = [self.timings[name] for name in current.requires if name in self.timings]
+            current = max(parents, key=lambda t: t.finished) if parents else None
+        return list(reversed(path))
+    
+    def slack(self) -> Dict[str, float]:
+        """
+        Seconds each stage could have been delayed without delaying the run.
+        
+        Critical stages have (close to) zero slack.
+        """
+        successors: Dict[str, List[str]] = {name: [] for name in self.timings}
+        for timing in self.timings.values():
+            for name in timing.requires:
+                if name in successors:
+                    successors[name].append(timing.name)
+        
+        latest_finish: Dict[str, float] = {}
+        
+        def visit(name: str) -> float:
+            if name not in latest_finish:
+                latest_finish[name] = min(
+                    (visit(child) - self.timings[child].duration for child in successors[name]),
+                    default=self.finished
+                )
+            return latest_finish[name]
+        
+        return {name: max(0.0, visit(name) - timing.finished) for name, timing in self.timings.items()}
+    
+    def report(self) -> Dict[str, Any]:
+        """
+        Critical-path report with offsets in milliseconds from the run start.
+        
+        Returns:
+            Dict with total_ms, critical_path and per-stage timings
+        """
+        def ms(seconds: float) -> float:
+            return round(seconds * 1000, 1)
+        
+        slack = self.slack()
+        ordered = sorted(self.timings.values(), key=lambda t: t.started)
+        return {
+            "total_ms": ms(self.finished - self.started),
+            "critical_path": [
+                {
+                    "stage": name,
+                    "start_ms": ms(self.timings[name].started - self.started),
+                    "duration_ms": ms(self.timings[name].duration),
+                }
+                for name in self.critical_path()
+            ],
+            "stages": [
+                {
+                    "stage": t.name,
+                    "requires": list(t.requires),
+                    "start_ms": ms(t.started - self.started),
+                    "duration_ms": ms(t.duration),
+                    "slack_ms": ms(slack[t.name]),
+                }
+                for t in ordered
+            ],
+        }
+    
+    def describe(self) -> str:
+        """One-line summary of the critical path for logs."""
+        steps = " -> ".join(
+            f"{name} {self.timings[name].duration:.2f}s" for name in self.critical_path()
+        )
+        return f"critical path ({self.finished - self.started:.2f}s): {steps}"
+
+
+class StageGraph:
+    """
+    Runs stages as soon as their dependencies resolve.
+    
+    Dependencies are either other stages or named inputs passed to run().
+    If a stage fails, the remaining stages are cancelled and the error
+    propagates.
+    """
+    
+    def __init__(self, stages: List[Stage], inputs: Tuple[str, ...] = ()):
+        """
+        Initialize and validate the graph.
+        
+        Args:
+            stages: Stages of the graph
+            inputs: Names of values supplied to run()
+        
+        Raises:
+            ValueError: On duplicate names, unknown dependencies or cycles
+        """
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            if stage.name in self.stages or stage.name in inputs:
+                raise ValueError(f"Duplicate stage name: {stage.name}")
+            self.stages[stage.name] = stage
+        self.inputs = tuple(inputs)
+        
+        for stage in stages:
+            unknown = [name for name in stage.requires if name not in self.stages and name not in self.inputs]
+            if unknown:
+                raise ValueError(f"Stage {stage.name} requires unknown values: {', '.join(unknown)}")
+        
+        self.order = self._topological_order()
+    
+    def _topological_order(self) -> List[str]:
+        """Order stages so every stage follows its dependencies."""
+        order: List[str] = []
+        state: Dict[str, str] = {}
+        
+        def visit(name: str, chain: Tuple[str, ...]) -> None:
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Stage dependency cycle: {' -> '.join(chain + (name,))}")
+            state[name] = "visiting"
+            for dependency in self.stages[name].requires:
+                if dependency in self.stages:
+                    visit(dependency, chain + (name,))
+            state[name] = "done"
+            order.append(name)
+        
+        for name in self.stages:
+            visit(name, ())
+        return order
+    
+    async def run(
+        self,
+        inputs: Optional[Dict[str, Any]] = None,
+        on_start: Optional[Callable[[str], None]] = None,
+        on_finish: Optional[Callable[[str], None]] = None
+    ) -> StageRun:
+        """
+        Execute the graph.
+        
+        Args:
+            inputs: Values for the graph's declared inputs
+            on_start: Called with the stage name when a stage starts
+            on_finish: Called with the stage name when a stage completes
+        
+        Returns:
+            StageRun with every stage's value and timing
+        """
+        values: Dict[str, Any] = dict(inputs or {})
+        missing = [name for name in self.inputs if name not in values]
+        if missing:
+            raise ValueError(f"Missing graph inputs: {', '.join(missing)}")
+        
+        loop = asyncio.get_running_loop()
+        timings: Dict[str, StageTiming] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+        
+        async def execute(stage: Stage) -> None:
+            dependencies = [tasks[name] for name in stage.requires if name in tasks]
+            if dependencies:
+                await asyncio.gather(*dependencies)
+            
+            started = loop.time()
+            if on_start:
+                on_start(stage.name)
+            with span(f"stage.{stage.name}"):
+                values[stage.name] = await stage.run(**{name: values[name] for name in stage.requires})
+            timings[stage.name] = StageTiming(stage.name, stage.requires, started, loop.time())
+            if on_finish:
+                on_finish(stage.name)
+        
+        started = loop.time()
+        for name in self.order:
+            tasks[name] = asyncio.create_task(execute(self.stages[name]))
+        
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        
+        return StageRun(values, timings, started, loop.time())
@@ -17,6 +17,7 @@ from .master_prompts import (
     DESIGNER_REVIEWER_PROMPT,
     IMAGE_VALIDATOR_PROMPT,
     ITERATIVE_FIX_PROMPT,
+    EDITION_TRANSLATOR_PROMPT,
 )
 from .language_utils import resolve_language, get_language_instruction
 
@@ -33,6 +34,7 @@ __all__ = [
     "DESIGNER_REVIEWER_PROMPT",
     "IMAGE_VALIDATOR_PROMPT",
     "ITERATIVE_FIX_PROMPT",
+    "EDITION_TRANSLATOR_PROMPT",
     "resolve_language",
     "get_language_instruction",
 ]
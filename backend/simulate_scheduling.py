@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Simulate Scheduling
+
+Stub-mode simulation of the call scheduler. A stream of books with
+mixed priorities and deadlines, plus interactive /enhance-text calls,
+is pushed through CallScheduler with simulated model latencies. No
+API calls are made.
+
+The same workload runs twice: once with priorities, deadlines and the
+interactive reservation ignored (FIFO baseline), and once scheduled.
+The report shows deadline hit rate per priority and interactive
+latency for both runs.
+
+Usage:
+    cd backend
+    python simulate_scheduling.py --books 40 --time-scale 0.002
+"""
+
+import sys
+import time
+import random
+import asyncio
+import argparse
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from statistics import median
+from typing import Dict, List, Optional
+
+from clients.call_scheduler import CallScheduler, KIND_TEXT, KIND_IMAGE
+from utils.job_context import (
+    job_context,
+    PRIORITY_HIGH,
+    PRIORITY_NORMAL,
+    PRIORITY_LOW,
+    PRIORITY_INTERACTIVE,
+)
+
+
+# Simulated model latencies in seconds (mean, jitter)
+TEXT_LATENCY = (2.0, 0.8)
+IMAGE_LATENCY = (8.0, 3.0)
+ENHANCE_LATENCY = (1.5, 0.5)
+
+# Deadline budget per priority, in seconds after submission
+DEADLINE_BUDGET = {
+    PRIORITY_HIGH: 240.0,
+    PRIORITY_NORMAL: 600.0,
+    PRIORITY_LOW: None,
+}
+
+
+@dataclass
+class SimulatedBook:
+    """A book job in the simulated workload."""
+    index: int
+    arrival: float
+    priority: str
+    page_count: int
+    deadline_budget: Optional[float]
+
+
+def build_workload(books: int, arrival_gap: float, seed: int) -> List[SimulatedBook]:
+    """Create a reproducible stream of book jobs."""
+    rng = random.Random(seed)
+    workload = []
+    arrival = 0.0
+    for index in range(books):
+        priority = rng.choices(
+            [PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW],
+            weights=[2, 5, 3]
+        )[0]
+        workload.append(SimulatedBook(
+            index=index,
+            arrival=arrival,
+            priority=priority,
+            page_count=rng.choice([10, 15, 20]),
+            deadline_budget=DEADLINE_BUDGET[priority]
+        ))
+        arrival += rng.expovariate(1.0 / arrival_gap)
+    return workload
+
+
+class Simulation:
+    """Runs a workload through one scheduler configuration."""
+    
+    def __init__(self, scheduled: bool, scale: float, text_slots: int, image_slots: int, seed: int):
+        self.scheduled = scheduled
+        self.scale = scale
+        self.rng = random.Random(seed)
+        self.scheduler = CallScheduler(
+            limits={KIND_TEXT: text_slots, KIND_IMAGE: image_slots},
+            reserved={KIND_TEXT: 1} if scheduled else None
+        )
+        self.start = 0.0
+        self.finish_times: Dict[int, float] = {}
+        self.interactive_latencies: List[float] = []
+    
+    def now(self) -> float:
+        """Simulated seconds since the start of the run."""
+        return (time.monotonic() - self.start) / self.scale
+    
+    async def call(self, kind: str, latency: tuple) -> None:
+        """One simulated model call."""
+        mean, jitter = latency
+        seconds = max(0.1, self.rng.gauss(mean, jitter))
+        async with self.scheduler.slot(kind):
+            await asyncio.sleep(seconds * self.scale)
+    
+    async def run_book(self, book: SimulatedBook) -> None:
+        """Simulate the pipeline's model calls for one book."""
+        await asyncio.sleep(book.arrival * self.scale)
+        
+        deadline = None
+        if self.scheduled and book.deadline_budget is not None:
+            deadline = datetime.now() + timedelta(seconds=book.deadline_budget * self.scale)
+        priority = book.priority if self.scheduled else PRIORITY_NORMAL
+        
+        with job_context(f"sim-{book.index}", priority=priority, deadline=deadline):
+            # Normalization, then planning and visual analysis in parallel
+            await self.call(KIND_TEXT, TEXT_LATENCY)
+            await asyncio.gather(self.call(KIND_TEXT, TEXT_LATENCY), self.call(KIND_TEXT, TEXT_LATENCY))
+            # Character sheet
+            await self.call(KIND_IMAGE, IMAGE_LATENCY)
+            # Prompt creation and review
+            await asyncio.gather(*[self.call(KIND_TEXT, TEXT_LATENCY) for _ in range(3)])
+            await self.call(KIND_TEXT, TEXT_LATENCY)
+            # Cover, pages and back cover
+            await asyncio.gather(*[
+                self.call(KIND_IMAGE, IMAGE_LATENCY) for _ in range(book.page_count + 2)
+            ])
+            # Illustration and design review
+            await self.call(KIND_TEXT, TEXT_LATENCY)
+            await self.call(KIND_TEXT, TEXT_LATENCY)
+        
+        self.finish_times[book.index] = self.now()
+    
+    async def run_enhance_stream(self, duration: float, gap: float) -> None:
+        """Simulate users calling /enhance-text while books generate."""
+        priority = PRIORITY_INTERACTIVE if self.scheduled else PRIORITY_NORMAL
+        pending = []
+        
+        async def enhance():
+            started = self.now()
+            with job_context(priority=priority):
+                await self.call(KIND_TEXT, ENHANCE_LATENCY)
+            self.interactive_latencies.append(self.now() - started)
+        
+        while self.now() < duration:
+            pending.append(asyncio.create_task(enhance()))
+            await asyncio.sleep(self.rng.expovariate(1.0 / gap) * self.scale)
+        await asyncio.gather(*pending)
+    
+    async def run(self, workload: List[SimulatedBook], enhance_gap: float) -> None:
+        self.start = time.monotonic()
+        books = asyncio.gather(*[self.run_book(book) for book in workload])
+        horizon = workload[-1].arrival if workload else 0.0
+        await asyncio.gather(books, self.run_enhance_stream(horizon, enhance_gap))
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+def report(label: str, simulation: Simulation, workload: List[SimulatedBook]) -> None:
+    """Print deadline hit rate and interactive latency for one run."""
+    print(f"\n{label}")
+    print("-" * len(label))
+    
+    total_hits = 0
+    total_with_deadline = 0
+    for priority in (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW):
+        books = [b for b in workload if b.priority == priority]
+        if not books:
+            continue
+        turnaround = [simulation.finish_times[b.index] - b.arrival for b in books]
+        line = f"  {priority:<7} books={len(books):<3} median turnaround={median(turnaround):7.1f}s"
+        if books[0].deadline_budget is not None:
+            hits = sum(1 for b, t in zip(books, turnaround) if t <= b.deadline_budget)
+            total_hits += hits
+            total_with_deadline += len(books)
+            line += f"  deadline hit rate={hits / len(books):6.1%}"
+        print(line)
+    
+    if total_with_deadline:
+        print(f"  overall deadline hit rate: {total_hits / total_with_deadline:.1%}")
+    
+    latencies = simulation.interactive_latencies
+    print(
+        f"  /enhance-text calls={len(latencies)} "
+        f"p50={percentile(latencies, 0.5):.1f}s p95={percentile(latencies, 0.95):.1f}s"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Simulate priority and deadline scheduling")
+    parser.add_argument("--books", type=int, default=30, help="Books in the workload")
+    parser.add_argument("--arrival-gap", type=float, default=45.0, help="Mean seconds between books")
+    parser.add_argument("--enhance-gap", type=float, default=10.0, help="Mean seconds between /enhance-text calls")
+    parser.add_argument("--text-slots", type=int, default=4, help="Concurrent text calls")
+    parser.add_argument("--image-slots", type=int, default=4, help="Concurrent image calls")
+    parser.add_argument("--time-scale", type=float, default=0.002, help="Real seconds per simulated second")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    
+    workload = build_workload(args.books, args.arrival_gap, args.seed)
+    print(f"Simulating {len(workload)} books "
+          f"({args.text_slots} text / {args.image_slots} image slots, stub mode)")
+    
+    for label, scheduled in (("FIFO baseline", False), ("Priority + deadline scheduling", True)):
+        simulation = Simulation(scheduled, args.time_scale, args.text_slots, args.image_slots, args.seed)
+        await simulation.run(workload, args.enhance_gap)
+        report(label, simulation, workload)
+    
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
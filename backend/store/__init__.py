@@ -1,7 +1,7 @@
 """
 MemoryBook Store Module
 
-In-memory job storage and tracking.
+Job storage, tracking and the worker job queue.
 """
 
 from .job_store import (
@@ -13,8 +13,23 @@ from .job_store import (
     PageStatus,
     StepInfo,
     PageInfo,
+    StyleRecord,
+    SQLiteJobStore,
+    get_job_db_path,
     get_job_store
 )
+from .job_queue import (
+    JobQueue,
+    QueuedJob,
+    QueueStatus,
+    get_job_queue
+)
+from .idempotency import (
+    IdempotencyIndex,
+    IdempotencyConflictError,
+    request_fingerprint,
+    get_idempotency_index
+)
 from .file_storage import (
     ensure_storage_dir,
     get_job_dir,
@@ -26,7 +41,11 @@ from .file_storage import (
     get_asset_path,
     list_job_assets,
     cleanup_job_storage,
-    get_mime_type
+    get_mime_type,
+    get_session_dir,
+    save_session_files,
+    copy_references_to_job,
+    cleanup_session_storage
 )
 
 __all__ = [
@@ -39,7 +58,20 @@ __all__ = [
     "PageStatus",
     "StepInfo",
     "PageInfo",
+    "StyleRecord",
+    "SQLiteJobStore",
+    "get_job_db_path",
     "get_job_store",
+    # Job Queue
+    "JobQueue",
+    "QueuedJob",
+    "QueueStatus",
+    "get_job_queue",
+    # Idempotency
+    "IdempotencyIndex",
+    "IdempotencyConflictError",
+    "request_fingerprint",
+    "get_idempotency_index",
     # File Storage
     "ensure_storage_dir",
     "get_job_dir",
@@ -52,4 +84,8 @@ __all__ = [
     "list_job_assets",
     "cleanup_job_storage",
     "get_mime_type",
+    "get_session_dir",
+    "save_session_files",
+    "copy_references_to_job",
+    "cleanup_session_storage",
 ]
@@ -11,7 +11,7 @@ from typing import List, Optional, Tuple
 from pathlib import Path
 
 # Base storage directory
-STORAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "storage")
+STORAGE_DIR = os.getenv("STORAGE_DIR") or os.path.join(os.path.dirname(os.path.dirname(__file__)), "storage")
 
 
 def ensure_storage_dir():
@@ -59,8 +59,11 @@ async def save_uploaded_file(
     Returns:
         Path to saved file
     """
-    refs_dir = get_references_dir(job_id)
-    
+    return _write_reference(get_references_dir(job_id), file_content, original_filename, file_index)
+
+
+def _write_reference(refs_dir: str, file_content: bytes, original_filename: str, file_index: int) -> str:
+    """Write a reference image as reference_<index><ext> in refs_dir."""
     # Get extension from original filename
     ext = os.path.splitext(original_filename)[1].lower()
     if ext not in ['.jpg', '.jpeg', '.png', '.webp']:
@@ -98,6 +101,69 @@ async def save_uploaded_files(
     return paths
 
 
+def get_session_dir(token: str) -> str:
+    """Get the storage directory for a reference upload session."""
+    session_dir = os.path.join(STORAGE_DIR, "sessions", token)
+    os.makedirs(session_dir, exist_ok=True)
+    return session_dir
+
+
+def save_session_files(token: str, files: List[Tuple[bytes, str]]) -> List[str]:
+    """
+    Save reference images uploaded ahead of a job.
+    
+    Args:
+        token: Session token
+        files: List of (content, filename) tuples
+        
+    Returns:
+        List of saved file paths
+    """
+    refs_dir = os.path.join(get_session_dir(token), "references")
+    os.makedirs(refs_dir, exist_ok=True)
+    return [
+        _write_reference(refs_dir, content, filename, i)
+        for i, (content, filename) in enumerate(files)
+    ]
+
+
+def copy_references_to_job(job_id: str, paths: List[str]) -> List[str]:
+    """
+    Copy reference images (such as a session's) into a job's references.
+    
+    Args:
+        job_id: Job identifier
+        paths: Reference image paths, in order
+        
+    Returns:
+        List of the job's reference paths
+    """
+    refs_dir = get_references_dir(job_id)
+    copied = []
+    for path in paths:
+        target = os.path.join(refs_dir, os.path.basename(path))
+        shutil.copyfile(path, target)
+        copied.append(target)
+    return copied
+
+
+def cleanup_session_storage(token: str) -> bool:
+    """
+    Remove all storage for a reference upload session.
+    
+    Args:
+        token: Session token
+        
+    Returns:
+        True if cleanup was successful
+    """
+    session_dir = os.path.join(STORAGE_DIR, "sessions", token)
+    if os.path.exists(session_dir):
+        shutil.rmtree(session_dir, ignore_errors=True)
+        return True
+    return False
+
+
 def get_output_path(job_id: str, filename: str) -> str:
     """
     Get the full path for an output file.
@@ -156,9 +222,13 @@ def list_job_assets(job_id: str) -> dict:
     if os.path.exists(refs_dir):
         result["references"] = sorted(os.listdir(refs_dir))
     
+    # Outputs of a multi-style job are in a subdirectory per style
     outputs_dir = get_outputs_dir(job_id)
-    if os.path.exists(outputs_dir):
-        result["outputs"] = sorted(os.listdir(outputs_dir))
+    for directory, _, filenames in os.walk(outputs_dir):
+        relative = os.path.relpath(directory, outputs_dir)
+        for filename in filenames:
+            result["outputs"].append(filename if relative == "." else f"{relative}/{filename}")
+    result["outputs"].sort()
     
     return result
 
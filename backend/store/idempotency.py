@@ -0,0 +1,188 @@
+"""
+Idempotent Job Submission
+
+The frontend retries POST /jobs on network errors and users double-click
+the submit button; each duplicate would start a full pipeline. The
+IdempotencyIndex maps request keys to the job they created, so a
+duplicate gets the existing job ID instead:
+
+- Idempotency-Key header values are remembered for
+  IDEMPOTENCY_TTL_MINUTES. Reusing a key with a different request is an
+  error.
+- Without a header, a hash of the payload and reference photos is
+  remembered for JOB_DEDUP_WINDOW_SECONDS, catching double submissions.
+
+The index is bounded (IDEMPOTENCY_MAX_KEYS, oldest entries evicted
+first) and expires entries lazily. A duplicate that arrives while the
+first request is still creating its job waits for it rather than
+creating a second one; if the first request fails, one waiter takes
+over.
+
+Per process: keys live in the API process that received them.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+import sys
+sys.path.append('..')
+
+from utils import metrics
+
+
+class IdempotencyConflictError(ValueError):
+    """Raised when an idempotency key is reused with a different request."""
+
+
+@dataclass
+class _Entry:
+    """A key's job, or the request still creating it."""
+    fingerprint: str
+    ttl_seconds: float
+    expires_at: float = 0.0
+    job_id: Optional[str] = None
+    pending: Optional[asyncio.Future] = None
+
+
+def request_fingerprint(payload: Dict, references: Iterable[bytes] = (), reference_session: Optional[str] = None) -> str:
+    """
+    Hash of a job request: its payload, reference photos and reference session.
+    
+    Args:
+        payload: Parsed job payload (as JSON data)
+        references: Content of the uploaded reference photos, in order
+        reference_session: Token of photos uploaded ahead, if any
+    """
+    digest = hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode())
+    for content in references:
+        digest.update(hashlib.sha256(content).digest())
+    if reference_session:
+        digest.update(reference_session.encode())
+    return digest.hexdigest()
+
+
+class IdempotencyIndex:
+    """
+    Bounded, expiring map from request keys to job IDs.
+    
+    Callers claim() a key before creating a job, then complete() it with
+    the new job's ID or release() it if creating the job failed.
+    """
+    
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        """
+        Args:
+            ttl_seconds: Default lifetime of a key
+            max_entries: Most keys kept; the oldest are evicted first
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    async def claim(self, key: str, fingerprint: str, ttl_seconds: Optional[float] = None) -> Optional[str]:
+        """
+        Look a key up, reserving it when it is new.
+        
+        Args:
+            key: Request key (idempotency key or request fingerprint)
+            fingerprint: Hash of the request, to detect a reused key
+            ttl_seconds: Lifetime of the key once completed (default ttl_seconds)
+        
+        Returns:
+            The job ID created for the key, or None when the caller now
+            holds the key and must complete() or release() it
+        
+        Raises:
+            IdempotencyConflictError: If the key was used for a different request
+        """
+        while True:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is None:
+                loop = asyncio.get_running_loop()
+                self._entries[key] = _Entry(
+                    fingerprint=fingerprint,
+                    ttl_seconds=self.ttl_seconds if ttl_seconds is None else ttl_seconds,
+                    pending=loop.create_future()
+                )
+                self._evict()
+                return None
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyConflictError("Idempotency key was already used for a different request")
+            if entry.pending is None:
+                metrics.JOB_DEDUPLICATIONS.inc(outcome="duplicate")
+                return entry.job_id
+            
+            # Coalesce with the request creating the job; shielded so a
+            # cancelled waiter does not cancel the others
+            job_id = await asyncio.shield(entry.pending)
+            if job_id is not None:
+                metrics.JOB_DEDUPLICATIONS.inc(outcome="coalesced")
+                return job_id
+            # That request failed: look again, and take over the key
+    
+    def complete(self, key: str, job_id: str) -> None:
+        """Record the job created for a claimed key and wake its waiters."""
+        entry = self._entries.get(key)
+        if entry is None or entry.pending is None:
+            return
+        entry.job_id = job_id
+        entry.pending.set_result(job_id)
+        entry.pending = None
+        entry.expires_at = time.time() + entry.ttl_seconds
+    
+    def release(self, key: str) -> None:
+        """Give up a claimed key after failing to create its job."""
+        entry = self._entries.get(key)
+        if entry is None or entry.pending is None:
+            return
+        del self._entries[key]
+        entry.pending.set_result(None)
+    
+    def forget_job(self, job_id: str) -> None:
+        """Drop the keys of a deleted job, so a retry creates a new one."""
+        for key, entry in list(self._entries.items()):
+            if entry.job_id == job_id:
+                del self._entries[key]
+    
+    def _expire(self) -> None:
+        now = time.time()
+        for key, entry in list(self._entries.items()):
+            if entry.pending is None and entry.expires_at <= now:
+                del self._entries[key]
+                metrics.JOB_DEDUPLICATIONS.inc(outcome="expired")
+    
+    def _evict(self) -> None:
+        # Keys still creating their job are never evicted
+        for key, entry in list(self._entries.items()):
+            if len(self._entries) <= self.max_entries:
+                break
+            if entry.pending is None:
+                del self._entries[key]
+                metrics.JOB_DEDUPLICATIONS.inc(outcome="evicted")
+
+
+# Global idempotency index instance
+_idempotency_index: Optional[IdempotencyIndex] = None
+
+
+def get_idempotency_index() -> IdempotencyIndex:
+    """Get the process-wide idempotency index configured from the app config."""
+    global _idempotency_index
+    if _idempotency_index is None:
+        from utils.config import get_config
+        
+        config = get_config()
+        _idempotency_index = IdempotencyIndex(
+            ttl_seconds=config.idempotency_ttl_minutes * 60,
+            max_entries=config.idempotency_max_keys
+        )
+    return _idempotency_index
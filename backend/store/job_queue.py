@@ -0,0 +1,324 @@
+"""
+Job Queue
+
+Durable SQLite-backed job queue shared by the API process and the
+worker processes started with worker.py.
+
+Workers claim jobs with a time-limited lease and keep it alive with
+heartbeats. If a worker dies, its lease expires and the job becomes
+claimable again until it runs out of attempts.
+
+Jobs are claimed by priority, then earliest deadline, then arrival.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import sys
+sys.path.append('..')
+
+from utils.job_context import PRIORITY_RANKS, PRIORITY_NORMAL
+
+
+class QueueStatus:
+    """Queue entry states."""
+    QUEUED = "queued"
+    LEASED = "leased"
+    DONE = "done"
+    DEAD = "dead"
+
+
+@dataclass
+class QueuedJob:
+    """A job claimed from the queue by a worker."""
+    job_id: str
+    payload: Dict[str, Any]
+    reference_paths: List[str] = field(default_factory=list)
+    attempts: int = 0
+    lease_expires_at: float = 0.0
+
+
+class JobQueue:
+    """
+    Durable job queue with lease and heartbeat semantics.
+    
+    Thread-safe within a process; SQLite immediate transactions make
+    claims atomic across processes on the same machine.
+    """
+    
+    def __init__(self, db_path: str, lease_seconds: int = 60, max_attempts: int = 3):
+        """
+        Initialize the job queue.
+        
+        Args:
+            db_path: Path to the SQLite database file
+            lease_seconds: How long a claim stays valid without a heartbeat
+            max_attempts: Claims allowed before a job is declared dead
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS job_queue (
+                    job_id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    reference_paths TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_expires_at REAL,
+                    enqueued_at REAL NOT NULL,
+                    error TEXT,
+                    priority INTEGER NOT NULL DEFAULT 2,
+                    deadline REAL
+                )
+                """
+            )
+            # Databases created before scheduling support lack these columns
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(job_queue)")}
+            if "priority" not in columns:
+                conn.execute("ALTER TABLE job_queue ADD COLUMN priority INTEGER NOT NULL DEFAULT 2")
+            if "deadline" not in columns:
+                conn.execute("ALTER TABLE job_queue ADD COLUMN deadline REAL")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_job_queue_status ON job_queue (status, enqueued_at)"
+            )
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection with autocommit so transactions are explicit."""
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+    
+    def enqueue(
+        self,
+        job_id: str,
+        payload: Dict[str, Any],
+        reference_paths: List[str],
+        priority: str = PRIORITY_NORMAL,
+        deadline: Optional[datetime] = None
+    ) -> None:
+        """
+        Add a job to the queue.
+        
+        Args:
+            job_id: Job identifier (matches the job store record)
+            payload: JSON-serializable job payload
+            reference_paths: Paths to the saved reference images
+            priority: Scheduling priority ("high", "normal" or "low")
+            deadline: Optional desired completion time
+        """
+        rank = PRIORITY_RANKS.get(priority, PRIORITY_RANKS[PRIORITY_NORMAL])
+        with self._lock, closing(self._connect()) as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO job_queue
+                    (job_id, payload, reference_paths, status, attempts, enqueued_at, priority, deadline)
+                VALUES (?, ?, ?, ?, 0, ?, ?, ?)
+                """,
+                (
+                    job_id, json.dumps(payload), json.dumps(reference_paths), QueueStatus.QUEUED,
+                    time.time(), rank, deadline.timestamp() if deadline else None
+                )
+            )
+    
+    def claim(self, worker_id: str) -> Optional[QueuedJob]:
+        """
+        Lease the most urgent available job.
+        
+        Jobs whose lease expired (dead worker) are claimable again.
+        
+        Args:
+            worker_id: Identifier of the claiming worker
+        
+        Returns:
+            The claimed job, or None if the queue is empty
+        """
+        now = time.time()
+        with self._lock, closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    """
+                    SELECT job_id, payload, reference_paths, attempts FROM job_queue
+                    WHERE (status = ? OR (status = ? AND lease_expires_at < ?))
+                      AND attempts < ?
+                    ORDER BY priority, deadline IS NULL, deadline, enqueued_at
+                    LIMIT 1
+                    """,
+                    (QueueStatus.QUEUED, QueueStatus.LEASED, now, self.max_attempts)
+                ).fetchone()
+                
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                
+                job_id, payload, reference_paths, attempts = row
+                expires_at = now + self.lease_seconds
+                conn.execute(
+                    """
+                    UPDATE job_queue
+                    SET status = ?, attempts = ?, lease_owner = ?, lease_expires_at = ?
+                    WHERE job_id = ?
+                    """,
+                    (QueueStatus.LEASED, attempts + 1, worker_id, expires_at, job_id)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        
+        return QueuedJob(
+            job_id=job_id,
+            payload=json.loads(payload),
+            reference_paths=json.loads(reference_paths),
+            attempts=attempts + 1,
+            lease_expires_at=expires_at
+        )
+    
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """
+        Extend the lease on a claimed job.
+        
+        Returns:
+            False if the worker no longer holds the lease
+        """
+        with self._lock, closing(self._connect()) as conn:
+            cursor = conn.execute(
+                """
+                UPDATE job_queue SET lease_expires_at = ?
+                WHERE job_id = ? AND status = ? AND lease_owner = ?
+                """,
+                (time.time() + self.lease_seconds, job_id, QueueStatus.LEASED, worker_id)
+            )
+            return cursor.rowcount > 0
+    
+    def complete(self, job_id: str, worker_id: str) -> bool:
+        """Mark a leased job as finished."""
+        return self._finish(job_id, worker_id, QueueStatus.DONE)
+    
+    def fail(self, job_id: str, worker_id: str, error: str, retry: bool = False) -> bool:
+        """
+        Release a leased job after a worker-side failure.
+        
+        Args:
+            job_id: Job identifier
+            worker_id: Worker holding the lease
+            error: Error description
+            retry: Put the job back in the queue if attempts remain
+        """
+        with self._lock, closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT attempts FROM job_queue WHERE job_id = ? AND lease_owner = ?",
+                (job_id, worker_id)
+            ).fetchone()
+        if row is None:
+            return False
+        
+        status = QueueStatus.QUEUED if retry and row[0] < self.max_attempts else QueueStatus.DEAD
+        return self._finish(job_id, worker_id, status, error)
+    
+    def _finish(self, job_id: str, worker_id: str, status: str, error: Optional[str] = None) -> bool:
+        """Move a leased job to its next state."""
+        with self._lock, closing(self._connect()) as conn:
+            cursor = conn.execute(
+                """
+                UPDATE job_queue
+                SET status = ?, lease_owner = NULL, lease_expires_at = NULL, error = ?
+                WHERE job_id = ? AND status = ? AND lease_owner = ?
+                """,
+                (status, error, job_id, QueueStatus.LEASED, worker_id)
+            )
+            return cursor.rowcount > 0
+    
+    def remove(self, job_id: str) -> bool:
+        """
+        Remove a job from the queue, whatever its state.
+        
+        A worker running the job loses its lease at its next heartbeat
+        and cancels the job.
+        """
+        with self._lock, closing(self._connect()) as conn:
+            cursor = conn.execute("DELETE FROM job_queue WHERE job_id = ?", (job_id,))
+            return cursor.rowcount > 0
+    
+    def reap_expired(self) -> List[str]:
+        """
+        Handle leases abandoned by dead workers.
+        
+        Jobs with attempts left are returned to the queue; the rest are
+        marked dead.
+        
+        Returns:
+            IDs of jobs that ran out of attempts
+        """
+        now = time.time()
+        with self._lock, closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                dead = [
+                    row[0] for row in conn.execute(
+                        "SELECT job_id FROM job_queue WHERE status = ? AND lease_expires_at < ? AND attempts >= ?",
+                        (QueueStatus.LEASED, now, self.max_attempts)
+                    ).fetchall()
+                ]
+                conn.execute(
+                    """
+                    UPDATE job_queue SET status = ?, lease_owner = NULL, error = 'lease expired'
+                    WHERE status = ? AND lease_expires_at < ? AND attempts >= ?
+                    """,
+                    (QueueStatus.DEAD, QueueStatus.LEASED, now, self.max_attempts)
+                )
+                conn.execute(
+                    """
+                    UPDATE job_queue SET status = ?, lease_owner = NULL
+                    WHERE status = ? AND lease_expires_at < ?
+                    """,
+                    (QueueStatus.QUEUED, QueueStatus.LEASED, now)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return dead
+    
+    def stats(self) -> Dict[str, int]:
+        """Count queue entries by status."""
+        with self._lock, closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) FROM job_queue GROUP BY status"
+            ).fetchall()
+        counts = {status: 0 for status in (QueueStatus.QUEUED, QueueStatus.LEASED, QueueStatus.DONE, QueueStatus.DEAD)}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+
+# Global job queue instance
+_job_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """Get the global job queue instance (shares the job store database)."""
+    global _job_queue
+    if _job_queue is None:
+        from utils.config import get_config
+        from .job_store import get_job_db_path
+        
+        config = get_config()
+        _job_queue = JobQueue(
+            get_job_db_path(),
+            lease_seconds=config.worker_lease_seconds,
+            max_attempts=config.worker_max_attempts
+        )
+    return _job_queue
@@ -3,15 +3,27 @@ Job Store
 
 In-memory storage for job tracking and status management.
 Thread-safe implementation with Lock.
+
+SQLiteJobStore persists records in a local SQLite database so that the
+API process and worker processes on the same machine share job state.
 """
 
+import asyncio
+import atexit
+import logging
+import os
+import queue
+import sqlite3
 import threading
-from typing import Dict, List, Optional, Any
+from contextlib import closing
+from typing import Callable, Dict, List, Optional, Any, Tuple
 from datetime import datetime
 from enum import Enum
 from dataclasses import dataclass, field as dataclass_field
 from pydantic import BaseModel, Field
 
+logger = logging.getLogger("memorybook")
+
 
 class JobStatus(str, Enum):
     """Overall job status."""
@@ -82,12 +94,48 @@ class PageInfo(BaseModel):
         use_enum_values = True
 
 
+class StyleRecord(BaseModel):
+    """Progress and result of one style of a multi-style job."""
+    style: str
+    status: JobStatus = JobStatus.QUEUED
+    current_step: Optional[str] = None
+    progress_percent: int = 0
+    steps: Dict[str, StepInfo] = Field(default_factory=dict)
+    pages: List[PageInfo] = Field(default_factory=list)
+    result_path: Optional[str] = None
+    result_json: Optional[Dict[str, Any]] = None
+    prompts: List[Dict[str, Any]] = Field(default_factory=list)
+    editions: Dict[str, Dict[str, Any]] = Field(default_factory=dict)
+    critical_path: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    
+    class Config:
+        use_enum_values = True
+    
+    def to_status_response(self) -> Dict[str, Any]:
+        """Convert to the style's entry in the API status response."""
+        return {
+            "style": self.style,
+            "status": self.status,
+            "current_step": self.current_step,
+            "progress_percent": self.progress_percent,
+            "steps": _steps_response(self.steps),
+            "pages": _pages_response(self.pages),
+            "editions": sorted(self.editions),
+            "error": self.error
+        }
+
+
 class JobRecord(BaseModel):
     """Complete job record."""
     job_id: str
     status: JobStatus = JobStatus.QUEUED
     user_language: str = "en-US"
     
+    # Scheduling
+    priority: str = "normal"
+    deadline: Optional[datetime] = None
+    
     # Timestamps
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
@@ -108,6 +156,26 @@ class JobRecord(BaseModel):
     result_path: Optional[str] = None
     result_json: Optional[Dict[str, Any]] = None
     
+    # Reviewed image prompts of the result, for page regeneration
+    # (see pipeline/regeneration.py)
+    prompts: List[Dict[str, Any]] = Field(default_factory=list)
+    
+    # Normalized profile of the input, for revisions (see pipeline/revision.py)
+    normalized_profile: Optional[Dict[str, Any]] = None
+    
+    # Translated editions of the result by language (see pipeline/editions.py)
+    editions: Dict[str, Dict[str, Any]] = Field(default_factory=dict)
+    
+    # Model usage, latency and estimated cost per stage
+    usage: Optional[Dict[str, Any]] = None
+    
+    # Stage timings and the critical path of the run (see StageRun.report)
+    critical_path: Optional[Dict[str, Any]] = None
+    
+    # Per-style progress of a multi-style job, in requested order; the
+    # job's own progress is their average
+    styles: Dict[str, StyleRecord] = Field(default_factory=dict)
+    
     # Error handling
     error: Optional[str] = None
     
@@ -121,29 +189,77 @@ class JobRecord(BaseModel):
             "status": self.status,
             "current_step": self.current_step,
             "progress_percent": self.progress_percent,
-            "steps": [
-                {
-                    "name": step_name,
-                    "status": step_info.status,
-                    "started_at": step_info.started_at.isoformat() if step_info.started_at else None,
-                    "completed_at": step_info.completed_at.isoformat() if step_info.completed_at else None,
-                    "error": step_info.error
-                }
-                for step_name, step_info in self.steps.items()
-            ],
-            "pages": [
-                {
-                    "page_number": page.page_number,
-                    "page_type": page.page_type,
-                    "status": page.status,
-                    "retry_count": page.retry_count
-                }
-                for page in self.pages
-            ],
+            "priority": self.priority,
+            "deadline": self.deadline.isoformat() if self.deadline else None,
+            "steps": _steps_response(self.steps),
+            "pages": _pages_response(self.pages),
+            "styles": [style.to_status_response() for style in self.styles.values()],
+            "editions": sorted(self.editions),
             "created_at": self.created_at.isoformat(),
             "updated_at": self.updated_at.isoformat(),
+            "usage": self.usage,
+            "critical_path": self.critical_path,
             "error": self.error
         }
+    
+    def progress_target(self, style: Optional[str] = None):
+        """
+        The record that progress updates for a style apply to.
+        
+        Style records mirror the job's progress fields, so updates for a
+        style of a multi-style job go to its StyleRecord, others to the job.
+        """
+        if style is None:
+            return self
+        return self.styles.get(style)
+    
+    def refresh_style_progress(self) -> None:
+        """Set the job's progress to the average progress of its styles."""
+        if self.styles:
+            self.progress_percent = sum(s.progress_percent for s in self.styles.values()) // len(self.styles)
+
+
+def _steps_response(steps: Dict[str, StepInfo]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "name": step_name,
+            "status": step_info.status,
+            "started_at": step_info.started_at.isoformat() if step_info.started_at else None,
+            "completed_at": step_info.completed_at.isoformat() if step_info.completed_at else None,
+            "error": step_info.error
+        }
+        for step_name, step_info in steps.items()
+    ]
+
+
+def _pages_response(pages: List[PageInfo]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "page_number": page.page_number,
+            "page_type": page.page_type,
+            "status": page.status,
+            "retry_count": page.retry_count
+        }
+        for page in pages
+    ]
+
+
+def _initial_steps() -> Dict[str, StepInfo]:
+    """All pipeline steps, pending."""
+    return {step_name.value: StepInfo(name=step_name.value) for step_name in StepName}
+
+
+def _initial_pages(page_count: int) -> List[PageInfo]:
+    """Cover, content pages and back cover, pending."""
+    pages = [PageInfo(page_number=0, page_type="cover")]
+    for i in range(1, page_count + 1):
+        pages.append(PageInfo(page_number=i, page_type="page"))
+    pages.append(PageInfo(page_number=-1, page_type="back_cover"))
+    return pages
+
+
+# Edits a job record in place; returns it, or None if it left it unchanged
+JobEdit = Callable[[JobRecord], Optional[JobRecord]]
 
 
 class JobStore:
@@ -158,13 +274,40 @@ class JobStore:
         self._jobs: Dict[str, JobRecord] = {}
         self._lock = threading.Lock()
     
+    def _update(self, job_id: str, edit: JobEdit) -> Optional[JobRecord]:
+        """
+        Apply an edit to a job record while holding the store lock.
+        
+        Args:
+            job_id: Job to edit
+            edit: Function modifying the record in place; returns the
+                record, or None when it left it unchanged
+            
+        Returns:
+            The edited record, or None if the job or edit target is missing
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return edit(job) if job else None
+    
+    def flush(self) -> None:
+        """Wait until every update is written; updates are immediate here."""
+    
+    def _insert(self, record: JobRecord) -> None:
+        """Store a newly created job record."""
+        with self._lock:
+            self._jobs[record.job_id] = record
+    
     def create_job(
         self,
         job_id: str,
         user_language: str = "en-US",
         input_payload: Optional[Dict[str, Any]] = None,
         reference_image_paths: Optional[List[str]] = None,
-        page_count: int = 10
+        page_count: int = 10,
+        priority: str = "normal",
+        deadline: Optional[datetime] = None,
+        styles: Optional[List[str]] = None
     ) -> JobRecord:
         """
         Create a new job record.
@@ -175,33 +318,31 @@ class JobStore:
             input_payload: Original request payload
             reference_image_paths: Paths to uploaded reference images
             page_count: Number of pages in the book
+            priority: Scheduling priority ("high", "normal" or "low")
+            deadline: Optional desired completion time
+            styles: Styles of a multi-style job, each tracked separately
             
         Returns:
             Created JobRecord
         """
-        with self._lock:
-            # Initialize steps
-            steps = {}
-            for step_name in StepName:
-                steps[step_name.value] = StepInfo(name=step_name.value)
-            
-            # Initialize pages (cover + pages + back_cover)
-            pages = [PageInfo(page_number=0, page_type="cover")]
-            for i in range(1, page_count + 1):
-                pages.append(PageInfo(page_number=i, page_type="page"))
-            pages.append(PageInfo(page_number=-1, page_type="back_cover"))
-            
-            record = JobRecord(
-                job_id=job_id,
-                user_language=user_language,
-                input_payload=input_payload,
-                reference_image_paths=reference_image_paths or [],
-                steps=steps,
-                pages=pages
-            )
-            
-            self._jobs[job_id] = record
-            return record
+        record = JobRecord(
+            job_id=job_id,
+            user_language=user_language,
+            input_payload=input_payload,
+            reference_image_paths=reference_image_paths or [],
+            priority=priority,
+            deadline=deadline,
+            # A multi-style job's steps and pages are those of its styles
+            steps={} if styles else _initial_steps(),
+            pages=[] if styles else _initial_pages(page_count),
+            styles={
+                style: StyleRecord(style=style, steps=_initial_steps(), pages=_initial_pages(page_count))
+                for style in styles or []
+            }
+        )
+        
+        self._insert(record)
+        return record
     
     def get_job(self, job_id: str) -> Optional[JobRecord]:
         """Get a job record by ID."""
@@ -214,62 +355,104 @@ class JobStore:
         status: Optional[JobStatus] = None,
         current_step: Optional[str] = None,
         progress_percent: Optional[int] = None,
-        error: Optional[str] = None
+        error: Optional[str] = None,
+        style: Optional[str] = None
     ) -> Optional[JobRecord]:
-        """Update overall job status."""
-        with self._lock:
-            job = self._jobs.get(job_id)
-            if not job:
+        """Update overall job status, or that of one style of a multi-style job."""
+        def edit(job: JobRecord) -> Optional[JobRecord]:
+            target = job.progress_target(style)
+            if not target:
                 return None
             
             if status is not None:
-                job.status = status
-                if status == JobStatus.PROCESSING and not job.started_at:
-                    job.started_at = datetime.now()
-                elif status in [JobStatus.COMPLETED, JobStatus.FAILED]:
-                    job.completed_at = datetime.now()
+                target.status = status
+                if style is None:
+                    if status == JobStatus.PROCESSING and not job.started_at:
+                        job.started_at = datetime.now()
+                    elif status in [JobStatus.COMPLETED, JobStatus.FAILED]:
+                        job.completed_at = datetime.now()
             
             if current_step is not None:
-                job.current_step = current_step
+                target.current_step = current_step
             
             if progress_percent is not None:
-                job.progress_percent = min(100, max(0, progress_percent))
+                target.progress_percent = min(100, max(0, progress_percent))
+                if style is not None:
+                    job.refresh_style_progress()
             
             if error is not None:
-                job.error = error
+                target.error = error
             
             job.updated_at = datetime.now()
             return job
+        
+        return self._update(job_id, edit)
+    
+    def requeue_job(self, job_id: str) -> Optional[JobRecord]:
+        """
+        Put a job back to QUEUED with fresh progress, for another attempt.
+        
+        Steps, pages and progress of the failed attempt are reset, so
+        clients do not take them for the progress of the next one.
+        """
+        def edit(job: JobRecord) -> Optional[JobRecord]:
+            styles = list(job.styles.values())
+            page_count = len(styles[0].pages if styles else job.pages) - 2
+            # A multi-style job's steps and pages are those of its styles
+            job.steps = {} if styles else _initial_steps()
+            job.pages = [] if styles else _initial_pages(page_count)
+            for target in [job, *styles]:
+                target.status = JobStatus.QUEUED
+                target.current_step = None
+                target.progress_percent = 0
+                target.error = None
+            for style in styles:
+                style.steps = _initial_steps()
+                style.pages = _initial_pages(page_count)
+            job.updated_at = datetime.now()
+            return job
+        
+        return self._update(job_id, edit)
     
-    def start_step(self, job_id: str, step_name: str) -> Optional[JobRecord]:
+    def start_step(self, job_id: str, step_name: str, style: Optional[str] = None) -> Optional[JobRecord]:
         """Mark a step as started."""
-        with self._lock:
-            job = self._jobs.get(job_id)
-            if not job or step_name not in job.steps:
+        def edit(job: JobRecord) -> Optional[JobRecord]:
+            target = job.progress_target(style)
+            if not target or step_name not in target.steps:
                 return None
             
-            job.steps[step_name].status = StepStatus.IN_PROGRESS
-            job.steps[step_name].started_at = datetime.now()
-            job.current_step = step_name
+            target.steps[step_name].status = StepStatus.IN_PROGRESS
+            target.steps[step_name].started_at = datetime.now()
+            target.current_step = step_name
             job.updated_at = datetime.now()
             return job
+        
+        return self._update(job_id, edit)
     
-    def complete_step(self, job_id: str, step_name: str, error: Optional[str] = None) -> Optional[JobRecord]:
+    def complete_step(
+        self,
+        job_id: str,
+        step_name: str,
+        error: Optional[str] = None,
+        style: Optional[str] = None
+    ) -> Optional[JobRecord]:
         """Mark a step as completed or failed."""
-        with self._lock:
-            job = self._jobs.get(job_id)
-            if not job or step_name not in job.steps:
+        def edit(job: JobRecord) -> Optional[JobRecord]:
+            target = job.progress_target(style)
+            if not target or step_name not in target.steps:
                 return None
             
             if error:
-                job.steps[step_name].status = StepStatus.FAILED
-                job.steps[step_name].error = error
+                target.steps[step_name].status = StepStatus.FAILED
+                target.steps[step_name].error = error
             else:
-                job.steps[step_name].status = StepStatus.COMPLETED
+                target.steps[step_name].status = StepStatus.COMPLETED
             
-            job.steps[step_name].completed_at = datetime.now()
+            target.steps[step_name].completed_at = datetime.now()
             job.updated_at = datetime.now()
             return job
+        
+        return self._update(job_id, edit)
     
     def update_page_status(
         self,
@@ -278,15 +461,16 @@ class JobStore:
         status: PageStatus,
         image_path: Optional[str] = None,
         error: Optional[str] = None,
-        increment_retry: bool = False
+        increment_retry: bool = False,
+        style: Optional[str] = None
     ) -> Optional[JobRecord]:
         """Update status for a specific page."""
-        with self._lock:
-            job = self._jobs.get(job_id)
-            if not job:
+        def edit(job: JobRecord) -> Optional[JobRecord]:
+            target = job.progress_target(style)
+            if not target:
                 return None
             
-            for page in job.pages:
+            for page in target.pages:
                 if page.page_number == page_number:
                     page.status = status
                     if image_path:
@@ -299,18 +483,121 @@ class JobStore:
             
             job.updated_at = datetime.now()
             return job
+        
+        return self._update(job_id, edit)
     
-    def set_result(self, job_id: str, result_path: str, result_json: Dict[str, Any]) -> Optional[JobRecord]:
-        """Set the job result."""
-        with self._lock:
-            job = self._jobs.get(job_id)
-            if not job:
+    def set_result(
+        self,
+        job_id: str,
+        result_path: str,
+        result_json: Dict[str, Any],
+        style: Optional[str] = None
+    ) -> Optional[JobRecord]:
+        """Set the job result, or the result of one style of a multi-style job."""
+        def edit(job: JobRecord) -> Optional[JobRecord]:
+            target = job.progress_target(style)
+            if not target:
+                return None
+            
+            target.result_path = result_path
+            target.result_json = result_json
+            job.updated_at = datetime.now()
+            return job
+        
+        return self._update(job_id, edit)
+    
+    def set_prompts(
+        self,
+        job_id: str,
+        prompts: List[Dict[str, Any]],
+        style: Optional[str] = None
+    ) -> Optional[JobRecord]:
+        """Store the image prompts of the job's (or a style's) result."""
+        def edit(job: JobRecord) -> Optional[JobRecord]:
+            target = job.progress_target(style)
+            if not target:
                 return None
             
-            job.result_path = result_path
-            job.result_json = result_json
+            target.prompts = prompts
+            job.updated_at = datetime.now()
+            return job
+        
+        return self._update(job_id, edit)
+    
+    def set_normalized_profile(self, job_id: str, normalized_profile: Dict[str, Any]) -> Optional[JobRecord]:
+        """Store the normalized profile of the job's input."""
+        def edit(job: JobRecord) -> Optional[JobRecord]:
+            job.normalized_profile = normalized_profile
+            job.updated_at = datetime.now()
+            return job
+        
+        return self._update(job_id, edit)
+    
+    def set_revised_input(
+        self,
+        job_id: str,
+        input_payload: Dict[str, Any],
+        normalized_profile: Dict[str, Any]
+    ) -> Optional[JobRecord]:
+        """
+        Replace the job's input with a revision whose result is already stored.
+        
+        Translated editions are dropped: their text is that of the old input.
+        """
+        def edit(job: JobRecord) -> Optional[JobRecord]:
+            job.input_payload = input_payload
+            job.normalized_profile = normalized_profile
+            job.editions = {}
             job.updated_at = datetime.now()
             return job
+        
+        return self._update(job_id, edit)
+    
+    def set_edition(
+        self,
+        job_id: str,
+        language: str,
+        result_json: Dict[str, Any],
+        style: Optional[str] = None
+    ) -> Optional[JobRecord]:
+        """Store a translated edition of the job's (or a style's) result."""
+        def edit(job: JobRecord) -> Optional[JobRecord]:
+            target = job.progress_target(style)
+            if not target:
+                return None
+            
+            target.editions[language] = result_json
+            job.updated_at = datetime.now()
+            return job
+        
+        return self._update(job_id, edit)
+    
+    def set_usage(self, job_id: str, usage: Dict[str, Any]) -> Optional[JobRecord]:
+        """Store the per-stage usage and cost breakdown of a job."""
+        def edit(job: JobRecord) -> Optional[JobRecord]:
+            job.usage = usage
+            job.updated_at = datetime.now()
+            return job
+        
+        return self._update(job_id, edit)
+    
+    def set_critical_path(
+        self,
+        job_id: str,
+        report: Optional[Dict[str, Any]],
+        style: Optional[str] = None
+    ) -> Optional[JobRecord]:
+        """Store the stage timing and critical-path report of a job or one of its styles."""
+        def edit(job: JobRecord) -> Optional[JobRecord]:
+            target = job.progress_target(style)
+            if not target:
+                return None
+            
+            target.critical_path = report
+            job.updated_at = datetime.now()
+            return job
+        
+        return self._update(job_id, edit)
     
     def list_jobs(self, limit: int = 100) -> List[JobRecord]:
         """List recent jobs."""
@@ -328,13 +615,186 @@ class JobStore:
             return False
 
 
+class SQLiteJobStore(JobStore):
+    """
+    Job store backed by a local SQLite database.
+    
+    Records are stored as JSON and every update runs inside an
+    immediate transaction, so several processes can safely update
+    the same job (API process reading, worker processes writing).
+    Updates made on the event loop are written by a background writer
+    thread; reads first wait for pending writes.
+    """
+    
+    def __init__(self, db_path: str):
+        """
+        Initialize the SQLite job store.
+        
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        super().__init__()
+        self.db_path = db_path
+        self._pending: "queue.Queue[Tuple[str, JobEdit]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        atexit.register(self.flush)
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS job_records (
+                    job_id TEXT PRIMARY KEY,
+                    created_at TEXT NOT NULL,
+                    data TEXT NOT NULL
+                )
+                """
+            )
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection with autocommit so transactions are explicit."""
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+    
+    def _update(self, job_id: str, edit: JobEdit) -> Optional[JobRecord]:
+        """
+        Apply an edit to a job record in the database.
+        
+        Off the event loop the edit is written at once. On the event loop
+        it is handed to the writer thread instead, so the loop never waits
+        for the database lock; the write lands shortly after and None is
+        returned.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return self._write(job_id, [edit])
+        
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_pending, name="job-store-writer", daemon=True)
+                self._writer.start()
+        self._pending.put((job_id, edit))
+        return None
+    
+    def flush(self) -> None:
+        """Wait until the writer thread has written every queued edit."""
+        self._pending.join()
+    
+    def _write_pending(self) -> None:
+        """
+        Writer thread: write queued edits, batching those of the same job.
+        
+        Each job's batch is loaded, edited and written back in a single
+        transaction, so a burst of progress updates parses and serializes
+        the record once.
+        """
+        while True:
+            batch = [self._pending.get()]
+            while True:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            
+            edits: Dict[str, List[JobEdit]] = {}
+            for job_id, edit in batch:
+                edits.setdefault(job_id, []).append(edit)
+            for job_id, job_edits in edits.items():
+                try:
+                    self._write(job_id, job_edits)
+                except Exception as e:
+                    logger.error(f"[{job_id}] Failed to write job record: {e}")
+            
+            for _ in batch:
+                self._pending.task_done()
+    
+    def _write(self, job_id: str, edits: List[JobEdit]) -> Optional[JobRecord]:
+        """Load a record, apply edits in order and write it back if any changed it."""
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    "SELECT data FROM job_records WHERE job_id = ?", (job_id,)
+                ).fetchone()
+                job = JobRecord.model_validate_json(row[0]) if row else None
+                edited = [edit(job) for edit in edits] if job else []
+                if any(result is not None for result in edited):
+                    conn.execute(
+                        "UPDATE job_records SET data = ? WHERE job_id = ?",
+                        (job.model_dump_json(), job_id)
+                    )
+                conn.execute("COMMIT")
+                return edited[-1] if edited else None
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+    
+    def _insert(self, record: JobRecord) -> None:
+        """Store a newly created job record."""
+        self.flush()
+        with self._lock, closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO job_records (job_id, created_at, data) VALUES (?, ?, ?)",
+                (record.job_id, record.created_at.isoformat(), record.model_dump_json())
+            )
+    
+    def get_job(self, job_id: str) -> Optional[JobRecord]:
+        """Get a job record by ID."""
+        self.flush()
+        with self._lock, closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT data FROM job_records WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return JobRecord.model_validate_json(row[0]) if row else None
+    
+    def list_jobs(self, limit: int = 100) -> List[JobRecord]:
+        """List recent jobs."""
+        self.flush()
+        with self._lock, closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT data FROM job_records ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [JobRecord.model_validate_json(row[0]) for row in rows]
+    
+    def delete_job(self, job_id: str) -> bool:
+        """Delete a job record."""
+        self.flush()
+        with self._lock, closing(self._connect()) as conn:
+            cursor = conn.execute("DELETE FROM job_records WHERE job_id = ?", (job_id,))
+            return cursor.rowcount > 0
+
+
 # Global job store instance
 _job_store: Optional[JobStore] = None
 
 
+def get_job_db_path() -> str:
+    """Get the SQLite database path shared by the API and worker processes."""
+    from utils.config import get_config
+    from .file_storage import STORAGE_DIR
+    
+    return get_config().job_db_path or os.path.join(STORAGE_DIR, "jobs.db")
+
+
 def get_job_store() -> JobStore:
-    """Get the global job store instance."""
+    """
+    Get the global job store instance.
+    
+    In queue mode the store is shared through SQLite so worker processes
+    can report progress; otherwise jobs live in process memory.
+    """
     global _job_store
     if _job_store is None:
-        _job_store = JobStore()
+        from utils.config import get_config
+        
+        if get_config().is_queue_mode:
+            _job_store = SQLiteJobStore(get_job_db_path())
+        else:
+            _job_store = JobStore()
     return _job_store
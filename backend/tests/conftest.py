@@ -7,10 +7,20 @@ Shared fixtures and configuration for tests.
 import pytest
 import sys
 import os
+from collections import Counter
 
 # Add backend to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import agents
+import clients.fake_genai as fake_genai
+import store.file_storage as file_storage
+import store.job_store
+from clients.fake_genai import FakeAPIError, FakeGenaiClient, ModelProfile
+from clients.gemini_client import set_sdk_factory
+from store import JobStore
+from utils.config import get_config
+
 
 @pytest.fixture(autouse=True)
 def setup_test_environment():
@@ -27,3 +37,91 @@ def setup_test_environment():
 def temp_directory(tmp_path):
     """Provide a temporary directory for tests."""
     return str(tmp_path)
+
+
+class RecordingFake(FakeGenaiClient):
+    """Fake backend that keeps the prompt and config of every request and can fail selected ones."""
+    
+    def __init__(self, reject_schemas: bool = False, fail_when: str = None, **kwargs):
+        super().__init__(**kwargs)
+        self.reject_schemas = reject_schemas
+        self.fail_when = fail_when
+        self.requests = []
+    
+    @property
+    def prompts(self):
+        return [prompt for prompt, _ in self.requests]
+    
+    def generate_content(self, model, contents, config=None):
+        self.requests.append((contents[-1], config))
+        if self.fail_when and self.fail_when in contents[-1]:
+            raise ValueError("request failed")
+        if self.reject_schemas and getattr(config, "response_schema", None) is not None:
+            raise FakeAPIError(400, "INVALID_ARGUMENT", "response_schema is not supported by this model")
+        return super().generate_content(model=model, contents=contents, config=config)
+
+
+@pytest.fixture
+def install_fake(tmp_path, monkeypatch):
+    """
+    Install a fake SDK, with storage and the reference cache in a temporary directory.
+    
+    Returns a factory taking the fake's class, constructor arguments and
+    optionally the size of streamed chunks; by default the fake is
+    error-free and answers at once.
+    """
+    monkeypatch.setattr(file_storage, "STORAGE_DIR", str(tmp_path / "storage"))
+    monkeypatch.setattr(get_config(), "reference_cache_directory", str(tmp_path / "cache"))
+    monkeypatch.setattr(fake_genai, "FALLBACK_PROFILE", ModelProfile(1.0, 0.1, 10000))
+    
+    def install(fake_class=FakeGenaiClient, stream_chunk=None, **kwargs):
+        options = {"time_scale": 0, "image_size": (256, 256), "image_variants": 1, "profiles": {}}
+        fake = fake_class(**{**options, **kwargs})
+        if stream_chunk is not None:
+            fake.STREAM_CHUNK = stream_chunk
+        set_sdk_factory(lambda api_key: fake)
+        return fake
+    
+    yield install
+    set_sdk_factory(None)
+
+
+@pytest.fixture
+def fake_backend(install_fake):
+    """Error-free fake SDK, with storage and the reference cache in a temporary directory."""
+    return install_fake()
+
+
+@pytest.fixture
+def recording_backend(install_fake):
+    """Factory installing a RecordingFake with small images; takes RecordingFake's arguments."""
+    def install(**kwargs):
+        return install_fake(RecordingFake, image_size=(64, 64), **kwargs)
+    
+    return install
+
+
+@pytest.fixture
+def job_store(monkeypatch):
+    """A fresh in-memory job store, installed as the global one."""
+    job_store = JobStore()
+    monkeypatch.setattr(store.job_store, "_job_store", job_store)
+    return job_store
+
+
+@pytest.fixture
+def agent_runs(monkeypatch):
+    """
+    Count the runs of each agent, by class name.
+    
+    Wraps the agents' run() as it is when the fixture is set up, so
+    fixtures replacing an agent's run() must come before it.
+    """
+    runs = Counter()
+    for name in agents.__all__:
+        agent = getattr(agents, name)
+        async def counted(self, input_data, run=agent.run, name=name):
+            runs[name] += 1
+            return await run(self, input_data)
+        monkeypatch.setattr(agent, "run", counted)
+    return runs
@@ -0,0 +1,117 @@
+"""
+Tests for Chunked Narrative Planning
+
+Tests that large books are planned as an outline plus concurrent
+per-phase expansions, merged and renumbered into one plan.
+"""
+
+import logging
+
+import pytest
+
+import sys
+sys.path.insert(0, '..')
+
+from agents.narrative_planner import NarrativePlannerAgent, PlanStream
+from clients.gemini_client import GeminiClient
+from models.planning import BackCoverConcept, CoverConcept, PhaseAllocation, PlanOutline
+from models.profile import NormalizedLifePhase, NormalizedProfile
+from models.user_input import BookPreferences
+
+
+PROFILE = NormalizedProfile(
+    subject_name="Ada",
+    life_phases=[
+        NormalizedLifePhase(phase_name=name, age_range=ages, core_memories=[f"{name} memory"])
+        for name, ages in [("young", "0-12"), ("adolescent", "13-19"), ("adult", "20-64"), ("elderly", "65+")]
+    ]
+)
+
+
+def outline_with(allocation):
+    """Plan outline allotting pages as given by (phase, count) pairs."""
+    return PlanOutline(
+        book_title="Ada",
+        cover=CoverConcept(main_subject_pose="smiling", mood="warm"),
+        back_cover=BackCoverConcept(),
+        phases=[PhaseAllocation(life_phase=name, page_count=count) for name, count in allocation]
+    )
+
+
+def planner() -> NarrativePlannerAgent:
+    return NarrativePlannerAgent(GeminiClient(api_key="fake-key"), logging.getLogger("test"))
+
+
+class TestPageAllocation:
+    """Tests for fixing up the outline's page allocation."""
+    
+    def test_allocation_is_rebalanced_to_page_count(self):
+        """Test counts are scaled to the page count, in profile order."""
+        allocation = planner()._allocate_pages(
+            outline_with([("elderly", 4), ("young", 4), ("adult", 8), ("adolescent", 2)]), PROFILE, 20
+        )
+        
+        assert [a.life_phase for a in allocation] == ["young", "adolescent", "adult", "elderly"]
+        assert sum(a.page_count for a in allocation) == 20
+        assert allocation[2].page_count == max(a.page_count for a in allocation)
+    
+    def test_empty_allocation_splits_evenly(self):
+        """Test an outline without page counts gets an even split."""
+        allocation = planner()._allocate_pages(outline_with([]), PROFILE, 20)
+        
+        assert [a.page_count for a in allocation] == [5, 5, 5, 5]
+    
+    def test_phases_without_pages_are_dropped(self):
+        """Test a phase the outline gave no pages is not expanded."""
+        allocation = planner()._allocate_pages(outline_with([("young", 10), ("adult", 5)]), PROFILE, 15)
+        
+        assert [(a.life_phase, a.page_count) for a in allocation] == [("young", 10), ("adult", 5)]
+
+
+class TestChunkedPlanning:
+    """Tests for outline-then-expand planning."""
+    
+    @pytest.mark.asyncio
+    async def test_large_book_is_planned_per_phase(self, recording_backend):
+        """Test a 20-page book is planned by an outline and one call per phase."""
+        fake = recording_backend()
+        preferences = BookPreferences(title="Ada", date="2024", page_count=20, style="watercolor")
+        stream = PlanStream()
+        
+        plan = await planner().execute((PROFILE, preferences, "en-US", stream))
+        
+        assert [p.page_number for p in plan.pages] == list(range(1, 21))
+        assert plan.total_pages == 20
+        phases = [p.life_phase for p in plan.pages]
+        assert phases == sorted(phases, key=["young", "adolescent", "adult", "elderly"].index)
+        assert sum("-page section" in prompt for prompt in fake.prompts) == len(set(phases))
+        assert len(fake.prompts) == len(set(phases)) + 1
+        # Every page was published to the stream
+        assert sorted(p.page_number for p in stream._pages) == list(range(1, 21))
+        assert await stream.plan() is plan
+    
+    @pytest.mark.asyncio
+    async def test_small_book_uses_one_call(self, recording_backend):
+        """Test books below the threshold keep the single planning call."""
+        fake = recording_backend()
+        preferences = BookPreferences(title="Ada", date="2024", page_count=10, style="watercolor")
+        
+        plan = await planner().execute((PROFILE, preferences, "en-US"))
+        
+        assert len(plan.pages) == 10
+        assert len(fake.prompts) == 1
+    
+    @pytest.mark.asyncio
+    async def test_failed_phase_gets_fallback_pages(self, recording_backend):
+        """Test a phase whose call fails is filled with placeholder pages."""
+        fake = recording_backend(fail_when="of the adult life phase")
+        preferences = BookPreferences(title="Ada", date="2024", page_count=20, style="watercolor")
+        
+        plan = await planner().execute((PROFILE, preferences, "en-US"))
+        
+        assert [p.page_number for p in plan.pages] == list(range(1, 21))
+        adult = [p for p in plan.pages if p.life_phase == "adult"]
+        assert adult and all(p.scene_description.startswith("Illustration of:") for p in adult)
+        # The adult phase was requested and failed; the other phases were planned
+        assert any("of the adult life phase" in prompt for prompt in fake.prompts)
+        assert not all(p.scene_description.startswith("Illustration of:") for p in plan.pages)
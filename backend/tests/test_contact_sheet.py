@@ -0,0 +1,133 @@
+"""
+Tests for Contact-Sheet Review
+
+Tests tiling page images into labelled contact sheets and reviewing a
+whole book in one vision call.
+"""
+
+import io
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from PIL import Image
+
+import sys
+sys.path.insert(0, '..')
+
+from agents.illustrator_reviewer import IllustratorReviewerAgent
+from clients.fake_genai import render_image
+from models.generation import GenerationResult, GenerationMetadata
+from models.user_input import BookPreferences
+from utils.contact_sheet import TILE_SIZE, build_contact_sheets
+
+
+@pytest.fixture
+def pages(tmp_path):
+    """Twenty page JPEGs as generation results."""
+    image = Image.open(io.BytesIO(render_image(400, 600, seed=1)))
+    results = []
+    for number in range(20):
+        path = tmp_path / f"page_{number:02d}.jpg"
+        image.save(path, "JPEG", quality=60)
+        results.append(GenerationResult(
+            success=True, image_path=str(path), metadata=GenerationMetadata(generation_id=str(number))
+        ))
+    return results
+
+
+@pytest.fixture
+def preferences():
+    return BookPreferences(title="Book", date="2024", page_count=20, style="watercolor")
+
+
+def review_item(page_number, action="approve"):
+    return {
+        "page_number": page_number, "artistic_assessment": "Good", "color_harmony": "good",
+        "style_adherence": "good", "recommended_action": action
+    }
+
+
+class TestBuildContactSheets:
+    """Tests for build_contact_sheets."""
+    
+    def test_pages_are_tiled_across_sheets(self, pages, tmp_path):
+        """Test 20 pages fill two sheets of at most 12 tiles, 4 columns wide."""
+        out = tmp_path / "sheets"
+        out.mkdir()
+        
+        sheets = build_contact_sheets([(i, r.image_path) for i, r in enumerate(pages)], str(out))
+        
+        assert len(sheets) == 2
+        first, second = Image.open(sheets[0]), Image.open(sheets[1])
+        assert first.width == second.width > 4 * TILE_SIZE
+        assert first.height > 3 * TILE_SIZE and second.height < 3 * TILE_SIZE
+    
+    def test_unreadable_page_gets_placeholder(self, tmp_path):
+        """Test a missing image still gets a tile."""
+        sheets = build_contact_sheets([(1, str(tmp_path / "missing.jpg"))], str(tmp_path))
+        
+        assert Image.open(sheets[0]).width > TILE_SIZE
+
+
+class TestContactSheetReview:
+    """Tests for IllustratorReviewerAgent in contact-sheet mode."""
+    
+    @pytest.mark.asyncio
+    async def test_book_reviewed_in_one_call(self, pages, preferences):
+        """Test a 20-page book takes one vision call and keeps per-page reviews."""
+        gemini = Mock()
+        gemini.analyze_images = AsyncMock(return_value={
+            "pages": [review_item(i, "regenerate" if i == 5 else "approve") for i in range(20)],
+            "book_assessment": {
+                "cohesion_assessment": "Cohesive", "style_consistency": "good",
+                "consistency_issues": ["Page 5 is darker"], "inconsistent_pages": [5, 99]
+            }
+        })
+        
+        reviews = await IllustratorReviewerAgent(gemini, Mock()).execute((pages, preferences, "en-US"))
+        
+        gemini.analyze_images.assert_called_once()
+        assert len(gemini.analyze_images.call_args.kwargs["images"]) == 2
+        assert reviews.vision_calls == 1
+        assert [r.page_number for r in reviews.pages] == list(range(20))
+        assert reviews.pages[5].recommended_action == "regenerate"
+        assert reviews.book_assessment.inconsistent_pages == [5]
+    
+    @pytest.mark.asyncio
+    async def test_missing_and_failed_pages(self, pages, preferences):
+        """Test pages absent from the reply default to approval and failed pages to regeneration."""
+        pages[3] = GenerationResult(success=False, metadata=GenerationMetadata(generation_id="failed"))
+        gemini = Mock()
+        gemini.analyze_images = AsyncMock(return_value={"pages": [review_item(i) for i in range(10)]})
+        
+        reviews = await IllustratorReviewerAgent(gemini, Mock()).execute((pages, preferences, "en-US"))
+        
+        assert len(reviews.pages) == 20
+        assert reviews.pages[3].recommended_action == "regenerate"
+        assert reviews.pages[15].recommended_action == "approve"
+        assert reviews.book_assessment is None
+    
+    @pytest.mark.asyncio
+    async def test_falls_back_to_per_page_review(self, pages, preferences):
+        """Test a failed contact-sheet call falls back to one call per page."""
+        gemini = Mock()
+        gemini.analyze_images = AsyncMock(side_effect=[RuntimeError("boom")] + [review_item(0)] * 4)
+        
+        reviews = await IllustratorReviewerAgent(gemini, Mock()).execute((pages[:4], preferences, "en-US"))
+        
+        assert gemini.analyze_images.call_count == 5
+        assert reviews.vision_calls == 4
+        assert [r.page_number for r in reviews.pages] == [0, 1, 2, 3]
+    
+    @pytest.mark.asyncio
+    async def test_per_page_mode(self, pages, preferences):
+        """Test contact sheets can be turned off."""
+        gemini = Mock()
+        gemini.analyze_images = AsyncMock(return_value=review_item(0))
+        agent = IllustratorReviewerAgent(gemini, Mock())
+        agent.CONTACT_SHEET = False
+        
+        reviews = await agent.execute((pages[:3], preferences, "en-US"))
+        
+        assert gemini.analyze_images.call_count == 3
+        assert reviews.book_assessment is None
@@ -0,0 +1,140 @@
+"""
+Tests for Book Editions
+
+Tests translating a completed book into other languages with one
+batched call per language, reusing the book's images.
+"""
+
+import json
+import os
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+import sys
+sys.path.insert(0, '..')
+
+import pipeline.editions as editions
+import store.file_storage as file_storage
+from agents.edition_translator import EditionTranslatorAgent
+from models.output import BookPage, FinalBookPackage
+from pipeline.editions import edition_languages, translate_editions
+
+
+def translate_all(language, drop=()):
+    """generate_json stand-in translating every segment it is sent, except the dropped texts."""
+    async def generate_json(system_prompt, user_prompt, schema):
+        segments = json.loads(user_prompt.split("\n", 1)[1])
+        return {"segments": [
+            {"id": segment["id"], "text": f"[{language}] {segment['text']}"}
+            for segment in segments
+            if segment["text"] not in drop
+        ]}
+    return generate_json
+
+
+@pytest.fixture
+def package():
+    return FinalBookPackage(
+        book_id="book-1",
+        title="A vida de Maria",
+        style="watercolor",
+        language="pt-BR",
+        cover=BookPage(page_number=0, page_type="cover", image_path="cover.jpg", narrative_text="A vida de Maria"),
+        back_cover=BookPage(page_number=-1, page_type="back_cover", image_path="back_cover.jpg", narrative_text="Fim"),
+        pages=[
+            BookPage(
+                page_number=number,
+                page_type="content",
+                image_path=f"page_{number:02d}.jpg",
+                narrative_text=f"Página {number}",
+                memory_reference="Brincando no jardim"
+            )
+            for number in (1, 2)
+        ],
+        total_pages=4
+    )
+
+
+class TestEditionTranslator:
+    """Tests for the edition translator agent."""
+    
+    @pytest.mark.asyncio
+    async def test_translates_text_and_keeps_images(self, package):
+        """Test every text is translated in one call and image paths are unchanged."""
+        gemini = Mock()
+        gemini.generate_json = AsyncMock(side_effect=translate_all("en-US"))
+        
+        edition = await EditionTranslatorAgent(gemini, Mock()).run((package, "pt-BR", "en"))
+        
+        assert gemini.generate_json.await_count == 1
+        assert edition.language == "en-US"
+        assert edition.title == "[en-US] A vida de Maria"
+        assert edition.cover.narrative_text == "[en-US] A vida de Maria"
+        assert edition.pages[1].narrative_text == "[en-US] Página 2"
+        assert edition.pages[0].memory_reference == "[en-US] Brincando no jardim"
+        assert edition.get_all_image_paths() == package.get_all_image_paths()
+        # Repeated texts are sent once
+        segments = json.loads(gemini.generate_json.await_args.kwargs["user_prompt"].split("\n", 1)[1])
+        assert len(segments) == 5
+    
+    @pytest.mark.asyncio
+    async def test_asks_again_for_missing_segments(self, package):
+        """Test segments dropped by the model are requested in a second call."""
+        gemini = Mock()
+        first_call = translate_all("es-ES", drop={"Fim"})
+        
+        async def generate_json(**kwargs):
+            if gemini.generate_json.await_count == 1:
+                return await first_call(**kwargs)
+            return {"segments": [{"id": "s1", "text": "Fin"}]}
+        gemini.generate_json = AsyncMock(side_effect=generate_json)
+        
+        edition = await EditionTranslatorAgent(gemini, Mock()).run((package, "pt-BR", "es"))
+        
+        assert gemini.generate_json.await_count == 2
+        assert edition.back_cover.narrative_text == "Fin"
+        assert "Fim" in gemini.generate_json.await_args.kwargs["user_prompt"]
+    
+    @pytest.mark.asyncio
+    async def test_fails_when_segments_stay_missing(self, package):
+        """Test an incomplete translation raises instead of mixing languages."""
+        gemini = Mock()
+        gemini.generate_json = AsyncMock(side_effect=translate_all("es-ES", drop={"Fim"}))
+        
+        with pytest.raises(ValueError, match="1 of 5 segments missing"):
+            await EditionTranslatorAgent(gemini, Mock()).run((package, "pt-BR", "es"))
+
+
+class TestTranslateEditions:
+    """Tests for translating a job's book into several languages."""
+    
+    def test_edition_languages(self):
+        """Test languages are resolved, deduplicated and the source language dropped."""
+        assert edition_languages(["en", "pt", "en-US", "es"], "pt-BR") == ["en-US", "es-ES"]
+    
+    @pytest.mark.asyncio
+    async def test_stores_editions_per_language(self, package, job_store, tmp_path, monkeypatch):
+        """Test each language is one call, saved next to result.json and stored on the job."""
+        monkeypatch.setattr(file_storage, "STORAGE_DIR", str(tmp_path / "storage"))
+        gemini = Mock()
+        gemini.close = AsyncMock()
+        
+        async def generate_json(system_prompt, user_prompt, schema):
+            language = "fr-FR" if "fr-FR" in system_prompt else "en-US"
+            if language == "fr-FR":
+                raise RuntimeError("quota exhausted")
+            return await translate_all(language)(system_prompt, user_prompt, schema)
+        gemini.generate_json = AsyncMock(side_effect=generate_json)
+        monkeypatch.setattr(editions, "GeminiClient", Mock(return_value=gemini))
+        job_store.create_job("job-1", page_count=2, user_language="pt-BR")
+        
+        errors = await translate_editions("job-1", package, ["en-US", "fr-FR"])
+        
+        assert errors["en-US"] is None and "quota exhausted" in errors["fr-FR"]
+        job = job_store.get_job("job-1")
+        assert list(job.editions) == ["en-US"]
+        assert job.editions["en-US"]["pages"][0]["narrative_text"] == "[en-US] Página 1"
+        assert job.to_status_response()["editions"] == ["en-US"]
+        assert os.path.exists(os.path.join(file_storage.get_outputs_dir("job-1"), "result.en-US.json"))
+        gemini.close.assert_awaited_once()
@@ -0,0 +1,105 @@
+"""
+Tests for the Fake GenAI Backend
+
+Tests that GeminiClient runs its real code paths against the fake SDK
+used by the benchmark.
+"""
+
+import os
+import logging
+
+import pytest
+
+import sys
+sys.path.insert(0, '..')
+
+from clients.fake_genai import FakeAPIError, ModelProfile
+from clients.gemini_client import GeminiClient
+from models.planning import NarrativePlan
+from models.prompts import PromptItem
+from models.visual import VisualFingerprint
+from pipeline.runner import PipelineRunner
+
+
+class TestFakeGenai:
+    """Tests for FakeGenaiClient."""
+    
+    @pytest.mark.asyncio
+    async def test_json_follows_schema_and_page_count(self, fake_backend):
+        """Test JSON responses validate against the requested schema."""
+        client = GeminiClient(api_key="fake-key")
+        fake_backend.profiles = {client.model: ModelProfile(1.0, 0.1, 100)}
+        
+        result = await client.generate_json(
+            "You plan books.", "Create a narrative plan for a 15-page memory book.", schema=NarrativePlan
+        )
+        
+        plan = NarrativePlan(**result)
+        assert plan.total_pages == 15
+        assert [p.page_number for p in plan.pages] == list(range(1, 16))
+        assert fake_backend.stats.calls == {client.model: 1}
+    
+    @pytest.mark.asyncio
+    async def test_image_is_compressed_to_jpeg(self, fake_backend, tmp_path):
+        """Test image responses go through Pillow compression."""
+        fake_backend.profiles = {GeminiClient.MODEL_IMAGE: ModelProfile(1.0, 0.1, 100)}
+        client = GeminiClient(api_key="fake-key")
+        
+        result = await client.generate_image("A garden", output_path=str(tmp_path / "page_01.png"))
+        
+        assert result.success
+        assert result.image_path.endswith("page_01.jpg")
+        assert os.path.getsize(result.image_path) > 0
+    
+    def test_rate_limit_raises_429(self, fake_backend):
+        """Test requests over the per-minute limit are rejected."""
+        fake_backend.profiles = {"limited-model": ModelProfile(1.0, 0.1, requests_per_minute=1)}
+        
+        fake_backend.models.generate_content(model="limited-model", contents=["hi"])
+        with pytest.raises(FakeAPIError) as error:
+            fake_backend.models.generate_content(model="limited-model", contents=["hi"])
+        
+        assert error.value.code == 429
+        assert fake_backend.stats.rate_limited == {"limited-model": 1}
+    
+    @pytest.mark.asyncio
+    async def test_refusal_is_classified_as_safety(self, fake_backend, tmp_path):
+        """Test a safety refusal is reported as such instead of a transient failure."""
+        fake_backend.profiles = {GeminiClient.MODEL_IMAGE: ModelProfile(1.0, 0.1, 100, refusal_rate=1.0)}
+        client = GeminiClient(api_key="fake-key")
+        
+        result = await client.generate_image("A garden", output_path=str(tmp_path / "page_01.png"))
+        
+        assert not result.success
+        assert result.error_class == "safety"
+        assert "SAFETY" in result.error_message
+    
+    @pytest.mark.asyncio
+    async def test_refused_page_goes_straight_to_repair(self, fake_backend, tmp_path):
+        """Test a refused page skips retries and is regenerated once with a repaired prompt."""
+        client = GeminiClient(api_key="fake-key")
+        fake_backend.profiles = {
+            client.model: ModelProfile(1.0, 0.1, 100),
+            GeminiClient.MODEL_IMAGE: ModelProfile(1.0, 0.1, 100, refusal_rate=1.0),
+        }
+        runner = PipelineRunner(client, logging.getLogger("test"))
+        prompt = PromptItem(
+            page_number=1,
+            prompt_type="page",
+            main_prompt="A child climbing an old oak tree",
+            character_description="A young girl with curly hair",
+            scene_description="A sunny garden",
+            style_prompt="Watercolor"
+        )
+        
+        prompts = [prompt]
+        results = await runner._generate_all_images(
+            prompts, None, str(tmp_path), VisualFingerprint(), "English"
+        )
+        
+        assert results[0].error_class == "safety"
+        # The repaired prompt replaces the refused one for validation
+        assert prompts[0].version == prompt.version + 1
+        # The refused call and the repaired one; no blind retries in between
+        assert fake_backend.stats.calls[GeminiClient.MODEL_IMAGE] == 2
+        assert fake_backend.stats.calls[client.model] == 1
@@ -0,0 +1,176 @@
+"""
+Tests for Request Hedging
+
+Tests hedge timing, cancellation of the loser, per-job budgets and the
+scheduler slot of a cancelled request.
+"""
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import sys
+sys.path.insert(0, '..')
+
+import clients.call_scheduler as call_scheduler
+import clients.hedging as hedging
+from clients.call_scheduler import CallScheduler, KIND_IMAGE
+from clients.gemini_client import GeminiClient, set_sdk_factory
+from clients.hedging import HedgePolicy, HedgeUnavailable, hedged_call
+from utils import metrics
+from utils.config import get_config
+from utils.job_context import job_context
+
+
+def _warm_policy(latency=0.02, **kwargs):
+    """A policy whose recent latencies put the hedge delay at `latency`."""
+    policy = HedgePolicy(min_samples=5, **kwargs)
+    for _ in range(50):
+        policy.observe(latency)
+    return policy
+
+
+def _hedges(outcome):
+    return metrics.IMAGE_HEDGES.value(outcome=outcome)
+
+
+class TestHedging:
+    """Tests for hedged_call and HedgePolicy."""
+    
+    @pytest.mark.asyncio
+    async def test_no_hedge_until_enough_samples(self):
+        """Test hedging waits for a latency baseline."""
+        policy = HedgePolicy(min_samples=5)
+        calls = []
+        
+        async def call():
+            calls.append("primary")
+            return "done"
+        
+        async def hedge():
+            calls.append("hedge")
+        
+        assert policy.delay() is None
+        assert await hedged_call(call, hedge, policy) == "done"
+        assert calls == ["primary"]
+    
+    @pytest.mark.asyncio
+    async def test_slow_request_is_hedged_and_loser_cancelled(self):
+        """Test the first success wins and the slow primary is cancelled."""
+        policy = _warm_policy()
+        cancelled = []
+        won_before = _hedges("won")
+        
+        async def slow():
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append("primary")
+                raise
+            return "primary"
+        
+        async def fast():
+            await asyncio.sleep(0.01)
+            return "hedge"
+        
+        with job_context("job-hedge-win"):
+            assert await hedged_call(slow, fast, policy) == "hedge"
+        assert cancelled == ["primary"]
+        assert policy.spent("job-hedge-win") == 1
+        assert _hedges("won") == won_before + 1
+    
+    @pytest.mark.asyncio
+    async def test_budget_limits_hedges_per_job(self):
+        """Test a job stops hedging once its budget is spent."""
+        policy = _warm_policy(budget_per_job=1)
+        hedges = []
+        
+        async def slow():
+            await asyncio.sleep(0.06)
+            return "primary"
+        
+        async def hedge():
+            hedges.append(1)
+            await asyncio.sleep(1)
+        
+        with job_context("job-hedge-budget"):
+            assert await hedged_call(slow, hedge, policy) == "primary"
+            assert await hedged_call(slow, hedge, policy) == "primary"
+        with job_context("job-hedge-other"):
+            assert await hedged_call(slow, hedge, policy) == "primary"
+        
+        assert len(hedges) == 2
+    
+    @pytest.mark.asyncio
+    async def test_unavailable_hedge_is_refunded(self):
+        """Test a hedge without a free slot does not use the budget."""
+        policy = _warm_policy()
+        
+        async def slow():
+            await asyncio.sleep(0.05)
+            return "primary"
+        
+        async def no_slot():
+            raise HedgeUnavailable("busy")
+        
+        with job_context("job-hedge-slot"):
+            assert await hedged_call(slow, no_slot, policy) == "primary"
+        assert policy.spent("job-hedge-slot") == 0
+    
+    @pytest.mark.asyncio
+    async def test_primary_error_raised_when_all_fail(self):
+        """Test failures propagate once no request succeeds."""
+        policy = _warm_policy()
+        
+        async def failing():
+            await asyncio.sleep(0.05)
+            raise RuntimeError("primary failed")
+        
+        async def failing_hedge():
+            raise RuntimeError("hedge failed")
+        
+        with pytest.raises(RuntimeError, match="primary failed"):
+            await hedged_call(failing, failing_hedge, policy)
+
+
+class TestHedgedSlots:
+    """Tests for the scheduler slots of hedged image requests."""
+    
+    @pytest.mark.asyncio
+    async def test_loser_keeps_its_slot_until_its_thread_returns(self, monkeypatch):
+        """Test the cancelled primary's slot stays in use while its SDK call still runs."""
+        scheduler = CallScheduler(limits={KIND_IMAGE: 2})
+        monkeypatch.setattr(call_scheduler, "_call_scheduler", scheduler)
+        monkeypatch.setattr(hedging, "_hedge_policy", _warm_policy())
+        monkeypatch.setattr(get_config(), "image_hedging_enabled", True)
+        release = threading.Event()
+        calls = []
+        
+        def generate_content(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                # The primary hangs until the test releases it
+                release.wait(5)
+            return SimpleNamespace(candidates=[])
+        
+        sdk = SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+        set_sdk_factory(lambda api_key: sdk)
+        try:
+            client = GeminiClient(api_key="key")
+            client._ensure_client()
+            await client._scheduled_call(KIND_IMAGE, hedge=True, model="image", contents="A garden")
+            
+            assert len(calls) == 2
+            assert scheduler.stats()[KIND_IMAGE]["in_use"] == 1
+            
+            release.set()
+            for _ in range(100):
+                if scheduler.stats()[KIND_IMAGE]["in_use"] == 0:
+                    break
+                await asyncio.sleep(0.01)
+            assert scheduler.stats()[KIND_IMAGE]["in_use"] == 0
+        finally:
+            release.set()
+            set_sdk_factory(None)
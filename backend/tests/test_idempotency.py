@@ -0,0 +1,208 @@
+"""
+Tests for Idempotent Job Submission
+
+Tests the idempotency index and duplicate POST /jobs requests.
+"""
+
+import asyncio
+import json
+
+import pytest
+from fastapi import BackgroundTasks, HTTPException
+
+import sys
+sys.path.insert(0, '..')
+
+import store.idempotency as idempotency
+from store import JobStore
+from store.idempotency import IdempotencyIndex, IdempotencyConflictError, request_fingerprint
+
+
+class Clock:
+    """Controllable time.time() for expiry."""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(idempotency.time, "time", clock)
+    return clock
+
+
+class TestIdempotencyIndex:
+    """Tests for IdempotencyIndex."""
+    
+    @pytest.mark.asyncio
+    async def test_duplicate_returns_the_job(self):
+        """Test a completed key returns its job, and a new key is claimed."""
+        index = IdempotencyIndex(ttl_seconds=60, max_entries=10)
+        
+        assert await index.claim("a", "request") is None
+        index.complete("a", "job-1")
+        
+        assert await index.claim("a", "request") == "job-1"
+        assert await index.claim("b", "request") is None
+    
+    @pytest.mark.asyncio
+    async def test_key_reused_for_another_request(self):
+        """Test a key cannot be reused with a different request."""
+        index = IdempotencyIndex(ttl_seconds=60, max_entries=10)
+        await index.claim("a", "request")
+        index.complete("a", "job-1")
+        
+        with pytest.raises(IdempotencyConflictError):
+            await index.claim("a", "other request")
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_duplicates_coalesce(self):
+        """Test duplicates arriving while the job is created wait for it."""
+        index = IdempotencyIndex(ttl_seconds=60, max_entries=10)
+        assert await index.claim("a", "request") is None
+        
+        waiters = [asyncio.create_task(index.claim("a", "request")) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert not any(waiter.done() for waiter in waiters)
+        index.complete("a", "job-1")
+        
+        assert await asyncio.gather(*waiters) == ["job-1"] * 3
+    
+    @pytest.mark.asyncio
+    async def test_failed_request_hands_over_the_key(self):
+        """Test one waiter takes over a key whose request failed, the others wait for it."""
+        index = IdempotencyIndex(ttl_seconds=60, max_entries=10)
+        await index.claim("a", "request")
+        waiters = [asyncio.create_task(index.claim("a", "request")) for _ in range(2)]
+        await asyncio.sleep(0)
+        
+        index.release("a")
+        done, pending = await asyncio.wait(waiters, timeout=0.1)
+        
+        assert [task.result() for task in done] == [None]
+        index.complete("a", "job-2")
+        assert await pending.pop() == "job-2"
+    
+    @pytest.mark.asyncio
+    async def test_keys_expire(self, clock):
+        """Test keys expire after their TTL, counted from completion."""
+        index = IdempotencyIndex(ttl_seconds=60, max_entries=10)
+        await index.claim("a", "request")
+        await index.claim("b", "request", ttl_seconds=5)
+        clock.now += 30
+        index.complete("a", "job-1")
+        index.complete("b", "job-2")
+        
+        clock.now += 50
+        assert await index.claim("a", "request") == "job-1"
+        assert await index.claim("b", "request") is None
+        clock.now += 11
+        assert await index.claim("a", "request") is None
+    
+    @pytest.mark.asyncio
+    async def test_bounded(self):
+        """Test the oldest completed keys are evicted, never a pending one."""
+        index = IdempotencyIndex(ttl_seconds=60, max_entries=2)
+        await index.claim("pending", "request")
+        for key in ("a", "b", "c"):
+            await index.claim(key, "request")
+            index.complete(key, f"job-{key}")
+        
+        assert len(index) == 2
+        assert await index.claim("c", "request") == "job-c"
+        assert await index.claim("a", "request") is None
+        index.complete("pending", "job-pending")
+        assert await index.claim("pending", "request") == "job-pending"
+    
+    @pytest.mark.asyncio
+    async def test_forget_job(self):
+        """Test a deleted job's keys are dropped."""
+        index = IdempotencyIndex(ttl_seconds=60, max_entries=10)
+        await index.claim("a", "request")
+        index.complete("a", "job-1")
+        
+        index.forget_job("job-1")
+        
+        assert await index.claim("a", "request") is None
+    
+    def test_request_fingerprint(self):
+        """Test the fingerprint covers the payload, photos and reference session."""
+        payload = {"title": "Book", "page_count": 10}
+        base = request_fingerprint(payload, [b"photo"])
+        
+        assert request_fingerprint({"page_count": 10, "title": "Book"}, [b"photo"]) == base
+        assert request_fingerprint(payload, [b"other photo"]) != base
+        assert request_fingerprint(payload, [b"photo"], "session") != base
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """The app with a fresh job store and idempotency index."""
+    import app
+    monkeypatch.setattr(app, "job_store", JobStore())
+    monkeypatch.setattr(idempotency, "_idempotency_index", IdempotencyIndex(ttl_seconds=60, max_entries=10))
+    return app
+
+
+def submit(api, payload, key=None):
+    return api.create_job(
+        BackgroundTasks(), payload=json.dumps(payload), reference_images=[], reference_session=None,
+        idempotency_key=key
+    )
+
+
+class TestCreateJobDeduplication:
+    """Tests for duplicate POST /jobs requests."""
+    
+    @pytest.mark.asyncio
+    async def test_idempotency_key(self, api):
+        """Test a retried request with the same key returns the first job."""
+        payload = {"title": "Book", "date": "2024"}
+        first = await submit(api, payload, key="k1")
+        retry = await submit(api, payload, key="k1")
+        other = await submit(api, payload, key="k2")
+        
+        assert not first.duplicate and retry.duplicate
+        assert retry.job_id == first.job_id and retry.status == "queued"
+        assert other.job_id != first.job_id
+        assert len(api.job_store.list_jobs()) == 2
+    
+    @pytest.mark.asyncio
+    async def test_key_reused_with_another_payload(self, api):
+        """Test a key reused for a different payload is rejected."""
+        await submit(api, {"title": "Book", "date": "2024"}, key="k1")
+        
+        with pytest.raises(HTTPException) as error:
+            await submit(api, {"title": "Other book", "date": "2024"}, key="k1")
+        assert error.value.status_code == 422
+    
+    @pytest.mark.asyncio
+    async def test_identical_requests_without_key(self, api, monkeypatch):
+        """Test identical payloads within the dedup window return the same job, unless disabled."""
+        payload = {"title": "Book", "date": "2024"}
+        first = await submit(api, payload)
+        
+        assert (await submit(api, payload)).job_id == first.job_id
+        assert (await submit(api, {**payload, "page_count": 12})).job_id != first.job_id
+        
+        monkeypatch.setattr(api.config, "job_dedup_window_seconds", 0)
+        assert (await submit(api, payload)).job_id != first.job_id
+    
+    @pytest.mark.asyncio
+    async def test_failed_request_releases_the_key(self, api):
+        """Test a request that fails leaves its key free for the retry."""
+        payload = {"title": "Book", "date": "2024"}
+        failed = api.create_job(
+            BackgroundTasks(), payload=json.dumps(payload), reference_images=[], reference_session="unknown",
+            idempotency_key="k1"
+        )
+        with pytest.raises(HTTPException):
+            await failed
+        
+        assert len(idempotency.get_idempotency_index()) == 0
+        response = await submit(api, payload, key="k1")
+        assert not response.duplicate
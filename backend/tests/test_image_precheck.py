@@ -0,0 +1,165 @@
+"""
+Tests for Image Pre-Check
+
+Tests the local NumPy image checks, that rejected images skip the
+vision-model validator and that jobs regenerate them.
+"""
+
+import io
+import time
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from PIL import Image
+
+import sys
+sys.path.insert(0, '..')
+
+from agents.image_validator import ImageValidatorAgent
+from clients.fake_genai import render_image
+from models.generation import GenerationResult, GenerationMetadata, ImageSignals
+from models.job_payload import JobPayload
+from models.visual import VisualFingerprint
+from pipeline.job_processor import process_job_background
+from store import JobStatus, PageStatus
+from utils import metrics
+from utils.image_precheck import analyze_image, describe_flags, mark_duplicates
+
+
+def save_jpeg(path, image):
+    """Save an image the way the image client does."""
+    image.save(path, "JPEG", quality=60, optimize=True, progressive=True)
+    return str(path)
+
+
+@pytest.fixture
+def illustration(tmp_path):
+    """A detailed 600x600 JPEG."""
+    image = Image.open(io.BytesIO(render_image(600, 600, seed=1)))
+    return save_jpeg(tmp_path / "page_01.jpg", image)
+
+
+def result_for(path):
+    return GenerationResult(success=True, image_path=path, metadata=GenerationMetadata(generation_id="test"))
+
+
+class TestAnalyzeImage:
+    """Tests for single-image checks."""
+    
+    def test_detailed_image_passes(self, illustration):
+        """Test a normal illustration has no flags."""
+        signals = analyze_image(illustration, expected_aspect=1.0)
+        
+        assert signals.flags == []
+        assert signals.entropy > 5
+        assert len(signals.phash) == 16
+        assert (signals.width, signals.height) == (600, 600)
+    
+    def test_flat_image_is_blank(self, tmp_path):
+        """Test a single-colour image is flagged blank."""
+        path = save_jpeg(tmp_path / "blank.jpg", Image.new("RGB", (600, 600), (245, 240, 230)))
+        
+        assert analyze_image(path).flags == ["blank"]
+    
+    def test_truncated_file_is_unreadable(self, illustration, tmp_path):
+        """Test a JPEG cut off mid-file is flagged unreadable."""
+        data = open(illustration, "rb").read()
+        path = tmp_path / "truncated.jpg"
+        path.write_bytes(data[:len(data) // 2])
+        
+        assert analyze_image(str(path)).flags == ["unreadable"]
+    
+    def test_wrong_aspect_ratio(self, tmp_path):
+        """Test a landscape image is flagged when a square was requested."""
+        image = Image.open(io.BytesIO(render_image(600, 300, seed=2)))
+        path = save_jpeg(tmp_path / "wide.jpg", image)
+        
+        signals = analyze_image(path, expected_aspect=1.0)
+        
+        assert signals.flags == ["aspect_ratio"]
+        assert describe_flags(signals) == ["Image has the wrong aspect ratio (600x300)"]
+    
+    def test_analysis_is_fast(self, illustration):
+        """Test a page image is analysed well under 10ms."""
+        analyze_image(illustration)
+        timings = []
+        for _ in range(20):
+            started = time.perf_counter()
+            analyze_image(illustration)
+            timings.append(time.perf_counter() - started)
+        
+        assert sorted(timings)[len(timings) // 2] < 0.010
+
+
+class TestDuplicates:
+    """Tests for cross-page near-duplicate detection."""
+    
+    def test_later_page_is_flagged(self, illustration, tmp_path):
+        """Test a re-encoded copy of a page is a duplicate of the first page."""
+        copy = save_jpeg(tmp_path / "page_02.jpg", Image.open(illustration).resize((590, 590)))
+        other = save_jpeg(tmp_path / "page_03.jpg", Image.open(io.BytesIO(render_image(600, 600, seed=3))))
+        results = [result_for(path) for path in (illustration, copy, other)]
+        for result in results:
+            result.signals = analyze_image(result.image_path)
+        
+        mark_duplicates(results, [1, 2, 3], max_distance=6)
+        
+        assert [r.signals.duplicate_of for r in results] == [None, 1, None]
+        assert results[1].signals.flags == ["duplicate"]
+        
+        # Marks are recomputed once the duplicate has been regenerated
+        results[1].signals = analyze_image(save_jpeg(tmp_path / "page_02b.jpg", Image.open(
+            io.BytesIO(render_image(600, 600, seed=4))
+        )))
+        mark_duplicates(results, [1, 2, 3], max_distance=6)
+        
+        assert all(not r.signals.rejected for r in results)
+    
+    def test_negative_distance_disables(self, illustration):
+        """Test the duplicate check can be turned off."""
+        results = [result_for(illustration), result_for(illustration)]
+        for result in results:
+            result.signals = analyze_image(result.image_path)
+        
+        mark_duplicates(results, [1, 2], max_distance=-1)
+        
+        assert not results[1].signals.rejected
+
+
+class TestValidatorGate:
+    """Tests for skipping the vision call."""
+    
+    @pytest.mark.asyncio
+    async def test_rejected_image_skips_vision_call(self):
+        """Test an image flagged by the pre-check is failed without a model call."""
+        gemini = Mock()
+        gemini.analyze_images = AsyncMock()
+        result = result_for("/test/page_02.jpg")
+        result.signals = ImageSignals(flags=["duplicate"], duplicate_of=1)
+        
+        qc = await ImageValidatorAgent(gemini, Mock()).execute((result, VisualFingerprint(), 2, "en-US"))
+        
+        gemini.analyze_images.assert_not_called()
+        assert not qc.passed and qc.requires_regeneration
+        assert qc.issues_found == ["Image is a near-duplicate of another page (page 1)"]
+
+
+class TestJobRegeneration:
+    """Tests for regenerating rejected images in a job."""
+    
+    @pytest.mark.asyncio
+    async def test_rejected_images_are_regenerated(self, fake_backend, job_store, agent_runs):
+        """Test a job repairs and regenerates the images the pre-check rejects, without a vision call."""
+        # The fake returns the same image for every page: all but the first are duplicates
+        duplicates = metrics.IMAGE_PRECHECK_REJECTIONS.value(reason="duplicate")
+        job_store.create_job("job-1", page_count=10)
+        
+        await process_job_background("job-1", JobPayload(title="Book", date="2024", page_count=10), [])
+        
+        job = job_store.get_job("job-1")
+        assert job.status == JobStatus.COMPLETED
+        assert metrics.IMAGE_PRECHECK_REJECTIONS.value(reason="duplicate") == duplicates + 11
+        # The first image is kept as the original, but is the wrong aspect ratio
+        assert agent_runs["IterativeFixAgent"] == 12
+        assert agent_runs["ImageValidatorAgent"] == 0
+        assert all(page.status == PageStatus.COMPLETED for page in job.pages)
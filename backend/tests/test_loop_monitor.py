@@ -0,0 +1,54 @@
+"""
+Tests for Event Loop Monitor
+
+Tests stall detection and call-site attribution.
+"""
+
+import time
+import asyncio
+
+import pytest
+
+import sys
+sys.path.insert(0, '..')
+
+from utils.loop_monitor import LoopMonitor
+
+
+def _blocking_call():
+    """Block the event loop like a sync SDK call."""
+    time.sleep(0.25)
+
+
+class TestLoopMonitor:
+    """Tests for LoopMonitor."""
+    
+    @pytest.mark.asyncio
+    async def test_attributes_stall_to_blocking_call(self):
+        """Test a blocking call is recorded with its call site."""
+        monitor = LoopMonitor(interval=0.01, threshold=0.05)
+        monitor.start()
+        try:
+            await asyncio.sleep(0.05)
+            _blocking_call()
+            await asyncio.sleep(0.05)
+        finally:
+            await monitor.stop()
+        
+        sites = monitor.top_sites()
+        assert monitor.stalls >= 1
+        assert "_blocking_call" in sites[0]["site"]
+        assert sites[0]["max_ms"] >= 150
+        assert monitor.snapshot()["recent_lag"]["max_ms"] >= 150
+    
+    @pytest.mark.asyncio
+    async def test_no_stalls_when_loop_is_idle(self):
+        """Test awaiting does not count as blocking."""
+        monitor = LoopMonitor(interval=0.01, threshold=0.1)
+        monitor.start()
+        await asyncio.sleep(0.2)
+        await monitor.stop()
+        
+        assert monitor.stalls == 0
+        assert monitor.top_sites() == []
+        assert not monitor.running
@@ -0,0 +1,104 @@
+"""
+Tests for Metrics
+
+Tests the metrics registry, GeminiClient instrumentation and per-job usage.
+"""
+
+import pytest
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import sys
+sys.path.insert(0, '..')
+
+from clients.gemini_client import GeminiClient
+from utils.job_context import job_context, stage_context
+from utils import metrics, tracing
+
+
+@pytest.fixture(autouse=True)
+def trace_exporter(tmp_path):
+    """Keep job spans created by these tests out of the storage directory."""
+    tracing.set_exporter(tracing.FileSpanExporter(str(tmp_path)))
+    yield
+    tracing.set_exporter(None)
+
+
+def _fake_sdk_client(text="hello", prompt_tokens=1200, output_tokens=300):
+    """Create an SDK client stand-in that returns a response with usage."""
+    response = SimpleNamespace(
+        text=text,
+        usage_metadata=SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=output_tokens),
+        candidates=[SimpleNamespace(content=SimpleNamespace(parts=[SimpleNamespace(inline_data=None, text=text)]))]
+    )
+    sdk = Mock()
+    sdk.models.generate_content = Mock(return_value=response)
+    return sdk
+
+
+class TestMetricsRegistry:
+    """Tests for the Prometheus registry."""
+    
+    def test_histogram_renders_cumulative_buckets(self):
+        """Test histogram exposition format."""
+        registry = metrics.MetricsRegistry()
+        histogram = registry.histogram("test_seconds", "Test latency", ["agent"], buckets=(0.5, 1.0))
+        histogram.observe(0.2, agent="A")
+        histogram.observe(0.7, agent="A")
+        
+        text = registry.render()
+        assert "# TYPE test_seconds histogram" in text
+        assert 'test_seconds_bucket{agent="A",le="0.5"} 1' in text
+        assert 'test_seconds_bucket{agent="A",le="1"} 2' in text
+        assert 'test_seconds_bucket{agent="A",le="+Inf"} 2' in text
+        assert 'test_seconds_count{agent="A"} 2' in text
+    
+    def test_counter_escapes_labels(self):
+        """Test label values are escaped."""
+        registry = metrics.MetricsRegistry()
+        counter = registry.counter("test_total", "Test counter", ["stage"])
+        counter.inc(stage='say "hi"')
+        
+        assert 'test_total{stage="say \\"hi\\""} 1' in registry.render()
+
+
+class TestModelInstrumentation:
+    """Tests for GeminiClient metrics and per-job usage."""
+    
+    @pytest.mark.asyncio
+    async def test_usage_is_attributed_to_job_and_stage(self):
+        """Test tokens and cost are recorded per job and stage."""
+        client = GeminiClient(api_key="test-key", model="gemini-2.0-flash")
+        client._client = _fake_sdk_client()
+        
+        with job_context("job-metrics"):
+            with stage_context("NormalizerAgent"):
+                assert await client.generate_text("system", "user") == "hello"
+        
+        usage = metrics.pop_job_usage("job-metrics")
+        stage = usage["stages"]["NormalizerAgent"]
+        assert stage["calls"] == 1
+        assert stage["input_tokens"] == 1200
+        assert stage["output_tokens"] == 300
+        assert stage["cost_usd"] == pytest.approx(metrics.estimate_cost("gemini-2.0-flash", 1200, 300))
+        assert usage["total"]["calls"] == 1
+        
+        assert metrics.MODEL_CALL_DURATION.count(
+            method="generate_text", model="gemini-2.0-flash", stage="NormalizerAgent", outcome="success"
+        ) >= 1
+    
+    @pytest.mark.asyncio
+    async def test_failed_call_is_counted_as_error(self):
+        """Test SDK errors are recorded with the error outcome."""
+        client = GeminiClient(api_key="test-key", model="gemini-2.0-flash")
+        client._client = Mock()
+        client._client.models.generate_content = Mock(side_effect=ValueError("boom"))
+        
+        with job_context("job-error"), stage_context("PlannerStage"):
+            with pytest.raises(RuntimeError):
+                await client.generate_text("system", "user")
+        
+        assert metrics.pop_job_usage("job-error")["stages"]["PlannerStage"]["errors"] == 1
+        assert metrics.MODEL_CALL_DURATION.count(
+            method="generate_text", model="gemini-2.0-flash", stage="PlannerStage", outcome="error"
+        ) == 1
@@ -0,0 +1,111 @@
+"""
+Tests for Multi-Style Jobs
+
+Tests that a job with several styles runs the style-independent stages
+once, and tracks progress and results per style.
+"""
+
+import os
+
+import pytest
+
+import sys
+sys.path.insert(0, '..')
+
+import store.file_storage as file_storage
+from agents.character_sheet_generator import CharacterSheetGeneratorAgent
+from clients.fake_genai import render_image
+from models.job_payload import JobPayload
+from pipeline.job_processor import process_job_background
+from store import JobStore, JobStatus, PageStatus
+
+
+def multi_style_payload(styles):
+    return JobPayload(title="Book", date="2024", page_count=10, styles=styles)
+
+
+class TestMultiStyleJob:
+    """Tests for fanning a job out into several styles."""
+    
+    @pytest.mark.asyncio
+    async def test_shared_stages_run_once(self, fake_backend, agent_runs, job_store, tmp_path):
+        """Test normalization, planning and visual analysis run once for two styles."""
+        photo = tmp_path / "photo.jpg"
+        photo.write_bytes(render_image(128, 128, seed=1))
+        payload = multi_style_payload(["watercolor", "coloring"])
+        job_store.create_job("job-1", page_count=10, styles=payload.requested_styles())
+        
+        await process_job_background("job-1", payload, [str(photo)])
+        
+        shared = {
+            "NormalizerAgent": 1,
+            "NarrativePlannerAgent": 1,
+            "VisualAnalyzerAgent": 1,
+            "CharacterSheetGeneratorAgent": 2,
+        }
+        assert {name: agent_runs[name] for name in shared} == shared
+        job = job_store.get_job("job-1")
+        assert job.status == JobStatus.COMPLETED and job.progress_percent == 100
+        for style in ("watercolor", "coloring"):
+            record = job.styles[style]
+            assert record.status == JobStatus.COMPLETED
+            assert record.result_json["style"] == style
+            assert all(page.status == PageStatus.COMPLETED for page in record.pages)
+            assert record.result_json["cover"]["image_path"] == f"{style}/cover.jpg"
+            assert os.path.exists(os.path.join(file_storage.get_outputs_dir("job-1"), style, "cover.jpg"))
+        coloring = job.styles["coloring"].result_json["visual_fingerprint"]["style_attributes"]
+        assert coloring["color_palette"] == ["black", "white"]
+        assert job.result_json == job.styles["watercolor"].result_json
+    
+    @pytest.mark.asyncio
+    async def test_failed_style_does_not_fail_the_job(self, fake_backend, job_store, monkeypatch):
+        """Test the other styles complete when one style fails."""
+        original = CharacterSheetGeneratorAgent.execute
+        
+        async def fail_for_anime(self, input_data):
+            if input_data[1].style == "anime":
+                raise RuntimeError("sheet failed")
+            return await original(self, input_data)
+        monkeypatch.setattr(CharacterSheetGeneratorAgent, "execute", fail_for_anime)
+        payload = multi_style_payload(["anime", "cartoon"])
+        job_store.create_job("job-2", page_count=10, styles=payload.requested_styles())
+        
+        await process_job_background("job-2", payload, [])
+        
+        job = job_store.get_job("job-2")
+        assert job.status == JobStatus.COMPLETED
+        assert job.styles["anime"].status == JobStatus.FAILED
+        assert "sheet failed" in job.styles["anime"].error
+        assert job.styles["cartoon"].status == JobStatus.COMPLETED
+        assert job.result_json["style"] == "cartoon"
+
+
+class TestStyleProgress:
+    """Tests for per-style progress in the job store."""
+    
+    def test_job_progress_is_the_style_average(self):
+        """Test style updates go to the style record and average into the job."""
+        store = JobStore()
+        store.create_job("job-1", page_count=10, styles=["watercolor", "coloring"])
+        
+        store.start_step("job-1", "planning", style="coloring")
+        store.update_job_status("job-1", progress_percent=50, style="coloring")
+        store.update_page_status("job-1", 0, PageStatus.GENERATING, style="coloring")
+        
+        response = store.get_job("job-1").to_status_response()
+        assert response["progress_percent"] == 25
+        assert response["steps"] == [] and response["pages"] == []
+        watercolor, coloring = response["styles"]
+        assert (watercolor["style"], watercolor["progress_percent"]) == ("watercolor", 0)
+        assert coloring["current_step"] == "planning"
+        assert coloring["pages"][0]["status"] == "generating"
+    
+    def test_single_style_job_has_no_styles(self):
+        """Test a job with one style keeps the job-level steps and pages."""
+        assert JobPayload(title="Book", date="2024", styles=["anime", "anime"]).is_multi_style is False
+        
+        store = JobStore()
+        store.create_job("job-1", page_count=10)
+        
+        response = store.get_job("job-1").to_status_response()
+        assert response["styles"] == [] and len(response["pages"]) == 12
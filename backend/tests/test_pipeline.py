@@ -187,7 +187,7 @@ class TestPipelineIntegration:
         runner = PipelineRunner(mock_gemini_client, mock_logger)
         
         # This tests the helper method structure
-        assert hasattr(runner, '_build_final_package')
+        assert hasattr(runner, 'build_final_package')
 
 
 class TestParallelExecution:
@@ -0,0 +1,249 @@
+"""
+Tests for Narrative Plan Streaming
+
+Tests the incremental JSON parser and that page prompts are written
+while the narrative plan is still streaming.
+"""
+
+import json
+import time
+import asyncio
+import logging
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import sys
+sys.path.insert(0, '..')
+
+import clients.call_scheduler as call_scheduler
+from agents.narrative_planner import NarrativePlannerAgent, PlanStream
+from agents.prompt_writer import PromptWriterAgent
+from clients.call_scheduler import CallScheduler, KIND_TEXT
+from clients.fake_genai import ModelProfile
+from clients.gemini_client import GeminiClient, set_sdk_factory
+from models.planning import BackCoverConcept, CoverConcept, NarrativePlan, PagePlanItem
+from models.profile import NormalizedProfile
+from models.user_input import BookPreferences
+from models.visual import VisualFingerprint
+from utils.incremental_json import IncrementalJSONParser
+
+
+DOCUMENT = {
+    "title": "A {tricky} \"title\" [with] brackets",
+    "pages": [
+        {"page_number": 1, "notes": ["a", "b}"], "nested": {"x": [1, 2]}},
+        {"page_number": 2, "notes": [], "nested": {"x": []}},
+        {"page_number": 3, "notes": ["\\\\"], "nested": {}},
+    ],
+    "tail": {"pages": [{"page_number": 99}]},
+}
+
+
+class TestIncrementalJSONParser:
+    """Tests for IncrementalJSONParser."""
+    
+    @pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, 10000])
+    def test_emits_each_element_once_in_order(self, chunk_size):
+        """Test elements are emitted whatever the chunk boundaries."""
+        text = json.dumps(DOCUMENT)
+        parser = IncrementalJSONParser("pages")
+        
+        items = []
+        for start in range(0, len(text), chunk_size):
+            items.extend(parser.feed(text[start:start + chunk_size]))
+        
+        assert items == DOCUMENT["pages"]
+        assert parser.complete
+        assert parser.document() == DOCUMENT
+    
+    def test_elements_are_emitted_before_the_document_ends(self):
+        """Test an element is available as soon as it closes."""
+        text = json.dumps(DOCUMENT)
+        first_end = text.index('"nested": {"x": [1, 2]}}') + len('"nested": {"x": [1, 2]}}')
+        parser = IncrementalJSONParser("pages")
+        
+        assert parser.feed(text[:first_end]) == [DOCUMENT["pages"][0]]
+        assert not parser.complete
+    
+    def test_skips_prose_before_the_object(self):
+        """Test markdown fences and prose around the JSON are ignored."""
+        parser = IncrementalJSONParser("pages")
+        
+        items = parser.feed('Here is the plan:\n```json\n{"pages": [{"page_number": 1}]}\n```')
+        
+        assert items == [{"page_number": 1}]
+        assert parser.document() == {"pages": [{"page_number": 1}]}
+    
+    def test_incomplete_document_raises(self):
+        """Test a stream cut off mid-object is reported."""
+        parser = IncrementalJSONParser("pages")
+        parser.feed('{"pages": [{"page_number": 1}, {"page_')
+        
+        with pytest.raises(ValueError):
+            parser.document()
+
+
+@pytest.fixture
+def streaming_backend(install_fake):
+    """Fake SDK where every text call takes about 0.2s and streams in small chunks."""
+    return install_fake(
+        time_scale=0.2,
+        image_size=(64, 64),
+        stream_chunk=100,
+        profiles={
+            GeminiClient.MODEL_FAST: ModelProfile(1.0, 0.01, 1000),
+            GeminiClient.MODEL_CREATIVE: ModelProfile(1.0, 0.01, 1000),
+        }
+    )
+
+
+class TestPlanStreaming:
+    """Tests for streaming the narrative plan into the prompt writer."""
+    
+    @pytest.mark.asyncio
+    async def test_stub_mode_streams_chunks(self, monkeypatch):
+        """Test stub mode streams the stub reply in several chunks."""
+        monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
+        client = GeminiClient(api_key=None)
+        chunks = []
+        
+        result = await client.stream_json("system", "user", on_text=chunks.append, schema=NarrativePlan)
+        
+        assert len(chunks) > 1
+        assert json.loads("".join(chunks)) == result
+    
+    @pytest.mark.asyncio
+    async def test_prompt_writing_overlaps_planning(self, streaming_backend):
+        """Test the first page prompt is requested before the plan finishes streaming."""
+        client = GeminiClient(api_key="fake-key")
+        logger = logging.getLogger("test")
+        planner = NarrativePlannerAgent(client, logger)
+        writer = PromptWriterAgent(client, logger)
+        preferences = BookPreferences(title="Streaming", date="2024", page_count=10, style="watercolor")
+        
+        prompt_requests = []
+        generate_content = streaming_backend.generate_content
+        
+        def record(model, contents, config=None):
+            if "Create an image generation prompt for page" in contents[-1]:
+                prompt_requests.append(time.monotonic())
+            return generate_content(model=model, contents=contents, config=config)
+        
+        streaming_backend.generate_content = record
+        stream = PlanStream()
+        
+        async def plan():
+            result = await planner.execute((NormalizedProfile(), preferences, "en-US", stream))
+            return result, time.monotonic()
+        
+        (narrative_plan, plan_finished), prompts = await asyncio.gather(
+            plan(), writer.execute((stream, VisualFingerprint(), preferences, "en-US"))
+        )
+        
+        assert len(narrative_plan.pages) == 10
+        assert [p.page_number for p in prompts] == [p.page_number for p in narrative_plan.pages]
+        assert min(prompt_requests) < plan_finished
+        # No page had to be rewritten after the plan finished
+        assert len(prompt_requests) == 10
+    
+    @pytest.mark.asyncio
+    async def test_failed_stream_falls_back_to_full_plan(self, streaming_backend):
+        """Test the writer follows the finished plan when streaming fails."""
+        def broken_stream(model, contents, config=None):
+            raise RuntimeError("stream reset")
+        
+        streaming_backend.generate_content_stream = broken_stream
+        client = GeminiClient(api_key="fake-key")
+        logger = logging.getLogger("test")
+        preferences = BookPreferences(title="Streaming", date="2024", page_count=10, style="watercolor")
+        stream = PlanStream()
+        
+        narrative_plan, prompts = await asyncio.gather(
+            NarrativePlannerAgent(client, logger).execute((NormalizedProfile(), preferences, "en-US", stream)),
+            PromptWriterAgent(client, logger).execute((stream, VisualFingerprint(), preferences, "en-US"))
+        )
+        
+        assert [p.page_number for p in prompts] == [p.page_number for p in narrative_plan.pages]
+    
+    @pytest.mark.asyncio
+    async def test_failed_prompt_cancels_the_others(self):
+        """Test prompts written after the plan finished are cancelled when one of them fails."""
+        writer = PromptWriterAgent(GeminiClient(api_key="fake-key"), logging.getLogger("test"))
+        preferences = BookPreferences(title="Streaming", date="2024", page_count=10, style="watercolor")
+        cancelled = []
+        
+        async def create_page_prompt(page_plan, fingerprint, preferences, user_language):
+            if page_plan.page_number == 1:
+                raise RuntimeError("prompt failed")
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(page_plan.page_number)
+                raise
+        
+        writer._create_page_prompt = create_page_prompt
+        stream = PlanStream()
+        stream.finish(NarrativePlan(
+            book_title="Streaming",
+            total_pages=10,
+            cover=CoverConcept(main_subject_pose="smiling", mood="warm"),
+            back_cover=BackCoverConcept(design_type="symbolic", symbolic_meaning="home"),
+            pages=[
+                PagePlanItem(
+                    page_number=number,
+                    life_phase="young",
+                    memory_reference=f"Memory {number}",
+                    scene_description=f"Scene {number}",
+                    emotional_tone="joyful"
+                )
+                for number in (1, 2, 3)
+            ]
+        ))
+        
+        with pytest.raises(RuntimeError, match="prompt failed"):
+            await writer._run_streaming(stream, VisualFingerprint(), preferences, "en-US")
+        await asyncio.sleep(0)
+        
+        assert sorted(cancelled) == [2, 3]
+
+
+class TestStreamSlots:
+    """Tests for the scheduler slot of a streamed request."""
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_stream_keeps_its_slot_until_its_thread_returns(self, monkeypatch):
+        """Test a cancelled stream's text slot stays in use while its SDK iterator still runs."""
+        scheduler = CallScheduler(limits={KIND_TEXT: 2})
+        monkeypatch.setattr(call_scheduler, "_call_scheduler", scheduler)
+        release = threading.Event()
+        
+        def generate_content_stream(**kwargs):
+            yield SimpleNamespace(text="{", usage_metadata=None)
+            # The next chunk hangs until the test releases it
+            release.wait(5)
+            yield SimpleNamespace(text="}", usage_metadata=None)
+        
+        sdk = SimpleNamespace(models=SimpleNamespace(generate_content_stream=generate_content_stream))
+        set_sdk_factory(lambda api_key: sdk)
+        try:
+            received = asyncio.Event()
+            client = GeminiClient(api_key="key")
+            task = asyncio.create_task(client.stream_json("system", "user", on_text=lambda text: received.set()))
+            await asyncio.wait_for(received.wait(), 5)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            
+            assert scheduler.stats()[KIND_TEXT]["in_use"] == 1
+            
+            release.set()
+            for _ in range(100):
+                if scheduler.stats()[KIND_TEXT]["in_use"] == 0:
+                    break
+                await asyncio.sleep(0.01)
+            assert scheduler.stats()[KIND_TEXT]["in_use"] == 0
+        finally:
+            release.set()
+            set_sdk_factory(None)
@@ -0,0 +1,76 @@
+"""
+Tests for Sampling Profiler
+
+Tests stack sampling, job/agent annotation and the collapsed format.
+"""
+
+import time
+import asyncio
+
+import pytest
+
+import sys
+sys.path.insert(0, '..')
+
+from utils.job_context import job_context, stage_context, with_activity
+from utils.profiler import profile, ProfilerBusyError
+
+
+def _spin_in_thread(seconds):
+    """Burn CPU in a worker thread like a sync SDK call."""
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+async def _spin_on_loop(seconds):
+    """Burn CPU on the event loop in short slices."""
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        slice_end = time.monotonic() + 0.02
+        while time.monotonic() < slice_end:
+            pass
+        await asyncio.sleep(0)
+
+
+class TestSamplingProfiler:
+    """Tests for the sampling profiler."""
+    
+    @pytest.mark.asyncio
+    async def test_stacks_are_annotated_with_job_and_agent(self):
+        """Test loop and thread stacks carry the job ID and agent."""
+        async def work():
+            with job_context("job-123"):
+                with stage_context("PromptWriterAgent"):
+                    await asyncio.gather(
+                        _spin_on_loop(0.4),
+                        asyncio.to_thread(with_activity(_spin_in_thread), 0.4),
+                    )
+        
+        worker = asyncio.create_task(work())
+        result = await profile(0.3, sample_hz=200)
+        await worker
+        
+        assert result.samples > 10
+        annotated = [stack for stack in result.stacks if "job:job-123" in stack]
+        assert any("agent:PromptWriterAgent" in stack for stack in annotated)
+        assert any(any("_spin_in_thread" in frame for frame in stack) for stack in annotated)
+        assert any(any("_spin_on_loop" in frame for frame in stack) for stack in annotated)
+    
+    @pytest.mark.asyncio
+    async def test_collapsed_output_and_busy_guard(self):
+        """Test the collapsed format and that profiles do not overlap."""
+        first = asyncio.create_task(profile(0.2, sample_hz=50))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ProfilerBusyError):
+            await profile(0.1)
+        result = await first
+        
+        lines = result.collapsed().strip().splitlines()
+        assert lines
+        for line in lines:
+            stack, count = line.rsplit(" ", 1)
+            assert int(count) >= 1
+            assert ";" in stack
+        assert sum(result.stacks.values()) >= result.samples
+        assert 0 <= result.overhead < 0.5
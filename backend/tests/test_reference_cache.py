@@ -0,0 +1,171 @@
+"""
+Tests for Reference Cache
+
+Tests the cross-job fingerprint and character sheet cache and that the
+planning stages skip visual analysis and character sheet generation on
+a hit.
+"""
+
+import logging
+import os
+import shutil
+import time
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+import sys
+sys.path.insert(0, '..')
+
+from models.user_input import BookPreferences, ReferenceImages, UserForm
+from models.visual import VisualFingerprint
+from pipeline.runner import PipelineRunner
+from utils.reference_cache import (
+    ReferenceCache, reference_digest, entry_key, FINGERPRINT, CHARACTER_SHEET
+)
+
+
+@pytest.fixture
+def photos(tmp_path):
+    """Two reference photos."""
+    paths = []
+    for index, content in enumerate((b"first photo", b"second photo")):
+        path = tmp_path / f"reference_{index}.jpg"
+        path.write_bytes(content)
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ReferenceCache(str(tmp_path / "cache"), max_entries=3, max_bytes=10_000, ttl_seconds=3600)
+
+
+def fingerprint():
+    return VisualFingerprint(
+        subject_id="Ana",
+        reference_image_analysis=[{"image": 0}],
+        do_not_change=["glasses"],
+        character_sheet_path="/jobs/a/character_ref.jpg"
+    )
+
+
+class TestKeys:
+    """Tests for reference digests and entry keys."""
+    
+    def test_digest_depends_on_content_only(self, photos, tmp_path):
+        """Test renamed and reordered copies of the same photos have the same digest."""
+        copies = []
+        for index, path in enumerate(reversed(photos)):
+            copy = tmp_path / f"upload_{index}.jpg"
+            shutil.copyfile(path, copy)
+            copies.append(str(copy))
+        
+        assert reference_digest(ReferenceImages(paths=photos)) == reference_digest(ReferenceImages(paths=copies))
+        assert reference_digest(ReferenceImages(paths=photos)) != reference_digest(ReferenceImages(paths=photos[:1]))
+    
+    def test_entry_key_parts(self, photos):
+        """Test style and kind change the key."""
+        digest = reference_digest(ReferenceImages(paths=photos))
+        
+        assert entry_key(digest, CHARACTER_SHEET, "cartoon") != entry_key(digest, CHARACTER_SHEET, "anime")
+        assert entry_key(digest, FINGERPRINT, "cartoon") != entry_key(digest, CHARACTER_SHEET, "cartoon")
+
+
+class TestReferenceCache:
+    """Tests for storage, expiry and eviction."""
+    
+    def test_fingerprint_round_trip(self, cache):
+        """Test a stored fingerprint comes back without the job's sheet path."""
+        cache.put_fingerprint("a", fingerprint())
+        
+        cached = cache.get_fingerprint("a")
+        
+        assert cached.subject_id == "Ana" and cached.do_not_change == ["glasses"]
+        assert cached.character_sheet_path is None
+        assert cache.get_fingerprint("b") is None
+    
+    def test_character_sheet_is_copied(self, cache, tmp_path):
+        """Test a cached sheet is copied into the new job's directory."""
+        sheet = tmp_path / "character_ref.jpg"
+        sheet.write_bytes(b"sheet")
+        cache.put_character_sheet("a", str(sheet))
+        
+        target = tmp_path / "job" / "character_ref.jpg"
+        target.parent.mkdir()
+        
+        assert cache.get_character_sheet("a", str(target)) == str(target)
+        assert target.read_bytes() == b"sheet"
+    
+    def test_expired_entries_are_removed(self, cache):
+        """Test entries older than the TTL are misses and deleted."""
+        cache.put_fingerprint("a", fingerprint())
+        path = os.path.join(cache.directory, "a.json")
+        old = time.time() - 7200
+        os.utime(path, (old, old))
+        
+        assert cache.get_fingerprint("a") is None
+        assert not os.path.exists(path)
+    
+    def test_least_recently_used_is_evicted(self, cache):
+        """Test the entry limit evicts the entry unused for longest."""
+        for index, key in enumerate("abc"):
+            cache.put_fingerprint(key, fingerprint())
+            stamp = time.time() - 100 + index
+            os.utime(os.path.join(cache.directory, f"{key}.json"), (stamp, stamp))
+        cache.get_fingerprint("a")
+        
+        cache.put_fingerprint("d", fingerprint())
+        
+        assert cache.get_fingerprint("b") is None
+        assert all(cache.get_fingerprint(key) is not None for key in "acd")
+    
+    def test_size_limit(self, cache, tmp_path):
+        """Test entries are evicted until the cache fits in max_bytes."""
+        sheet = tmp_path / "big.jpg"
+        sheet.write_bytes(b"x" * 6000)
+        cache.put_character_sheet("a", str(sheet))
+        cache.put_character_sheet("b", str(sheet))
+        
+        assert sorted(os.listdir(cache.directory)) == ["b.jpg"]
+
+
+class TestPlanningStages:
+    """Tests for reusing cached results in the pipeline."""
+    
+    @pytest.mark.asyncio
+    async def test_second_job_skips_analysis_and_sheet(self, photos, tmp_path):
+        """Test a job with the same photos reuses the fingerprint and character sheet."""
+        runner = PipelineRunner(Mock(), logging.getLogger("test"))
+        runner.reference_cache = ReferenceCache(str(tmp_path / "cache"))
+        runner.visual_analyzer = Mock(execute=AsyncMock(return_value=fingerprint()))
+        
+        async def generate_sheet(input_data):
+            path = os.path.join(input_data[3], "character_ref.jpg")
+            with open(path, "wb") as f:
+                f.write(b"sheet")
+            return path
+        runner.character_sheet_generator = Mock(execute=AsyncMock(side_effect=generate_sheet))
+        preferences = BookPreferences(title="Book", date="2024", page_count=10, style="cartoon")
+        
+        async def plan(job):
+            output_dir = tmp_path / job
+            output_dir.mkdir()
+            stages = {
+                stage.name: stage
+                for stage in runner.planning_stages(
+                    UserForm(), preferences, ReferenceImages(paths=photos), str(output_dir), "en-US", print
+                )
+            }
+            keys = await stages["reference_cache_keys"].run()
+            fp = await stages["visual_fingerprint"].run(keys)
+            return fp, await stages["character_sheet"].run(fp, keys)
+        
+        await plan("first")
+        fp, sheet = await plan("second")
+        
+        runner.visual_analyzer.execute.assert_called_once()
+        runner.character_sheet_generator.execute.assert_called_once()
+        assert fp.subject_id == "Ana"
+        assert sheet == str(tmp_path / "second" / "character_ref.jpg")
+        assert open(sheet, "rb").read() == b"sheet"
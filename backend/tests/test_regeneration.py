@@ -0,0 +1,156 @@
+"""
+Tests for Page Regeneration
+
+Tests regenerating one page of a completed book from the job's stored
+state, leaving the rest of the book untouched.
+"""
+
+import os
+
+import pytest
+
+import sys
+sys.path.insert(0, '..')
+
+import store.file_storage as file_storage
+from agents.image_validator import ImageValidatorAgent
+from agents.iterative_fix import IterativeFixAgent
+from models.job_payload import JobPayload
+from models.prompts import PromptItem
+from models.review import ImageQCResult
+from pipeline.job_processor import process_job_background
+from pipeline.regeneration import regenerate_page, PageBusyError
+from store import JobStatus, PageStatus
+from utils.config import get_config
+
+
+async def complete_job(job_store):
+    """Run a ten-page job to completion."""
+    payload = JobPayload(title="Book", date="2024", page_count=10, style="watercolor")
+    job_store.create_job("job-1", page_count=10)
+    await process_job_background("job-1", payload, [])
+    assert job_store.get_job("job-1").status == JobStatus.COMPLETED
+    return job_store.get_job("job-1")
+
+
+@pytest.fixture
+def passing_validation(monkeypatch):
+    """Every image passes validation."""
+    async def passes(self, input_data):
+        result, _, page_number, _ = input_data
+        return ImageQCResult(page_number=page_number, image_path=result.image_path or "", passed=True)
+    monkeypatch.setattr(ImageValidatorAgent, "run", passes)
+
+
+class TestRegeneratePage:
+    """Tests for regenerating one page of a completed book."""
+    
+    @pytest.mark.asyncio
+    async def test_regenerates_only_the_page(self, fake_backend, job_store, passing_validation, agent_runs):
+        """Test feedback runs the fixer, generation and validation for the page alone."""
+        job = await complete_job(job_store)
+        before = job.result_json
+        version = next(p for p in job.prompts if p["page_number"] == 7)["version"]
+        agent_runs.clear()
+        
+        page = await regenerate_page("job-1", 7, feedback="Add her red scarf")
+        
+        assert page.page_number == 7
+        assert page.generation_attempts == before["pages"][6]["generation_attempts"] + 1
+        assert agent_runs == {"IterativeFixAgent": 1, "ImageValidatorAgent": 1}
+        
+        job = job_store.get_job("job-1")
+        after = job.result_json
+        assert after["pages"][6]["generation_attempts"] == page.generation_attempts
+        for key in ("cover", "back_cover", "design_review", "narrative_plan"):
+            assert after[key] == before[key]
+        assert [p for i, p in enumerate(after["pages"]) if i != 6] == [
+            p for i, p in enumerate(before["pages"]) if i != 6
+        ]
+        
+        outputs = file_storage.get_outputs_dir("job-1")
+        assert os.path.exists(os.path.join(outputs, "page_07.jpg"))
+        assert not any("regenerating" in name for name in os.listdir(outputs))
+        page_info = next(p for p in job.pages if p.page_number == 7)
+        assert page_info.status == PageStatus.COMPLETED and page_info.retry_count == 1
+        prompt = next(p for p in job.prompts if p["page_number"] == 7)
+        assert prompt["version"] == version + 1
+    
+    @pytest.mark.asyncio
+    async def test_without_feedback_reuses_the_prompt(self, fake_backend, job_store, passing_validation, agent_runs):
+        """Test a regeneration without feedback skips the fixer when the image passes."""
+        job = await complete_job(job_store)
+        prompt = next(p for p in job.prompts if p["page_number"] == 0)
+        agent_runs.clear()
+        
+        await regenerate_page("job-1", 0)
+        
+        assert agent_runs == {"ImageValidatorAgent": 1}
+        assert next(p for p in job_store.get_job("job-1").prompts if p["page_number"] == 0) == prompt
+    
+    @pytest.mark.asyncio
+    async def test_rejects_unknown_and_busy_pages(self, fake_backend, job_store):
+        """Test a missing page, a job without prompts and a busy page are refused."""
+        await complete_job(job_store)
+        with pytest.raises(LookupError):
+            await regenerate_page("job-1", 42)
+        
+        job_store.update_page_status("job-1", 3, PageStatus.GENERATING)
+        with pytest.raises(PageBusyError):
+            await regenerate_page("job-1", 3)
+        
+        job_store.set_prompts("job-1", [])
+        with pytest.raises(ValueError):
+            await regenerate_page("job-1", 4)
+    
+    @pytest.mark.asyncio
+    async def test_failed_generation_keeps_the_old_image(self, fake_backend, job_store, monkeypatch):
+        """Test the book is unchanged when no image can be generated."""
+        from models.generation import GenerationResult
+        from pipeline.runner import GeminiImageClient
+        
+        async def refuse(self, **kwargs):
+            return GenerationResult(success=False, error_message="quota", error_class="permanent")
+        monkeypatch.setattr(GeminiImageClient, "generate_image", refuse)
+        before = (await complete_job(job_store)).result_json
+        
+        with pytest.raises(RuntimeError, match="could not be regenerated"):
+            await regenerate_page("job-1", 2)
+        
+        job = job_store.get_job("job-1")
+        assert job.result_json == before
+        assert next(p for p in job.pages if p.page_number == 2).status == PageStatus.COMPLETED
+
+
+class TestRefusedPrompts:
+    """Tests for prompts repaired after a refusal during the job."""
+    
+    @pytest.mark.asyncio
+    async def test_stored_prompt_is_the_repaired_one(self, fake_backend, job_store, monkeypatch):
+        """Test a page refused by the image model stores its repaired prompt, not the refused one."""
+        from models.generation import GenerationResult
+        from pipeline.runner import GeminiImageClient
+        
+        generate_image = GeminiImageClient.generate_image
+        refused = []
+        
+        async def refuse_first(self, **kwargs):
+            if not refused:
+                refused.append(kwargs["prompt"])
+                return GenerationResult(success=False, error_message="SAFETY", error_class="safety")
+            return await generate_image(self, **kwargs)
+        
+        async def repair(self, input_data):
+            prompt = input_data[0]
+            return prompt.model_copy(update={"main_prompt": "A repaired scene", "version": prompt.version + 1})
+        monkeypatch.setattr(GeminiImageClient, "generate_image", refuse_first)
+        monkeypatch.setattr(IterativeFixAgent, "run", repair)
+        # The fake's identical pages would all be repaired as duplicates
+        monkeypatch.setattr(get_config(), "image_precheck_enabled", False)
+        
+        job = await complete_job(job_store)
+        
+        repaired = [prompt for prompt in job.prompts if prompt["main_prompt"] == "A repaired scene"]
+        assert len(repaired) == 1
+        stored = [PromptItem(**prompt).get_full_prompt() for prompt in job.prompts]
+        assert refused[0] not in stored
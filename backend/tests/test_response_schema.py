@@ -0,0 +1,117 @@
+"""
+Tests for Native Structured Output
+
+Tests the Pydantic to response-schema conversion and GeminiClient's
+choice between native JSON mode and the schema-in-prompt path.
+"""
+
+import pytest
+
+import sys
+sys.path.insert(0, '..')
+
+from clients.fake_genai import ModelProfile, SCHEMA_MARKER
+from clients.gemini_client import GeminiClient
+from clients.response_schema import response_schema_for, to_response_schema, UnsupportedSchema
+from models.planning import NarrativePlan
+from models.visual import VisualFingerprint
+from utils import metrics
+
+
+class TestResponseSchema:
+    """Tests for the schema conversion."""
+    
+    def test_refs_are_inlined_and_fields_ordered(self):
+        """Test nested models are inlined and properties keep declaration order."""
+        schema = response_schema_for(NarrativePlan)
+        
+        assert "$defs" not in str(schema) and "$ref" not in str(schema)
+        assert schema["type"] == "object"
+        assert schema["propertyOrdering"] == list(NarrativePlan.model_fields)
+        page = schema["properties"]["pages"]["items"]
+        assert page["type"] == "object"
+        assert "page_number" in page["properties"]
+    
+    def test_optional_fields_become_nullable(self):
+        """Test Optional[X] converts to a nullable X."""
+        schema = to_response_schema({
+            "type": "object",
+            "properties": {"note": {"anyOf": [{"type": "string"}, {"type": "null"}], "default": None}},
+        })
+        
+        assert schema["properties"]["note"] == {"type": "string", "nullable": True}
+    
+    def test_free_form_dicts_are_unsupported(self):
+        """Test models with dict fields fall back to the prompt path."""
+        with pytest.raises(UnsupportedSchema):
+            to_response_schema({"type": "object", "additionalProperties": {"type": "string"}})
+        
+        assert response_schema_for(VisualFingerprint) is None
+    
+    def test_conversion_is_cached_per_model(self):
+        """Test each model's schema is computed once."""
+        assert response_schema_for(NarrativePlan) is response_schema_for(NarrativePlan)
+
+
+class TestStructuredOutput:
+    """Tests for GeminiClient JSON requests."""
+    
+    @pytest.mark.asyncio
+    async def test_native_mode_leaves_schema_out_of_prompt(self, recording_backend):
+        """Test supported schemas are sent as a response schema, not prompt text."""
+        fake = recording_backend()
+        client = GeminiClient(api_key="fake-key")
+        
+        result = await client.generate_json("You plan books.", "Plan a 12-page memory book.", schema=NarrativePlan)
+        
+        prompt, config = fake.requests[0]
+        assert SCHEMA_MARKER not in prompt
+        assert config.response_mime_type == "application/json"
+        assert NarrativePlan(**result).total_pages == 12
+    
+    @pytest.mark.asyncio
+    async def test_unsupported_schema_uses_prompt(self, recording_backend):
+        """Test schemas without a native equivalent are pasted into the prompt."""
+        fake = recording_backend()
+        client = GeminiClient(api_key="fake-key")
+        fallbacks = metrics.STRUCTURED_OUTPUT_FALLBACKS.value(model=client.model, reason="unsupported_schema")
+        
+        await client.generate_json("You analyze people.", "Describe the subject.", schema=VisualFingerprint)
+        
+        prompt, config = fake.requests[0]
+        assert SCHEMA_MARKER in prompt
+        assert config is None
+        assert metrics.STRUCTURED_OUTPUT_FALLBACKS.value(
+            model=client.model, reason="unsupported_schema"
+        ) == fallbacks + 1
+    
+    @pytest.mark.asyncio
+    async def test_rejected_schema_falls_back_and_is_remembered(self, recording_backend):
+        """Test a model rejecting native mode is answered through the prompt path from then on."""
+        fake = recording_backend(reject_schemas=True)
+        client = GeminiClient(api_key="fake-key")
+        
+        first = await client.generate_json("You plan books.", "Plan a 10-page memory book.", schema=NarrativePlan)
+        second = await client.generate_json("You plan books.", "Plan a 10-page memory book.", schema=NarrativePlan)
+        
+        assert NarrativePlan(**first).total_pages == NarrativePlan(**second).total_pages == 10
+        # Rejected native request, its prompt-path retry, then the prompt path only
+        assert [config is None for _, config in fake.requests] == [False, True, True]
+    
+    @pytest.mark.asyncio
+    async def test_parse_failures_are_counted(self, recording_backend):
+        """Test malformed replies are counted per mode."""
+        fake = recording_backend()
+        fake.profiles[GeminiClient.MODEL_FAST] = ModelProfile(1.0, 0.1, 1000, malformed_json_rate=1.0)
+        client = GeminiClient(api_key="fake-key")
+        before = metrics.JSON_PARSE_FAILURES.value(method="generate_json", mode="prompt", stage="none")
+        
+        # Every field has a default, so the empty reply still validates
+        await client.generate_json("You analyze people.", "Describe the subject.", schema=VisualFingerprint)
+        result = await client.generate_json("You plan books.", "Plan a 10-page memory book.", schema=NarrativePlan)
+        
+        assert metrics.JSON_PARSE_FAILURES.value(
+            method="generate_json", mode="prompt", stage="none"
+        ) == before + 1
+        # Native JSON mode is not affected by free-form formatting slips
+        assert NarrativePlan(**result).total_pages == 10
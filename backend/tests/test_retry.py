@@ -0,0 +1,163 @@
+"""
+Tests for Retry Policy
+
+Tests error classification, retry hints, jittered backoff and budgets.
+"""
+
+import random
+
+import pytest
+
+import sys
+sys.path.insert(0, '..')
+
+from clients.fake_genai import FakeAPIError
+from models.generation import GenerationResult
+from utils.job_context import job_context
+from utils.retry import (
+    RetryPolicy, ModelCallError, classify_error, result_failure,
+    THROTTLE, TRANSIENT, SAFETY, PERMANENT
+)
+
+
+def _policy(**kwargs):
+    """A policy with millisecond delays."""
+    kwargs.setdefault("base_delay", 0.001)
+    kwargs.setdefault("max_delay", 0.05)
+    return RetryPolicy(rng=random.Random(1), **kwargs)
+
+
+def _throttle(delay="0.01s"):
+    return FakeAPIError(429, "RESOURCE_EXHAUSTED", "quota", details={"error": {"details": [
+        {"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": delay}
+    ]}})
+
+
+class TestClassification:
+    """Tests for classify_error and result_failure."""
+    
+    def test_classifies_api_errors(self):
+        """Test status codes map to error classes."""
+        throttle = classify_error(_throttle("37s"))
+        assert throttle.error_class == THROTTLE
+        assert throttle.retry_after == 37.0
+        assert classify_error(FakeAPIError(503, "UNAVAILABLE", "overloaded")).error_class == TRANSIENT
+        assert classify_error(FakeAPIError(400, "INVALID_ARGUMENT", "bad request")).error_class == PERMANENT
+        assert classify_error(
+            FakeAPIError(400, "INVALID_ARGUMENT", "Request blocked", details={"promptFeedback": {"blockReason": "SAFETY"}})
+        ).error_class == SAFETY
+        assert classify_error(TimeoutError("read timed out")).error_class == TRANSIENT
+    
+    def test_blocked_in_the_message_is_not_a_refusal(self):
+        """Test status codes decide unless the error carries an explicit block or finish reason."""
+        assert classify_error(
+            FakeAPIError(403, "PERMISSION_DENIED", "API_KEY_SERVICE_BLOCKED: requests are blocked")
+        ).error_class == PERMANENT
+        assert classify_error(FakeAPIError(500, "INTERNAL", "Upstream blocked on safety check")).error_class == TRANSIENT
+        assert classify_error(RuntimeError("connection blocked")).error_class == TRANSIENT
+    
+    def test_wrapped_errors_keep_their_class(self):
+        """Test ModelCallError carries the original classification."""
+        wrapped = ModelCallError("Gemini text generation failed", classify_error(_throttle()))
+        assert isinstance(wrapped, RuntimeError)
+        assert classify_error(wrapped).error_class == THROTTLE
+    
+    def test_result_failure(self):
+        """Test failed generation results are classified from their fields."""
+        assert result_failure(GenerationResult(success=True)) is None
+        failure = result_failure(GenerationResult(success=False, error_message="x", error_class=SAFETY))
+        assert failure.error_class == SAFETY
+        assert not failure.retryable
+        assert result_failure(GenerationResult(success=False)).error_class == TRANSIENT
+
+
+class TestRetryPolicy:
+    """Tests for RetryPolicy.run."""
+    
+    @pytest.mark.asyncio
+    async def test_retries_transient_until_success(self):
+        """Test transient failures are retried."""
+        attempts = []
+        
+        async def flaky(attempt):
+            attempts.append(attempt)
+            if attempt < 3:
+                raise FakeAPIError(503, "UNAVAILABLE", "overloaded")
+            return "ok"
+        
+        assert await _policy().run(flaky) == "ok"
+        assert attempts == [1, 2, 3]
+    
+    @pytest.mark.asyncio
+    async def test_permanent_and_safety_are_not_retried(self):
+        """Test non-retryable failures fail fast."""
+        attempts = []
+        
+        async def invalid(attempt):
+            attempts.append(attempt)
+            raise FakeAPIError(400, "INVALID_ARGUMENT", "bad request")
+        
+        with pytest.raises(FakeAPIError):
+            await _policy().run(invalid)
+        assert attempts == [1]
+        
+        async def refused(attempt):
+            attempts.append(attempt)
+            return GenerationResult(success=False, error_class=SAFETY)
+        
+        result = await _policy().run(refused, classify_result=result_failure)
+        assert not result.success
+        assert attempts == [1, 1]
+    
+    @pytest.mark.asyncio
+    async def test_honours_retry_hint(self, monkeypatch):
+        """Test throttles wait at least the server's retry delay."""
+        waits = []
+        
+        async def fake_sleep(seconds):
+            waits.append(seconds)
+        
+        monkeypatch.setattr("utils.retry.asyncio.sleep", fake_sleep)
+        
+        async def throttled(attempt):
+            if attempt == 1:
+                raise _throttle("0.04s")
+            return "ok"
+        
+        assert await _policy().run(throttled) == "ok"
+        assert waits and waits[0] >= 0.04
+        
+        async def long_hint(attempt):
+            raise _throttle("600s")
+        
+        with pytest.raises(FakeAPIError):
+            await _policy().run(long_hint)
+        assert len(waits) == 1
+    
+    def test_decorrelated_jitter_bounds(self):
+        """Test delays stay between base and the cap and are not identical."""
+        policy = RetryPolicy(base_delay=1.0, max_delay=20.0, rng=random.Random(3))
+        delays = []
+        delay = 1.0
+        for _ in range(50):
+            delay = policy.backoff(delay)
+            delays.append(delay)
+        assert all(1.0 <= d <= 20.0 for d in delays)
+        assert len(set(round(d, 6) for d in delays)) > 10
+    
+    @pytest.mark.asyncio
+    async def test_job_budget_limits_retries(self):
+        """Test a job stops retrying once its budget is spent."""
+        policy = _policy(max_attempts=5, budget_per_job=2)
+        attempts = []
+        
+        async def failing(attempt):
+            attempts.append(attempt)
+            return GenerationResult(success=False, error_class=TRANSIENT)
+        
+        with job_context("job-retry-budget"):
+            await policy.run(failing, classify_result=result_failure)
+            await policy.run(failing, classify_result=result_failure)
+        
+        assert attempts == [1, 2, 3, 1]
+        assert policy.spent("job-retry-budget") == 2
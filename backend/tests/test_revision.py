@@ -0,0 +1,184 @@
+"""
+Tests for Incremental Revisions
+
+Tests diffing edited memories against a job's stored input and
+re-running only the affected phases and pages.
+"""
+
+from collections import Counter
+
+import pytest
+
+import sys
+sys.path.insert(0, '..')
+
+from agents.normalizer import NormalizerAgent
+from agents.narrative_planner import NarrativePlannerAgent
+from agents.prompt_writer import PromptWriterAgent
+from agents.visual_analyzer import VisualAnalyzerAgent
+from models.job_payload import JobPayload
+from models.planning import BackCoverConcept, CoverConcept, NarrativePlan, PagePlanItem
+from models.profile import NormalizedLifePhase, NormalizedProfile
+from models.user_input import LifePhase, UserForm
+from pipeline.job_processor import process_job_background
+from pipeline.revision import affected_pages, changed_phases, merge_phases, revise_job
+from store import JobStatus
+
+
+MEMORIES = {
+    "young": ["Playing in grandma's garden", "First day at school", "Learning to ride a bike"],
+    "adult": ["Wedding in Lisbon", "Opening the bakery"],
+}
+
+
+def page(number, phase, memory):
+    return PagePlanItem(
+        page_number=number,
+        life_phase=phase,
+        memory_reference=memory,
+        scene_description=f"Scene of {memory}",
+        emotional_tone="joyful"
+    )
+
+
+def payload(young=None):
+    return JobPayload(
+        title="Book",
+        date="2024",
+        page_count=10,
+        young={"memories": young or MEMORIES["young"]},
+        adult={"memories": MEMORIES["adult"]}
+    )
+
+
+@pytest.fixture
+def plan():
+    return NarrativePlan(
+        book_title="Book",
+        total_pages=10,
+        cover=CoverConcept(main_subject_pose="smiling", mood="warm"),
+        back_cover=BackCoverConcept(design_type="symbolic", symbolic_meaning="home"),
+        pages=[page(i + 1, "young", memory) for i, memory in enumerate(MEMORIES["young"])]
+        + [page(i + 4, "adult", memory) for i, memory in enumerate(MEMORIES["adult"])]
+    )
+
+
+class TestDiff:
+    """Tests for finding what an edit affects."""
+    
+    def test_changed_phases(self):
+        """Test only phases with different memories, events or emotions are reported."""
+        old = UserForm(young=LifePhase(memories=["a"]), adult=LifePhase(emotions=["calm"]))
+        new = UserForm(young=LifePhase(memories=["a"]), adult=LifePhase(emotions=["proud"]))
+        
+        assert changed_phases(old, new) == ["adult"]
+    
+    def test_edited_memory_affects_its_page(self, plan):
+        """Test an edited memory re-plans the page about it, matched by life phase and reference."""
+        old = UserForm(young=LifePhase(memories=MEMORIES["young"]))
+        new = UserForm(young=LifePhase(memories=["Playing in grandma's garden", "First day at the new school",
+                                                 "Learning to ride a bike"]))
+        
+        pages = affected_pages(plan, old, new, ["young"])
+        
+        assert [p.page_number for p in pages] == [2]
+    
+    def test_added_memory_affects_the_phase(self, plan):
+        """Test an edit no page can be traced to re-plans the whole phase."""
+        old = UserForm(adult=LifePhase(memories=MEMORIES["adult"]))
+        new = UserForm(adult=LifePhase(memories=MEMORIES["adult"] + ["Retiring to the coast"]))
+        
+        pages = affected_pages(plan, old, new, ["adult"])
+        
+        assert [p.page_number for p in pages] == [4, 5]
+    
+    def test_merge_phases(self):
+        """Test changed phases are replaced, removed ones dropped and the order kept."""
+        def phase(name, memory):
+            return NormalizedLifePhase(phase_name=name, age_range="", core_memories=[memory])
+        profile = NormalizedProfile(
+            subject_name="Maria",
+            life_phases=[phase("young", "old"), phase("adolescent", "teen"), phase("adult", "work")],
+            overall_themes=["family"]
+        )
+        revised = NormalizedProfile(subject_name="", life_phases=[phase("young", "new")])
+        
+        merged = merge_phases(profile, revised, ["young", "adolescent"])
+        
+        assert [(p.phase_name, p.core_memories) for p in merged.life_phases] == [
+            ("young", ["new"]), ("adult", ["work"])
+        ]
+        assert merged.overall_themes == ["family"] and merged.subject_name == "Maria"
+
+
+class TestReviseJob:
+    """Tests for revising a completed job."""
+    
+    @pytest.mark.asyncio
+    async def test_only_the_edited_page_is_recomputed(self, fake_backend, job_store, plan, monkeypatch):
+        """Test one edited memory re-normalizes its phase and re-plans and redraws its page only."""
+        original = payload()
+        job_store.create_job("job-1", page_count=10, input_payload=original.model_dump(mode="json"))
+        await process_job_background("job-1", original, [])
+        job = job_store.get_job("job-1")
+        assert job.status == JobStatus.COMPLETED
+        # Give the fake's random plan known memories
+        result = dict(job.result_json)
+        plan.pages = plan.pages + [page(n, "elderly", f"Memory {n}") for n in range(6, 11)]
+        result["narrative_plan"] = plan.model_dump()
+        job_store.set_result("job-1", job.result_path, result)
+        before = job_store.get_job("job-1").result_json
+        
+        runs = Counter()
+        normalized = []
+        for agent in (NormalizerAgent, NarrativePlannerAgent, PromptWriterAgent, VisualAnalyzerAgent):
+            async def counted(self, input_data, execute=agent.execute, name=agent.__name__):
+                runs[name] += 1
+                if name == "NormalizerAgent":
+                    normalized.append(input_data[0])
+                return await execute(self, input_data)
+            monkeypatch.setattr(agent, "execute", counted)
+        
+        revision = await revise_job(
+            "job-1", payload(young=["Playing in grandma's garden", "First day at the new school",
+                                    "Learning to ride a bike"])
+        )
+        
+        assert revision.changed_phases == ["young"]
+        assert revision.replanned_pages == [2]
+        assert set(revision.regenerated_pages) <= {2}
+        assert revision.model_calls > 0
+        assert revision.calls_saved == job.usage["total"]["calls"] - revision.model_calls
+        assert runs == {"NormalizerAgent": 1, "PromptWriterAgent": 1}
+        assert normalized[0].adult == LifePhase() and normalized[0].young.memories[1] == "First day at the new school"
+        
+        job = job_store.get_job("job-1")
+        after = job.result_json
+        assert after["narrative_plan"]["pages"][1] != before["narrative_plan"]["pages"][1]
+        assert after["narrative_plan"]["pages"][0] == before["narrative_plan"]["pages"][0]
+        for key in ("cover", "back_cover", "design_review"):
+            assert after[key] == before[key]
+        assert [p for i, p in enumerate(after["pages"]) if i != 1] == [
+            p for i, p in enumerate(before["pages"]) if i != 1
+        ]
+        assert job.input_payload["young"]["memories"][1] == "First day at the new school"
+    
+    @pytest.mark.asyncio
+    async def test_rejects_changes_beyond_memories(self, job_store):
+        """Test a revision may only change the memories."""
+        original = payload()
+        job_store.create_job("job-1", input_payload=original.model_dump(mode="json"))
+        job_store.set_normalized_profile("job-1", {"subject_name": "Maria"})
+        job_store.set_prompts("job-1", [{"page_number": 1}])
+        job_store.set_result("job-1", "result.json", {"narrative_plan": {}, "visual_fingerprint": {}})
+        
+        with pytest.raises(ValueError, match="page_count"):
+            await revise_job("job-1", original.model_copy(update={"page_count": 15}))
+    
+    @pytest.mark.asyncio
+    async def test_job_without_stored_state(self, job_store):
+        """Test jobs that completed without stored state cannot be revised."""
+        job_store.create_job("job-1", input_payload=payload().model_dump(mode="json"))
+        
+        with pytest.raises(ValueError, match="no stored input"):
+            await revise_job("job-1", payload())
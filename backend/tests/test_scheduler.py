@@ -0,0 +1,127 @@
+"""
+Tests for Call Scheduler
+
+Tests priority, deadline and interactive-slot ordering of model calls.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import sys
+sys.path.insert(0, '..')
+
+from clients.call_scheduler import CallScheduler, KIND_TEXT, KIND_IMAGE
+from utils.job_context import job_context, current_job, PRIORITY_INTERACTIVE
+
+
+async def _run_call(scheduler, kind, name, order, release, **context):
+    """Hold a slot until released, recording the admission order."""
+    with job_context(**context):
+        async with scheduler.slot(kind):
+            order.append(name)
+            await release.wait()
+
+
+class TestCallScheduler:
+    """Tests for CallScheduler."""
+    
+    @pytest.mark.asyncio
+    async def test_orders_by_priority_then_deadline(self):
+        """Test waiting calls are admitted by priority, then earliest deadline."""
+        scheduler = CallScheduler(limits={KIND_IMAGE: 1})
+        order = []
+        release = asyncio.Event()
+        now = datetime.now()
+        
+        blocker = asyncio.create_task(_run_call(scheduler, KIND_IMAGE, "blocker", order, release))
+        await asyncio.sleep(0)
+        
+        tasks = [
+            asyncio.create_task(_run_call(scheduler, KIND_IMAGE, "low", order, release, priority="low")),
+            asyncio.create_task(_run_call(
+                scheduler, KIND_IMAGE, "normal-late", order, release, deadline=now + timedelta(hours=2)
+            )),
+            asyncio.create_task(_run_call(
+                scheduler, KIND_IMAGE, "normal-soon", order, release, deadline=now + timedelta(minutes=5)
+            )),
+            asyncio.create_task(_run_call(scheduler, KIND_IMAGE, "high", order, release, priority="high")),
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.stats()[KIND_IMAGE]["waiting"] == 4
+        
+        release.set()
+        await asyncio.gather(blocker, *tasks)
+        
+        assert order == ["blocker", "high", "normal-soon", "normal-late", "low"]
+    
+    @pytest.mark.asyncio
+    async def test_reserved_slot_only_for_interactive(self):
+        """Test batch calls cannot take the interactive reservation."""
+        scheduler = CallScheduler(limits={KIND_TEXT: 2}, reserved={KIND_TEXT: 1})
+        order = []
+        release = asyncio.Event()
+        
+        batch = [
+            asyncio.create_task(_run_call(scheduler, KIND_TEXT, f"batch-{i}", order, release))
+            for i in range(2)
+        ]
+        await asyncio.sleep(0)
+        assert order == ["batch-0"]
+        
+        interactive = asyncio.create_task(
+            _run_call(scheduler, KIND_TEXT, "enhance", order, release, priority=PRIORITY_INTERACTIVE)
+        )
+        await asyncio.sleep(0)
+        assert order == ["batch-0", "enhance"]
+        
+        release.set()
+        await asyncio.gather(interactive, *batch)
+        assert scheduler.stats()[KIND_TEXT]["in_use"] == 0
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_releases_nothing(self):
+        """Test cancelling a waiting call leaves slot accounting intact."""
+        scheduler = CallScheduler(limits={KIND_IMAGE: 1})
+        order = []
+        release = asyncio.Event()
+        
+        holder = asyncio.create_task(_run_call(scheduler, KIND_IMAGE, "holder", order, release))
+        waiter = asyncio.create_task(_run_call(scheduler, KIND_IMAGE, "waiter", order, release))
+        await asyncio.sleep(0)
+        
+        waiter.cancel()
+        release.set()
+        await holder
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        
+        assert order == ["holder"]
+        assert scheduler.stats()[KIND_IMAGE]["in_use"] == 0
+    
+    @pytest.mark.asyncio
+    async def test_slot_if_free_never_queues(self):
+        """Test optional calls only take a slot that is free right away."""
+        scheduler = CallScheduler(limits={KIND_IMAGE: 2})
+        release = asyncio.Event()
+        holder = asyncio.create_task(_run_call(scheduler, KIND_IMAGE, "holder", [], release))
+        await asyncio.sleep(0)
+        
+        async with scheduler.slot_if_free(KIND_IMAGE) as admitted:
+            assert admitted
+            assert scheduler.stats()[KIND_IMAGE]["in_use"] == 2
+            async with scheduler.slot_if_free(KIND_IMAGE) as second:
+                assert not second
+        
+        assert scheduler.stats()[KIND_IMAGE]["in_use"] == 1
+        release.set()
+        await holder
+    
+    def test_job_context_resets(self):
+        """Test the job context is restored after the block."""
+        with job_context("job-1", priority="high"):
+            assert current_job().job_id == "job-1"
+            assert current_job().priority == "high"
+        assert current_job().job_id is None
+        assert current_job().priority == "normal"
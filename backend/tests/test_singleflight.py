@@ -0,0 +1,188 @@
+"""
+Tests for Request Coalescing
+
+Tests sharing identical in-flight model requests, cancellation of their
+callers and coalescing in GeminiClient on the fake SDK.
+"""
+
+import asyncio
+
+import pytest
+
+import sys
+sys.path.insert(0, '..')
+
+import clients.fake_genai as fake_genai
+from clients.fake_genai import FakeGenaiClient, ModelProfile, render_image
+from clients.gemini_client import GeminiClient, set_sdk_factory
+from clients.singleflight import SingleFlight, request_key
+from utils import metrics
+from utils.config import get_config
+
+
+def _coalescing(outcome, kind="test"):
+    return metrics.MODEL_CALL_COALESCING.value(kind=kind, outcome=outcome)
+
+
+class TestSingleFlight:
+    """Tests for SingleFlight and request_key."""
+    
+    @pytest.mark.asyncio
+    async def test_identical_calls_share_one_request(self):
+        """Test callers with the same key share one call and its result."""
+        flight = SingleFlight()
+        calls = []
+        
+        async def call():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"text": "reply"}
+        
+        coalesced = _coalescing("coalesced")
+        results = await asyncio.gather(*(flight.do("key", call, kind="test") for _ in range(3)))
+        
+        assert len(calls) == 1
+        assert results == [{"text": "reply"}] * 3
+        assert _coalescing("coalesced") == coalesced + 2
+        assert flight.in_flight() == 0
+        
+        await flight.do("key", call, kind="test")
+        assert len(calls) == 2
+    
+    @pytest.mark.asyncio
+    async def test_errors_reach_every_caller(self):
+        """Test the shared request's error is raised to each caller."""
+        flight = SingleFlight()
+        
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("quota")
+        
+        results = await asyncio.gather(*(flight.do("key", fail) for _ in range(2)), return_exceptions=True)
+        
+        assert [str(result) for result in results] == ["quota", "quota"]
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_leaves_the_request_running(self):
+        """Test cancelling one caller neither cancels the request nor the other callers."""
+        flight = SingleFlight()
+        release = asyncio.Event()
+        
+        async def call():
+            await release.wait()
+            return "reply"
+        
+        first = asyncio.create_task(flight.do("key", call))
+        second = asyncio.create_task(flight.do("key", call))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        
+        assert await second == "reply"
+        assert first.cancelled()
+    
+    @pytest.mark.asyncio
+    async def test_request_cancelled_when_every_caller_leaves(self):
+        """Test the request is cancelled with its last caller, and a new caller starts afresh."""
+        flight = SingleFlight()
+        cancelled = []
+        
+        async def call():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+        
+        abandoned = _coalescing("abandoned")
+        callers = [asyncio.create_task(flight.do("key", call, kind="test")) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        
+        assert cancelled == [1]
+        assert _coalescing("abandoned") == abandoned + 1
+        assert flight.in_flight() == 0
+        
+        async def quick():
+            return "reply"
+        assert await flight.do("key", quick) == "reply"
+    
+    def test_request_key(self):
+        """Test keys depend on every part of the request, and unknown values are not keyed."""
+        base = request_key(model="m", contents=["prompt", b"image"], config={"a": 1, "b": 2})
+        
+        assert request_key(model="m", contents=["prompt", b"image"], config={"b": 2, "a": 1}) == base
+        assert request_key(model="m", contents=["prompt", b"other"], config={"a": 1, "b": 2}) != base
+        assert request_key(model="n", contents=["prompt", b"image"], config={"a": 1, "b": 2}) != base
+        assert request_key(model="m", contents=[object()]) is None
+
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    """Error-free fake SDK with a short simulated latency."""
+    monkeypatch.setattr(fake_genai, "FALLBACK_PROFILE", ModelProfile(1.0, 0.1, 10000))
+    fake = FakeGenaiClient(time_scale=0.05, image_size=(64, 64), image_variants=1, profiles={})
+    set_sdk_factory(lambda api_key: fake)
+    yield fake
+    set_sdk_factory(None)
+
+
+class TestGeminiClientCoalescing:
+    """Tests for coalescing in GeminiClient."""
+    
+    @pytest.mark.asyncio
+    async def test_identical_calls_from_separate_clients(self, fake_backend):
+        """Test identical concurrent calls of different jobs' clients send one request."""
+        clients = [GeminiClient(api_key="key") for _ in range(3)]
+        
+        replies = await asyncio.gather(
+            *(client.generate_text("system", "Enhance this text") for client in clients),
+            clients[0].generate_text("system", "Another text")
+        )
+        
+        assert sum(fake_backend.stats.calls.values()) == 2
+        assert replies[0] == replies[1] == replies[2]
+    
+    @pytest.mark.asyncio
+    async def test_identical_image_requests(self, fake_backend, tmp_path):
+        """Test requests with the same inline images are coalesced, different images are not."""
+        paths = []
+        for seed in (1, 2):
+            path = tmp_path / f"photo{seed}.png"
+            path.write_bytes(render_image(64, 64, seed))
+            paths.append(str(path))
+        client = GeminiClient(api_key="key")
+        
+        await asyncio.gather(
+            client.analyze_images("Describe", [paths[0]]),
+            client.analyze_images("Describe", [paths[0]]),
+            client.analyze_images("Describe", [paths[1]])
+        )
+        
+        assert sum(fake_backend.stats.calls.values()) == 2
+    
+    @pytest.mark.asyncio
+    async def test_image_generation_is_not_coalesced(self, fake_backend, tmp_path):
+        """Test identical concurrent image generations each get their own sampled image."""
+        client = GeminiClient(api_key="key")
+        
+        results = await asyncio.gather(*(
+            client.generate_image("A garden", output_path=str(tmp_path / f"page_0{page}.jpg")) for page in (1, 2)
+        ))
+        
+        assert all(result.success for result in results)
+        assert fake_backend.stats.calls[GeminiClient.MODEL_IMAGE] == 2
+    
+    @pytest.mark.asyncio
+    async def test_disabled(self, fake_backend, monkeypatch):
+        """Test every call is sent when coalescing is disabled."""
+        monkeypatch.setattr(get_config(), "request_coalescing_enabled", False)
+        client = GeminiClient(api_key="key")
+        
+        await asyncio.gather(*(client.generate_text("system", "Enhance this text") for _ in range(2)))
+        
+        assert sum(fake_backend.stats.calls.values()) == 2
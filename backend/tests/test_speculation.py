@@ -0,0 +1,121 @@
+"""
+Tests for Reference Speculation
+
+Tests reference upload sessions, speculative analysis into the reference
+cache and its adoption by a later job, on the fake SDK.
+"""
+
+import asyncio
+import logging
+import os
+
+import pytest
+
+import sys
+sys.path.insert(0, '..')
+
+import pipeline.speculation as speculation
+import store.file_storage as file_storage
+from clients.fake_genai import render_image
+from clients.gemini_client import GeminiClient
+from models.user_input import BookPreferences, ReferenceImages, UserForm
+from pipeline.runner import PipelineRunner
+from pipeline.speculation import SpeculationManager
+
+
+@pytest.fixture
+def fake_backend(fake_backend, tmp_path, monkeypatch):
+    """The shared fake SDK, with uploaded reference sessions stored with the rest of the storage."""
+    monkeypatch.setattr(speculation, "STORAGE_DIR", str(tmp_path / "storage"))
+    return fake_backend
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    manager = SpeculationManager(ttl_seconds=60, wait_seconds=10)
+    monkeypatch.setattr(speculation, "_speculation_manager", manager)
+    return manager
+
+
+def photos():
+    return [(render_image(128, 128, seed=seed), f"photo{seed}.jpg") for seed in (1, 2)]
+
+
+async def plan_references(job_id, reference_paths):
+    """Run a job's reference stages; returns (fingerprint, character sheet path)."""
+    runner = PipelineRunner(GeminiClient(api_key="fake-key"), logging.getLogger("test"))
+    output_dir = file_storage.get_outputs_dir(job_id)
+    stages = {
+        stage.name: stage
+        for stage in runner.planning_stages(
+            UserForm(),
+            BookPreferences(title="Book", date="2024", page_count=10, style="watercolor"),
+            ReferenceImages(paths=reference_paths),
+            output_dir,
+            "en-US",
+            print
+        )
+    }
+    keys = await stages["reference_cache_keys"].run()
+    fingerprint = await stages["visual_fingerprint"].run(keys)
+    return fingerprint, await stages["character_sheet"].run(fingerprint, keys)
+
+
+class TestSpeculation:
+    """Tests for SpeculationManager."""
+    
+    @pytest.mark.asyncio
+    async def test_adopting_job_skips_reference_stages(self, fake_backend, manager):
+        """Test a job adopting a finished session makes no model calls for its references."""
+        session = await manager.create(photos(), style="watercolor", user_language="en-US")
+        await session.task
+        calls = sum(fake_backend.stats.calls.values())
+        assert calls == 2
+        
+        paths = await manager.adopt(session.token, "job-1")
+        fingerprint, sheet = await plan_references("job-1", paths)
+        
+        assert sum(fake_backend.stats.calls.values()) == calls
+        assert [os.path.dirname(p) for p in paths] == [file_storage.get_references_dir("job-1")] * 2
+        assert sheet == os.path.join(file_storage.get_outputs_dir("job-1"), "character_ref.jpg")
+        assert fingerprint.reference_image_analysis
+        assert not os.path.exists(os.path.join(file_storage.STORAGE_DIR, "sessions", session.token))
+    
+    @pytest.mark.asyncio
+    async def test_job_waits_for_running_speculation(self, fake_backend, manager):
+        """Test a job started mid-speculation reuses it instead of repeating the calls."""
+        session = await manager.create(photos(), style="watercolor", user_language="en-US")
+        assert session.speculating
+        
+        paths = await manager.adopt(session.token, "job-2")
+        await plan_references("job-2", paths)
+        
+        assert sum(fake_backend.stats.calls.values()) == 2
+    
+    @pytest.mark.asyncio
+    async def test_without_style_only_photos_are_kept(self, fake_backend, manager):
+        """Test a session without a style holds the photos but does not speculate."""
+        session = await manager.create(photos())
+        
+        assert session.task is None
+        assert len(await manager.adopt(session.token, "job-3")) == 2
+        assert fake_backend.stats.calls == {}
+    
+    @pytest.mark.asyncio
+    async def test_expired_session(self, fake_backend):
+        """Test an expired session is cancelled, deleted and cannot be adopted."""
+        manager = SpeculationManager(ttl_seconds=0, wait_seconds=10)
+        session = await manager.create(photos(), style="watercolor")
+        
+        assert await manager.adopt(session.token, "job-4") is None
+        await asyncio.sleep(0)
+        assert session.task.cancelled()
+        assert not os.path.exists(os.path.join(file_storage.STORAGE_DIR, "sessions", session.token))
+    
+    @pytest.mark.asyncio
+    async def test_invalid_style(self, fake_backend, manager):
+        """Test an unknown style is rejected before anything is saved."""
+        with pytest.raises(ValueError):
+            await manager.create(photos(), style="oil painting")
+        
+        assert not os.path.exists(os.path.join(file_storage.STORAGE_DIR, "sessions"))
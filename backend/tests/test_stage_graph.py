@@ -0,0 +1,95 @@
+"""
+Tests for Stage Graph
+
+Tests dependency-driven stage execution and the critical-path report.
+"""
+
+import asyncio
+
+import pytest
+
+import sys
+sys.path.insert(0, '..')
+
+from pipeline.stage_graph import Stage, StageGraph
+
+
+def _sleeper(seconds, value=None, log=None, name=None):
+    """Create a stage function that sleeps and returns a value."""
+    async def run(**inputs):
+        if log is not None:
+            log.append(name)
+        await asyncio.sleep(seconds)
+        return value if value is not None else inputs
+    return run
+
+
+class TestStageGraph:
+    """Tests for StageGraph."""
+    
+    @pytest.mark.asyncio
+    async def test_stage_starts_when_its_inputs_resolve(self):
+        """Test an independent stage does not wait for unrelated stages."""
+        started = []
+        graph = StageGraph([
+            Stage("profile", _sleeper(0.05, "profile", started, "profile")),
+            Stage("plan", _sleeper(0.01, "plan", started, "plan"), ("profile",)),
+            Stage("fingerprint", _sleeper(0.01, "fingerprint", started, "fingerprint")),
+            Stage("sheet", _sleeper(0.01, "sheet", started, "sheet"), ("fingerprint",)),
+        ])
+        
+        run = await graph.run()
+        
+        assert started.index("sheet") < started.index("plan")
+        assert run["plan"] == "plan"
+        assert run.timings["sheet"].finished < run.timings["plan"].started
+    
+    @pytest.mark.asyncio
+    async def test_critical_path_follows_slowest_dependency(self):
+        """Test the critical path and slack report."""
+        graph = StageGraph([
+            Stage("fast", _sleeper(0.01, 1)),
+            Stage("slow", _sleeper(0.08, 2)),
+            Stage("merge", _sleeper(0.01, 3), ("fast", "slow")),
+        ], inputs=("seed",))
+        
+        run = await graph.run({"seed": 0})
+        report = run.report()
+        
+        assert run.critical_path() == ["slow", "merge"]
+        assert [step["stage"] for step in report["critical_path"]] == ["slow", "merge"]
+        slack = {stage["stage"]: stage["slack_ms"] for stage in report["stages"]}
+        assert slack["fast"] > 40
+        assert slack["slow"] < 20
+        assert "critical path" in run.describe()
+    
+    @pytest.mark.asyncio
+    async def test_failure_cancels_pending_stages(self):
+        """Test a failing stage cancels the rest and propagates."""
+        async def broken():
+            raise ValueError("boom")
+        
+        finished = []
+        
+        async def slow():
+            await asyncio.sleep(1)
+            finished.append("slow")
+        
+        graph = StageGraph([
+            Stage("broken", broken),
+            Stage("slow", slow),
+            Stage("after", _sleeper(0, 1), ("broken",)),
+        ])
+        
+        with pytest.raises(ValueError, match="boom"):
+            await graph.run()
+        assert finished == []
+    
+    def test_rejects_cycles_and_unknown_inputs(self):
+        """Test graph validation."""
+        noop = _sleeper(0, 1)
+        
+        with pytest.raises(ValueError, match="cycle"):
+            StageGraph([Stage("a", noop, ("b",)), Stage("b", noop, ("a",))])
+        with pytest.raises(ValueError, match="unknown"):
+            StageGraph([Stage("a", noop, ("missing",))])
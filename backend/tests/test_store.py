@@ -0,0 +1,219 @@
+"""
+Tests for Job Storage
+
+Tests the job store implementations and the worker job queue.
+"""
+
+import time
+from datetime import datetime, timedelta
+import pytest
+
+import sys
+sys.path.insert(0, '..')
+
+import store.job_store
+from store.job_store import JobStore, SQLiteJobStore, JobStatus, StepName, PageStatus
+from store.job_queue import JobQueue, QueueStatus
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Provide a temporary SQLite database path."""
+    return str(tmp_path / "jobs.db")
+
+
+class TestSQLiteJobStore:
+    """Tests for SQLiteJobStore."""
+    
+    def test_updates_are_visible_to_other_instances(self, db_path):
+        """Test that a second store (another process) sees updates."""
+        writer = SQLiteJobStore(db_path)
+        reader = SQLiteJobStore(db_path)
+        
+        writer.create_job("job-1", input_payload={"title": "Test"}, page_count=10)
+        writer.update_job_status("job-1", status=JobStatus.PROCESSING, progress_percent=40)
+        writer.start_step("job-1", StepName.PLANNING.value)
+        writer.update_page_status("job-1", 3, PageStatus.GENERATING)
+        
+        job = reader.get_job("job-1")
+        assert job.status == JobStatus.PROCESSING.value
+        assert job.progress_percent == 40
+        assert job.current_step == StepName.PLANNING.value
+        assert job.pages[3].status == PageStatus.GENERATING.value
+    
+    @pytest.mark.asyncio
+    async def test_updates_on_the_event_loop_do_not_wait_for_the_database(self, db_path):
+        """Test an update made on the event loop returns while another process holds the write lock."""
+        import sqlite3
+        writer = SQLiteJobStore(db_path)
+        reader = SQLiteJobStore(db_path)
+        writer.create_job("job-1", page_count=10)
+        
+        other = sqlite3.connect(db_path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        started = time.monotonic()
+        writer.update_job_status("job-1", progress_percent=20)
+        writer.update_job_status("job-1", progress_percent=40)
+        writer.update_page_status("job-1", 3, PageStatus.GENERATING)
+        assert time.monotonic() - started < 0.5
+        other.execute("COMMIT")
+        other.close()
+        
+        writer.flush()
+        job = reader.get_job("job-1")
+        assert job.progress_percent == 40
+        assert job.pages[3].status == PageStatus.GENERATING.value
+    
+    def test_list_and_delete(self, db_path):
+        """Test listing and deleting records."""
+        store = SQLiteJobStore(db_path)
+        store.create_job("job-1")
+        store.create_job("job-2")
+        
+        assert {j.job_id for j in store.list_jobs()} == {"job-1", "job-2"}
+        assert store.delete_job("job-1")
+        assert store.get_job("job-1") is None
+        assert store.update_job_status("job-1", progress_percent=10) is None
+    
+    def test_in_memory_store_unchanged(self):
+        """Test the default in-memory store still behaves the same."""
+        store = JobStore()
+        store.create_job("job-1", page_count=10)
+        job = store.update_job_status("job-1", status=JobStatus.COMPLETED)
+        
+        assert job.completed_at is not None
+        assert len(job.pages) == 12
+
+
+class TestJobQueue:
+    """Tests for JobQueue lease semantics."""
+    
+    def test_claim_is_exclusive(self, db_path):
+        """Test that a leased job cannot be claimed by another worker."""
+        queue = JobQueue(db_path, lease_seconds=60)
+        queue.enqueue("job-1", {"title": "Test"}, ["/ref.jpg"])
+        
+        job = queue.claim("worker-a")
+        assert job.job_id == "job-1"
+        assert job.payload == {"title": "Test"}
+        assert job.reference_paths == ["/ref.jpg"]
+        assert queue.claim("worker-b") is None
+    
+    def test_expired_lease_is_requeued(self, db_path):
+        """Test that a dead worker's job is picked up by another worker."""
+        queue = JobQueue(db_path, lease_seconds=0.05)
+        queue.enqueue("job-1", {}, [])
+        
+        queue.claim("worker-a")
+        time.sleep(0.1)
+        
+        assert queue.reap_expired() == []
+        job = queue.claim("worker-b")
+        assert job.job_id == "job-1"
+        assert job.attempts == 2
+        assert not queue.heartbeat("job-1", "worker-a")
+        assert queue.heartbeat("job-1", "worker-b")
+    
+    def test_job_dies_after_max_attempts(self, db_path):
+        """Test that repeatedly abandoned jobs are marked dead."""
+        queue = JobQueue(db_path, lease_seconds=0.05, max_attempts=1)
+        queue.enqueue("job-1", {}, [])
+        
+        queue.claim("worker-a")
+        time.sleep(0.1)
+        
+        assert queue.reap_expired() == ["job-1"]
+        assert queue.claim("worker-b") is None
+        assert queue.stats()[QueueStatus.DEAD] == 1
+    
+    def test_claims_by_priority_then_deadline(self, db_path):
+        """Test that urgent jobs are claimed before older ones."""
+        queue = JobQueue(db_path)
+        now = datetime.now()
+        queue.enqueue("low", {}, [], priority="low")
+        queue.enqueue("normal", {}, [])
+        queue.enqueue("normal-deadline", {}, [], deadline=now + timedelta(minutes=10))
+        queue.enqueue("high", {}, [], priority="high")
+        
+        claimed = [queue.claim("worker-a").job_id for _ in range(4)]
+        assert claimed == ["high", "normal-deadline", "normal", "low"]
+    
+    def test_complete_requires_lease(self, db_path):
+        """Test that only the lease owner can complete a job."""
+        queue = JobQueue(db_path)
+        queue.enqueue("job-1", {}, [])
+        queue.claim("worker-a")
+        
+        assert not queue.complete("job-1", "worker-b")
+        assert queue.complete("job-1", "worker-a")
+        assert queue.stats()[QueueStatus.DONE] == 1
+    
+    def test_removed_job_loses_its_lease(self, db_path):
+        """Test a removed job is gone from the queue and its worker's heartbeat fails."""
+        queue = JobQueue(db_path)
+        queue.enqueue("job-1", {}, [])
+        queue.claim("worker-a")
+        
+        assert queue.remove("job-1")
+        assert not queue.heartbeat("job-1", "worker-a")
+        assert sum(queue.stats().values()) == 0
+
+
+@pytest.fixture
+def worker(db_path, tmp_path, monkeypatch):
+    """A worker on a fresh queue (two attempts per job) and SQLite job store."""
+    import logging
+    import store.job_queue
+    from utils import tracing
+    from utils.config import get_config
+    from worker import Worker
+    
+    monkeypatch.setattr(store.job_queue, "_job_queue", JobQueue(db_path, max_attempts=2))
+    monkeypatch.setattr(store.job_store, "_job_store", SQLiteJobStore(db_path))
+    monkeypatch.setattr(tracing, "_exporter", tracing.FileSpanExporter(str(tmp_path / "traces")))
+    return Worker("worker-a", 1, get_config(), logging.getLogger("test"))
+
+
+def failing_pipeline(monkeypatch, error):
+    """Make every job's pipeline fail with an error after reporting some progress."""
+    import pipeline.job_processor as job_processor
+    
+    async def fail(job_id, **kwargs):
+        store.job_store.get_job_store().update_job_status(job_id, progress_percent=40)
+        raise error
+    monkeypatch.setattr(job_processor, "run_pipeline_with_tracking", fail)
+
+
+class TestWorker:
+    """Tests for the queue worker."""
+    
+    @pytest.mark.asyncio
+    async def test_transient_failure_is_retried(self, worker, monkeypatch):
+        """Test a job failing on an unavailable model is requeued with fresh progress until out of attempts."""
+        from utils.retry import Failure, ModelCallError, TRANSIENT
+        failing_pipeline(monkeypatch, ModelCallError("Model unavailable", Failure(TRANSIENT)))
+        worker.job_store.create_job("job-1", page_count=10)
+        worker.queue.enqueue("job-1", {"title": "Book", "date": "2024"}, [])
+        
+        await worker._handle(worker.queue.claim("worker-a"))
+        assert worker.queue.stats()[QueueStatus.QUEUED] == 1
+        job = worker.job_store.get_job("job-1")
+        assert job.status == JobStatus.QUEUED.value
+        assert job.progress_percent == 0 and job.error is None
+        
+        await worker._handle(worker.queue.claim("worker-a"))
+        assert worker.queue.stats()[QueueStatus.DEAD] == 1
+        job = worker.job_store.get_job("job-1")
+        assert job.status == JobStatus.FAILED.value and job.error == "Model unavailable"
+    
+    @pytest.mark.asyncio
+    async def test_other_failures_are_not_retried(self, worker, monkeypatch):
+        """Test a job failing for another reason fails at once."""
+        failing_pipeline(monkeypatch, RuntimeError("All styles failed"))
+        worker.job_store.create_job("job-1", page_count=10)
+        worker.queue.enqueue("job-1", {"title": "Book", "date": "2024"}, [])
+        
+        await worker._handle(worker.queue.claim("worker-a"))
+        
+        assert worker.queue.stats()[QueueStatus.DEAD] == 1
+        assert worker.job_store.get_job("job-1").status == JobStatus.FAILED.value
@@ -0,0 +1,116 @@
+"""
+Tests for Style Analytics
+
+Tests the book-level style consistency measurements and that they reach
+the design review.
+"""
+
+import io
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from PIL import Image, ImageOps
+
+import sys
+sys.path.insert(0, '..')
+
+from agents.designer_reviewer import DesignerReviewerAgent
+from clients.fake_genai import render_image
+from models.generation import GenerationResult, GenerationMetadata
+from models.review import IllustrationReviewItem
+from models.user_input import BookPreferences
+from utils.style_analytics import analyze_book_style
+
+
+@pytest.fixture
+def book(tmp_path):
+    """Write pages as JPEGs; returns a function taking per-page images."""
+    def write(images):
+        results = []
+        for number, image in enumerate(images, start=1):
+            path = tmp_path / f"page_{number:02d}.jpg"
+            image.save(path, "JPEG", quality=60)
+            results.append(GenerationResult(
+                success=True, image_path=str(path), metadata=GenerationMetadata(generation_id=str(number))
+            ))
+        return results, list(range(1, len(images) + 1))
+    return write
+
+
+def illustration(seed=1):
+    return Image.open(io.BytesIO(render_image(300, 300, seed=seed)))
+
+
+class TestStyleAnalytics:
+    """Tests for analyze_book_style."""
+    
+    def test_consistent_book(self, book):
+        """Test identical pages score full consistency with no outliers."""
+        results, pages = book([illustration()] * 6)
+        
+        style = analyze_book_style(results, pages)
+        
+        assert style.consistency_score == 10.0
+        assert style.outlier_pages == []
+        assert len(style.book_palette) == 5
+        assert style.pages[0].palette == style.book_palette
+        assert 0 < style.pages[0].edge_density < 1
+    
+    def test_off_style_pages_are_outliers(self, book):
+        """Test a grayscale page and a flat dark page stand out."""
+        pages = [illustration(seed % 2) for seed in range(10)]
+        pages[3] = ImageOps.grayscale(pages[3]).convert("RGB")
+        pages[7] = Image.new("RGB", (300, 300), (20, 20, 60))
+        results, numbers = book(pages)
+        
+        style = analyze_book_style(results, numbers)
+        
+        assert style.outlier_pages == [4, 8]
+        assert style.pages[3].saturation < 0.05
+        assert style.consistency_score < 10.0
+    
+    def test_unreadable_pages_are_skipped(self, book):
+        """Test pages without a readable image are left out."""
+        results, pages = book([illustration()] * 3)
+        results.append(GenerationResult(success=False, metadata=GenerationMetadata(generation_id="failed")))
+        pages.append(4)
+        
+        style = analyze_book_style(results, pages)
+        
+        assert [p.page_number for p in style.pages] == [1, 2, 3]
+        assert analyze_book_style(results[:1], pages[:1]) is None
+
+
+class TestDesignReviewMetrics:
+    """Tests for passing the measurements to DesignerReviewerAgent."""
+    
+    @pytest.mark.asyncio
+    async def test_metrics_are_prompted_and_stored(self, book):
+        """Test the measurements reach the prompt and the review, and outliers need attention."""
+        pages = [illustration()] * 5 + [Image.new("RGB", (300, 300), (20, 20, 60))]
+        results, numbers = book(pages)
+        style = analyze_book_style(results, numbers)
+        gemini = Mock()
+        gemini.generate_json = AsyncMock(return_value={
+            "overall_cohesion": 9, "style_consistency_score": 9, "color_palette_harmony": 9,
+            "narrative_flow": 9, "character_consistency": 9
+        })
+        reviews = [
+            IllustrationReviewItem(
+                page_number=n, artistic_assessment="Good", color_harmony="good",
+                style_adherence="good", recommended_action="approve"
+            )
+            for n in numbers
+        ]
+        preferences = BookPreferences(title="Book", date="2024", page_count=10, style="watercolor")
+        
+        review = await DesignerReviewerAgent(gemini, Mock()).execute(
+            (results, reviews, preferences, "en-US", style)
+        )
+        
+        prompt = gemini.generate_json.call_args.kwargs["user_prompt"]
+        assert "=== MEASURED STYLE CONSISTENCY ===" in prompt
+        assert "Page 6:" in prompt and "(OUTLIER)" in prompt
+        assert review.style_metrics == style
+        assert review.pages_needing_attention == [6]
+        assert not review.approved
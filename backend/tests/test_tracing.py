@@ -0,0 +1,102 @@
+"""
+Tests for Tracing
+
+Tests span nesting, the file exporter, the waterfall timeline and the
+pipeline instrumentation.
+"""
+
+import os
+import asyncio
+import pytest
+from unittest.mock import Mock, AsyncMock
+
+import sys
+sys.path.insert(0, '..')
+
+from agents.normalizer import NormalizerAgent
+from models.user_input import UserForm, BookPreferences, LifePhase
+from utils.job_context import job_context
+from utils import tracing
+
+
+@pytest.fixture
+def exporter(tmp_path):
+    """Route exported spans to a temporary directory."""
+    exporter = tracing.FileSpanExporter(str(tmp_path))
+    tracing.set_exporter(exporter)
+    yield exporter
+    tracing.set_exporter(None)
+
+
+class TestSpans:
+    """Tests for span creation and export."""
+    
+    @pytest.mark.asyncio
+    async def test_children_of_gathered_tasks_share_parent(self, exporter):
+        """Test spans opened in asyncio.gather children are parented to the caller."""
+        async def page(number):
+            with tracing.span("image.generate", page=number, attempt=1):
+                await asyncio.sleep(0)
+        
+        with job_context("job-1"):
+            with tracing.span("job.process") as root:
+                await asyncio.gather(page(1), page(2))
+        
+        spans = exporter.load(tracing.trace_id_for_job("job-1"))
+        assert len(spans) == 3
+        children = [s for s in spans if s["name"] == "image.generate"]
+        assert {s["parent_span_id"] for s in children} == {root.span_id}
+        assert sorted(s["attributes"]["page"] for s in children) == [1, 2]
+        assert all(s["attributes"]["job_id"] == "job-1" for s in spans)
+    
+    def test_error_status_and_unsampled_spans(self, exporter):
+        """Test failures are recorded and spans outside a job are not exported."""
+        with job_context("job-2"):
+            with pytest.raises(ValueError):
+                with tracing.span("storage.upload", page=3):
+                    raise ValueError("bucket missing")
+        
+        with tracing.span("enhance-text"):
+            pass
+        
+        spans = exporter.load(tracing.trace_id_for_job("job-2"))
+        assert spans[0]["status"] == tracing.STATUS_ERROR
+        assert "bucket missing" in spans[0]["status_message"]
+        assert len(os.listdir(exporter.directory)) == 1
+    
+    def test_waterfall_orders_depth_first(self):
+        """Test the timeline nests children under parents with offsets."""
+        spans = [
+            {"name": "child", "trace_id": "t", "span_id": "b", "parent_span_id": "a",
+             "start_time_unix_nano": 2_000_000, "end_time_unix_nano": 5_000_000},
+            {"name": "root", "trace_id": "t", "span_id": "a", "parent_span_id": None,
+             "start_time_unix_nano": 1_000_000, "end_time_unix_nano": 9_000_000},
+        ]
+        
+        timeline = tracing.build_waterfall(spans)
+        
+        assert [row["name"] for row in timeline["spans"]] == ["root", "child"]
+        assert timeline["spans"][1]["depth"] == 1
+        assert timeline["spans"][1]["start_offset_ms"] == 1.0
+        assert timeline["spans"][1]["duration_ms"] == 3.0
+        assert timeline["duration_ms"] == 8.0
+
+
+class TestAgentSpans:
+    """Tests for AgentBase.execute instrumentation."""
+    
+    @pytest.mark.asyncio
+    async def test_agent_execute_creates_span(self, exporter):
+        """Test each agent execution is recorded as a span."""
+        gemini = Mock()
+        gemini.generate_json = AsyncMock(return_value={})
+        agent = NormalizerAgent(gemini, Mock())
+        form = UserForm(young=LifePhase(memories=["Playing in the park"]))
+        preferences = BookPreferences(title="Test Book", date="2024", page_count=10, style="watercolor")
+        
+        with job_context("job-3"):
+            await agent.execute((form, preferences, "en-US"))
+        
+        spans = exporter.load(tracing.trace_id_for_job("job-3"))
+        assert [s["name"] for s in spans] == ["agent.NormalizerAgent"]
+        assert spans[0]["attributes"]["agent"] == "NormalizerAgent"
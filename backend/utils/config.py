@@ -59,6 +59,90 @@ class Config:
     port: int = field(default_factory=lambda: int(os.getenv("PORT", "8000")))
     debug: bool = field(default_factory=lambda: os.getenv("DEBUG", "false").lower() == "true")
     
+    # Job execution settings
+    # "inline" runs jobs inside the API process, "queue" hands them to worker.py processes
+    execution_mode: str = field(default_factory=lambda: os.getenv("JOB_EXECUTION_MODE", "inline").lower())
+    job_db_path: str = field(default_factory=lambda: os.getenv("JOB_DB_PATH", ""))
+    worker_lease_seconds: int = field(default_factory=lambda: int(os.getenv("WORKER_LEASE_SECONDS", "60")))
+    worker_max_attempts: int = field(default_factory=lambda: int(os.getenv("WORKER_MAX_ATTEMPTS", "3")))
+    worker_poll_interval: float = field(default_factory=lambda: float(os.getenv("WORKER_POLL_INTERVAL", "1.0")))
+    
+    # Call scheduling (concurrent model calls per process)
+    text_max_concurrency: int = field(default_factory=lambda: int(os.getenv("TEXT_MAX_CONCURRENCY", "4")))
+    image_max_concurrency: int = field(default_factory=lambda: int(os.getenv("IMAGE_MAX_CONCURRENCY", "2")))
+    interactive_reserved_slots: int = field(default_factory=lambda: int(os.getenv("INTERACTIVE_RESERVED_SLOTS", "1")))
+    
+    # Retries of failed model calls and image generations (utils/retry.py)
+    retry_max_attempts: int = field(default_factory=lambda: int(os.getenv("RETRY_MAX_ATTEMPTS", "3")))
+    retry_base_delay: float = field(default_factory=lambda: float(os.getenv("RETRY_BASE_DELAY", "1.0")))
+    retry_max_delay: float = field(default_factory=lambda: float(os.getenv("RETRY_MAX_DELAY", "60")))
+    retry_budget_per_job: int = field(default_factory=lambda: int(os.getenv("RETRY_BUDGET_PER_JOB", "30")))
+    
+    # Native structured output: JSON requests send their schema as the model's
+    # response schema instead of pasting it into the prompt
+    structured_output_enabled: bool = field(default_factory=lambda: os.getenv("STRUCTURED_OUTPUT_ENABLED", "true").lower() == "true")
+    
+    # Stream the narrative plan so page prompts are written as pages arrive
+    plan_streaming_enabled: bool = field(default_factory=lambda: os.getenv("PLAN_STREAMING_ENABLED", "true").lower() == "true")
+    
+    # Books with at least this many pages are planned as an outline plus
+    # concurrent per-phase expansions (0 disables)
+    chunked_planning_min_pages: int = field(default_factory=lambda: int(os.getenv("CHUNKED_PLANNING_MIN_PAGES", "15")))
+    
+    # Local pre-check of generated images before vision validation; images
+    # within IMAGE_DUPLICATE_DISTANCE hash bits of another page are
+    # duplicates (negative disables the duplicate check)
+    image_precheck_enabled: bool = field(default_factory=lambda: os.getenv("IMAGE_PRECHECK_ENABLED", "true").lower() == "true")
+    image_duplicate_distance: int = field(default_factory=lambda: int(os.getenv("IMAGE_DUPLICATE_DISTANCE", "6")))
+    
+    # Measure style consistency across page images for the design review
+    style_analytics_enabled: bool = field(default_factory=lambda: os.getenv("STYLE_ANALYTICS_ENABLED", "true").lower() == "true")
+    
+    # Review all page images in one vision call over labelled contact sheets
+    contact_sheet_review_enabled: bool = field(default_factory=lambda: os.getenv("CONTACT_SHEET_REVIEW_ENABLED", "true").lower() == "true")
+    contact_sheet_pages: int = field(default_factory=lambda: int(os.getenv("CONTACT_SHEET_PAGES", "12")))
+    
+    # Cross-job cache of fingerprints and character sheets for the same reference
+    # photos (default <STORAGE_DIR>/cache/references)
+    reference_cache_enabled: bool = field(default_factory=lambda: os.getenv("REFERENCE_CACHE_ENABLED", "true").lower() == "true")
+    reference_cache_directory: str = field(default_factory=lambda: os.getenv("REFERENCE_CACHE_DIR", ""))
+    reference_cache_max_entries: int = field(default_factory=lambda: int(os.getenv("REFERENCE_CACHE_MAX_ENTRIES", "200")))
+    reference_cache_max_mb: int = field(default_factory=lambda: int(os.getenv("REFERENCE_CACHE_MAX_MB", "256")))
+    reference_cache_ttl_hours: float = field(default_factory=lambda: float(os.getenv("REFERENCE_CACHE_TTL_HOURS", "168")))
+    
+    # Speculative analysis of reference photos uploaded ahead of a job (POST /references)
+    reference_speculation_enabled: bool = field(default_factory=lambda: os.getenv("REFERENCE_SPECULATION_ENABLED", "true").lower() == "true")
+    reference_session_ttl_minutes: float = field(default_factory=lambda: float(os.getenv("REFERENCE_SESSION_TTL_MINUTES", "30")))
+    speculation_wait_seconds: float = field(default_factory=lambda: float(os.getenv("SPECULATION_WAIT_SECONDS", "90")))
+    
+    # Deduplication of job submissions: Idempotency-Key headers are remembered for
+    # IDEMPOTENCY_TTL_MINUTES, identical payloads and photos for JOB_DEDUP_WINDOW_SECONDS (0 disables)
+    idempotency_ttl_minutes: float = field(default_factory=lambda: float(os.getenv("IDEMPOTENCY_TTL_MINUTES", "1440")))
+    idempotency_max_keys: int = field(default_factory=lambda: int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000")))
+    job_dedup_window_seconds: float = field(default_factory=lambda: float(os.getenv("JOB_DEDUP_WINDOW_SECONDS", "10")))
+    
+    # Image request hedging: re-issue a page's request that is slower than the
+    # given percentile of recent latencies, at most IMAGE_HEDGE_BUDGET times per job
+    image_hedging_enabled: bool = field(default_factory=lambda: os.getenv("IMAGE_HEDGING_ENABLED", "false").lower() == "true")
+    image_hedge_percentile: float = field(default_factory=lambda: float(os.getenv("IMAGE_HEDGE_PERCENTILE", "90")))
+    image_hedge_budget: int = field(default_factory=lambda: int(os.getenv("IMAGE_HEDGE_BUDGET", "3")))
+    
+    # Share one upstream request between identical text and vision calls in flight at the same time
+    request_coalescing_enabled: bool = field(default_factory=lambda: os.getenv("REQUEST_COALESCING_ENABLED", "true").lower() == "true")
+    
+    # Tracing (spans are written to <TRACE_DIR>/<trace_id>.jsonl, default storage/traces)
+    tracing_enabled: bool = field(default_factory=lambda: os.getenv("TRACING_ENABLED", "true").lower() == "true")
+    trace_directory: str = field(default_factory=lambda: os.getenv("TRACE_DIR", ""))
+    
+    # Event loop monitoring (heartbeat lag histogram and blocking-call watchdog)
+    loop_monitor_enabled: bool = field(default_factory=lambda: os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true")
+    loop_block_threshold_ms: int = field(default_factory=lambda: int(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "200")))
+    
+    # Debug endpoints (/debug/*) require this token in X-Debug-Token; unset disables them
+    debug_token: str = field(default_factory=lambda: os.getenv("DEBUG_TOKEN", ""))
+    profiler_sample_hz: int = field(default_factory=lambda: int(os.getenv("PROFILER_SAMPLE_HZ", "100")))
+    profiler_max_seconds: int = field(default_factory=lambda: int(os.getenv("PROFILER_MAX_SECONDS", "60")))
+    
     def __post_init__(self):
         """Validate configuration after initialization."""
         # Create directories if they don't exist
@@ -70,6 +154,11 @@ class Config:
         """Check if running in stub mode (no API keys)."""
         return not self.google_api_key
     
+    @property
+    def is_queue_mode(self) -> bool:
+        """Check if jobs are executed by separate worker processes."""
+        return self.execution_mode == "queue"
+    
     def validate(self) -> list[str]:
         """
         Validate the configuration.
@@ -88,6 +177,33 @@ class Config:
         if not 0 <= self.validation_threshold <= 10:
             errors.append("validation_threshold must be between 0 and 10")
         
+        if self.execution_mode not in ("inline", "queue"):
+            errors.append("JOB_EXECUTION_MODE must be 'inline' or 'queue'")
+        
+        if self.worker_lease_seconds <= 0:
+            errors.append("worker_lease_seconds must be positive")
+        
+        if self.text_max_concurrency < 1 or self.image_max_concurrency < 1:
+            errors.append("model call concurrency limits must be at least 1")
+        
+        if self.retry_max_attempts < 1:
+            errors.append("RETRY_MAX_ATTEMPTS must be at least 1")
+        
+        if not 0 < self.retry_base_delay <= self.retry_max_delay:
+            errors.append("RETRY_BASE_DELAY must be positive and at most RETRY_MAX_DELAY")
+        
+        if not 50 <= self.image_hedge_percentile < 100:
+            errors.append("IMAGE_HEDGE_PERCENTILE must be between 50 and 100")
+        
+        if self.image_hedge_budget < 0:
+            errors.append("IMAGE_HEDGE_BUDGET must be non-negative")
+        
+        if self.loop_block_threshold_ms <= 0:
+            errors.append("LOOP_BLOCK_THRESHOLD_MS must be positive")
+        
+        if not 1 <= self.profiler_sample_hz <= 1000:
+            errors.append("PROFILER_SAMPLE_HZ must be between 1 and 1000")
+        
         return errors
 
 
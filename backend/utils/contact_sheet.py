@@ -0,0 +1,104 @@
+"""
+Contact Sheets
+
+Tiles downscaled page images into labelled montage images, so a vision
+model can review many pages in one request.
+
+    sheets = build_contact_sheets([(1, "page_01.jpg"), (2, "page_02.jpg")], out_dir)
+
+Each tile is a page thumbnail with a "Page N" strip below it; pages
+whose image cannot be read get a grey placeholder tile. Sheets hold at
+most `per_sheet` tiles, in a grid `columns` wide.
+"""
+
+import os
+from typing import List, Tuple
+
+
+TILE_SIZE = 320
+LABEL_HEIGHT = 36
+GUTTER = 8
+BACKGROUND = (255, 255, 255)
+PLACEHOLDER = (200, 200, 200)
+LABEL_COLOR = (20, 20, 20)
+FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+
+
+def _font(size: int):
+    from PIL import ImageFont
+    
+    try:
+        return ImageFont.truetype(FONT_PATH, size)
+    except (OSError, IOError):
+        return ImageFont.load_default()
+
+
+def _tile(path: str):
+    """A page thumbnail fitted into a TILE_SIZE square, or None if unreadable."""
+    from PIL import Image
+    
+    try:
+        with Image.open(path) as img:
+            img.draft("RGB", (TILE_SIZE, TILE_SIZE))
+            img = img.convert("RGB")
+            img.thumbnail((TILE_SIZE, TILE_SIZE), Image.Resampling.LANCZOS)
+            return img
+    except (OSError, ValueError, SyntaxError):
+        return None
+
+
+def build_contact_sheets(
+    pages: List[Tuple[int, str]],
+    output_dir: str,
+    per_sheet: int = 12,
+    columns: int = 4,
+    quality: int = 85
+) -> List[str]:
+    """
+    Write contact sheets for the given pages.
+    
+    Args:
+        pages: (label number, image path) in display order
+        output_dir: Directory for the sheet JPEGs
+        per_sheet: Maximum tiles per sheet
+        columns: Tiles per row
+        quality: JPEG quality
+    
+    Returns:
+        Paths of the written sheets, in order
+    """
+    from PIL import Image, ImageDraw
+    
+    font = _font(22)
+    sheets = []
+    for start in range(0, len(pages), per_sheet):
+        chunk = pages[start:start + per_sheet]
+        width = min(columns, len(chunk))
+        rows = (len(chunk) + columns - 1) // columns
+        cell_w = TILE_SIZE + GUTTER
+        cell_h = TILE_SIZE + LABEL_HEIGHT + GUTTER
+        sheet = Image.new("RGB", (width * cell_w + GUTTER, rows * cell_h + GUTTER), BACKGROUND)
+        draw = ImageDraw.Draw(sheet)
+        
+        for index, (number, path) in enumerate(chunk):
+            x = GUTTER + (index % columns) * cell_w
+            y = GUTTER + (index // columns) * cell_h
+            tile = _tile(path)
+            if tile is None:
+                draw.rectangle([x, y, x + TILE_SIZE - 1, y + TILE_SIZE - 1], fill=PLACEHOLDER)
+            else:
+                sheet.paste(tile, (x + (TILE_SIZE - tile.width) // 2, y + (TILE_SIZE - tile.height) // 2))
+            
+            label = f"Page {number}"
+            box = draw.textbbox((0, 0), label, font=font)
+            draw.text(
+                (x + (TILE_SIZE - (box[2] - box[0])) // 2, y + TILE_SIZE + (LABEL_HEIGHT - (box[3] - box[1])) // 2),
+                label,
+                fill=LABEL_COLOR,
+                font=font
+            )
+        
+        path = os.path.join(output_dir, f"contact_sheet_{len(sheets) + 1:02d}.jpg")
+        sheet.save(path, "JPEG", quality=quality)
+        sheets.append(path)
+    return sheets
@@ -0,0 +1,173 @@
+"""
+Image Pre-Check
+
+Cheap local checks of generated images, run before the vision-model
+validator. Each image is decoded once at low resolution (JPEG draft
+mode) into a 64x64 grayscale array, and NumPy computes:
+
+    entropy          Shannon entropy of the gray-level histogram (bits)
+    blank_fraction   share of pixels close to the median gray level
+    aspect_ratio     width / height of the full-size image
+    phash            64-bit DCT perceptual hash, for near-duplicates
+
+Images that fail a check (unreadable or truncated file, one flat
+colour, wrong aspect ratio, near-duplicate of another page) skip the
+vision call and go straight to regeneration. Analysis takes a few
+milliseconds per image.
+"""
+
+import time
+from typing import List, Optional
+
+import numpy as np
+
+import sys
+sys.path.append('..')
+
+from models.generation import GenerationResult, ImageSignals
+
+
+# Side of the analysed grayscale image; the hash uses a 32x32 average of it
+ANALYSIS_SIZE = 64
+DCT_SIZE = 32
+HASH_SIZE = 8
+
+# Thresholds for obvious failures
+MIN_ENTROPY = 1.5
+MAX_BLANK_FRACTION = 0.98
+BLANK_TOLERANCE = 8
+ASPECT_TOLERANCE = 0.1
+
+ISSUE_MESSAGES = {
+    "unreadable": "Image file is unreadable or truncated",
+    "blank": "Image is blank or a single flat colour",
+    "low_entropy": "Image has almost no visual detail",
+    "aspect_ratio": "Image has the wrong aspect ratio",
+    "duplicate": "Image is a near-duplicate of another page",
+}
+
+
+def _dct_matrix(size: int) -> np.ndarray:
+    """Orthonormal DCT-II basis; the 2-D transform of X is D @ X @ D.T."""
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    basis = np.cos(np.pi * (2 * n + 1) * k / (2 * size)) * np.sqrt(2 / size)
+    basis[0] /= np.sqrt(2)
+    return basis.astype(np.float32)
+
+
+_DCT = _dct_matrix(DCT_SIZE)
+
+
+def analyze_image(path: str, expected_aspect: Optional[float] = None) -> ImageSignals:
+    """
+    Measure one image file.
+    
+    Args:
+        path: Image file path
+        expected_aspect: Requested width / height, checked when given
+    
+    Returns:
+        ImageSignals; flags lists the failed checks
+    """
+    from PIL import Image
+    
+    started = time.perf_counter()
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+            # JPEGs decode straight to a reduced size in the DCT domain
+            img.draft("L", (ANALYSIS_SIZE, ANALYSIS_SIZE))
+            small = img.convert("L").resize((ANALYSIS_SIZE, ANALYSIS_SIZE), Image.Resampling.BILINEAR)
+    except (OSError, ValueError, SyntaxError):
+        return ImageSignals(flags=["unreadable"], analysis_ms=(time.perf_counter() - started) * 1000)
+    
+    pixels = np.asarray(small, dtype=np.uint8)
+    
+    histogram = np.bincount(pixels.ravel(), minlength=256) / pixels.size
+    probabilities = histogram[histogram > 0]
+    entropy = max(0.0, float(-(probabilities * np.log2(probabilities)).sum()))
+    
+    median = np.median(pixels)
+    blank_fraction = float((np.abs(pixels.astype(np.int16) - median) <= BLANK_TOLERANCE).mean())
+    
+    aspect_ratio = width / height if height else 0.0
+    
+    signals = ImageSignals(
+        width=width,
+        height=height,
+        aspect_ratio=round(aspect_ratio, 4),
+        entropy=round(entropy, 4),
+        blank_fraction=round(blank_fraction, 4),
+        phash=perceptual_hash(pixels)
+    )
+    
+    if blank_fraction >= MAX_BLANK_FRACTION:
+        signals.flags.append("blank")
+    elif entropy < MIN_ENTROPY:
+        signals.flags.append("low_entropy")
+    if expected_aspect and abs(aspect_ratio / expected_aspect - 1) > ASPECT_TOLERANCE:
+        signals.flags.append("aspect_ratio")
+    
+    signals.analysis_ms = round((time.perf_counter() - started) * 1000, 3)
+    return signals
+
+
+def perceptual_hash(pixels: np.ndarray) -> str:
+    """64-bit DCT hash of a 64x64 grayscale array, as 16 hex digits."""
+    factor = pixels.shape[0] // DCT_SIZE
+    reduced = pixels.reshape(DCT_SIZE, factor, DCT_SIZE, factor).mean(axis=(1, 3), dtype=np.float32)
+    coefficients = (_DCT @ reduced @ _DCT.T)[:HASH_SIZE, :HASH_SIZE].ravel()
+    # The DC term only encodes average brightness
+    bits = coefficients > np.median(coefficients[1:])
+    return f"{int(np.packbits(bits).view('>u8')[0]):016x}"
+
+
+def hash_distances(hashes: List[str]) -> np.ndarray:
+    """Pairwise Hamming distances between perceptual hashes."""
+    values = np.array([int(h, 16) for h in hashes], dtype=np.uint64)
+    xor = values[:, None] ^ values[None, :]
+    return np.unpackbits(xor.view(np.uint8), axis=-1).reshape(len(values), len(values), 64).sum(axis=-1)
+
+
+def mark_duplicates(results: List[GenerationResult], page_numbers: List[int], max_distance: int) -> None:
+    """
+    Flag images within max_distance hash bits of an earlier page.
+    
+    The earlier page is kept; the later one is flagged "duplicate" with
+    duplicate_of set. Flags from a previous call are recomputed, so this
+    can run again after pages are regenerated.
+    """
+    indexed = [
+        i for i, result in enumerate(results)
+        if result.signals is not None and result.signals.phash
+    ]
+    for i in indexed:
+        signals = results[i].signals
+        signals.duplicate_of = None
+        if "duplicate" in signals.flags:
+            signals.flags.remove("duplicate")
+    
+    if max_distance < 0 or len(indexed) < 2:
+        return
+    
+    distances = hash_distances([results[i].signals.phash for i in indexed])
+    for row in range(1, len(indexed)):
+        earlier = np.flatnonzero(distances[row, :row] <= max_distance)
+        if earlier.size:
+            signals = results[indexed[row]].signals
+            signals.duplicate_of = page_numbers[indexed[earlier[0]]]
+            signals.flags.append("duplicate")
+
+
+def describe_flags(signals: ImageSignals) -> List[str]:
+    """Human-readable issues for the flags of an image."""
+    issues = []
+    for flag in signals.flags:
+        message = ISSUE_MESSAGES.get(flag, flag)
+        if flag == "duplicate" and signals.duplicate_of is not None:
+            message = f"{message} (page {signals.duplicate_of})"
+        elif flag == "aspect_ratio":
+            message = f"{message} ({signals.width}x{signals.height})"
+        issues.append(message)
+    return issues
@@ -0,0 +1,122 @@
+"""
+Incremental JSON Parser
+
+Emits the elements of one array of a streamed JSON object as soon as
+each element closes, without waiting for the rest of the document.
+
+    parser = IncrementalJSONParser("pages")
+    for chunk in chunks:
+        for page in parser.feed(chunk):
+            ...                      # each page dict, in order
+    plan = parser.document()         # the whole object at the end
+
+Only the top-level object's array named `array_key` is tracked; its
+elements must be objects. Text before the first "{" (prose, a markdown
+fence) is skipped, as the schema-in-prompt path may produce it.
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+
+class IncrementalJSONParser:
+    """
+    Scans streamed JSON text once, character by character.
+    
+    Args:
+        array_key: Key of the top-level array whose elements are emitted
+    """
+    
+    def __init__(self, array_key: str):
+        self.array_key = array_key
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._started = False
+        self._closed = False
+        self._in_string = False
+        self._escaped = False
+        self._string_start = -1
+        self._last_key: Optional[str] = None
+        self._in_array = False
+        self._item_start = -1
+        self.emitted = 0
+    
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Add streamed text.
+        
+        Returns:
+            Array elements completed by this chunk, in order
+        """
+        self._text += chunk
+        items = []
+        text = self._text
+        while self._pos < len(text) and not self._closed:
+            char = text[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = text[self._string_start + 1:self._pos]
+            elif not self._started:
+                if char == "{":
+                    self._started = True
+                    self._depth = 1
+                    self._text = text = text[self._pos:]
+                    self._pos = 0
+            elif char == '"':
+                self._in_string = True
+                self._string_start = self._pos
+            elif char in "{[":
+                if char == "[" and self._depth == 1 and self._last_key == self.array_key:
+                    self._in_array = True
+                self._depth += 1
+                if char == "{" and self._in_array and self._depth == 3:
+                    self._item_start = self._pos
+            elif char in "}]":
+                self._depth -= 1
+                if char == "}" and self._in_array and self._depth == 2 and self._item_start >= 0:
+                    item = self._parse(text[self._item_start:self._pos + 1])
+                    self._item_start = -1
+                    if item is not None:
+                        items.append(item)
+                elif char == "]" and self._in_array and self._depth == 1:
+                    self._in_array = False
+                elif self._depth == 0:
+                    self._closed = True
+            self._pos += 1
+        self.emitted += len(items)
+        return items
+    
+    @staticmethod
+    def _parse(fragment: str) -> Optional[Dict[str, Any]]:
+        try:
+            value = json.loads(fragment)
+        except json.JSONDecodeError:
+            return None
+        return value if isinstance(value, dict) else None
+    
+    @property
+    def complete(self) -> bool:
+        """Whether the top-level object has closed."""
+        return self._closed
+    
+    def text(self) -> str:
+        """The streamed text from the first "{" on."""
+        return self._text
+    
+    def document(self) -> Dict[str, Any]:
+        """
+        Parse the whole streamed object.
+        
+        Raises:
+            ValueError: If the object is incomplete or invalid
+        """
+        if not self._closed:
+            raise ValueError("Streamed JSON ended before the object closed")
+        return json.loads(self._text[:self._pos])
@@ -0,0 +1,226 @@
+"""
+Job Context
+
+Per-task context describing the job a piece of work belongs to.
+
+The context is stored in a ContextVar, so it follows asyncio tasks
+created with asyncio.gather/create_task and lets shared components
+(such as the call scheduler) see which job, priority and deadline a
+model call is made for without threading extra arguments through
+every agent.
+
+The current pipeline stage (usually the running agent) is tracked the
+same way so that instrumentation can label model calls with it.
+
+ContextVars cannot be read from another thread, so the job and stage
+are also published per asyncio task (or per thread outside the event
+loop) for samplers such as the profiler.
+"""
+
+import asyncio
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+
+# Priority classes, most urgent first. "interactive" is reserved for
+# user-facing request/response endpoints such as /enhance-text.
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_HIGH = "high"
+PRIORITY_NORMAL = "normal"
+PRIORITY_LOW = "low"
+
+PRIORITY_RANKS = {
+    PRIORITY_INTERACTIVE: 0,
+    PRIORITY_HIGH: 1,
+    PRIORITY_NORMAL: 2,
+    PRIORITY_LOW: 3,
+}
+
+
+@dataclass(frozen=True)
+class JobContext:
+    """Job attributes visible to code running on behalf of a job."""
+    job_id: Optional[str] = None
+    priority: str = PRIORITY_NORMAL
+    deadline: Optional[datetime] = None
+    
+    @property
+    def is_interactive(self) -> bool:
+        """Whether the work is a user-facing interactive request."""
+        return self.priority == PRIORITY_INTERACTIVE
+    
+    @property
+    def priority_rank(self) -> int:
+        """Numeric rank of the priority (lower runs first)."""
+        return PRIORITY_RANKS.get(self.priority, PRIORITY_RANKS[PRIORITY_NORMAL])
+    
+    @property
+    def deadline_timestamp(self) -> Optional[float]:
+        """Deadline as a POSIX timestamp, if any."""
+        return self.deadline.timestamp() if self.deadline else None
+
+
+_DEFAULT_CONTEXT = JobContext()
+_current: contextvars.ContextVar[JobContext] = contextvars.ContextVar(
+    "memorybook_job_context", default=_DEFAULT_CONTEXT
+)
+
+
+def current_job() -> JobContext:
+    """
+    Get the job context of the running task.
+    
+    Returns:
+        The active JobContext (a default normal-priority context if none is set)
+    """
+    return _current.get()
+
+
+@contextmanager
+def job_context(
+    job_id: Optional[str] = None,
+    priority: str = PRIORITY_NORMAL,
+    deadline: Optional[datetime] = None
+) -> Iterator[JobContext]:
+    """
+    Run a block of code on behalf of a job.
+    
+    Args:
+        job_id: Job identifier
+        priority: Priority class (see PRIORITY_RANKS)
+        deadline: Optional completion deadline
+    
+    Yields:
+        The JobContext that was activated
+    """
+    context = JobContext(job_id=job_id, priority=priority, deadline=deadline)
+    token = _current.set(context)
+    try:
+        with bind_activity():
+            yield context
+    finally:
+        _current.reset(token)
+
+
+_stage: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "memorybook_stage", default="none"
+)
+
+
+def current_stage() -> str:
+    """
+    Get the pipeline stage of the running task.
+    
+    Returns:
+        Stage name (agent or step name), "none" outside the pipeline
+    """
+    return _stage.get()
+
+
+@contextmanager
+def stage_context(stage: str) -> Iterator[str]:
+    """
+    Run a block of code as part of a pipeline stage.
+    
+    Args:
+        stage: Stage name, e.g. an agent name or a pipeline step
+    
+    Yields:
+        The stage name
+    """
+    token = _stage.set(stage)
+    try:
+        with bind_activity():
+            yield stage
+    finally:
+        _stage.reset(token)
+
+
+# (job_id, stage) of each task or thread currently working for a job
+_activity: Dict[Any, Tuple[Optional[str], str]] = {}
+
+
+def _activity_key() -> Any:
+    """The running asyncio task, or the thread ident outside a running loop."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return task if task is not None else threading.get_ident()
+
+
+@contextmanager
+def bind_activity() -> Iterator[None]:
+    """Publish the current job and stage for the running task or thread."""
+    key = _activity_key()
+    previous = _activity.get(key)
+    _activity[key] = (current_job().job_id, current_stage())
+    try:
+        yield
+    finally:
+        if previous is None:
+            _activity.pop(key, None)
+        else:
+            _activity[key] = previous
+
+
+def activity_of(key: Any) -> Optional[Tuple[Optional[str], str]]:
+    """
+    Get the published job and stage of a task or thread.
+    
+    Args:
+        key: asyncio Task or thread ident
+    
+    Returns:
+        (job_id, stage), or None if nothing is published for it
+    """
+    return _activity.get(key)
+
+
+def _forget_activity(task: asyncio.Task) -> None:
+    _activity.pop(task, None)
+
+
+def track_task_activity(loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+    """
+    Make tasks created on a loop inherit their creator's published activity.
+    
+    Tasks copy their creator's ContextVars; this does the same for the
+    published job and stage, so tasks fanned out with gather() inside a
+    stage are attributed to it.
+    
+    Args:
+        loop: Event loop to install the task factory on (default: running loop)
+    """
+    loop = loop or asyncio.get_running_loop()
+    factory = loop.get_task_factory()
+    if getattr(factory, "tracks_activity", False):
+        return
+    
+    def create_task(loop, coro, **kwargs):
+        if factory is not None:
+            task = factory(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        activity = _activity.get(_activity_key())
+        if activity is not None:
+            _activity[task] = activity
+            task.add_done_callback(_forget_activity)
+        return task
+    
+    create_task.tracks_activity = True
+    loop.set_task_factory(create_task)
+
+
+def with_activity(func: Callable) -> Callable:
+    """Wrap a callable so the thread running it publishes the caller's job and stage."""
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        with bind_activity():
+            return func(*args, **kwargs)
+    return run
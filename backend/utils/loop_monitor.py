@@ -0,0 +1,245 @@
+"""
+Event Loop Monitor
+
+Detects event loop stalls and the code that caused them.
+
+A heartbeat task sleeps for a short interval and records how late it
+woke up (loop lag). A watchdog thread checks the heartbeat; when it is
+late by more than the blocking threshold, the watchdog samples the
+event loop thread's stack with sys._current_frames() while the
+offending call is still running. Stalls are aggregated per call site
+(the innermost frame in this code base) so the worst offenders - sync
+SDK calls, Pillow encoding, sync uploads - can be listed.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from . import metrics
+
+logger = logging.getLogger("memorybook")
+
+# Frames under this directory count as application code
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+UNSAMPLED_SITE = "<unsampled>"
+
+
+@dataclass
+class BlockingSite:
+    """Stalls attributed to one call site."""
+    site: str
+    count: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    last_seen: Optional[datetime] = None
+    stack: List[str] = field(default_factory=list)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "site": self.site,
+            "count": self.count,
+            "total_ms": round(self.total_seconds * 1000, 1),
+            "max_ms": round(self.max_seconds * 1000, 1),
+            "last_seen": self.last_seen.isoformat() if self.last_seen else None,
+            "stack": self.stack,
+        }
+
+
+def _is_app_frame(filename: str) -> bool:
+    return filename.startswith(APP_ROOT) and not filename.endswith("loop_monitor.py")
+
+
+def describe_stack(frame, limit: int = 15) -> tuple:
+    """
+    Summarize a thread's stack.
+    
+    Args:
+        frame: Innermost frame of the thread
+        limit: Maximum frames kept in the formatted stack
+    
+    Returns:
+        (site, stack) where site is the innermost application frame
+        ("file:line in function") and stack lists the innermost frames
+    """
+    summary = traceback.extract_stack(frame)
+    site_frame = next((f for f in reversed(summary) if _is_app_frame(f.filename)), summary[-1])
+    site = f"{os.path.relpath(site_frame.filename, APP_ROOT)}:{site_frame.lineno} in {site_frame.name}"
+    stack = [
+        f"{os.path.relpath(f.filename, APP_ROOT) if _is_app_frame(f.filename) else f.filename}:"
+        f"{f.lineno} in {f.name}"
+        for f in summary[-limit:]
+    ]
+    return site, stack
+
+
+class LoopMonitor:
+    """
+    Heartbeat lag histogram plus a stack-sampling watchdog.
+    
+    Args:
+        interval: Heartbeat interval in seconds
+        threshold: Lag in seconds that counts as a stall
+        max_sites: Call sites kept; the least costly site is evicted first
+        recent: Lag samples kept for percentiles
+    """
+    
+    def __init__(self, interval: float = 0.1, threshold: float = 0.2, max_sites: int = 50, recent: int = 3000):
+        self.interval = interval
+        self.threshold = threshold
+        self.max_sites = max_sites
+        self.started_at: Optional[datetime] = None
+        self.stalls = 0
+        self.recent_lag = deque(maxlen=recent)
+        self._sites: Dict[str, BlockingSite] = {}
+        self._lock = threading.Lock()
+        self._beat = 0.0
+        self._sampled_beat = -1.0
+        self._pending: Optional[tuple] = None
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self) -> None:
+        """Start the heartbeat on the running loop and the watchdog thread."""
+        if self.running:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self.started_at = datetime.now()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+    
+    async def stop(self) -> None:
+        """Stop the heartbeat and the watchdog."""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _heartbeat(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._record_lag(max(0.0, loop.time() - expected))
+    
+    def _watch(self) -> None:
+        """Sample the loop thread's stack while a heartbeat is overdue."""
+        while not self._stop.wait(min(self.interval, self.threshold) / 2):
+            beat = self._beat
+            if beat == self._sampled_beat:
+                continue
+            if time.monotonic() - beat < self.interval + self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            site, stack = describe_stack(frame)
+            with self._lock:
+                self._sampled_beat = beat
+                self._pending = (site, stack)
+    
+    def _record_lag(self, lag: float) -> None:
+        metrics.LOOP_LAG.observe(lag)
+        with self._lock:
+            self.recent_lag.append(lag)
+            pending, self._pending = self._pending, None
+            if lag < self.threshold:
+                return
+            
+            site, stack = pending or (UNSAMPLED_SITE, [])
+            self.stalls += 1
+            entry = self._sites.get(site)
+            if entry is None:
+                if len(self._sites) >= self.max_sites:
+                    cheapest = min(self._sites.values(), key=lambda s: s.total_seconds)
+                    del self._sites[cheapest.site]
+                entry = self._sites[site] = BlockingSite(site)
+            entry.count += 1
+            entry.total_seconds += lag
+            entry.max_seconds = max(entry.max_seconds, lag)
+            entry.last_seen = datetime.now()
+            if stack:
+                entry.stack = stack
+        
+        metrics.LOOP_STALLS.inc()
+        metrics.LOOP_BLOCKED.inc(lag)
+        logger.warning(f"[loop-monitor] Event loop blocked for {lag * 1000:.0f}ms at {site}")
+    
+    def lag_summary(self) -> Dict[str, float]:
+        """p50, p95 and max of the recent heartbeat lag in milliseconds."""
+        with self._lock:
+            samples = sorted(self.recent_lag)
+        if not samples:
+            return {"p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        
+        def at(fraction: float) -> float:
+            return round(samples[min(len(samples) - 1, int(fraction * len(samples)))] * 1000, 2)
+        
+        return {"p50_ms": at(0.5), "p95_ms": at(0.95), "max_ms": round(samples[-1] * 1000, 2)}
+    
+    def top_sites(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Call sites ordered by total blocked time."""
+        with self._lock:
+            sites = sorted(self._sites.values(), key=lambda s: s.total_seconds, reverse=True)
+            return [s.to_dict() for s in sites[:limit]]
+    
+    def snapshot(self, limit: int = 20) -> Dict[str, Any]:
+        """Monitor settings, totals and top blocking call sites."""
+        return {
+            "running": self.running,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "interval_ms": round(self.interval * 1000),
+            "threshold_ms": round(self.threshold * 1000),
+            "stalls": self.stalls,
+            "recent_lag": self.lag_summary(),
+            "sites": self.top_sites(limit),
+        }
+
+
+# Global monitor instance
+_monitor: Optional[LoopMonitor] = None
+
+
+def get_loop_monitor() -> LoopMonitor:
+    """Get the process-wide loop monitor."""
+    global _monitor
+    if _monitor is None:
+        from .config import get_config
+        
+        config = get_config()
+        _monitor = LoopMonitor(threshold=config.loop_block_threshold_ms / 1000)
+    return _monitor
+
+
+def start_loop_monitor() -> Optional[LoopMonitor]:
+    """Start monitoring the running event loop unless disabled by config."""
+    from .config import get_config
+    
+    if not get_config().loop_monitor_enabled:
+        return None
+    monitor = get_loop_monitor()
+    monitor.start()
+    return monitor
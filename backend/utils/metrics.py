@@ -0,0 +1,562 @@
+"""
+Metrics Utilities
+
+In-process metrics registry with Prometheus text exposition.
+
+Counters and histograms are labelled by agent, model, stage and
+outcome. Model calls additionally feed a per-job usage accumulator
+(latency, tokens, bytes and estimated cost per stage) that is stored
+on the JobRecord when the job finishes.
+
+Metrics are per process; in queue mode each worker process keeps its
+own registry.
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .job_context import current_job, current_stage
+
+
+# Latency buckets in seconds, from fast text calls to slow image generation
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+# Estimated prices in USD: per million input/output tokens and per output image.
+# Models not listed here are reported with zero cost.
+MODEL_PRICING = {
+    "gemini-2.0-flash": {"input": 0.10, "output": 0.40, "image": 0.0},
+    "gemini-2.0-pro-exp": {"input": 1.25, "output": 10.00, "image": 0.0},
+    "gemini-2.5-flash": {"input": 0.30, "output": 2.50, "image": 0.0},
+    "gemini-2.5-flash-image": {"input": 0.30, "output": 0.0, "image": 0.039},
+}
+
+
+def _escape(value: str) -> str:
+    """Escape a label value."""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    """Render a Prometheus label set."""
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    """Base class for labelled metrics."""
+    
+    kind = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+    
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+    
+    kind = "counter"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Increase the counter for a label set."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def value(self, **labels: str) -> float:
+        """Current value for a label set."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+    
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value:g}"
+            for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+    
+    kind = "gauge"
+    
+    def set(self, value: float, **labels: str) -> None:
+        """Set the gauge for a label set."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Cumulative histogram of observed values."""
+    
+    kind = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+    
+    def observe(self, value: float, **labels: str) -> None:
+        """Record one observation."""
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Bucket counts, then sum and count
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+    
+    def count(self, **labels: str) -> int:
+        """Number of observations for a label set."""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return int(series[-1]) if series else 0
+    
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            for bound, bucket_count in zip(self.buckets, series):
+                labels = _format_labels(self.labelnames, key, f'le="{bound:g}"')
+                lines.append(f"{self.name}_bucket{labels} {bucket_count:g}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {series[-1]:g}")
+            plain = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{plain} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{plain} {series[-1]:g}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+    
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+    
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+    
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+    
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+    
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+AGENT_DURATION = REGISTRY.histogram(
+    "memorybook_agent_duration_seconds",
+    "Agent execute() latency",
+    ["agent", "outcome"]
+)
+MODEL_CALL_DURATION = REGISTRY.histogram(
+    "memorybook_model_call_duration_seconds",
+    "GeminiClient method latency",
+    ["method", "model", "stage", "outcome"]
+)
+MODEL_TOKENS = REGISTRY.counter(
+    "memorybook_model_tokens_total",
+    "Tokens consumed by model calls",
+    ["model", "stage", "direction"]
+)
+MODEL_BYTES = REGISTRY.counter(
+    "memorybook_model_bytes_total",
+    "Inline image bytes uploaded to and returned by model calls",
+    ["model", "stage", "direction"]
+)
+MODEL_COST = REGISTRY.counter(
+    "memorybook_model_cost_usd_total",
+    "Estimated model cost in USD",
+    ["model", "stage"]
+)
+JSON_PARSE_FAILURES = REGISTRY.counter(
+    "memorybook_json_parse_failures_total",
+    "JSON replies that did not parse or validate, by mode (native: response "
+    "schema, prompt: schema in the prompt)",
+    ["method", "mode", "stage"]
+)
+STRUCTURED_OUTPUT_FALLBACKS = REGISTRY.counter(
+    "memorybook_structured_output_fallbacks_total",
+    "JSON requests sent with the schema in the prompt instead of a native response "
+    "schema (unsupported_schema, rejected)",
+    ["model", "reason"]
+)
+SCHEDULER_WAIT = REGISTRY.histogram(
+    "memorybook_scheduler_wait_seconds",
+    "Time model calls wait for a scheduler slot",
+    ["kind", "priority"]
+)
+IMAGE_PROCESSING = REGISTRY.histogram(
+    "memorybook_image_processing_cpu_seconds",
+    "CPU time spent decoding and compressing images with Pillow",
+    ["operation"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+IMAGE_PRECHECK_REJECTIONS = REGISTRY.counter(
+    "memorybook_image_precheck_rejections_total",
+    "Images sent straight to regeneration by the local pre-check",
+    ["reason"]
+)
+REFERENCE_CACHE_LOOKUPS = REGISTRY.counter(
+    "memorybook_reference_cache_lookups_total",
+    "Cross-job fingerprint and character sheet cache lookups by outcome (hit, miss, expired)",
+    ["kind", "outcome"]
+)
+REFERENCE_CACHE_EVICTIONS = REGISTRY.counter(
+    "memorybook_reference_cache_evictions_total",
+    "Reference cache entries removed, by reason (ttl, lru, invalid)",
+    ["reason"]
+)
+SPECULATIONS = REGISTRY.counter(
+    "memorybook_reference_speculations_total",
+    "Reference upload sessions and their speculative analysis by outcome (started, "
+    "completed, failed, cancelled, adopted, expired)",
+    ["outcome"]
+)
+EDITION_TRANSLATIONS = REGISTRY.counter(
+    "memorybook_edition_translations_total",
+    "Translated book editions, by outcome (completed, failed)",
+    ["outcome"]
+)
+JOB_DEDUPLICATIONS = REGISTRY.counter(
+    "memorybook_job_deduplications_total",
+    "Job submissions answered with an existing job (duplicate, coalesced) and idempotency keys "
+    "dropped (expired, evicted)",
+    ["outcome"]
+)
+RETRIES = REGISTRY.counter(
+    "memorybook_retries_total",
+    "Retried operations",
+    ["stage", "reason"]
+)
+RETRY_DELAY = REGISTRY.histogram(
+    "memorybook_retry_delay_seconds",
+    "Backoff before a retry (jittered, or the server's retry hint)",
+    ["stage", "reason"],
+    buckets=(0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0)
+)
+RETRY_GIVEUPS = REGISTRY.counter(
+    "memorybook_retry_giveups_total",
+    "Failures not retried, by error class and why (safety, permanent, attempts, "
+    "hint_too_long, budget)",
+    ["stage", "error_class", "reason"]
+)
+IMAGE_REFUSALS = REGISTRY.counter(
+    "memorybook_image_refusals_total",
+    "Image requests refused by safety or policy filters",
+    ["stage", "reason"]
+)
+REFUSAL_REPAIRS = REGISTRY.counter(
+    "memorybook_refusal_repairs_total",
+    "Refused pages sent straight to prompt repair, by regeneration outcome",
+    ["outcome"]
+)
+MODEL_CALL_COALESCING = REGISTRY.counter(
+    "memorybook_model_call_coalescing_total",
+    "Model requests by outcome: sent upstream, coalesced into an identical in-flight request, "
+    "or abandoned by every caller",
+    ["kind", "outcome"]
+)
+IMAGE_HEDGES = REGISTRY.counter(
+    "memorybook_image_hedges_total",
+    "Hedged image requests by outcome (won: hedge returned first, lost: primary "
+    "returned first, failed, no_budget, no_slot)",
+    ["outcome"]
+)
+LOOP_LAG = REGISTRY.histogram(
+    "memorybook_event_loop_lag_seconds",
+    "How late the event loop heartbeat woke up",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+LOOP_STALLS = REGISTRY.counter(
+    "memorybook_event_loop_stalls_total",
+    "Heartbeats delayed beyond the blocking threshold"
+)
+LOOP_BLOCKED = REGISTRY.counter(
+    "memorybook_event_loop_blocked_seconds_total",
+    "Event loop time lost to stalls beyond the blocking threshold"
+)
+JOB_DURATION = REGISTRY.histogram(
+    "memorybook_job_duration_seconds",
+    "End-to-end job latency",
+    ["outcome"],
+    buckets=(30.0, 60.0, 120.0, 180.0, 300.0, 450.0, 600.0, 900.0, 1200.0, 1800.0)
+)
+
+
+def estimate_cost(model: str, input_tokens: int = 0, output_tokens: int = 0, images: int = 0) -> float:
+    """
+    Estimate the USD cost of a model call.
+    
+    Args:
+        model: Model name
+        input_tokens: Prompt tokens
+        output_tokens: Response tokens
+        images: Generated images
+    
+    Returns:
+        Estimated cost (0 for unknown models)
+    """
+    pricing = MODEL_PRICING.get(model)
+    if not pricing:
+        return 0.0
+    return (
+        input_tokens / 1_000_000 * pricing["input"]
+        + output_tokens / 1_000_000 * pricing["output"]
+        + images * pricing["image"]
+    )
+
+
+# ============================================================================
+# Per-job usage
+# ============================================================================
+
+@dataclass
+class StageUsage:
+    """Accumulated model usage for one stage of a job."""
+    calls: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    bytes_uploaded: int = 0
+    bytes_downloaded: int = 0
+    images: int = 0
+    cost_usd: float = 0.0
+    hedges: int = 0
+    hedges_won: int = 0
+    retries: int = 0
+    
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "seconds": round(self.seconds, 3),
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "bytes_uploaded": self.bytes_uploaded,
+            "bytes_downloaded": self.bytes_downloaded,
+            "images": self.images,
+            "cost_usd": round(self.cost_usd, 6),
+            "hedges": self.hedges,
+            "hedges_won": self.hedges_won,
+            "retries": self.retries,
+        }
+
+
+@dataclass
+class JobUsage:
+    """Per-stage model usage for one job."""
+    stages: Dict[str, StageUsage] = field(default_factory=dict)
+    
+    def stage(self, name: str) -> StageUsage:
+        if name not in self.stages:
+            self.stages[name] = StageUsage()
+        return self.stages[name]
+    
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        """Breakdown per stage plus a total."""
+        total = StageUsage()
+        for usage in self.stages.values():
+            for name in total.__dataclass_fields__:
+                setattr(total, name, getattr(total, name) + getattr(usage, name))
+        return {
+            "stages": {name: usage.to_dict() for name, usage in sorted(self.stages.items())},
+            "total": total.to_dict(),
+        }
+
+
+_job_usage: Dict[str, JobUsage] = {}
+_job_usage_lock = threading.Lock()
+
+
+def _usage_for_current_job() -> Optional[StageUsage]:
+    job_id = current_job().job_id
+    if not job_id:
+        return None
+    with _job_usage_lock:
+        usage = _job_usage.setdefault(job_id, JobUsage())
+        return usage.stage(current_stage())
+
+
+def pop_job_usage(job_id: str) -> Dict[str, Dict[str, float]]:
+    """
+    Remove and return the usage breakdown collected for a job.
+    
+    Args:
+        job_id: Job identifier
+    
+    Returns:
+        Breakdown dict with "stages" and "total"
+    """
+    with _job_usage_lock:
+        usage = _job_usage.pop(job_id, None)
+    return (usage or JobUsage()).to_dict()
+
+
+# ============================================================================
+# Recording helpers
+# ============================================================================
+
+def record_model_call(method: str, model: str, seconds: float, outcome: str) -> None:
+    """
+    Record the latency and outcome of a GeminiClient method.
+    
+    Args:
+        method: Client method name
+        model: Model name
+        seconds: Wall time
+        outcome: "success", "error" or "stub"
+    """
+    MODEL_CALL_DURATION.observe(
+        seconds, method=method, model=model, stage=current_stage(), outcome=outcome
+    )
+
+
+def record_model_usage(
+    model: str,
+    seconds: float,
+    success: bool = True,
+    input_tokens: int = 0,
+    output_tokens: int = 0,
+    bytes_uploaded: int = 0,
+    bytes_downloaded: int = 0,
+    images: int = 0
+) -> None:
+    """
+    Record token, byte and cost usage of one API request.
+    
+    Updates the global counters and the current job's breakdown.
+    """
+    stage = current_stage()
+    cost = estimate_cost(model, input_tokens, output_tokens, images)
+    
+    if input_tokens:
+        MODEL_TOKENS.inc(input_tokens, model=model, stage=stage, direction="input")
+    if output_tokens:
+        MODEL_TOKENS.inc(output_tokens, model=model, stage=stage, direction="output")
+    if bytes_uploaded:
+        MODEL_BYTES.inc(bytes_uploaded, model=model, stage=stage, direction="upload")
+    if bytes_downloaded:
+        MODEL_BYTES.inc(bytes_downloaded, model=model, stage=stage, direction="download")
+    if cost:
+        MODEL_COST.inc(cost, model=model, stage=stage)
+    
+    usage = _usage_for_current_job()
+    if usage is None:
+        return
+    with _job_usage_lock:
+        usage.calls += 1
+        usage.errors += 0 if success else 1
+        usage.seconds += seconds
+        usage.input_tokens += input_tokens
+        usage.output_tokens += output_tokens
+        usage.bytes_uploaded += bytes_uploaded
+        usage.bytes_downloaded += bytes_downloaded
+        usage.images += images
+        usage.cost_usd += cost
+
+
+def record_retry(reason: str, stage: Optional[str] = None, delay: Optional[float] = None) -> None:
+    """
+    Count a retried operation.
+    
+    Args:
+        reason: Why it is retried (error class, or e.g. "validation_failed")
+        stage: Stage label (default: current stage)
+        delay: Backoff before the retry in seconds, if any
+    """
+    stage = stage or current_stage()
+    RETRIES.inc(stage=stage, reason=reason)
+    if delay is not None:
+        RETRY_DELAY.observe(delay, stage=stage, reason=reason)
+    
+    usage = _usage_for_current_job()
+    if usage is None:
+        return
+    with _job_usage_lock:
+        usage.retries += 1
+
+
+def record_retry_giveup(error_class: str, reason: str, stage: Optional[str] = None) -> None:
+    """Count a failure that is not retried (further)."""
+    RETRY_GIVEUPS.inc(stage=stage or current_stage(), error_class=error_class, reason=reason)
+
+
+def record_hedge(outcome: str) -> None:
+    """
+    Count a hedging decision for an image request.
+    
+    Args:
+        outcome: "won", "lost", "failed", "no_budget" or "no_slot"
+    """
+    IMAGE_HEDGES.inc(outcome=outcome)
+    if outcome not in ("won", "lost", "failed"):
+        return
+    usage = _usage_for_current_job()
+    if usage is None:
+        return
+    with _job_usage_lock:
+        usage.hedges += 1
+        usage.hedges_won += 1 if outcome == "won" else 0
+
+
+def render_metrics() -> str:
+    """Render the process registry in Prometheus text format."""
+    return REGISTRY.render()
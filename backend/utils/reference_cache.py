@@ -0,0 +1,228 @@
+"""
+Reference Cache
+
+Persistent cross-job cache for the work derived from a user's reference
+photos: the visual fingerprint and the character sheet image. A job that
+reuses the same photos (another style, edited memories) skips visual
+analysis and character sheet generation on a hit.
+
+Entries are files in one directory:
+
+    <key>.json     visual fingerprint
+    <key>.jpg      character sheet
+
+Keys are SHA-256 digests over the sorted content hashes of the reference
+images, the physical characteristics and whatever else the entry depends
+on (see reference_digest and entry_key). A file's mtime is when it was
+stored, which the TTL is measured from; its atime is set on every hit
+and orders LRU eviction. Timestamps live on the files themselves, so worker processes
+sharing the directory see each other's entries without an index.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import sys
+sys.path.append('..')
+
+from models.user_input import ReferenceImages
+from models.visual import VisualFingerprint
+from . import metrics
+
+
+# Bump to invalidate entries written by older prompts or models
+CACHE_VERSION = "1"
+
+FINGERPRINT = "fingerprint"
+CHARACTER_SHEET = "character_sheet"
+_SUFFIXES = {FINGERPRINT: ".json", CHARACTER_SHEET: ".jpg"}
+
+_HASH_CHUNK = 1 << 20
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def reference_digest(reference_images: ReferenceImages) -> str:
+    """
+    Digest of what a job's references look like.
+    
+    Image order and file names do not matter, only their content.
+    
+    Raises:
+        OSError: If a reference image cannot be read
+    """
+    digest = hashlib.sha256()
+    digest.update(reference_images.reference_input_mode.encode() + b"\0")
+    for content in sorted(_file_digest(path) for path in reference_images.paths):
+        digest.update(content.encode() + b"\0")
+    if reference_images.physical_characteristics is not None:
+        digest.update(reference_images.physical_characteristics.model_dump_json().encode())
+    return digest.hexdigest()
+
+
+def entry_key(digest: str, kind: str, *parts: str) -> str:
+    """
+    Cache key for an entry derived from the references.
+    
+    Args:
+        digest: reference_digest of the job's references
+        kind: FINGERPRINT or CHARACTER_SHEET
+        parts: Other inputs the entry depends on (style, language)
+    """
+    return hashlib.sha256("\0".join((CACHE_VERSION, digest, kind, *parts)).encode()).hexdigest()
+
+
+def is_cacheable(reference_images: ReferenceImages, fingerprint: VisualFingerprint) -> bool:
+    """
+    Whether a fingerprint, and a character sheet drawn from it, may be cached.
+    
+    Fallback fingerprints from a failed image analysis carry no per-image
+    analysis and are not reused by later jobs.
+    """
+    if reference_images.has_images():
+        return bool(fingerprint.reference_image_analysis)
+    return reference_images.has_characteristics()
+
+
+class ReferenceCache:
+    """
+    Disk cache of fingerprints and character sheets with TTL and LRU eviction.
+    
+    Blocking file I/O; call from a worker thread.
+    """
+    
+    def __init__(self, directory: str, max_entries: int = 64, max_bytes: int = 256 * 1024 * 1024,
+                 ttl_seconds: float = 7 * 24 * 3600):
+        """
+        Args:
+            directory: Cache directory, created on the first write
+            max_entries: Maximum number of entries (files)
+            max_bytes: Maximum total size of the entries
+            ttl_seconds: Entries older than this are expired
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+    
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.directory, key + _SUFFIXES[kind])
+    
+    def _lookup(self, kind: str, key: str) -> Optional[str]:
+        """Path of a live entry, marked as used; expired entries are removed."""
+        path = self._path(kind, key)
+        with self._lock:
+            try:
+                stored = os.stat(path).st_mtime
+            except FileNotFoundError:
+                metrics.REFERENCE_CACHE_LOOKUPS.inc(kind=kind, outcome="miss")
+                return None
+            now = time.time()
+            if now - stored > self.ttl_seconds:
+                self._remove(path, "ttl")
+                metrics.REFERENCE_CACHE_LOOKUPS.inc(kind=kind, outcome="expired")
+                return None
+            os.utime(path, (now, stored))
+        metrics.REFERENCE_CACHE_LOOKUPS.inc(kind=kind, outcome="hit")
+        return path
+    
+    def _store(self, kind: str, key: str, write) -> None:
+        """Write an entry atomically via write(temp_path), then evict."""
+        os.makedirs(self.directory, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        os.close(handle)
+        try:
+            write(temp_path)
+            os.replace(temp_path, self._path(kind, key))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self.evict()
+    
+    def _remove(self, path: str, reason: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        metrics.REFERENCE_CACHE_EVICTIONS.inc(reason=reason)
+    
+    def _entries(self) -> List[Tuple[str, os.stat_result]]:
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for name in os.listdir(self.directory):
+            if name.startswith("."):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                entries.append((path, os.stat(path)))
+            except FileNotFoundError:
+                continue
+        return entries
+    
+    def evict(self) -> None:
+        """Remove expired entries, then least recently used ones until within the limits."""
+        with self._lock:
+            now = time.time()
+            live = []
+            for path, stat in self._entries():
+                if now - stat.st_mtime > self.ttl_seconds:
+                    self._remove(path, "ttl")
+                else:
+                    live.append((path, stat))
+            
+            live.sort(key=lambda entry: entry[1].st_atime)
+            total = sum(stat.st_size for _, stat in live)
+            while live and (len(live) > self.max_entries or total > self.max_bytes):
+                path, stat = live.pop(0)
+                self._remove(path, "lru")
+                total -= stat.st_size
+    
+    def get_fingerprint(self, key: str) -> Optional[VisualFingerprint]:
+        path = self._lookup(FINGERPRINT, key)
+        if path is None:
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                return VisualFingerprint.model_validate_json(f.read())
+        except (OSError, ValueError):
+            # Corrupt or removed meanwhile: drop it and regenerate
+            self._remove(path, "invalid")
+            return None
+    
+    def put_fingerprint(self, key: str, fingerprint: VisualFingerprint) -> None:
+        # The sheet path belongs to the job that generated it
+        data = fingerprint.model_dump_json(exclude={"character_sheet_path"})
+        
+        def write(temp_path: str):
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+        
+        self._store(FINGERPRINT, key, write)
+    
+    def get_character_sheet(self, key: str, output_path: str) -> Optional[str]:
+        """Copy a cached character sheet to output_path; returns output_path on a hit."""
+        path = self._lookup(CHARACTER_SHEET, key)
+        if path is None:
+            return None
+        try:
+            shutil.copyfile(path, output_path)
+        except FileNotFoundError:
+            return None
+        return output_path
+    
+    def put_character_sheet(self, key: str, image_path: str) -> None:
+        self._store(CHARACTER_SHEET, key, lambda temp_path: shutil.copyfile(image_path, temp_path))
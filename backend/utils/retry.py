@@ -0,0 +1,350 @@
+"""
+Retry Policy
+
+Shared retry handling for model calls and image generation.
+
+Failures are classified before deciding whether to retry:
+
+    throttle   - quota / rate limits (429, RESOURCE_EXHAUSTED); retried,
+                 waiting at least as long as the server's retry hint
+    transient  - overloads, timeouts, 5xx, empty responses; retried
+    safety     - refused by safety filters (an explicit block or finish
+                 reason); retrying the same request gives the same
+                 answer, so it is not retried
+    permanent  - invalid requests, auth errors; not retried
+
+Backoff uses decorrelated jitter (each delay is drawn between the base
+delay and three times the previous delay, capped), so pages failing
+together do not retry in lockstep. Each job has a retry budget that
+bounds the extra calls a struggling backend can cost a single book.
+"""
+
+import re
+import random
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from . import metrics
+from .job_context import current_job, current_stage
+
+logger = logging.getLogger("memorybook")
+
+T = TypeVar("T")
+
+THROTTLE = "throttle"
+TRANSIENT = "transient"
+SAFETY = "safety"
+PERMANENT = "permanent"
+
+RETRYABLE = (THROTTLE, TRANSIENT)
+
+_THROTTLE_STATUSES = {"RESOURCE_EXHAUSTED"}
+_TRANSIENT_STATUSES = {"UNAVAILABLE", "DEADLINE_EXCEEDED", "INTERNAL", "ABORTED", "UNKNOWN"}
+# Finish and block reasons meaning the request was refused by safety or
+# policy filters rather than failing
+REFUSAL_REASONS = {
+    "SAFETY", "IMAGE_SAFETY", "PROHIBITED_CONTENT", "IMAGE_PROHIBITED_CONTENT", "BLOCKLIST", "SPII",
+}
+_REASON_KEYS = ("blockReason", "finishReason", "block_reason", "finish_reason")
+
+
+@dataclass(frozen=True)
+class Failure:
+    """A classified failure."""
+    error_class: str
+    message: str = ""
+    retry_after: Optional[float] = None
+    
+    @property
+    def retryable(self) -> bool:
+        return self.error_class in RETRYABLE
+
+
+class ModelCallError(RuntimeError):
+    """A failed model call, classified for retry decisions."""
+    
+    def __init__(self, message: str, failure: Failure):
+        super().__init__(message)
+        self.failure = failure
+    
+    @property
+    def error_class(self) -> str:
+        return self.failure.error_class
+
+
+def _parse_duration(value: Any) -> Optional[float]:
+    """Parse "37s", "1.5s" or a number of seconds."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*s?\s*", value)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def _find_retry_delay(details: Any) -> Optional[float]:
+    """Find a google.rpc.RetryInfo retryDelay anywhere in an error payload."""
+    if isinstance(details, dict):
+        if "retryDelay" in details:
+            return _parse_duration(details["retryDelay"])
+        values = details.values()
+    elif isinstance(details, (list, tuple)):
+        values = details
+    else:
+        return None
+    for value in values:
+        delay = _find_retry_delay(value)
+        if delay is not None:
+            return delay
+    return None
+
+
+def _find_refusal_reason(details: Any) -> Optional[str]:
+    """Find a safety/policy block or finish reason anywhere in an error payload."""
+    if isinstance(details, dict):
+        for key in _REASON_KEYS:
+            reason = str(details.get(key) or "").upper()
+            if reason in REFUSAL_REASONS:
+                return reason
+        values = details.values()
+    elif isinstance(details, (list, tuple)):
+        values = details
+    else:
+        return None
+    for value in values:
+        reason = _find_refusal_reason(value)
+        if reason is not None:
+            return reason
+    return None
+
+
+def refusal_reason(error: BaseException) -> Optional[str]:
+    """
+    The safety/policy reason a request was refused for, if the error says.
+    
+    Only explicit block or finish reasons count (block_reason or
+    finish_reason attributes, or blockReason/finishReason in the error
+    details); words like "blocked" in the message do not.
+    """
+    for attribute in ("block_reason", "finish_reason"):
+        reason = getattr(error, attribute, None)
+        # The SDK uses enums, the fake plain strings
+        name = getattr(reason, "name", None) or (str(reason).upper() if reason else None)
+        if name in REFUSAL_REASONS:
+            return name
+    return _find_refusal_reason(getattr(error, "details", None))
+
+
+def retry_hint(error: BaseException) -> Optional[float]:
+    """
+    Seconds the server asked us to wait before retrying, if it said.
+    
+    Looks at a retry_after attribute, RetryInfo in the error details
+    (Gemini's format) and the Retry-After response header.
+    """
+    hint = _parse_duration(getattr(error, "retry_after", None))
+    if hint is None:
+        hint = _find_retry_delay(getattr(error, "details", None))
+    if hint is None:
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        if headers is not None:
+            try:
+                hint = _parse_duration(headers.get("Retry-After") or headers.get("retry-after"))
+            except AttributeError:
+                hint = None
+    return hint
+
+
+def classify_error(error: BaseException) -> Failure:
+    """
+    Classify an exception from a model call.
+    
+    Duck-types the code/status attributes of google.genai errors, so SDK
+    errors, the offline fake and HTTP client errors are handled alike.
+    Status codes are checked first; an error is only a safety refusal
+    when it carries an explicit block or finish reason (see
+    refusal_reason). Unknown errors are treated as transient.
+    """
+    if isinstance(error, ModelCallError):
+        return error.failure
+    
+    message = str(error)
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    status = str(getattr(error, "status", "") or "").upper()
+    if not isinstance(code, int):
+        code = None
+    
+    if code == 429 or status in _THROTTLE_STATUSES:
+        return Failure(THROTTLE, message, retry_hint(error))
+    if code is not None and 500 <= code < 600 or status in _TRANSIENT_STATUSES:
+        return Failure(TRANSIENT, message, retry_hint(error))
+    if refusal_reason(error) is not None:
+        return Failure(SAFETY, message)
+    if code is not None and 400 <= code < 500:
+        return Failure(PERMANENT, message)
+    if isinstance(error, (ValueError, TypeError, KeyError)):
+        return Failure(PERMANENT, message)
+    return Failure(TRANSIENT, message)
+
+
+def result_failure(result: Any) -> Optional[Failure]:
+    """
+    Failure of a result object with success/error_message (e.g. GenerationResult).
+    
+    Returns:
+        None for successful results
+    """
+    if getattr(result, "success", True):
+        return None
+    return Failure(
+        getattr(result, "error_class", None) or TRANSIENT,
+        getattr(result, "error_message", None) or "",
+        getattr(result, "retry_after", None)
+    )
+
+
+class RetryPolicy:
+    """
+    Retries classified failures with decorrelated jitter and per-job budgets.
+    
+    Args:
+        max_attempts: Attempts per operation, including the first
+        base_delay: Smallest backoff in seconds
+        max_delay: Largest backoff; a server hint longer than this gives up
+        budget_per_job: Retries allowed per job across all operations
+        rng: Random source (for tests)
+    """
+    
+    # Jobs whose spent budget is remembered; older jobs are forgotten
+    MAX_JOBS = 1000
+    
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        budget_per_job: int = 30,
+        rng: Optional[random.Random] = None
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_per_job = budget_per_job
+        self._rng = rng or random.Random()
+        self._spent: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def backoff(self, previous: float) -> float:
+        """Next decorrelated-jitter delay after a delay of `previous` seconds."""
+        upper = max(self.base_delay, previous * 3)
+        return min(self.max_delay, self._rng.uniform(self.base_delay, upper))
+    
+    def try_spend(self, job_id: Optional[str]) -> bool:
+        """Take one retry from the job's budget; False when it is exhausted."""
+        if not job_id:
+            return True
+        with self._lock:
+            spent = self._spent.get(job_id, 0)
+            if spent >= self.budget_per_job:
+                return False
+            self._spent[job_id] = spent + 1
+            self._spent.move_to_end(job_id)
+            while len(self._spent) > self.MAX_JOBS:
+                self._spent.popitem(last=False)
+            return True
+    
+    def spent(self, job_id: Optional[str]) -> int:
+        """Retries used by a job so far."""
+        with self._lock:
+            return self._spent.get(job_id or "", 0)
+    
+    def _give_up_reason(self, failure: Failure, attempt: int) -> Optional[str]:
+        if not failure.retryable:
+            return failure.error_class
+        if attempt >= self.max_attempts:
+            return "attempts"
+        if failure.retry_after is not None and failure.retry_after > self.max_delay:
+            return "hint_too_long"
+        if not self.try_spend(current_job().job_id):
+            return "budget"
+        return None
+    
+    async def run(
+        self,
+        operation: Callable[[int], Awaitable[T]],
+        classify_result: Optional[Callable[[T], Optional[Failure]]] = None,
+        stage: Optional[str] = None,
+        description: str = "operation"
+    ) -> T:
+        """
+        Run an operation, retrying retryable failures.
+        
+        Args:
+            operation: Called with the attempt number (1-based)
+            classify_result: Maps a returned value to a Failure (None = success);
+                for operations that report failure in their result
+            stage: Stage label for metrics (default: current stage)
+            description: What is being retried, for logs
+        
+        Returns:
+            The first successful result, or the last failed result
+        
+        Raises:
+            The last exception when the operation raised and will not be retried
+        """
+        stage = stage or current_stage()
+        delay = self.base_delay
+        attempt = 0
+        while True:
+            attempt += 1
+            error: Optional[Exception] = None
+            try:
+                result = await operation(attempt)
+                failure = classify_result(result) if classify_result else None
+            except Exception as e:
+                error, result = e, None
+                failure = classify_error(e)
+            
+            if failure is None:
+                return result
+            
+            reason = self._give_up_reason(failure, attempt)
+            if reason is not None:
+                metrics.record_retry_giveup(failure.error_class, reason, stage=stage)
+                if error is not None:
+                    raise error
+                return result
+            
+            delay = self.backoff(delay)
+            wait = max(delay, failure.retry_after or 0.0)
+            metrics.record_retry(failure.error_class, stage=stage, delay=wait)
+            logger.warning(
+                f"[retry] {description} failed ({failure.error_class}, attempt {attempt}/"
+                f"{self.max_attempts}), retrying in {wait:.1f}s: {failure.message[:200]}"
+            )
+            await asyncio.sleep(wait)
+
+
+# Global policy instance
+_retry_policy: Optional[RetryPolicy] = None
+
+
+def get_retry_policy() -> RetryPolicy:
+    """Get the process-wide retry policy configured from the app config."""
+    global _retry_policy
+    if _retry_policy is None:
+        from .config import get_config
+        
+        config = get_config()
+        _retry_policy = RetryPolicy(
+            max_attempts=config.retry_max_attempts,
+            base_delay=config.retry_base_delay,
+            max_delay=config.retry_max_delay,
+            budget_per_job=config.retry_budget_per_job
+        )
+    return _retry_policy
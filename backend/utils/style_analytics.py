@@ -0,0 +1,171 @@
+"""
+Style Analytics
+
+Book-level style consistency measured from the page images, run once
+over all pages. Each image is decoded at low resolution into a 64x64
+RGB array and NumPy computes, for all pages at once:
+
+    colour histogram   4x4x4 RGB bins
+    brightness         mean luminance
+    contrast           standard deviation of luminance
+    saturation         mean (max - min) / max over the channels
+    edge density       share of pixels with a strong luminance gradient
+    palette            k-means colour clusters per page and for the book
+
+A page's style vector is its square-rooted histogram (so Euclidean
+distance approximates the Hellinger distance) followed by the four
+scalars. Pages much further from the book's centroid than the others
+are outliers: a palette drift or a page rendered in another style.
+"""
+
+from typing import List, Optional
+
+import numpy as np
+
+import sys
+sys.path.append('..')
+
+from models.generation import GenerationResult
+from models.review import PageStyleMetrics, StyleConsistency
+
+
+ANALYSIS_SIZE = 64
+HISTOGRAM_LEVELS = 4
+PALETTE_SIZE = 5
+PALETTE_SAMPLE_STEP = 4
+KMEANS_ITERATIONS = 8
+EDGE_THRESHOLD = 0.1
+
+# A page is an outlier when its distance exceeds the median by this many
+# (scaled) median absolute deviations, and is at least MIN_OUTLIER_DISTANCE
+MIN_PAGES_FOR_OUTLIERS = 4
+OUTLIER_MADS = 3.0
+MIN_OUTLIER_DISTANCE = 0.25
+
+# Mean distance at which the consistency score reaches 0
+SCORE_SCALE = 0.8
+
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def _load(path: str) -> Optional[np.ndarray]:
+    """A page as a 64x64x3 float array in [0, 1], or None if unreadable."""
+    from PIL import Image
+    
+    try:
+        with Image.open(path) as img:
+            img.draft("RGB", (ANALYSIS_SIZE, ANALYSIS_SIZE))
+            small = img.convert("RGB").resize((ANALYSIS_SIZE, ANALYSIS_SIZE), Image.Resampling.BILINEAR)
+    except (OSError, ValueError, SyntaxError):
+        return None
+    return np.asarray(small, dtype=np.float32) / 255.0
+
+
+def _kmeans(pixels: np.ndarray, k: int) -> np.ndarray:
+    """
+    Batched k-means over pixel sets.
+    
+    Args:
+        pixels: (batches, points, 3) colours
+    
+    Returns:
+        (batches, k, 3) cluster centres, largest cluster first
+    """
+    batches, points, _ = pixels.shape
+    # Deterministic start: pixels evenly spaced in luminance order
+    order = np.argsort(pixels @ _LUMA, axis=1)
+    seeds = order[:, np.linspace(0, points - 1, k).astype(int)]
+    centres = np.take_along_axis(pixels, seeds[..., None], axis=1)
+    
+    for _ in range(KMEANS_ITERATIONS):
+        # |p - c|^2 up to the per-pixel |p|^2 term, which does not change the argmin
+        distances = (centres ** 2).sum(axis=-1)[:, None, :] - 2 * pixels @ centres.transpose(0, 2, 1)
+        members = np.eye(k, dtype=np.float32)[distances.argmin(axis=-1)]
+        counts = members.sum(axis=1)
+        sums = members.transpose(0, 2, 1) @ pixels
+        centres = np.where(counts[..., None] > 0, sums / np.maximum(counts, 1)[..., None], centres)
+    
+    order = np.argsort(-counts, axis=1)
+    return np.take_along_axis(centres, order[..., None], axis=1)
+
+
+def _hex(colours: np.ndarray) -> List[str]:
+    return ["#{:02x}{:02x}{:02x}".format(*(np.clip(c, 0, 1) * 255).round().astype(int)) for c in colours]
+
+
+def analyze_book_style(results: List[GenerationResult], page_numbers: List[int]) -> Optional[StyleConsistency]:
+    """
+    Measure the style of every page image and how consistent the book is.
+    
+    Args:
+        results: Generation results; pages without a readable image are skipped
+        page_numbers: Page number of each result
+    
+    Returns:
+        StyleConsistency, or None when fewer than two pages could be read
+    """
+    loaded = []
+    for result, page_number in zip(results, page_numbers):
+        if result.has_image and result.image_path:
+            pixels = _load(result.image_path)
+            if pixels is not None:
+                loaded.append((page_number, pixels))
+    if len(loaded) < 2:
+        return None
+    
+    pages = np.stack([pixels for _, pixels in loaded])
+    count = len(loaded)
+    flat = pages.reshape(count, -1, 3)
+    
+    luma = flat @ _LUMA
+    brightness = luma.mean(axis=1)
+    contrast = luma.std(axis=1)
+    high = flat.max(axis=-1)
+    saturation = np.where(high > 0, (high - flat.min(axis=-1)) / np.maximum(high, 1e-6), 0).mean(axis=1)
+    
+    grid = luma.reshape(count, ANALYSIS_SIZE, ANALYSIS_SIZE)
+    gradient = np.hypot(np.diff(grid, axis=2)[:, :-1, :], np.diff(grid, axis=1)[:, :, :-1])
+    edge_density = (gradient > EDGE_THRESHOLD).mean(axis=(1, 2))
+    
+    levels = np.minimum((flat * HISTOGRAM_LEVELS).astype(np.int64), HISTOGRAM_LEVELS - 1)
+    bins = HISTOGRAM_LEVELS ** 3
+    index = levels[..., 0] * HISTOGRAM_LEVELS ** 2 + levels[..., 1] * HISTOGRAM_LEVELS + levels[..., 2]
+    index += np.arange(count)[:, None] * bins
+    histograms = np.bincount(index.ravel(), minlength=count * bins).reshape(count, bins) / flat.shape[1]
+    
+    vectors = np.hstack([
+        np.sqrt(histograms),
+        np.stack([brightness, contrast, saturation, edge_density], axis=1)
+    ])
+    distances = np.linalg.norm(vectors - vectors.mean(axis=0), axis=1)
+    
+    median = float(np.median(distances))
+    spread = float(np.median(np.abs(distances - median))) * 1.4826
+    threshold = max(median + OUTLIER_MADS * spread, MIN_OUTLIER_DISTANCE)
+    outliers = distances > threshold if count >= MIN_PAGES_FOR_OUTLIERS else np.zeros(count, dtype=bool)
+    
+    sample = flat[:, ::PALETTE_SAMPLE_STEP]
+    page_palettes = _kmeans(sample, PALETTE_SIZE)
+    book_palette = _kmeans(sample.reshape(1, -1, 3), PALETTE_SIZE)[0]
+    
+    mean_distance = float(distances.mean())
+    return StyleConsistency(
+        pages=[
+            PageStyleMetrics(
+                page_number=page_number,
+                brightness=round(float(brightness[i]), 4),
+                contrast=round(float(contrast[i]), 4),
+                saturation=round(float(saturation[i]), 4),
+                edge_density=round(float(edge_density[i]), 4),
+                palette=_hex(page_palettes[i]),
+                distance=round(float(distances[i]), 4),
+                outlier=bool(outliers[i])
+            )
+            for i, (page_number, _) in enumerate(loaded)
+        ],
+        book_palette=_hex(book_palette),
+        mean_distance=round(mean_distance, 4),
+        outlier_threshold=round(threshold, 4),
+        outlier_pages=[page_number for i, (page_number, _) in enumerate(loaded) if outliers[i]],
+        consistency_score=round(10 * min(1.0, max(0.0, 1 - mean_distance / SCORE_SCALE)), 2)
+    )
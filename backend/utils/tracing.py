@@ -0,0 +1,278 @@
+"""
+Tracing Utilities
+
+Lightweight span-based tracing for the generation pipeline.
+
+Spans follow the OpenTelemetry data model (trace and span ids, parent
+span, start/end in Unix nanoseconds, attributes and status) without
+requiring the OpenTelemetry SDK. The active span is kept in a
+ContextVar, so spans opened inside asyncio.gather children are
+parented correctly.
+
+A job's trace id is derived from its job id, and finished spans of job
+traces are appended as JSON lines to one file per trace. Spans outside
+a job (e.g. /enhance-text) are not exported. The API reads that file
+back to build a waterfall timeline, which also works in queue mode
+because workers and the API share the storage directory.
+"""
+
+import os
+import json
+import time
+import uuid
+import hashlib
+import secrets
+import threading
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from .job_context import current_job
+
+
+STATUS_UNSET = "UNSET"
+STATUS_OK = "OK"
+STATUS_ERROR = "ERROR"
+
+
+def trace_id_for_job(job_id: str) -> str:
+    """
+    Derive a 32 hex digit trace id from a job id.
+    
+    Args:
+        job_id: Job identifier (usually a UUID)
+    
+    Returns:
+        Trace id
+    """
+    try:
+        return uuid.UUID(job_id).hex
+    except (ValueError, AttributeError, TypeError):
+        return hashlib.sha256(str(job_id).encode("utf-8")).hexdigest()[:32]
+
+
+@dataclass
+class Span:
+    """A timed operation within a trace."""
+    name: str
+    trace_id: str
+    span_id: str = field(default_factory=lambda: secrets.token_hex(8))
+    parent_span_id: Optional[str] = None
+    start_time_unix_nano: int = field(default_factory=time.time_ns)
+    end_time_unix_nano: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = STATUS_UNSET
+    status_message: Optional[str] = None
+    sampled: bool = True
+    
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Set one attribute."""
+        self.attributes[key] = value
+    
+    def set_status(self, status: str, message: Optional[str] = None) -> None:
+        """Set the span status."""
+        self.status = status
+        self.status_message = message
+    
+    def record_exception(self, error: BaseException) -> None:
+        """Mark the span as failed by an exception."""
+        self.set_status(STATUS_ERROR, f"{type(error).__name__}: {error}")
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time_unix_nano": self.start_time_unix_nano,
+            "end_time_unix_nano": self.end_time_unix_nano,
+            "attributes": self.attributes,
+            "status": self.status,
+            "status_message": self.status_message,
+        }
+
+
+class FileSpanExporter:
+    """Appends finished spans to <directory>/<trace_id>.jsonl."""
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+    
+    def path_for(self, trace_id: str) -> str:
+        return os.path.join(self.directory, f"{trace_id}.jsonl")
+    
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path_for(span.trace_id), "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    
+    def load(self, trace_id: str) -> List[Dict[str, Any]]:
+        """Read all exported spans of a trace."""
+        path = self.path_for(trace_id)
+        if not os.path.exists(path):
+            return []
+        spans = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        spans.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # Partially written line from a crashed process
+                        continue
+        return spans
+    
+    def delete(self, trace_id: str) -> None:
+        path = self.path_for(trace_id)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "memorybook_span", default=None
+)
+_exporter: Optional[FileSpanExporter] = None
+
+
+def get_exporter() -> Optional[FileSpanExporter]:
+    """Get the span exporter, or None when tracing is disabled."""
+    global _exporter
+    if _exporter is None:
+        from utils.config import get_config
+        from store.file_storage import STORAGE_DIR
+        
+        config = get_config()
+        if not config.tracing_enabled:
+            return None
+        _exporter = FileSpanExporter(config.trace_directory or os.path.join(STORAGE_DIR, "traces"))
+    return _exporter
+
+
+def set_exporter(exporter: Optional[FileSpanExporter]) -> None:
+    """Replace the span exporter (used by tests and scripts)."""
+    global _exporter
+    _exporter = exporter
+
+
+def current_span() -> Optional[Span]:
+    """Get the active span of the running task."""
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, trace_id: Optional[str] = None, **attributes: Any) -> Iterator[Span]:
+    """
+    Record a span around a block of code.
+    
+    The span is a child of the active span. A root span joins the trace
+    of the current job, or starts a new trace.
+    
+    Args:
+        name: Span name, e.g. "agent.NormalizerAgent" or "gemini.generate_image"
+        trace_id: Explicit trace id for root spans
+        **attributes: Span attributes (page, attempt, model, ...)
+    
+    Yields:
+        The active Span
+    """
+    job_id = current_job().job_id
+    parent = _current_span.get()
+    sampled = True
+    if parent is not None:
+        trace_id = parent.trace_id
+        sampled = parent.sampled
+    elif trace_id is None:
+        sampled = job_id is not None
+        trace_id = trace_id_for_job(job_id) if job_id else secrets.token_hex(16)
+    
+    if job_id and "job_id" not in attributes:
+        attributes["job_id"] = job_id
+    
+    current = Span(
+        name=name,
+        trace_id=trace_id,
+        parent_span_id=parent.span_id if parent else None,
+        attributes=attributes,
+        sampled=sampled
+    )
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_exception(e)
+        raise
+    else:
+        if current.status == STATUS_UNSET:
+            current.set_status(STATUS_OK)
+    finally:
+        _current_span.reset(token)
+        current.end_time_unix_nano = time.time_ns()
+        exporter = get_exporter() if current.sampled else None
+        if exporter is not None:
+            try:
+                exporter.export(current)
+            except OSError:
+                # Tracing must never break the pipeline
+                pass
+
+
+def build_waterfall(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Turn exported spans into a waterfall-ready timeline.
+    
+    Spans are ordered depth-first by start time with offsets relative to
+    the start of the trace.
+    
+    Args:
+        spans: Exported span dicts of one trace
+    
+    Returns:
+        Timeline with trace bounds and one row per span
+    """
+    if not spans:
+        return {"trace_id": None, "duration_ms": 0, "span_count": 0, "spans": []}
+    
+    trace_start = min(s["start_time_unix_nano"] for s in spans)
+    trace_end = max(s.get("end_time_unix_nano") or s["start_time_unix_nano"] for s in spans)
+    
+    by_id = {s["span_id"]: s for s in spans}
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for s in spans:
+        parent = s.get("parent_span_id")
+        # Spans whose parent was never exported (e.g. crashed worker) become roots
+        children.setdefault(parent if parent in by_id else None, []).append(s)
+    for group in children.values():
+        group.sort(key=lambda s: s["start_time_unix_nano"])
+    
+    rows = []
+    
+    def visit(node: Dict[str, Any], depth: int) -> None:
+        end = node.get("end_time_unix_nano") or node["start_time_unix_nano"]
+        rows.append({
+            "span_id": node["span_id"],
+            "parent_span_id": node.get("parent_span_id"),
+            "name": node["name"],
+            "depth": depth,
+            "start_offset_ms": round((node["start_time_unix_nano"] - trace_start) / 1e6, 3),
+            "duration_ms": round((end - node["start_time_unix_nano"]) / 1e6, 3),
+            "status": node.get("status"),
+            "status_message": node.get("status_message"),
+            "attributes": node.get("attributes", {}),
+        })
+        for child in children.get(node["span_id"], []):
+            visit(child, depth + 1)
+    
+    for root in children.get(None, []):
+        visit(root, 0)
+    
+    return {
+        "trace_id": spans[0]["trace_id"],
+        "duration_ms": round((trace_end - trace_start) / 1e6, 3),
+        "span_count": len(rows),
+        "spans": rows,
+    }
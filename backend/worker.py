@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Job Worker
+
+Standalone worker entry point for queue mode. Each worker process
+claims jobs from the shared SQLite queue, runs the pipeline and
+reports progress to the shared job store, so several processes can
+drain the queue in parallel while the API process only serves HTTP.
+
+Usage:
+    cd backend
+    JOB_EXECUTION_MODE=queue python run_local.py   # API
+    python worker.py --processes 4                 # workers
+"""
+
+import os
+import sys
+import signal
+import socket
+import asyncio
+import argparse
+import threading
+import multiprocessing
+from typing import Optional, Set
+
+# Load environment variables from .env file
+from dotenv import load_dotenv
+load_dotenv()
+
+from models.job_payload import JobPayload
+from pipeline.job_processor import process_job_background
+from store import get_job_store, get_job_queue, JobStatus, QueuedJob
+from utils.config import load_config_from_env
+from utils.logging import setup_logger
+from utils.job_context import track_task_activity
+from utils.loop_monitor import start_loop_monitor
+from utils.retry import ModelCallError
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Whether a failed job is worth another attempt.
+    
+    Only failures of throttled or transient model calls are: the job's
+    calls were already retried, but the backend may recover before the
+    job is claimed again. Anything else would fail the same way.
+    """
+    while error is not None:
+        if isinstance(error, ModelCallError):
+            return error.failure.retryable
+        error = error.__cause__
+    return False
+
+
+class LeaseKeeper(threading.Thread):
+    """
+    Heartbeat thread for a claimed job.
+    
+    Runs outside the event loop so that blocking SDK calls inside the
+    pipeline cannot starve the heartbeat and lose the lease.
+    """
+    
+    def __init__(self, job_id: str, worker_id: str, interval: float,
+                 loop: asyncio.AbstractEventLoop, task: asyncio.Task, logger):
+        super().__init__(daemon=True, name=f"lease-{job_id[:8]}")
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.interval = interval
+        self.loop = loop
+        self.task = task
+        self.logger = logger
+        self._stopped = threading.Event()
+    
+    def run(self):
+        queue = get_job_queue()
+        while not self._stopped.wait(self.interval):
+            if not queue.heartbeat(self.job_id, self.worker_id):
+                self.logger.warning(f"[{self.job_id}] Lease lost by {self.worker_id}, cancelling job")
+                self.loop.call_soon_threadsafe(self.task.cancel)
+                return
+    
+    def stop(self):
+        self._stopped.set()
+
+
+class Worker:
+    """Claims queued jobs and runs them with bounded concurrency."""
+    
+    def __init__(self, worker_id: str, concurrency: int, config, logger):
+        self.worker_id = worker_id
+        self.concurrency = concurrency
+        self.config = config
+        self.logger = logger
+        self.queue = get_job_queue()
+        self.job_store = get_job_store()
+        self._running: Set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+    
+    def stop(self):
+        """Stop claiming new jobs; in-flight jobs are allowed to finish."""
+        self._stopping.set()
+    
+    async def run(self):
+        """Main claim loop."""
+        self.logger.info(f"[{self.worker_id}] Worker started (concurrency={self.concurrency})")
+        
+        while not self._stopping.is_set():
+            self._reap_expired()
+            
+            job: Optional[QueuedJob] = None
+            if len(self._running) < self.concurrency:
+                job = await asyncio.to_thread(self.queue.claim, self.worker_id)
+            
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.config.worker_poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            task = asyncio.create_task(self._handle(job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+        
+        if self._running:
+            self.logger.info(f"[{self.worker_id}] Waiting for {len(self._running)} in-flight jobs")
+            await asyncio.gather(*self._running, return_exceptions=True)
+        
+        await asyncio.to_thread(self.job_store.flush)
+        self.logger.info(f"[{self.worker_id}] Worker stopped")
+    
+    def _reap_expired(self):
+        """Requeue jobs abandoned by dead workers and fail those out of attempts."""
+        for job_id in self.queue.reap_expired():
+            self.logger.error(f"[{job_id}] Lease expired after {self.queue.max_attempts} attempts, giving up")
+            self.job_store.update_job_status(
+                job_id,
+                status=JobStatus.FAILED,
+                error="Job abandoned by worker too many times"
+            )
+    
+    async def _handle(self, job: QueuedJob):
+        """Run a claimed job while keeping its lease alive."""
+        self.logger.info(f"[{job.job_id}] Claimed by {self.worker_id} (attempt {job.attempts})")
+        
+        try:
+            payload = JobPayload.model_validate(job.payload)
+        except Exception as e:
+            self.logger.error(f"[{job.job_id}] Invalid queued payload: {e}")
+            await asyncio.to_thread(self.queue.fail, job.job_id, self.worker_id, str(e))
+            self.job_store.update_job_status(job.job_id, status=JobStatus.FAILED, error=str(e))
+            return
+        
+        work = asyncio.create_task(
+            process_job_background(job.job_id, payload, job.reference_paths, raise_on_failure=True)
+        )
+        keeper = LeaseKeeper(
+            job.job_id,
+            self.worker_id,
+            interval=max(1.0, self.queue.lease_seconds / 3),
+            loop=asyncio.get_running_loop(),
+            task=work,
+            logger=self.logger
+        )
+        keeper.start()
+        
+        try:
+            await work
+            # The record's final state is written before the job is done
+            await asyncio.to_thread(self.job_store.flush)
+            await asyncio.to_thread(self.queue.complete, job.job_id, self.worker_id)
+        except asyncio.CancelledError:
+            # Lease was lost; another worker owns the job now
+            self.logger.warning(f"[{job.job_id}] Abandoned by {self.worker_id}")
+        except Exception as e:
+            retry = is_retryable(e) and job.attempts < self.queue.max_attempts
+            await asyncio.to_thread(self.queue.fail, job.job_id, self.worker_id, str(e), retry=retry)
+            if retry:
+                self.logger.warning(f"[{job.job_id}] Attempt {job.attempts} failed, requeued: {e}")
+                self.job_store.requeue_job(job.job_id)
+            else:
+                self.logger.error(f"[{job.job_id}] Job failed: {e}")
+                self.job_store.update_job_status(job.job_id, status=JobStatus.FAILED, error=str(e))
+        finally:
+            keeper.stop()
+
+
+def _run_process(index: int, concurrency: int):
+    """Entry point for a single worker process."""
+    config = load_config_from_env()
+    config.execution_mode = "queue"
+    logger = setup_logger("memorybook", log_file=config.log_file)
+    
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{index}"
+    worker = Worker(worker_id, concurrency, config, logger)
+    
+    async def main():
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, worker.stop)
+            except NotImplementedError:
+                # Windows: fall back to KeyboardInterrupt
+                pass
+        track_task_activity()
+        start_loop_monitor()
+        await worker.run()
+    
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    """Start one or more worker processes."""
+    parser = argparse.ArgumentParser(description="Run MemoryBook queue workers")
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=int(os.getenv("WORKER_PROCESSES", "1")),
+        help="Number of worker processes (default: 1)"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=int(os.getenv("WORKER_CONCURRENCY", "1")),
+        help="Jobs run concurrently inside each process (default: 1)"
+    )
+    
+    args = parser.parse_args()
+    
+    if args.processes <= 1:
+        _run_process(0, args.concurrency)
+        return
+    
+    processes = [
+        multiprocessing.Process(target=_run_process, args=(i, args.concurrency), name=f"worker-{i}")
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()